@@ -0,0 +1,91 @@
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mp2c import Converter  # noqa: E402
+from programs import generate_program  # noqa: E402
+
+
+async def measure(convert, sources, in_flight):
+    """
+    Convert the sources with `in_flight` conversions at a time, while a ticker measures how late the event loop wakes
+    it up. Return the wall time, the median latency of a conversion and the largest delay of the event loop.
+    """
+    latencies = []
+    delays = []
+    semaphore = asyncio.Semaphore(in_flight)
+    done = asyncio.Event()
+
+    async def tick():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            delays.append(time.perf_counter() - start - 0.001)
+
+    async def one(source):
+        async with semaphore:
+            start = time.perf_counter()
+            result = await convert(source)
+            latencies.append(time.perf_counter() - start)
+            assert result.success
+
+    ticker = asyncio.create_task(tick())
+    start = time.perf_counter()
+    await asyncio.gather(*(one(source) for source in sources))
+    wall = time.perf_counter() - start
+    done.set()
+    await ticker
+    return wall, statistics.median(latencies), max(delays, default = 0)
+
+
+def main():
+    """
+    Compare calling the blocking `Converter.convert` from a coroutine with awaiting `Converter.aconvert`, with 1, 8 and
+    64 conversions in flight, for the built-in formatter and for clang-format. Blocking calls stall the event loop for
+    a whole conversion, while `aconvert` keeps it responsive. The CPU work runs in an executor with one thread per CPU,
+    as more threads only contend for the GIL, and the clang-format processes of the conversions in flight run at the
+    same time.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--conversions", type = int, default = 128, help = "number of conversions")
+    parser.add_argument("-s", "--subprograms", type = int, default = 10, help = "subprograms per program")
+    parser.add_argument("--in-flight", type = int, nargs = "+", default = [1, 8, 64],
+                        help = "numbers of conversions in flight")
+    parser.add_argument("-w", "--workers", type = int, default = os.cpu_count() or 1,
+                        help = "threads of the executor running the CPU work of aconvert")
+    args = parser.parse_args()
+
+    # distinct programs, so that no conversion is a repeat of another
+    code = generate_program(args.subprograms, 10)
+    sources = [code.replace("program bench", "program bench{}".format(index), 1) for index in range(args.conversions)]
+    formats = ["builtin"] + (["clang"] if shutil.which("clang-format") else [])
+    print("CPUs: {}, {} conversions of {} lines".format(os.cpu_count(), args.conversions, code.count("\n") + 1))
+    print("{:>8} {:>10} {:>10} {:>12} {:>14} {:>16}".format("format", "mode", "in flight", "wall (s)",
+                                                          "latency (ms)", "max stall (ms)"))
+    with ThreadPoolExecutor(args.workers) as executor:
+        for format in formats:
+            converter = Converter("lalr", format = format)
+            converter.convert(sources[0])
+
+            async def blocking(source):
+                return converter.convert(source, "never")
+
+            async def awaiting(source):
+                return await converter.aconvert(source, "never", executor)
+
+            for in_flight in args.in_flight:
+                for mode, convert in (("blocking", blocking), ("aconvert", awaiting)):
+                    wall, latency, stall = asyncio.run(measure(convert, sources, in_flight))
+                    print("{:>8} {:>10} {:>10} {:>12.3f} {:>14.2f} {:>16.2f}".format(format, mode, in_flight, wall,
+                                                                                    latency * 1000, stall * 1000))
+
+
+if __name__ == '__main__':
+    main()
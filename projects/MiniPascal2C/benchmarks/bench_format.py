@@ -0,0 +1,46 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mp2c import Context, Converter, format_code, postprocess, preprocess, visit_programstruct  # noqa: E402
+from mp2c.formatter import format_tokens  # noqa: E402
+from programs import generate_sizes  # noqa: E402
+
+
+def best_time(func, repeat):
+    """
+    Return the best wall time of calling `func` `repeat` times.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    """
+    Compare the built-in formatter with clang-format across program sizes.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--sizes", type = int, nargs = "+", default = [25, 100, 1000, 5000],
+                        help = "approximate program sizes in lines")
+    parser.add_argument("-r", "--repeat", type = int, default = 5, help = "number of runs per measurement")
+    args = parser.parse_args()
+
+    converter = Converter("lalr")
+    print("{:>8} {:>10} {:>14} {:>14} {:>9}".format("lines", "tokens", "builtin (s)", "clang (s)", "speedup"))
+    for lines, code in generate_sizes(args.sizes):
+        tokens = postprocess(visit_programstruct(converter.parser.parse(preprocess(code)), Context()))
+        builtin = best_time(lambda: format_tokens(tokens), args.repeat)
+        clang = best_time(lambda: format_code("\n".join(tokens)), args.repeat)
+        print("{:>8} {:>10} {:>14.5f} {:>14.5f} {:>8.1f}x".format(lines, len(tokens), builtin, clang,
+                                                                 clang / builtin))
+
+
+if __name__ == '__main__':
+    main()
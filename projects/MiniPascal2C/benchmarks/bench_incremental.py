@@ -0,0 +1,94 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mp2c import Converter  # noqa: E402
+from mp2c.incremental import IncrementalConverter  # noqa: E402
+from programs import generate_program  # noqa: E402
+
+
+def replay_edits(code, subprograms, edits):
+    """
+    Generate the successive versions of a program edited as in an editor session.
+
+    The edits cycle through changing a statement in a subprogram, adding a statement to the main block, adding a
+    comment, and adding then removing a local variable.
+
+    Args:
+        code (str): The initial program, from `generate_program`.
+        subprograms (int): The number of subprograms of the program.
+        edits (int): The number of edits.
+
+    Returns:
+        list: A list of (edit description, program) tuples.
+    """
+    versions = []
+    for edit in range(edits):
+        index = edit * 7 % subprograms
+        body = "t" if index % 2 == 0 else "a"
+        kind = edit % 4
+        if kind == 0:
+            old = "  {0} := {0} + a * b - 1 div 3;".format(body)
+            marker = "function f{}(".format(index) if index % 2 == 0 else "procedure p{}(".format(index)
+            position = code.index(marker)
+            position = code.index(old, position)
+            code = code[:position] + old.replace("1 div 3", "{} div 3".format(edit + 2)) + code[position + len(old):]
+            description = "change a statement of subprogram {}".format(index)
+        elif kind == 1:
+            code = code.replace("  writeln(total)\n", "  total := total + {};\n  writeln(total)\n".format(edit))
+            description = "add a statement to the main block"
+        elif kind == 2:
+            code = code.replace("begin\n  total := 0;", "begin\n  {{ edit {} }}\n  total := 0;".format(edit))
+            description = "add a comment"
+        else:
+            marker = "var k: integer;" if index % 2 else "var k, t: integer;"
+            header = "function f{}(".format(index) if index % 2 == 0 else "procedure p{}(".format(index)
+            position = code.index(marker, code.index(header))
+            declaration = marker.replace(": integer;", ", extra{}: integer;".format(edit))
+            code = code[:position] + declaration + code[position + len(marker):]
+            description = "add a local variable to subprogram {}".format(index)
+        versions.append((description, code))
+    return versions
+
+
+def main():
+    """
+    Replay a sequence of edits and compare full and incremental re-conversion times.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--subprograms", type = int, default = 80, help = "number of subprograms")
+    parser.add_argument("-e", "--edits", type = int, default = 20, help = "number of edits")
+    args = parser.parse_args()
+
+    code = generate_program(args.subprograms, 20)
+    versions = replay_edits(code, args.subprograms, args.edits)
+    full = Converter("lalr")
+    incremental = IncrementalConverter()
+    start = time.perf_counter()
+    incremental.convert(code)
+    print("{} lines, first conversion {:.3f} s".format(code.count("\n"), time.perf_counter() - start))
+    print("{:<42} {:>10} {:>10} {:>8} {:>8}".format("edit", "full (s)", "incr (s)", "parsed", "visited"))
+    full_times = []
+    incremental_times = []
+    for description, version in versions:
+        start = time.perf_counter()
+        expected = full.convert(version)
+        full_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        result = incremental.convert(version)
+        incremental_times.append(time.perf_counter() - start)
+        assert (result.code, result.error_messages) == (expected.code, expected.error_messages)
+        print("{:<42} {:>10.4f} {:>10.4f} {:>8} {:>8}".format(description, full_times[-1], incremental_times[-1],
+                                                              incremental.stats["parsed"],
+                                                              incremental.stats["visited"]))
+    print("median: full {:.4f} s, incremental {:.4f} s, {:.1f}x".format(
+        statistics.median(full_times), statistics.median(incremental_times),
+        statistics.median(full_times) / statistics.median(incremental_times)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mp2c import Converter  # noqa: E402
+from bench_optimize import best_time, build  # noqa: E402
+
+programs = {
+    # reads integers and writes their running sums, one per line
+    "sums": """program sums(input, output);
+var n, i, x, s: integer;
+begin
+  read(n);
+  s := 0;
+  for i := 1 to n do
+  begin
+    read(x);
+    s := s + x;
+    writeln(s)
+  end
+end.
+""",
+    # reads reals and writes each of them scaled, with its index
+    "scale": """program scale(input, output);
+var n, i: integer; x: real;
+begin
+  read(n);
+  for i := 1 to n do
+  begin
+    read(x);
+    writeln(i, x * 2.5)
+  end
+end.
+""",
+    # reads the characters of the input and writes them back
+    "copy": """program copy(input, output);
+var n, i: integer; c: char;
+begin
+  read(n);
+  for i := 1 to n do
+  begin
+    read(c);
+    write(c)
+  end;
+  writeln(n)
+end.
+""",
+}
+
+
+def generate_input(name, count, seed = 0):
+    """
+    Generate the input of one of the benchmark programs.
+
+    Args:
+        name (str): The name of the program in `programs`.
+        count (int): The number of values read by the program.
+        seed (int, optional): The seed of the random values. Defaults to 0.
+
+    Returns:
+        str: The input, starting with the number of values.
+    """
+    generator = random.Random(seed)
+    if name == "sums":
+        values = [str(generator.randint(-1000, 1000)) for _ in range(count)]
+    elif name == "scale":
+        values = ["{:.3f}".format(generator.uniform(-1000, 1000)) for _ in range(count)]
+    else:
+        text = "".join(generator.choice("abc 0123456789\n") for _ in range(count))
+        return "{} {}".format(count, text)
+    return "{}\n{}\n".format(count, "\n".join(values))
+
+
+def main():
+    """
+    Compare the run time of programs reading and writing large files through scanf and printf and through the
+    buffered I/O runtime (--fast-io), compiled with gcc at the given optimization levels.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-r", "--repeat", type = int, default = 3, help = "number of timed runs")
+    parser.add_argument("-n", "--count", type = int, default = 1000000, help = "number of values in each input file")
+    parser.add_argument("--cflags", nargs = "+", default = ["-O0", "-O2"], help = "gcc optimization flags to compare")
+    args = parser.parse_args()
+
+    plain = Converter("lalr")
+    fast = Converter("lalr", fast_io = True)
+    print("{:>8} {:>6} {:>10} {:>12} {:>12} {:>8}".format("program", "gcc", "input (MB)", "stdio (s)", "fast-io (s)",
+                                                          "speedup"))
+    with tempfile.TemporaryDirectory() as directory:
+        for name, code in programs.items():
+            path = os.path.join(directory, name + ".txt")
+            with open(path, "w") as file:
+                file.write(generate_input(name, args.count))
+            size = os.path.getsize(path) / 1e6
+
+            def run(executable):
+                with open(path, "rb") as input_file:
+                    return subprocess.run([executable], stdin = input_file, capture_output = True, check = True).stdout
+
+            for flags in args.cflags:
+                executables = [build(plain.convert(code).code, directory, name + "_stdio", flags.split()),
+                               build(fast.convert(code).code, directory, name + "_fast", flags.split())]
+                outputs = [run(executable) for executable in executables]
+                assert outputs[0] == outputs[1], name
+                times = [best_time(lambda: run(executable), args.repeat) for executable in executables]
+                print("{:>8} {:>6} {:>10.1f} {:>12.3f} {:>12.3f} {:>7.2f}x".format(name, flags, size, times[0],
+                                                                                  times[1], times[0] / times[1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mp2c import Converter  # noqa: E402
+from bench_optimize import best_time, build  # noqa: E402
+
+header = """program kernels(input, output);
+const n = {size};
+var
+  a, b, c: array[1..{size}, 1..{size}] of real;
+  i, j, k, r: integer;
+  s: real;
+function limit(x: integer): integer;
+var
+  m, t: integer;
+begin
+  m := 0;
+  for t := 1 to x do m := m + 1;
+  limit := m
+end;
+begin
+  for i := 1 to n do
+    for j := 1 to n do
+    begin
+      a[i, j] := (i + j) mod 7;
+      b[i, j] := (i * j) mod 5
+    end;
+"""
+
+kernels = {
+    "matmul": """
+  for r := 1 to {repeats} do
+    for i := 1 to n do
+      for j := 1 to n do
+      begin
+        c[i, j] := 0.0;
+        for k := 1 to n do c[i, j] := c[i, j] + a[i, k] * b[k, j]
+      end;
+""",
+    "stencil": """
+  for r := 1 to {repeats} do
+  begin
+    for i := 2 to n - 1 do
+      for j := 2 to n - 1 do
+        c[i, j] := (a[i - 1, j] + a[i + 1, j] + a[i, j - 1] + a[i, j + 1]) * 0.25;
+    for i := 2 to n - 1 do
+      for j := 2 to n - 1 do
+        a[i, j] := c[i, j]
+  end;
+""",
+    "triangle": """
+  for r := 1 to {repeats} do
+    for i := 1 to n do
+      for j := 1 to limit(i) do
+        c[i, j] := a[i, j] + b[j, i] * r;
+""",
+    "reverse": """
+  for r := 1 to {repeats} do
+    for i := n downto 1 do
+      for j := n downto 1 do
+        c[i, j] := a[n + 1 - i, j] - c[i, j];
+""",
+}
+
+footer = """
+  s := 0.0;
+  for i := 1 to n do
+    for j := 1 to n do s := s + c[i, j];
+  writeln(s)
+end.
+"""
+
+# The repetitions of each kernel for arrays of 100 by 100 elements, scaled for the other sizes
+repeats = {"matmul": 80, "stencil": 1600, "triangle": 160, "reverse": 1600}
+
+
+def generate_kernel(name, size = 100):
+    """
+    Generate a MiniPascal program running one of the matrix kernels.
+
+    Args:
+        name (str): The name of the kernel in `kernels`.
+        size (int, optional): The number of rows and columns of the matrices. Defaults to 100.
+
+    Returns:
+        str: The MiniPascal program.
+    """
+    scale = (100 / size) ** (3 if name == "matmul" else 2)
+    count = max(1, round(repeats[name] * scale))
+    return header.format(size = size) + kernels[name].format(repeats = count) + footer
+
+
+def main():
+    """
+    Compare the run time of matrix kernels converted with the folding passes only (-O 1) and with the loop
+    optimizations (-O 2), compiled with gcc at the given optimization levels.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-r", "--repeat", type = int, default = 3, help = "number of timed runs")
+    parser.add_argument("-s", "--size", type = int, default = 100, help = "rows and columns of the matrices")
+    parser.add_argument("--cflags", nargs = "+", default = ["-O0", "-O2"], help = "gcc optimization flags to compare")
+    args = parser.parse_args()
+
+    folded = Converter("lalr", optimize = 1)
+    loops = Converter("lalr", optimize = 2)
+    print("{:>10} {:>6} {:>12} {:>12} {:>8}".format("kernel", "gcc", "-O 1 (s)", "-O 2 (s)", "speedup"))
+    with tempfile.TemporaryDirectory() as directory:
+        for name in kernels:
+            code = generate_kernel(name, args.size)
+            for flags in args.cflags:
+                executables = [build(folded.convert(code).code, directory, name + "1", flags.split()),
+                               build(loops.convert(code).code, directory, name + "2", flags.split())]
+                outputs = [subprocess.run([executable], capture_output = True, text = True, check = True).stdout
+                           for executable in executables]
+                assert outputs[0] == outputs[1], outputs
+                times = [best_time(lambda: subprocess.run([executable], check = True, capture_output = True),
+                                   args.repeat) for executable in executables]
+                print("{:>10} {:>6} {:>12.3f} {:>12.3f} {:>7.2f}x".format(name, flags, times[0], times[1],
+                                                                         times[0] / times[1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mp2c import Converter  # noqa: E402
+
+
+def generate_array_program(length, arrays = 4):
+    """
+    Generate a program that declares large arrays and uses a few of their elements.
+
+    Args:
+        length (int): The length of each dimension of the one-dimensional arrays, and the number of elements of the
+            two-dimensional ones.
+        arrays (int, optional): The number of arrays of each kind. Defaults to 4.
+
+    Returns:
+        str: The MiniPascal program.
+    """
+    side = max(1, int(length ** 0.5))
+    lines = ["program arrays(input, output);", "var"]
+    for index in range(arrays):
+        lines.append("  a{}: array[1..{}] of integer;".format(index, length))
+        lines.append("  m{}: array[0..{}, 1..{}] of real;".format(index, side - 1, side))
+    lines.append("  i: integer;")
+    lines.append("begin")
+    for index in range(arrays):
+        lines.append("  for i := 1 to 10 do a{0}[i] := i;".format(index))
+        lines.append("  m{0}[0, 1] := a{0}[{1}] / 2;".format(index, length))
+    lines.append("  writeln(a0[1])")
+    lines.append("end.")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    """
+    Measure the peak memory allocated by `Converter.convert` on programs declaring arrays of growing sizes.
+
+    The last column is the per-element storage that array symbols used to allocate, one list slot per index of each
+    dimension, for comparison.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-a", "--arrays", type = int, default = 4, help = "number of arrays of each kind")
+    args = parser.parse_args()
+
+    converter = Converter("lalr")
+    converter.convert(generate_array_program(10, args.arrays))
+    print("{:>12} {:>10} {:>16} {:>22}".format("length", "time (s)", "peak (MB)", "former storage (MB)"))
+    for length in (10 ** 3, 10 ** 5, 10 ** 7, 10 ** 8):
+        code = generate_array_program(length, args.arrays)
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = converter.convert(code)
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert result.success, result.error_messages
+        side = max(1, int(length ** 0.5))
+        former = args.arrays * 8 * (length + 2 * side)
+        print("{:>12} {:>10.4f} {:>16.2f} {:>22.2f}".format(length, seconds, peak / 1e6, former / 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mp2c import Converter  # noqa: E402
+from programs import generate_sizes  # noqa: E402
+
+
+def generate_numeric_program(size = 200, repeats = 20000):
+    """
+    Generate a numeric MiniPascal program whose loops use constants, constant expressions and array bounds.
+
+    Args:
+        size (int, optional): The length of the arrays. Defaults to 200.
+        repeats (int, optional): The number of passes over the arrays. Defaults to 20000.
+
+    Returns:
+        str: The MiniPascal program.
+    """
+    return "\n".join([
+        "program numeric(input, output);",
+        "const",
+        "  n = {};".format(size),
+        "  repeats = {};".format(repeats),
+        "  scale = 3; base = 10; offset = 1; modulus = 1000007; half = 0.5;",
+        "var",
+        "  a: array[1..{}] of integer;".format(size),
+        "  b: array[0..{}] of integer;".format(size - 1),
+        "  i, j, s: integer;",
+        "  x: real;",
+        "begin",
+        "  s := 0;",
+        "  x := 0.0;",
+        "  for j := 1 to repeats do",
+        "  begin",
+        "    for i := 1 to n do a[i] := i * scale + base * 2 - offset * (scale - 1);",
+        "    for i := 1 to n - 1 do b[i - 1] := a[i + 1] - a[i] + (n div 4) * (scale + 1) mod base;",
+        "    for i := 0 to n - 2 do s := (s + b[i] * (base * base - 1) + j mod 7) mod modulus;",
+        "    if scale * 2 > base then s := s + 1 else x := x + half * scale / (base * 4) + 1 / 3",
+        "  end;",
+        "  writeln(s, x)",
+        "end.",
+    ]) + "\n"
+
+
+def best_time(func, repeat):
+    """
+    Return the best wall time of calling `func` `repeat` times.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def build(code, directory, name, flags):
+    """
+    Compile C code with gcc.
+
+    Args:
+        code (str): The C code.
+        directory (str): The directory of the source and the executable.
+        name (str): The base name of the files.
+        flags (list): The gcc optimization flags.
+
+    Returns:
+        str: The path of the executable.
+    """
+    source = os.path.join(directory, name + ".c")
+    executable = os.path.join(directory, name)
+    with open(source, "w") as file:
+        file.write(code)
+    subprocess.run(["gcc", *flags, source, "-o", executable, "-lm"], check = True, capture_output = True)
+    return executable
+
+
+def main():
+    """
+    Compare the size of the generated code and the run time of the compiled numeric program with and without the
+    constant folding pass.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-r", "--repeat", type = int, default = 5, help = "number of timed runs")
+    parser.add_argument("--repeats", type = int, default = 20000, help = "passes of the numeric program")
+    parser.add_argument("--cflags", default = "-O0", help = "gcc optimization flags")
+    args = parser.parse_args()
+
+    plain = Converter("lalr")
+    optimized = Converter("lalr", optimize = 1)
+    print("{:>8} {:>14} {:>14} {:>10} {:>12} {:>12}".format("lines", "plain (bytes)", "folded (bytes)", "smaller",
+                                                            "plain (s)", "folded (s)"))
+    programs = generate_sizes([100, 1000])
+    programs.append((0, generate_numeric_program(repeats = args.repeats)))
+    for lines, code in programs:
+        lines = lines or code.count("\n")
+        before = plain.convert(code).code
+        after = optimized.convert(code).code
+        plain_time = best_time(lambda: plain.convert(code), args.repeat)
+        optimized_time = best_time(lambda: optimized.convert(code), args.repeat)
+        print("{:>8} {:>14} {:>14} {:>9.1f}% {:>12.4f} {:>12.4f}".format(
+            lines, len(before), len(after), 100 * (1 - len(after) / len(before)), plain_time, optimized_time))
+
+    code = programs[-1][1]
+    flags = args.cflags.split()
+    with tempfile.TemporaryDirectory() as directory:
+        executables = [build(plain.convert(code).code, directory, "plain", flags),
+                       build(optimized.convert(code).code, directory, "optimized", flags)]
+        outputs = [subprocess.run([executable], capture_output = True, text = True, check = True).stdout
+                   for executable in executables]
+        assert outputs[0] == outputs[1]
+        times = [best_time(lambda: subprocess.run([executable], check = True, capture_output = True), args.repeat)
+                 for executable in executables]
+    print("numeric program compiled with gcc {}: plain {:.3f} s, folded {:.3f} s, {:.2f}x".format(
+        args.cflags, times[0], times[1], times[0] / times[1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mp2c import Converter, ParallelConverter  # noqa: E402
+from programs import generate_program  # noqa: E402
+
+
+def best_time(func, repeat):
+    """
+    Return the result and the best wall time of calling `func` `repeat` times.
+    """
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    """
+    Compare the sequential conversion with the parallel translation of the subprogram bodies of `ParallelConverter`,
+    with several numbers of worker processes, on programs with many subprograms.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-r", "--repeat", type = int, default = 3, help = "number of timed runs")
+    parser.add_argument("-s", "--statements", type = int, default = 20, help = "statements per subprogram")
+    parser.add_argument("--sizes", type = int, nargs = "+", default = [100, 500, 2000], help = "numbers of subprograms")
+    parser.add_argument("-j", "--jobs", type = int, nargs = "+", default = [1, 2, 4], help = "numbers of workers")
+    args = parser.parse_args()
+
+    print("CPUs: {}".format(os.cpu_count()))
+    sequential = Converter("lalr", cache = True)
+    sequential.convert("program p; begin end.")
+    converters = [ParallelConverter(jobs = jobs, min_subprograms = 0) for jobs in args.jobs]
+    try:
+        print("{:>12} {:>10} {:>16}".format("subprograms", "lines", "sequential (s)") +
+              "".join(" {:>16}".format("{} jobs (s)".format(jobs)) for jobs in args.jobs))
+        for subprograms in args.sizes:
+            code = generate_program(subprograms, args.statements)
+            expected, sequential_time = best_time(lambda: sequential.convert(code), args.repeat)
+            times = []
+            for converter in converters:
+                # the first conversion starts the worker processes
+                converter.convert(code)
+                result, seconds = best_time(lambda: converter.convert(code), args.repeat)
+                assert result.success and result.code == expected.code and converter.stats["parallel"]
+                times.append(seconds)
+            print("{:>12} {:>10} {:>16.3f}".format(subprograms, code.count("\n") + 1, sequential_time) +
+                  "".join(" {:>16.3f}".format(seconds) for seconds in times))
+    finally:
+        for converter in converters:
+            converter.close()
+
+
+if __name__ == '__main__':
+    main()
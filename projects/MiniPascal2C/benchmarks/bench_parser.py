@@ -0,0 +1,49 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mp2c import Converter, preprocess  # noqa: E402
+from programs import generate_sizes  # noqa: E402
+
+
+def time_parse(parser, code, repeat):
+    """
+    Return the best wall time of parsing the preprocessed code `repeat` times.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parser.parse(code)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    """
+    Compare the Earley and LALR parsers of the Converter across program sizes.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--sizes", type = int, nargs = "+", default = [100, 500, 1000, 5000],
+                        help = "approximate program sizes in lines")
+    parser.add_argument("-r", "--repeat", type = int, default = 3, help = "number of runs per measurement")
+    args = parser.parse_args()
+
+    converters = {}
+    for mode in ("earley", "lalr"):
+        start = time.perf_counter()
+        converters[mode] = Converter(mode)
+        print("{:>6} grammar construction: {:8.3f} s".format(mode, time.perf_counter() - start))
+
+    print("{:>8} {:>12} {:>12} {:>9}".format("lines", "earley (s)", "lalr (s)", "speedup"))
+    for lines, code in generate_sizes(args.sizes):
+        code = preprocess(code)
+        earley = time_parse(converters["earley"].parser, code, args.repeat)
+        lalr = time_parse(converters["lalr"].parser, code, args.repeat)
+        print("{:>8} {:>12.4f} {:>12.4f} {:>8.1f}x".format(lines, earley, lalr, earley / lalr))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mp2c import preprocess  # noqa: E402
+from programs import generate_sizes  # noqa: E402
+
+
+def legacy_preprocess(code):
+    """
+    The former preprocessor: a regex pass removing the comments, then lowercasing by string concatenation.
+    """
+    code = re.sub(r"\{.*?}", "", code, flags = re.DOTALL)
+    converted_code = ''
+    in_char_literal = False
+    in_string_literal = False
+    for i, char in enumerate(code):
+        if char == "'" and (i == 0 or code[i - 1] != '\\') and not in_string_literal:
+            in_char_literal = not in_char_literal
+        elif char == '"' and (i == 0 or code[i - 1] != '\\') and not in_char_literal:
+            in_string_literal = not in_string_literal
+        if not in_char_literal and not in_string_literal:
+            converted_code += char.lower()
+        else:
+            converted_code += char
+    return converted_code
+
+
+def best_time(func, repeat):
+    """
+    Return the best wall time of calling `func` `repeat` times.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    """
+    Compare the single-pass preprocessor with the former one across program sizes.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--sizes", type = int, nargs = "+", default = [1000, 10000, 100000],
+                        help = "approximate program sizes in lines")
+    parser.add_argument("-r", "--repeat", type = int, default = 3, help = "number of runs per measurement")
+    args = parser.parse_args()
+
+    print("{:>8} {:>10} {:>12} {:>12} {:>9}".format("lines", "bytes", "legacy (s)", "single (s)", "speedup"))
+    for lines, code in generate_sizes(args.sizes):
+        # comments are common in hand-written programs, add one per line
+        code = code.replace(";\n", "; { Comment 'x' }\n")
+        legacy = best_time(lambda: legacy_preprocess(code), args.repeat)
+        single = best_time(lambda: preprocess(code), args.repeat)
+        print("{:>8} {:>10} {:>12.4f} {:>12.4f} {:>8.1f}x".format(lines, len(code), legacy, single, legacy / single))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mp2c import Converter  # noqa: E402
+from mp2c.context import Context  # noqa: E402
+from mp2c.builder import build_program  # noqa: E402
+from mp2c.pyemitter import compile_python, run_python  # noqa: E402
+from bench_optimize import build  # noqa: E402
+
+programs = {
+    # reads two numbers and writes a few values, the typical exercise program
+    "small": ("""program small(input, output);
+var a, b: integer;
+begin
+  read(a, b);
+  writeln(a + b, a * b, a div b, a mod b)
+end.
+""", "17 5\n"),
+    # recursive calls with a var parameter
+    "fib": ("""program fib(input, output);
+var n, calls, result: integer;
+function f(k: integer; var c: integer): integer;
+begin
+  c := c + 1;
+  if k < 2 then f := k else f := f(k - 1, c) + f(k - 2, c)
+end;
+begin
+  read(n);
+  calls := 0;
+  result := f(n, calls);
+  writeln(result, calls)
+end.
+""", "18\n"),
+    # nested loops over two-dimensional arrays
+    "matrix": ("""program matrix(input, output);
+var n, i, j, k: integer; a, b, c: array[1..40, 1..40] of real;
+begin
+  read(n);
+  for i := 1 to n do
+    for j := 1 to n do
+    begin
+      a[i, j] := i + j;
+      b[i, j] := i - j;
+      c[i, j] := 0
+    end;
+  for i := 1 to n do
+    for k := 1 to n do
+      for j := 1 to n do
+        c[i, j] := c[i, j] + a[i, k] * b[k, j];
+  writeln(c[1, 1], c[n, n])
+end.
+""", "40\n"),
+}
+
+
+def time_python(converter, code, input_):
+    """
+    Run a program in a Python worker process.
+
+    Returns:
+        tuple: The time until the program starts, from the MiniPascal source to the code object, the total time and
+            the output.
+    """
+    start = time.perf_counter()
+    program = build_program(converter.parse(code), Context())
+    code_object = compile_python(program)
+    ready = time.perf_counter()
+    output = run_python(code_object, input_)
+    return ready - start, time.perf_counter() - start, output
+
+
+def time_gcc(converter, code, input_, directory, flags):
+    """
+    Convert a program to C, compile it with gcc without any cache and run the executable.
+
+    Returns:
+        tuple: The time until the executable starts, from the MiniPascal source through gcc, the total time and the
+            output.
+    """
+    start = time.perf_counter()
+    executable = build(converter.convert(code).code, directory, "program", flags)
+    ready = time.perf_counter()
+    output = subprocess.run([executable], input = input_, capture_output = True, text = True, check = True).stdout
+    return ready - start, time.perf_counter() - start, output
+
+
+def main():
+    """
+    Compare the latency of running MiniPascal programs in-process (`Converter.run`) and through the C route, which
+    converts the program, compiles it with gcc and runs the executable. The time to start the program and the total
+    time are the best of the repeated runs, in milliseconds.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-r", "--repeat", type = int, default = 5, help = "number of timed runs")
+    parser.add_argument("--cflags", default = "-O0", help = "gcc optimization flags")
+    args = parser.parse_args()
+
+    converter = Converter("lalr")
+    flags = args.cflags.split()
+    print("{:>8} {:>13} {:>13} {:>13} {:>13} {:>8}".format("program", "run start", "run total", "gcc start",
+                                                          "gcc total", "speedup"))
+    with tempfile.TemporaryDirectory() as directory:
+        for name, (code, input_) in programs.items():
+            python_runs = [time_python(converter, code, input_) for _ in range(args.repeat)]
+            gcc_runs = [time_gcc(converter, code, input_, directory, flags) for _ in range(args.repeat)]
+            assert python_runs[0][2] == gcc_runs[0][2], name
+            python_start, python_total = (min(run[index] for run in python_runs) * 1000 for index in (0, 1))
+            gcc_start, gcc_total = (min(run[index] for run in gcc_runs) * 1000 for index in (0, 1))
+            print("{:>8} {:>10.2f} ms {:>10.2f} ms {:>10.2f} ms {:>10.2f} ms {:>7.1f}x".format(
+                name, python_start, python_total, gcc_start, gcc_total, gcc_total / python_total))
+
+
+if __name__ == '__main__':
+    main()
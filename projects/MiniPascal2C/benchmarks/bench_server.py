@@ -0,0 +1,68 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_startup import PROJECT_DIR, time_command  # noqa: E402
+from mp2c.client import connect  # noqa: E402
+from programs import generate_program  # noqa: E402
+
+
+def main():
+    """
+    Compare running `python main.py` for each file in a new process with converting through a running compile server,
+    from `python main.py` and from a client that stays connected, as an editor integration does. The runs of
+    `python main.py` convert the same file again, which the server answers from its conversion cache after the first
+    run, while the client converts a new program each time.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-r", "--repeat", type = int, default = 5, help = "number of runs per measurement")
+    parser.add_argument("--sizes", type = int, nargs = "+", default = [1, 50], help = "numbers of subprograms")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix = "mp2c-server-")
+    env = dict(os.environ, MP2C_CACHE_DIR = os.path.join(work_dir, "cache"))
+    os.environ["MP2C_CACHE_DIR"] = env["MP2C_CACHE_DIR"]
+    server = subprocess.Popen([sys.executable, "main.py", "--serve"], cwd = PROJECT_DIR, env = env,
+                              stderr = subprocess.DEVNULL)
+    try:
+        client = None
+        for _ in range(300):
+            client = connect()
+            if client is not None:
+                break
+            time.sleep(0.1)
+        assert client is not None, "the compile server did not start"
+        print("{:>12} {:>16} {:>16} {:>16}".format("subprograms", "no server (s)", "server (s)", "client (ms)"))
+        for subprograms in args.sizes:
+            input_path = os.path.join(work_dir, "program{}.pas".format(subprograms))
+            code = generate_program(subprograms, 10)
+            with open(input_path, "w") as file:
+                file.write(code)
+            command = [sys.executable, "main.py", "-i", input_path, "-o", input_path[:-4] + ".c"]
+            local = time_command(command + ["--no-server"], env, args.repeat)
+            served = time_command(command, env, args.repeat)
+            times = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                # a new program name each time, so that the conversion cache of the server is not used
+                result = client.analyze(code.replace("program bench", "program bench{}".format(len(times)), 1))
+                times.append(time.perf_counter() - start)
+                assert result["success"]
+            print("{:>12} {:>16.3f} {:>16.3f} {:>16.2f}".format(subprograms, local, served,
+                                                                 statistics.median(times) * 1000))
+        client.shutdown()
+        client.close()
+        server.wait(30)
+    finally:
+        if server.poll() is None:
+            server.kill()
+
+
+if __name__ == '__main__':
+    main()
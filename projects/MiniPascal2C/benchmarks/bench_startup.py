@@ -0,0 +1,64 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from programs import generate_program
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_command(command, env, repeat, fresh_cache = False):
+    """
+    Return the median wall time of running the command `repeat` times.
+
+    If `fresh_cache` is True, every run gets an empty parser cache directory.
+    """
+    times = []
+    for _ in range(repeat):
+        run_env = dict(env)
+        if fresh_cache:
+            run_env["MP2C_CACHE_DIR"] = tempfile.mkdtemp(prefix = "mp2c-cold-")
+        start = time.perf_counter()
+        subprocess.run(command, cwd = PROJECT_DIR, env = run_env, stdout = subprocess.DEVNULL, check = True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    """
+    Measure the startup time of `python main.py` with and without the parser cache.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-r", "--repeat", type = int, default = 5, help = "number of runs per measurement")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix = "mp2c-startup-")
+    input_path = os.path.join(work_dir, "small.pas")
+    output_path = os.path.join(work_dir, "small.c")
+    with open(input_path, "w") as file:
+        file.write(generate_program(1, 5))
+    env = dict(os.environ, MP2C_CACHE_DIR = os.path.join(work_dir, "cache"))
+    main_command = [sys.executable, "main.py", "-i", input_path, "-o", output_path]
+
+    cases = [
+        ("python -c pass", [sys.executable, "-c", "pass"], False),
+        ("import mp2c", [sys.executable, "-c", "import mp2c"], False),
+        ("main.py -p earley", main_command, False),
+        ("main.py -p lalr --no-cache", main_command + ["-p", "lalr", "--no-cache"], False),
+        ("main.py -p lalr (cold cache)", main_command + ["-p", "lalr"], True),
+        ("main.py -p lalr (warm cache)", main_command + ["-p", "lalr"], False),
+    ]
+    # populate the cache for the warm runs
+    subprocess.run(main_command + ["-p", "lalr"], cwd = PROJECT_DIR, env = env, stdout = subprocess.DEVNULL,
+                   check = True)
+    for name, command, fresh_cache in cases:
+        elapsed = time_command(command, env, args.repeat, fresh_cache)
+        print("{:<32} {:8.3f} s".format(name, elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mp2c import Context, Converter, build_program, emit_program, preprocess  # noqa: E402
+from mp2c.emitter import emit_items  # noqa: E402
+from mp2c.formatter import format_tokens, write_formatted  # noqa: E402
+from mp2c.utils import postprocess  # noqa: E402
+from programs import generate_program  # noqa: E402
+
+
+def measure(func):
+    """
+    Return the peak memory allocated by calling `func`.
+    """
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def write_whole(program, path):
+    """
+    Emit and format the whole program, then write it, as `Converter.convert` does.
+    """
+    code = format_tokens(postprocess(emit_program(program)))
+    with open(path, "w") as file:
+        file.write(code)
+
+
+def write_streamed(program, path):
+    """
+    Emit, format and write the program one part at a time, as `Converter.convert_to` does.
+    """
+    with open(path, "w") as file:
+        write_formatted((postprocess(tokens) for tokens in emit_items(program)), file.write)
+
+
+def main():
+    """
+    Compare the peak memory of converting programs with many subprograms to a file with `convert` and `convert_to`,
+    for the whole conversion and for the output phase alone, from the IR to the file.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--statements", type = int, default = 20, help = "statements per subprogram")
+    args = parser.parse_args()
+
+    converter = Converter("lalr")
+    print("{:>12} {:>10} {:>14} {:>14} {:>16} {:>16}".format("subprograms", "C (MB)", "convert (MB)",
+                                                             "convert_to (MB)", "output whole (MB)",
+                                                             "output parts (MB)"))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "out.c")
+        for subprograms in (10, 100, 500):
+            code = generate_program(subprograms, args.statements)
+
+            def convert():
+                with open(path, "w") as file:
+                    file.write(converter.convert(code).code)
+
+            def convert_to():
+                with open(path, "w") as file:
+                    assert converter.convert_to(code, file).success
+
+            whole = measure(convert)
+            size = os.path.getsize(path)
+            streamed = measure(convert_to)
+            assert os.path.getsize(path) == size
+            program = build_program(converter.parser.parse(preprocess(code)), Context())
+            output_whole = measure(lambda: write_whole(program, path))
+            output_parts = measure(lambda: write_streamed(program, path))
+            print("{:>12} {:>10.2f} {:>14.2f} {:>14.2f} {:>16.2f} {:>16.2f}".format(
+                subprograms, size / 1e6, whole / 1e6, streamed / 1e6, output_whole / 1e6, output_parts / 1e6))
+
+
+if __name__ == '__main__':
+    main()
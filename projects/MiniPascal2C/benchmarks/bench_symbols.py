@@ -0,0 +1,168 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mp2c import Context, Converter, build_program, preprocess  # noqa: E402
+
+library_function_names = ["acos", "asin", "atan", "cos", "cosh", "sin", "sinh", "tanh", "exp", "log", "log10", "sqrt",
+                          "ceil", "fabs", "floor"]
+
+
+class ScanningContext(Context):
+    """
+    The symbol table as it was before it was flattened: the lookups scan the scopes from the innermost one outward,
+    and the library functions are built again for every context.
+    """
+
+    def get_value(self, name):
+        symbol = self.get_values().get(name)
+        index = self.current_scope_index
+        while symbol is None and index >= 0:
+            symbol = self.scopes[index]["value"].get(name)
+            index -= 1
+        return symbol
+
+    def get_array(self, name):
+        symbol = self.get_arrays().get(name)
+        index = self.current_scope_index
+        while symbol is None and index >= 0:
+            symbol = self.scopes[index]["array"].get(name)
+            index -= 1
+        return symbol
+
+    def get_func(self, name):
+        index = self.current_scope_index
+        symbol = None
+        while symbol is None and index >= 0:
+            symbol = self.scopes[index]["subprogram"].get(name)
+            index -= 1
+        return symbol
+
+    def declare_library_functions(self):
+        for function_name in library_function_names:
+            self.register_func(function_name, ["float", function_name, "(", "float", "x", ")", ";"],
+                               [{'ids': ['x'], 'type': 'float'}], [False], tokens = [], is_library = True)
+
+
+def generate_nested_program(depth = 12, identifiers = 200, functions = 10):
+    """
+    Generate a program whose subprograms nest for loops deeply and use many global identifiers in the innermost loop.
+
+    Args:
+        depth (int, optional): The number of nested for loops in each subprogram. Defaults to 12.
+        identifiers (int, optional): The number of global variables. Defaults to 200.
+        functions (int, optional): The number of subprograms. Defaults to 10.
+
+    Returns:
+        str: The MiniPascal program.
+    """
+    names = ["g{}".format(index) for index in range(identifiers)]
+    lines = ["program nested(input, output);", "var {}: integer;".format(", ".join(names)), "  r: real;",
+             "  v: array[1..10] of integer;"]
+    for function in range(functions):
+        lines.append("function f{}(a: integer): integer;".format(function))
+        lines.append("var {}: integer;".format(", ".join("i{}".format(level) for level in range(depth))))
+        lines.append("begin")
+        for level in range(depth):
+            lines.append("  " * (level + 1) + "for i{0} := 1 to 2 do".format(level))
+        statements = []
+        for index in range(0, identifiers, 4):
+            statements.append("{} := {} + {} * a - v[{} mod 10 + 1]".format(
+                names[index], names[(index + 1) % identifiers], names[(index + 2) % identifiers],
+                names[(index + 3) % identifiers]))
+        statements.append("r := sqrt(r) + cos(r)")
+        lines.append("  " * (depth + 1) + "begin " + "; ".join(statements) + " end;")
+        lines.append("  f{} := a".format(function))
+        lines.append("end;")
+    lines.append("begin")
+    lines.append("  g0 := f0(1)")
+    lines.append("end.")
+    return "\n".join(lines) + "\n"
+
+
+def best_time(func, repeat):
+    """
+    Return the best wall time of calling `func` `repeat` times.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def build(tree, context_class):
+    """
+    Build the IR of a parse tree with a context of the given class.
+    """
+    context = context_class()
+    build_program(tree, context)
+    assert not context.on_error, context.error_messages
+
+
+def setup(context_class):
+    """
+    Create a context with the program scope and the library functions, as done for every conversion.
+    """
+    context = context_class()
+    context.enter_scope()
+    context.declare_library_functions()
+    context.exit_scope()
+
+
+def lookup(context, names, count):
+    """
+    Look up the given names `count` times each.
+    """
+    for _ in range(count):
+        for name in names:
+            context.get_value(name)
+
+
+def main():
+    """
+    Compare the flat symbol table with scope scanning on deeply nested programs with many identifiers.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-r", "--repeat", type = int, default = 5, help = "number of timed runs")
+    parser.add_argument("-i", "--identifiers", type = int, default = 200, help = "number of global variables")
+    args = parser.parse_args()
+
+    converter = Converter("lalr")
+    print("{:>6} {:>8} {:>13} {:>13} {:>8}".format("depth", "lines", "scanning (s)", "flat (s)", "speedup"))
+    for depth in (1, 8, 32, 64):
+        code = generate_nested_program(depth, args.identifiers)
+        tree = converter.parser.parse(preprocess(code))
+        scanning = best_time(lambda: build(tree, ScanningContext), args.repeat)
+        flat = best_time(lambda: build(tree, Context), args.repeat)
+        print("{:>6} {:>8} {:>13.4f} {:>13.4f} {:>7.2f}x".format(depth, code.count("\n"), scanning, flat,
+                                                                 scanning / flat))
+
+    names = ["g{}".format(index) for index in range(args.identifiers)]
+    print("{:>6} {:>22} {:>13} {:>8}".format("depth", "scanning lookups (s)", "flat (s)", "speedup"))
+    for depth in (1, 8, 32, 64):
+        times = []
+        for context_class in (ScanningContext, Context):
+            context = context_class()
+            context.enter_scope()
+            for name in names:
+                context.register_value(name, "int", True)
+            for level in range(depth):
+                context.enter_scope()
+                context.register_value("i{}".format(level), "int", True)
+            times.append(best_time(lambda: lookup(context, names, 100), args.repeat))
+        print("{:>6} {:>22.4f} {:>13.4f} {:>7.2f}x".format(depth, times[0], times[1], times[0] / times[1]))
+
+    count = 10000
+    scanning = best_time(lambda: [setup(ScanningContext) for _ in range(count)], args.repeat) / count
+    flat = best_time(lambda: [setup(Context) for _ in range(count)], args.repeat) / count
+    print("context setup with the library functions: scanning {:.2f} us, flat {:.2f} us".format(scanning * 1e6,
+                                                                                              flat * 1e6))
+
+
+if __name__ == '__main__':
+    main()
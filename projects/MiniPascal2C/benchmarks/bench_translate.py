@@ -0,0 +1,70 @@
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mp2c import Converter, StreamingConverter  # noqa: E402
+from programs import generate_program  # noqa: E402
+
+
+def measure(func):
+    """
+    Return the result, the wall time and the peak memory allocated by calling `func`.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def best_time(func, repeat):
+    """
+    Return the best wall time of calling `func` `repeat` times, without tracing the memory.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    """
+    Compare the peak memory and the throughput of the two-pass conversion, which parses the whole program before
+    building it, and of the parse-time translation of `StreamingConverter`, on programs with many subprograms.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-r", "--repeat", type = int, default = 3, help = "number of timed runs")
+    parser.add_argument("-s", "--statements", type = int, default = 20, help = "statements per subprogram")
+    parser.add_argument("--sizes", type = int, nargs = "+", default = [100, 500, 2000], help = "numbers of subprograms")
+    args = parser.parse_args()
+
+    two_pass = Converter("lalr", cache = True)
+    streaming = StreamingConverter(cache = True)
+    two_pass.convert("program p; begin end.")
+    streaming.convert("program p; begin end.")
+    print("{:>12} {:>10} {:>16} {:>16} {:>14} {:>14}".format("subprograms", "lines", "two-pass (MB)",
+                                                             "streaming (MB)", "two-pass (l/s)",
+                                                             "streaming (l/s)"))
+    for subprograms in args.sizes:
+        code = generate_program(subprograms, args.statements)
+        lines = code.count("\n") + 1
+        expected, _, two_pass_peak = measure(lambda: two_pass.convert(code))
+        result, _, streaming_peak = measure(lambda: streaming.convert(code))
+        assert result.code == expected.code and result.success
+        two_pass_time = best_time(lambda: two_pass.convert(code), args.repeat)
+        streaming_time = best_time(lambda: streaming.convert(code), args.repeat)
+        print("{:>12} {:>10} {:>16.2f} {:>16.2f} {:>14.0f} {:>14.0f}".format(
+            subprograms, lines, two_pass_peak / 1e6, streaming_peak / 1e6, lines / two_pass_time,
+            lines / streaming_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+def generate_program(subprograms = 10, statements = 20):
+    """
+    Generate a valid MiniPascal program for benchmarking.
+
+    The program declares some global variables and an array, `subprograms` functions and procedures with
+    `statements` statements each, and a main block that calls all of them.
+
+    Args:
+        subprograms (int, optional): The number of subprograms. Defaults to 10.
+        statements (int, optional): The number of statements in each body. Defaults to 20.
+
+    Returns:
+        str: The MiniPascal program.
+    """
+    lines = [
+        "program bench(input, output);",
+        "const",
+        "  limit = 100;",
+        "  ratio = 0.5;",
+        "var",
+        "  total, i, j: integer;",
+        "  acc: real;",
+        "  grid: array[1..100, 1..100] of integer;",
+    ]
+    for index in range(subprograms):
+        if index % 2 == 0:
+            lines.append("function f{}(a, b: integer): integer;".format(index))
+            lines.append("var k, t: integer;")
+            lines.append("begin")
+            lines.append("  t := 0;")
+            body_name = "t"
+        else:
+            lines.append("procedure p{}(var a: integer; b: integer);".format(index))
+            lines.append("var k: integer;")
+            lines.append("begin")
+            body_name = "a"
+        for statement in range(statements):
+            kind = statement % 5
+            if kind == 0:
+                lines.append("  {0} := {0} + a * b - {1} div 3;".format(body_name, statement + 1))
+            elif kind == 1:
+                lines.append("  if {0} > limit then {0} := {0} mod limit else {0} := {0} + 1;".format(body_name))
+            elif kind == 2:
+                lines.append("  for k := 1 to 10 do {0} := {0} + grid[k, k + 1];".format(body_name))
+            elif kind == 3:
+                lines.append("  while {0} > limit do {0} := {0} div 2;".format(body_name))
+            else:
+                lines.append("  begin grid[1, 2] := {0}; acc := acc + {0} / 2 end;".format(body_name))
+        if index % 2 == 0:
+            lines.append("  f{} := t".format(index))
+        lines.append("end;")
+    lines.append("begin")
+    lines.append("  total := 0;")
+    lines.append("  for i := 1 to 100 do for j := 1 to 100 do grid[i, j] := i * j;")
+    for index in range(subprograms):
+        if index % 2 == 0:
+            lines.append("  total := total + f{}(total, {});".format(index, index))
+        else:
+            lines.append("  p{}(total, {});".format(index, index))
+    lines.append("  writeln(total)")
+    lines.append("end.")
+    return "\n".join(lines) + "\n"
+
+
+def generate_sizes(sizes):
+    """
+    Generate one benchmark program for each requested size.
+
+    Args:
+        sizes (list): The approximate numbers of lines of the programs.
+
+    Returns:
+        list: A list of (line count, program) tuples.
+    """
+    programs = []
+    for size in sizes:
+        subprograms = max(1, size // 25)
+        code = generate_program(subprograms, 20)
+        programs.append((code.count("\n"), code))
+    return programs
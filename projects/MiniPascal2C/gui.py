@@ -4,7 +4,7 @@ import subprocess
 import customtkinter as ctk
 from customtkinter import filedialog
 
-from mp2c import Converter
+from mp2c import IncrementalConverter
 
 
 class MP2CGUI(ctk.CTk):
@@ -22,7 +22,7 @@ class MP2CGUI(ctk.CTk):
         self.label_left = None
         self.title("MiniPascal2C")
         self.geometry("1280x720")
-        self.converter = Converter()
+        self.converter = IncrementalConverter(recover = True)
         self.compile_succeed = False
         self.cn_font = ctk.CTkFont(family = "思源黑体 CN", size = 15)
         self.create_frames()
@@ -175,18 +175,22 @@ class MP2CGUI(ctk.CTk):
             self.t_line_numbers.tag_add("coloredText", "1.0", ctk.END)
             self.t_line_numbers.tag_config("coloredText", foreground = "red")
             self.t_line_numbers.configure(state = ctk.DISABLED)
-            output_error_msg = error_msg.split(", at", 1)[0]
+            output_error_msg = "\n".join(errmsg.split(", at", 1)[0] for errmsg in compile_res.error_messages)
             self.target_txt.configure(state = ctk.NORMAL)
             self.target_txt.delete("1.0", ctk.END)
             self.target_txt.insert(ctk.END, output_error_msg)
             self.target_txt.tag_add("coloredText", "1.0", ctk.END)
             self.target_txt.tag_config("coloredText", foreground = "red")
             self.target_txt.configure(state = ctk.DISABLED)
-            self.s_line_numbers.configure(state = ctk.NORMAL)
-            line_num = int(error_msg.split("at line ", 1)[1].split(" ", 1)[0])
-            start_index = f"{line_num}.0"
-            end_index = f"{line_num + 1}.0"
-            add_tags(self.source_txt, self.s_line_numbers, start_index, end_index)
+            if compile_res.syntax_errors:
+                line_nums = [syntax_error.line for syntax_error in compile_res.syntax_errors]
+            else:
+                line_nums = [int(error_msg.split("at line ", 1)[1].split(" ", 1)[0])]
+            for line_num in line_nums:
+                self.s_line_numbers.configure(state = ctk.NORMAL)
+                start_index = f"{line_num}.0"
+                end_index = f"{line_num + 1}.0"
+                add_tags(self.source_txt, self.s_line_numbers, start_index, end_index)
 
     def update_target_line_numbers(self):
         self.t_line_numbers.configure(state = ctk.NORMAL)
@@ -1,6 +1,144 @@
 import argparse
+import os
+import sys
 
-from mp2c import Converter
+import mp2c
+from mp2c.client import connect
+from mp2c.paths import get_cache_dir
+
+
+def run_batch(args):
+    """
+    Convert all the files matched by the batch arguments and report the throughput.
+
+    Args:
+        args (argparse.Namespace): The command line arguments.
+    """
+    from mp2c.batch import collect_sources, convert_batch, write_summary
+
+    sources = collect_sources(args.batch)
+    if not sources:
+        print("No input files found")
+        return
+    summary = convert_batch(sources, args.output_dir, args.jobs, args.parser, cache = not args.no_cache,
+                            format = args.format, conversion_cache = args.conversion_cache, optimize = args.optimize,
+                            fast_io = args.fast_io)
+    for record in summary["files"]:
+        if record["status"] != "success":
+            print("{}: {}".format(record["input"], record["status"]))
+            for error in record["error_messages"]:
+                print("    " + error)
+    print("Converted {} files ({} failed, {} lines) in {:.2f} s with {} jobs: {:.1f} files/s, {:.0f} lines/s".format(
+        summary["total"], summary["failed"], summary["lines"], summary["seconds"], summary["jobs"],
+        summary["files_per_second"], summary["lines_per_second"]))
+    if args.conversion_cache:
+        print("Conversion cache: {} hits, {} misses".format(summary["cache_hits"],
+                                                            summary["total"] - summary["cache_hits"]))
+    if args.summary:
+        write_summary(summary, args.summary)
+
+
+def convert_file(args, input_code, converter, run_input = None):
+    """
+    Convert or run the code of the input file and report the result.
+
+    Args:
+        args (argparse.Namespace): The command line arguments.
+        input_code (str): The code of the input file.
+        converter (Converter): The converter configured by the arguments.
+        run_input (str, optional): The standard input of the program with --run. Defaults to None.
+    """
+    if args.run:
+        sys.stdout.write(converter.run(input_code, run_input, args.timeout))
+        return
+    if args.output and converter.conversion_cache is None and not args.streaming and not args.parallel:
+        # the C code is written to the file as it is emitted, without holding it all in memory
+        with open(args.output, "w") as file:
+            result = converter.convert_to(input_code, file)
+        if result.profile is not None:
+            print(result.profile.format(), file = sys.stderr)
+        for error in result.error_messages:
+            print(error)
+        if not result.success:
+            with open(args.output, "r") as file:
+                code = file.read()
+            print(mp2c.code_analyze(code) if code else "")
+        return
+    result = converter.convert(input_code)
+    if result.profile is not None:
+        print(result.profile.format(), file = sys.stderr)
+    for error in result.error_messages:
+        print(error)
+    print(result.error_info)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(result.code)
+    else:
+        print(result.code)
+
+
+def convert_with_server(args, input_code, client, run_input = None):
+    """
+    Convert or run the code of the input file with a running compile server.
+
+    Args:
+        args (argparse.Namespace): The command line arguments.
+        input_code (str): The code of the input file.
+        client (Client): The client connected to the server.
+        run_input (str, optional): The standard input of the program with --run. Defaults to None.
+
+    Returns:
+        The output of the program with --run, or the result of the "analyze" method, see `report_server_result`.
+
+    Raises:
+        OSError: If the connection to the server is lost.
+        RuntimeError: If the server answers with an error.
+    """
+    if args.run:
+        return client.run(input_code, run_input, parser = args.parser, optimize = args.optimize, timeout = args.timeout)
+    return client.analyze(input_code, parser = args.parser, format = args.format, optimize = args.optimize,
+                          fast_io = args.fast_io, recover = args.recover)
+
+
+def report_server_result(args, result):
+    """
+    Report the result of `convert_with_server` as `convert_file` does.
+
+    Args:
+        args (argparse.Namespace): The command line arguments.
+        result: The output of the program with --run, or the result of the "analyze" method.
+    """
+    if args.run:
+        sys.stdout.write(result)
+        return
+    for error in result["error_messages"]:
+        print(error)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(result["code"])
+        if not result["success"]:
+            print(result["error_info"])
+    else:
+        print(result["error_info"])
+        print(result["code"])
+
+
+def serve(args):
+    """
+    Run the compile server until it is shut down, on a socket or on the standard input and output.
+
+    Args:
+        args (argparse.Namespace): The command line arguments.
+    """
+    conversion_cache = mp2c.ConversionCache(args.conversion_cache) if args.conversion_cache else None
+    options = {"run_timeout": args.timeout} if args.timeout is not None else {}
+    with mp2c.Server(not args.no_cache, conversion_cache, jobs = args.jobs, **options) as server:
+        server.warm()
+        if args.serve_stdio:
+            server.serve_stdio()
+        else:
+            server.serve(args.serve or None,
+                         on_ready = lambda address: print("Serving on {}".format(address), file = sys.stderr))
 
 
 def main():
@@ -9,27 +147,90 @@ def main():
 
     This function creates an argument parser and reads the input and output file paths from the command line arguments.
     If an input file is provided, it reads the file, converts the code using the Converter class, and writes the result
-    to the output file (if provided) or prints it to the console. If no input file is provided, it prints an error message.
+    to the output file as it is converted (if provided) or prints it to the console. In batch mode, it converts all the
+    given files, directories and glob patterns across a process pool. With --parallel, the subprogram bodies of the
+    input file are translated across a process pool. With --run, it runs the program on the standard input without
+    converting it. With --serve or --serve-stdio, it runs the compile server of `mp2c.server`, which a single conversion
+    or run uses when it is running, unless --no-server is given. If no input file is provided, it prints an error
+    message.
 
     """
     parser = argparse.ArgumentParser()
     parser.add_argument("-i", "--input", help = "input file")
     parser.add_argument("-o", "--output", help = "output file")
+    parser.add_argument("-p", "--parser", choices = ["earley", "lalr"],
+                        help = "parsing algorithm, earley by default, or lalr with --streaming, --parallel, --recover")
+    parser.add_argument("--no-cache", action = "store_true", help = "do not use the on-disk parser cache")
+    parser.add_argument("-f", "--format", choices = ["builtin", "clang"], default = "builtin", help = "C formatter")
+    parser.add_argument("-b", "--batch", nargs = "+", metavar = "PATH", help = "input files, directories or globs")
+    parser.add_argument("-d", "--output-dir", help = "output directory in batch mode")
+    parser.add_argument("-j", "--jobs", type = int, help = "number of worker processes in batch and parallel modes")
+    parser.add_argument("--summary", help = "JSON summary file in batch mode")
+    parser.add_argument("--conversion-cache", nargs = "?", const = os.path.join(get_cache_dir(), "conversions"),
+                        metavar = "DIR",
+                        help = "cache conversion results on disk (in $MP2C_CACHE_DIR/conversions by default)")
+    parser.add_argument("-O", "--optimize", type = int, nargs = "?", const = 1, default = 0, choices = [0, 1, 2],
+                        metavar = "LEVEL", help = "optimization level, 1 by default with -O")
+    parser.add_argument("--fast-io", action = "store_true", help = "read and write through a buffered I/O runtime")
+    parser.add_argument("--profile", nargs = "?", const = "phases", choices = ["phases", "calls"],
+                        help = "print the time and memory of each phase to stderr, and the builder calls with 'calls'")
+    parser.add_argument("--streaming", action = "store_true",
+                        help = "translate each subprogram while parsing, without the whole parse tree (lalr only)")
+    parser.add_argument("--parallel", action = "store_true",
+                        help = "translate the subprogram bodies in worker processes (lalr only)")
+    parser.add_argument("--recover", action = "store_true",
+                        help = "report all the syntax errors, then the semantic errors of the rest (lalr only)")
+    parser.add_argument("--run", action = "store_true",
+                        help = "run the program on the standard input with the Python engine instead of converting it")
+    parser.add_argument("--timeout", type = float, metavar = "SECONDS",
+                        help = "time limit of --run, and of the runs of the compile server (10 s by default)")
+    parser.add_argument("--serve", nargs = "?", const = "", metavar = "ADDRESS",
+                        help = "run the compile server on a local socket, or on unix:PATH or tcp:HOST:PORT")
+    parser.add_argument("--serve-stdio", action = "store_true",
+                        help = "run the compile server on the standard input and output")
+    parser.add_argument("--no-server", action = "store_true",
+                        help = "convert in this process even when a compile server is running")
     args = parser.parse_args()
+    if args.parser is None:
+        # the modes which need the lalr parser use it by default, while the others keep the output of earlier versions
+        args.parser = "lalr" if args.streaming or args.parallel or args.recover else "earley"
 
-    if args.input:
+    if args.serve is not None or args.serve_stdio:
+        serve(args)
+    elif args.batch:
+        run_batch(args)
+    elif args.input:
         with open(args.input, "r") as file:
             input_code = file.read()
-        converter = Converter()
-        result = converter.convert(input_code)
-        for error in result.error_messages:
-            print(error)
-        print(result.error_info)
-        if args.output:
-            with open(args.output, "w") as file:
-                file.write(result.code)
+        # the standard input is read once, since the file is run in this process if the server fails
+        run_input = sys.stdin.read() if args.run else None
+        local_only = args.no_server or args.streaming or args.parallel or args.profile or args.conversion_cache
+        client = connect() if not local_only else None
+        if client is not None:
+            try:
+                with client:
+                    result = convert_with_server(args, input_code, client, run_input)
+            except (OSError, RuntimeError):
+                # the file is converted in this process when the server stops or rejects the request
+                result = None
+            if result is not None:
+                # the errors of the output are not retried in this process, which would print the output twice
+                report_server_result(args, result)
+                return
+        conversion_cache = mp2c.ConversionCache(args.conversion_cache) if args.conversion_cache else None
+        options = {"cache": not args.no_cache, "format": args.format, "conversion_cache": conversion_cache,
+                   "optimize": args.optimize, "fast_io": args.fast_io,
+                   "profile": {None: False, "phases": True, "calls": "calls"}[args.profile], "recover": args.recover}
+        if args.parallel:
+            converter = mp2c.ParallelConverter(args.parser, jobs = args.jobs, **options)
         else:
-            print(result.code)
+            converter_class = mp2c.StreamingConverter if args.streaming else mp2c.Converter
+            converter = converter_class(args.parser, **options)
+        try:
+            convert_file(args, input_code, converter, run_input)
+        finally:
+            if args.parallel:
+                converter.close()
 
     else:
         print("No input file provided")
@@ -1,14 +1,79 @@
-from .utils import *
-from .visitors import *
-from .converter import Converter
-from .context import *
-from .rules import rules
-
-__all___ = [
-    "MP2CParser",
-    "Context",
-    "preprocess",
-    "compile_code",
-    "visitors",
-    "rules",
-]
+import importlib
+import types
+
+from .version import __version__
+# the grammars are imported now, since importing a submodule would bind `rules` to the module of the same name
+from .rules import lalr_rules, rules
+
+# The names exported by the package and their modules. They are imported when they are first used, so that the client
+# of the compile server, `mp2c.client`, starts without importing lark and the converter.
+_exports = {
+    "build_program": "builder",
+    "emit_program": "emitter",
+    "optimize_program": "optimizer",
+    "Converter": "converter",
+    "IncrementalConverter": "incremental",
+    "StreamingConverter": "streaming",
+    "ParallelConverter": "parallel",
+    "build_parser": "parsers",
+    "load_parser": "parsers",
+    "SyntaxErrorInfo": "recovery",
+    "parse_recovering": "recovery",
+    "ToolPool": "toolpool",
+    "ConversionCache": "cache",
+    "ExecutableCache": "executables",
+    "run_cases": "executables",
+    "Profile": "profiling",
+    "Client": "client",
+    "Server": "server",
+}
+# The modules all of whose public names are exported, as by `from module import *`, the last one first
+_star_modules = ("context", "visitors", "utils")
+
+
+def _get_public_names(module) -> list:
+    """
+    Get the names exported by `from module import *`, without the modules it imports.
+    """
+    names = getattr(module, "__all__", None)
+    if names is None:
+        names = [name for name, value in vars(module).items()
+                 if not name.startswith("_") and not isinstance(value, types.ModuleType)]
+    return list(names)
+
+
+def __getattr__(name: str):
+    """
+    Import an exported name, or a submodule, when it is first used.
+
+    Raises:
+        AttributeError: If the name is not exported by the package.
+    """
+    if name == "__all__":
+        # the star modules are imported by `from mp2c import *` only, not by `import mp2c`
+        names = {"rules", "lalr_rules", *_exports}
+        for module_name in _star_modules:
+            names.update(_get_public_names(importlib.import_module("." + module_name, __name__)))
+        value = sorted(names)
+    elif name in _exports:
+        value = getattr(importlib.import_module("." + _exports[name], __name__), name)
+    else:
+        for module_name in _star_modules:
+            module = importlib.import_module("." + module_name, __name__)
+            if name in _get_public_names(module):
+                value = getattr(module, name)
+                break
+        else:
+            try:
+                value = importlib.import_module("." + name, __name__)
+            except ModuleNotFoundError:
+                raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name)) from None
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list:
+    """
+    List the names of the package, with the exported names which are not imported yet.
+    """
+    return sorted(set(globals()) | set(__getattr__("__all__")))
@@ -0,0 +1,256 @@
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .cache import ConversionCache
+from .converter import Converter
+from .toolpool import ToolPool
+
+# The converter of the current worker process, created once by `init_worker`
+_converter = None
+
+
+def collect_sources(paths, extension = ".pas") -> list:
+    """
+    Collect the MiniPascal source files to be converted.
+
+    Each path may be a file, a directory (searched recursively for files with the given extension) or a glob pattern
+    (with "**" matching any number of directories).
+
+    Args:
+        paths (list): The files, directories or glob patterns.
+        extension (str, optional): The extension of the source files in directories. Defaults to ".pas".
+
+    Returns:
+        list: The sorted list of source file paths, without duplicates.
+    """
+    sources = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in files:
+                    if name.endswith(extension):
+                        sources.add(os.path.join(root, name))
+        elif os.path.isfile(path):
+            sources.add(path)
+        else:
+            sources.update(match for match in glob.glob(path, recursive = True) if os.path.isfile(match))
+    return sorted(sources)
+
+
+def get_output_paths(sources, output_dir = None) -> list:
+    """
+    Compute the output path of each source file.
+
+    Without an output directory, the C file is written next to its source. Otherwise the directory layout of the
+    sources, relative to their common parent directory, is mirrored in the output directory.
+
+    Args:
+        sources (list): The source file paths.
+        output_dir (str, optional): The output directory. Defaults to None.
+
+    Returns:
+        list: The output file paths.
+    """
+    if not sources:
+        return []
+    if output_dir is None:
+        return [os.path.splitext(source)[0] + ".c" for source in sources]
+    base = os.path.commonpath([os.path.dirname(os.path.abspath(source)) for source in sources])
+    outputs = []
+    for source in sources:
+        relative = os.path.relpath(os.path.abspath(source), base)
+        outputs.append(os.path.join(output_dir, os.path.splitext(relative)[0] + ".c"))
+    return outputs
+
+
+def make_converter(parser = "lalr", cache = True, format = "builtin", conversion_cache = None, optimize = 0,
+                   fast_io = False) -> Converter:
+    """
+    Create the converter shared by all the files converted in one process.
+
+    Args:
+        parser (str, optional): The parsing algorithm. Defaults to "lalr".
+        cache (bool, optional): Whether to use the on-disk parser cache. Defaults to True.
+        format (str, optional): The C formatter. Defaults to "builtin".
+        conversion_cache (str, optional): The directory of the on-disk conversion cache, shared by the workers.
+            Defaults to None, which disables the conversion cache.
+        optimize (int, optional): The optimization level. Defaults to 0.
+        fast_io (bool, optional): Whether to use the buffered I/O runtime. Defaults to False.
+
+    Returns:
+        Converter: The converter.
+    """
+    if conversion_cache is not None:
+        conversion_cache = ConversionCache(conversion_cache)
+    return Converter(parser, cache, format, conversion_cache = conversion_cache, optimize = optimize,
+                     fast_io = fast_io)
+
+
+def init_worker(parser = "lalr", cache = True, format = "builtin", conversion_cache = None, optimize = 0,
+                fast_io = False):
+    """
+    Initialize a worker process with its own converter, shared by all the files it converts.
+
+    The arguments are the options of the converter, see `make_converter`.
+    """
+    global _converter
+    _converter = make_converter(parser, cache, format, conversion_cache, optimize, fast_io)
+
+
+def write_output(code, output):
+    """
+    Write C code to an output file, creating its directory if needed.
+
+    Args:
+        code (str): The C code.
+        output (str): The output file path.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok = True)
+    with open(output, "w") as file:
+        file.write(code)
+
+
+def convert_file(source, output, write = True, converter = None) -> dict:
+    """
+    Convert one source file and write the C code to the output file.
+
+    Args:
+        source (str): The source file path.
+        output (str): The output file path.
+        write (bool, optional): Whether to write the output file. Otherwise the code is returned in the record, under
+            the "code" key, to be formatted and written by the caller. Defaults to True.
+        converter (Converter, optional): The converter. Defaults to None, which uses the converter of the worker
+            process.
+
+    Returns:
+        dict: The conversion record, with the status ("success", "error" or "exception"), the error messages and
+            whether the result came from the conversion cache.
+    """
+    if converter is None:
+        if _converter is None:
+            init_worker()
+        converter = _converter
+    start = time.perf_counter()
+    record = {"input": source, "output": None, "status": "exception", "error_messages": [], "lines": 0,
+              "cached": False}
+    try:
+        with open(source, "r") as file:
+            code = file.read()
+        record["lines"] = code.count("\n") + (0 if code.endswith("\n") else 1)
+        conversion_cache = converter.conversion_cache
+        hits = conversion_cache.stats["hits"] if conversion_cache is not None else 0
+        result = converter.convert(code)
+        record["cached"] = conversion_cache is not None and conversion_cache.stats["hits"] > hits
+        record["status"] = "success" if result.success else "error"
+        record["error_messages"] = list(result.error_messages)
+        if result.code and not write:
+            record["code"] = result.code
+        elif result.code:
+            write_output(result.code, output)
+            record["output"] = output
+    except Exception as e:
+        record["status"] = "exception"
+        record["error_messages"].append("{}: {}".format(type(e).__name__, e))
+    record["seconds"] = time.perf_counter() - start
+    return record
+
+
+def format_records(records, tool_pool: ToolPool):
+    """
+    Format the code of the conversion records with clang-format and write the output files.
+
+    All the files are submitted at once, so the pool formats them in batches of many files per clang-format process.
+
+    Args:
+        records (list): The records returned by `convert_file` with `write=False`.
+        tool_pool (ToolPool): The pool running clang-format.
+    """
+    pending = []
+    for record, output in records:
+        code = record.pop("code", None)
+        if code:
+            pending.append((record, output, time.perf_counter(), tool_pool.submit_format(code)))
+    for record, output, start, future in pending:
+        try:
+            write_output(future.result(), output)
+            record["output"] = output
+        except Exception as e:
+            record["status"] = "exception"
+            record["error_messages"].append("{}: {}".format(type(e).__name__, e))
+        record["seconds"] += time.perf_counter() - start
+
+
+def convert_batch(sources, output_dir = None, jobs = None, parser = "lalr", cache = True, format = "builtin",
+                  conversion_cache = None, optimize = 0, fast_io = False) -> dict:
+    """
+    Convert many source files across a pool of worker processes.
+
+    Each worker loads one parser and reuses it for all the files it converts. With a single job, the files are
+    converted in the current process, by a converter of their own. With the "clang" formatter, the workers leave the
+    code unformatted and the current process formats all the files through a `ToolPool`, which runs clang-format on
+    many files at once.
+
+    Args:
+        sources (list): The source file paths, see `collect_sources`.
+        output_dir (str, optional): The output directory, see `get_output_paths`. Defaults to None.
+        jobs (int, optional): The number of worker processes. Defaults to the number of CPUs.
+        parser (str, optional): The parsing algorithm. Defaults to "lalr".
+        cache (bool, optional): Whether to use the on-disk parser cache. Defaults to True.
+        format (str, optional): The C formatter. Defaults to "builtin".
+        conversion_cache (str, optional): The directory of the on-disk conversion cache. Defaults to None, which
+            disables the conversion cache.
+        optimize (int, optional): The optimization level, see `Converter`. Defaults to 0.
+        fast_io (bool, optional): Whether to use the buffered I/O runtime, see `Converter`. Defaults to False.
+
+    Returns:
+        dict: The summary, with one record per file, the number of conversion cache hits and the overall throughput.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    outputs = get_output_paths(sources, output_dir)
+    pooled = format == "clang"
+    if pooled:
+        format = "none"
+    writes = [not pooled] * len(sources)
+    start = time.perf_counter()
+    if jobs == 1 or len(sources) <= 1:
+        converter = make_converter(parser, cache, format, conversion_cache, optimize, fast_io)
+        records = [convert_file(source, output, write, converter)
+                   for source, output, write in zip(sources, outputs, writes)]
+    else:
+        chunksize = max(1, len(sources) // (jobs * 4))
+        initargs = (parser, cache, format, conversion_cache, optimize, fast_io)
+        with ProcessPoolExecutor(jobs, initializer = init_worker, initargs = initargs) as executor:
+            records = list(executor.map(convert_file, sources, outputs, writes, chunksize = chunksize))
+    if pooled:
+        with ToolPool(jobs) as tool_pool:
+            format_records(zip(records, outputs), tool_pool)
+    seconds = time.perf_counter() - start
+    lines = sum(record["lines"] for record in records)
+    succeeded = sum(1 for record in records if record["status"] == "success")
+    return {
+        "files": records,
+        "total": len(records),
+        "succeeded": succeeded,
+        "failed": len(records) - succeeded,
+        "cache_hits": sum(1 for record in records if record["cached"]),
+        "lines": lines,
+        "jobs": jobs,
+        "seconds": seconds,
+        "files_per_second": len(records) / seconds if seconds else 0.0,
+        "lines_per_second": lines / seconds if seconds else 0.0,
+    }
+
+
+def write_summary(summary: dict, path: str):
+    """
+    Write a batch summary to a JSON file.
+
+    Args:
+        summary (dict): The summary returned by `convert_batch`.
+        path (str): The path of the JSON file.
+    """
+    with open(path, "w") as file:
+        json.dump(summary, file, indent = 2)
@@ -0,0 +1,589 @@
+from lark import Token, Tree
+
+from .context import Context, FunctionSymbol
+from .emitter import emit_expression
+from .ir import (ArrayElement, Assign, Binary, Block, Call, ConstDeclaration, Constant, Empty, Expression, For,
+                 Function, If, Parameter, Parenthesized, Program, ProcedureCall, Read, Statement, Unary,
+                 VarDeclaration, Variable, While, Write, run_nested)
+from .utils import type_map
+from .visitors import flatten_left_recursion, get_else_if, get_single_factor, types_to_format
+
+
+# The builders resolve names and check types exactly as the visitors in `mp2c.visitors` do, and record the same error
+# messages in the same order, so that both front ends accept the same programs.
+
+
+def build_program(node: Tree, context: Context) -> Program:
+    """
+    Build the IR of a program from its parse tree, resolving the names and checking the types in the same pass.
+
+    Args:
+        node (Tree): The programstruct node in the parse tree.
+        context (Context): The context, where the errors are recorded.
+
+    Returns:
+        Program: The IR of the program.
+    """
+    context.enter_scope()
+    context.declare_library_functions()
+    program_head, program_body = node.children
+    name = program_head.children[0].children[0].value
+    const_declarations, var_declarations, subprogram_declarations, compound_statement = program_body.children
+    declarations = build_const_declarations(const_declarations, context)
+    declarations.extend(build_var_declarations(var_declarations, context))
+    functions = {}
+    for child in flatten_left_recursion(subprogram_declarations):
+        if child.data == "subprogram":
+            function = build_subprogram(child, context)
+            functions[function.name] = function
+    main = build_compound_statement(compound_statement, context, "main")
+    # the functions are emitted in the order of the symbol table, as by `visit_programstruct`
+    ordered = [functions[name] for name, symbol in context.get_funcs().items() if not symbol.is_library]
+    context.exit_scope()
+    return Program(name, ordered, declarations, main)
+
+
+def build_const_declarations(node: Tree, context: Context) -> list:
+    """
+    Build the constant declarations of a const_declarations node and register the constants.
+
+    Args:
+        node (Tree): The const_declarations node in the parse tree.
+        context (Context): The context.
+
+    Returns:
+        list: The `ConstDeclaration` nodes.
+    """
+    declarations = []
+    if not node.children or node.children[0].data == "empty":
+        return declarations
+    children = flatten_left_recursion(node.children[0])
+    for id_node, value_node in zip(children[::2], children[1::2]):
+        name = id_node.children[0].value
+        value = build_const_value(value_node)
+        tokens = []
+        emit_expression(value, tokens)
+        context.register_value(name, value.type, False, tokens)
+        declarations.append(ConstDeclaration(context.get_values()[name], value))
+    return declarations
+
+
+def build_const_value(node: Tree) -> Expression:
+    """
+    Build the value of a constant declaration.
+
+    Args:
+        node (Tree): The const_value node in the parse tree.
+
+    Returns:
+        Expression: A `Constant`, in a `Unary` for a signed number.
+    """
+    child = node.children[-1]
+    if isinstance(child, Token):
+        return Constant("'" + child.value + "'", "char")
+    value = build_num(child)
+    if len(node.children) == 2:
+        return Unary(node.children[0].value, value, value.type)
+    return value
+
+
+def build_num(node: Tree) -> Constant:
+    """
+    Build a number literal.
+
+    Args:
+        node (Tree): The num node in the parse tree.
+
+    Returns:
+        Constant: The number, of type "int" or "float".
+    """
+    if len(node.children) == 2:
+        return Constant(node.children[0].value + "." + node.children[1].children[0].value, "float")
+    return Constant(node.children[0].value, "int")
+
+
+def build_var_declarations(node: Tree, context: Context) -> list:
+    """
+    Build the variable declarations of a var_declarations node and register the variables and arrays.
+
+    Args:
+        node (Tree): The var_declarations node in the parse tree.
+        context (Context): The context.
+
+    Returns:
+        list: The `VarDeclaration` nodes.
+    """
+    declarations = []
+    if not node.children or node.children[0].data == "empty":
+        return declarations
+    children = flatten_left_recursion(node.children[0])
+    for idlist, type_node in zip(children[::2], children[1::2]):
+        names = [child.children[0].value for child in flatten_left_recursion(idlist)]
+        basic_type = type_map[type_node.children[-1].children[0].value]
+        periods = None
+        if type_node.children[0].data == "period":
+            values = [int(token.value) for token in flatten_left_recursion(type_node.children[0])]
+            periods = [values[index:index + 2] for index in range(0, len(values), 2)]
+        for name in names:
+            if periods is None:
+                context.register_value(name, basic_type, True)
+                declarations.append(VarDeclaration(context.get_values()[name]))
+            else:
+                context.register_array(name, basic_type, periods)
+                declarations.append(VarDeclaration(context.get_arrays()[name]))
+    return declarations
+
+
+def build_subprogram(node: Tree, context: Context) -> Function:
+    """
+    Build a function or procedure definition and register its symbol, before its body so that it can be recursive.
+
+    Args:
+        node (Tree): The subprogram node in the parse tree.
+        context (Context): The context.
+
+    Returns:
+        Function: The IR of the subprogram.
+    """
+    declaration = node.children[0]
+    if declaration.data == "function_declaration":
+        id_node, formal_parameter, basic_type, body = declaration.children
+        return_type = type_map[basic_type.children[0].value]
+    else:
+        id_node, formal_parameter, body = declaration.children
+        return_type = "void"
+    name = id_node.children[0].value
+    parameters = []
+    parameter_list = []
+    header = [return_type, name, "("]
+    parameter_list_node = formal_parameter.children[0]
+    if parameter_list_node.data == "parameter_list":
+        for parameter in parameter_list_node.children:
+            if parameter.data != "parameter":
+                continue
+            var = parameter.children[0].data == "var_parameter"
+            value_parameter = parameter.children[0].children[0] if var else parameter.children[0]
+            idlist, basic_type = value_parameter.children
+            ids = [child.children[0].value for child in flatten_left_recursion(idlist)]
+            parameter_type = type_map[basic_type.children[0].value]
+            parameter_list.append({"ids": ids, "type": parameter_type})
+            for id_ in ids:
+                # the parameters are registered in the enclosing scope, as by `construct_parameter_tokens`
+                context.register_value(id_, parameter_type, True, var = var)
+                if len(header) > 3:
+                    header.append(",")
+                header.append(parameter_type)
+                if var:
+                    header.append("*")
+                header.append(id_)
+                parameters.append(Parameter(id_, parameter_type, var))
+    header.append(")")
+    symbol = context.register_func(name, header, parameter_list, [parameter.var for parameter in parameters])
+    context.enter_scope()
+    if return_type != "void":
+        context.register_value("_" + name, return_type, True)
+    const_declarations, var_declarations, compound_statement = body.children
+    declarations = build_const_declarations(const_declarations, context)
+    declarations.extend(build_var_declarations(var_declarations, context))
+    statements = build_compound_statement(compound_statement, context, name)
+    context.exit_scope()
+    return Function(name, symbol, return_type, parameters, declarations, statements)
+
+
+def build_compound_statement(node: Tree, context: Context, func_name: str) -> list:
+    """
+    Build the statements of a compound statement. The nested statements and expressions are built on the stack of
+    `run_nested`, so that they may be nested to any depth.
+
+    Args:
+        node (Tree): The compound_statement node in the parse tree.
+        context (Context): The context.
+        func_name (str): The name of the enclosing function, whose result variable is renamed, or "main".
+
+    Returns:
+        list: The statements, without the empty ones.
+    """
+    return run_nested(build_statements(node, context, func_name))
+
+
+def build_statements(node: Tree, context: Context, func_name: str):
+    """
+    Build the statements of a compound statement, as a nested builder of `run_nested`.
+
+    Args:
+        node (Tree): The compound_statement node in the parse tree.
+        context (Context): The context.
+        func_name (str): The name of the enclosing function.
+
+    Returns:
+        list: The statements, without the empty ones.
+    """
+    statements = []
+    for child in flatten_left_recursion(node.children[0]):
+        statement = yield build_statement(child, context, func_name)
+        if not isinstance(statement, Empty):
+            statements.append(statement)
+    return statements
+
+
+def build_statement(node: Tree, context: Context, func_name: str):
+    """
+    Build a statement.
+
+    Args:
+        node (Tree): The statement node in the parse tree.
+        context (Context): The context.
+        func_name (str): The name of the enclosing function.
+
+    Returns:
+        Statement: The IR of the statement, or the nested builder returning it.
+    """
+    if not node.children:
+        return Empty()
+    child = node.children[0]
+    builder = _statement_builders.get(child.data)
+    if builder is None:
+        raise Exception("Unknown statement child data: {}".format(child.data))
+    return builder(child, context, func_name)
+
+
+def build_empty(node: Tree, context: Context, func_name: str) -> Statement:
+    """
+    Build the empty statement.
+    """
+    return Empty()
+
+
+def build_block(node: Tree, context: Context, func_name: str):
+    """
+    Build a compound statement nested in a statement.
+    """
+    return Block((yield build_statements(node, context, func_name)))
+
+
+def build_assign_statement(node: Tree, context: Context, func_name: str):
+    """
+    Build an assignment and check that the types of its sides are the same.
+    """
+    target = yield build_variable(node.children[0], context, func_name)
+    value = yield build_expression(node.children[2], context, func_name)
+    if target.type != value.type:
+        target_tokens = []
+        emit_expression(target, target_tokens)
+        value_tokens = []
+        emit_expression(value, value_tokens)
+        context.record_error("Type mismatch in assignment: {},{} != {}, {}".format(
+            "".join(target_tokens), target.type, "".join(value_tokens), value.type))
+    return Assign(target, value)
+
+
+def build_if_else_statement(node: Tree, context: Context, func_name: str):
+    """
+    Build an if statement, following "else if" chains in a loop.
+    """
+    root = None
+    previous = None
+    while node is not None:
+        condition = yield build_expression(node.children[0], context, func_name)
+        then = yield build_statement(node.children[1], context, func_name)
+        statement = If(condition, then)
+        if previous is None:
+            root = statement
+        else:
+            previous.otherwise = statement
+        previous = statement
+        nested = None
+        if len(node.children) == 3:
+            else_part = node.children[2]
+            nested = get_else_if(else_part)
+            if nested is None and else_part.children[0].data == "statement":
+                statement.otherwise = yield build_statement(else_part.children[0], context, func_name)
+        node = nested
+    return root
+
+
+def build_for_statement(node: Tree, context: Context, func_name: str):
+    """
+    Build a for loop, whose variable is declared in a new scope.
+    """
+    context.enter_scope()
+    name = build_id(node.children[0], func_name)
+    context.register_value(name, "int", True)
+    symbol = context.get_values()[name]
+    expressions = [child for child in node.children if isinstance(child, Tree)]
+    downto = any(isinstance(child, Token) and child.type == "DOWN" for child in node.children)
+    start = yield build_expression(expressions[1], context, func_name)
+    stop = yield build_expression(expressions[2], context, func_name)
+    body = yield build_statement(expressions[3], context, func_name)
+    context.exit_scope()
+    return For(name, symbol, start, stop, body, downto)
+
+
+def build_while_statement(node: Tree, context: Context, func_name: str):
+    """
+    Build a while loop.
+    """
+    condition = yield build_expression(node.children[0], context, func_name)
+    return While(condition, (yield build_statement(node.children[1], context, func_name)))
+
+
+def build_procedure_call(node: Tree, context: Context, func_name: str):
+    """
+    Build a procedure call, or a call of the read, write or writeln built-in procedures.
+    """
+    name = node.children[0].children[0].value
+    expression_list = node.children[1] if len(node.children) == 2 else None
+    if name == "read" or name == "write" or name == "writeln":
+        arguments = []
+        if expression_list is not None:
+            for child in expression_list.children:
+                arguments.append((yield build_expression(child, context, func_name)))
+        if name == "read":
+            format_ = types_to_format([argument.type for argument in arguments], context) if arguments else None
+            return Read(format_, arguments)
+        if expression_list is None:
+            return Write(r'"\n"' if name == "writeln" else '""', arguments)
+        return Write(types_to_format([argument.type for argument in arguments], context, name == "writeln"),
+                     arguments)
+    function = context.get_func(name)
+    if function is None:
+        context.record_error("Procedure not declared: {}".format(name))
+    if expression_list is None:
+        return ProcedureCall(name, function, [], [])
+    arguments, references = yield build_arguments(expression_list, context, func_name, function)
+    return ProcedureCall(name, function, arguments, references)
+
+
+def build_id(node: Tree, func_name: str) -> str:
+    """
+    Get the C name of an id, with a "_" prefix for the result variable of the enclosing function.
+    """
+    name = node.children[0].value
+    if name == func_name:
+        return "_" + name
+    return name
+
+
+def build_expression(node: Tree, context: Context, func_name: str):
+    """
+    Build an expression. The builders of the expressions give the IR of a leaf directly, and the nested builder of
+    `run_nested` returning it otherwise.
+
+    Args:
+        node (Tree): The expression node in the parse tree.
+        context (Context): The context.
+        func_name (str): The name of the enclosing function.
+
+    Returns:
+        Expression: The IR of the expression, with its type, or the nested builder returning it.
+    """
+    children = node.children
+    if len(children) == 3:
+        return build_comparison(node, context, func_name)
+    first = children[0]
+    if first.data == "simple_expression":
+        return build_simple_expression(first, context, func_name)
+    if first.data == "char_literal":
+        return Constant(first.children[0].value, "char")
+    return Constant(first.children[0].value, "char*")
+
+
+def build_comparison(node: Tree, context: Context, func_name: str):
+    """
+    Build the comparison of two sums.
+    """
+    children = node.children
+    left = yield build_simple_expression(children[0], context, func_name)
+    right = yield build_simple_expression(children[2], context, func_name)
+    return Binary(children[1].value, left, right, "bool")
+
+
+def build_simple_expression(node: Tree, context: Context, func_name: str):
+    """
+    Build a sum of terms, whose type is the type of its last term.
+    """
+    if len(node.children) == 1:
+        return build_term(node.children[0], context, func_name)
+    return build_chain(node, build_term, context, func_name)
+
+
+def build_term(node: Tree, context: Context, func_name: str):
+    """
+    Build a product of factors, whose type is "float" after a "/" and the type of its last factor otherwise.
+    """
+    if len(node.children) == 1:
+        return build_factor(node.children[0], context, func_name)
+    return build_chain(node, build_factor, context, func_name)
+
+
+def build_chain(node: Tree, builder, context: Context, func_name: str):
+    """
+    Build an operator chain of a simple_expression or term node from its operands, with `build_term` or
+    `build_factor`.
+    """
+    children = flatten_left_recursion(node)
+    expression = yield builder(children[0], context, func_name)
+    for index in range(1, len(children), 2):
+        op = children[index].value
+        right = yield builder(children[index + 1], context, func_name)
+        expression = Binary(op, expression, right, "float" if op == "/" else right.type)
+    return expression
+
+
+def build_factor(node: Tree, context: Context, func_name: str):
+    """
+    Build a factor. The signs, the "not" operators and the parentheses around a single factor are unwrapped in a
+    loop.
+    """
+    wrappers = []
+    while True:
+        child = node.children[0]
+        if isinstance(child, Token):
+            wrappers.append("not" if child.type == "NOT" else child.value)
+            node = node.children[1]
+            continue
+        inner = get_single_factor(child) if child.data == "expression" else None
+        if inner is None:
+            break
+        # None stands for a pair of parentheses
+        wrappers.append(None)
+        node = inner
+    builder = _factor_builders.get(child.data)
+    if builder is None:
+        raise Exception("Unknown factor child data: {}".format(child.data))
+    expression = builder(child, context, func_name)
+    return wrap_factor(expression, wrappers) if wrappers else expression
+
+
+def wrap_factor(expression, wrappers: list):
+    """
+    Wrap a factor in its signs, "not" operators and parentheses, None standing for a pair of parentheses.
+    """
+    expression = yield expression
+    for op in reversed(wrappers):
+        if op is None:
+            expression = Parenthesized(expression, expression.type)
+        else:
+            expression = Unary(op, expression, expression.type)
+    return expression
+
+
+def build_parenthesized(node: Tree, context: Context, func_name: str):
+    """
+    Build an expression in parentheses.
+    """
+    expression = yield build_expression(node, context, func_name)
+    return Parenthesized(expression, expression.type)
+
+
+def build_variable(node: Tree, context: Context, func_name: str):
+    """
+    Build a reference to a variable or an array element.
+    """
+    name = build_id(node.children[0], func_name)
+    if len(node.children) == 2:
+        return build_array_element(node, name, context, func_name)
+    symbol = context.get_value(name)
+    if symbol is None:
+        context.record_error("Variable not declared: {}".format(name))
+        return Variable(name, None, "")
+    return Variable(name, symbol, symbol.type)
+
+
+def build_array_element(node: Tree, name: str, context: Context, func_name: str):
+    """
+    Build a reference to an array element, and check that its indices are integers.
+    """
+    indices = []
+    for child in node.children[1].children[0].children:
+        indices.append((yield build_expression(child, context, func_name)))
+    for index in indices:
+        if index.type != "int":
+            context.record_error("Array index must be integer, but got {}".format(index.type))
+    symbol = context.get_array(name)
+    if symbol is None:
+        context.record_error("Array not declared: {}".format(name))
+        return ArrayElement(name, None, indices, [0] * len(indices), "")
+    if len(indices) != len(symbol.dimensions):
+        context.record_error("Number of indices does not match: expected {}, got {}".format(
+            len(symbol.dimensions), len(indices)))
+    offsets = [dimension.start for dimension in symbol.dimensions[:len(indices)]]
+    offsets += [0] * (len(indices) - len(offsets))
+    return ArrayElement(name, symbol, indices, offsets, symbol.type)
+
+
+def build_function_call(node: Tree, context: Context, func_name: str):
+    """
+    Build a function call, whose type is the return type of the function.
+    """
+    name = node.children[0].children[0].children[0].value
+    function = context.get_func(name)
+    if function is None:
+        context.record_error("Function not declared: {}".format(name))
+        type_ = ""
+    else:
+        type_ = function.header[0]
+    if len(node.children) == 1:
+        return Call(name, function, [], [], type_)
+    arguments, references = yield build_arguments(node.children[1], context, func_name, function)
+    return Call(name, function, arguments, references, type_)
+
+
+def build_arguments(node: Tree, context: Context, func_name: str, function: FunctionSymbol):
+    """
+    Build the arguments of a call and check them against the parameters of the function, as a nested builder of
+    `run_nested`.
+
+    Args:
+        node (Tree): The expression_list node in the parse tree.
+        context (Context): The context.
+        func_name (str): The name of the enclosing function.
+        function (FunctionSymbol): The called function, or None if it is not declared, whose arguments are built
+            without being checked.
+
+    Returns:
+        tuple: The argument expressions and whether each one is passed by reference.
+    """
+    if function is None:
+        arguments = []
+        for child in node.children:
+            arguments.append((yield build_expression(child, context, func_name)))
+        return arguments, [False] * len(arguments)
+    parameter_types = []
+    for id_group in function.parameter_list:
+        for _ in id_group["ids"]:
+            parameter_types.append(id_group["type"])
+    arguments = []
+    references = []
+    for count, child in enumerate(node.children):
+        references.append(count < len(function.var_parameter) and function.var_parameter[count])
+        argument = yield build_expression(child, context, func_name)
+        try:
+            if argument.type != parameter_types[count]:
+                context.record_error("Parameter types do not match: expected {}, got {}".format(
+                    function.parameter_list[count], argument.type))
+        except IndexError as e:
+            context.record_error(str(e))
+        arguments.append(argument)
+    if len(arguments) != len(function.var_parameter):
+        context.record_error("Number of parameters does not match: expected {}, got {}".format(
+            len(function.var_parameter), len(arguments)))
+    return arguments, references
+
+
+_factor_builders = {
+    "num": lambda node, context, func_name: build_num(node),
+    "variable": build_variable,
+    "expression": build_parenthesized,
+    "function_call": build_function_call,
+}
+
+_statement_builders = {
+    "empty": build_empty,
+    "assign_statement": build_assign_statement,
+    "procedure_call": build_procedure_call,
+    "compound_statement": build_block,
+    "if_else_statement": build_if_else_statement,
+    "for_statement": build_for_statement,
+    "while_statement": build_while_statement,
+}
@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from .paths import get_cache_dir
+from .version import __version__
+
+# Part of the cache key, bump it whenever the layout of the cache entries changes
+ENTRY_FORMAT = 1
+
+_fingerprint = None
+
+
+def get_compiler_fingerprint() -> str:
+    """
+    Get a fingerprint of the compiler: its version and the contents of its source files.
+
+    The fingerprint changes with any change to the compiler, including a change that does not bump the version, so
+    cached conversions of an older compiler are never used.
+
+    Returns:
+        str: The hexadecimal fingerprint.
+    """
+    global _fingerprint
+    if _fingerprint is None:
+        digest = hashlib.sha256(__version__.encode())
+        package_dir = os.path.dirname(os.path.abspath(__file__))
+        for name in sorted(os.listdir(package_dir)):
+            if name.endswith(".py"):
+                with open(os.path.join(package_dir, name), "rb") as file:
+                    digest.update(name.encode())
+                    digest.update(file.read())
+        _fingerprint = digest.hexdigest()
+    return _fingerprint
+
+
+def normalize_source(code: str) -> str:
+    """
+    Normalize MiniPascal code for cache lookups.
+
+    Line endings are converted to "\\n" and trailing whitespace is removed from each line and from the end of the code.
+    The positions of the tokens, and so the error messages, do not change.
+
+    Args:
+        code (str): The MiniPascal code.
+
+    Returns:
+        str: The normalized code.
+    """
+    return "\n".join(line.rstrip() for line in code.replace("\r\n", "\n").split("\n")).rstrip()
+
+
+class ConversionCache:
+    """
+    A content-addressed cache of conversion results, in memory and optionally on disk.
+
+    The key of a conversion is a hash of the normalized source code, the compiler fingerprint and the conversion
+    options. An entry stores the generated C code, the success flag, the error messages and the clang analysis output
+    when it is known. Recently used entries are kept in memory, within a number of entries and a total size. With a
+    directory, entries are also stored there, one JSON file each, written atomically so that concurrent processes can
+    share the directory; unreadable files are treated as misses.
+
+    Attributes:
+        directory (str): The directory of the on-disk store, or None for a memory-only cache.
+        max_entries (int): The maximum number of entries in memory.
+        max_bytes (int): The maximum total size in characters of the entries in memory.
+        stats (dict): The number of hits (from memory and from disk), misses, stores and evictions.
+    """
+
+    def __init__(self, directory = None, max_entries = 256, max_bytes = 64 * 1024 * 1024):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.size = 0
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    @classmethod
+    def on_disk(cls, **kwargs):
+        """
+        Create a cache stored in the "conversions" directory of the mp2c cache directory, see `get_cache_dir`.
+
+        Args:
+            **kwargs: The other arguments of `ConversionCache`.
+
+        Returns:
+            ConversionCache: The cache.
+        """
+        return cls(os.path.join(get_cache_dir(), "conversions"), **kwargs)
+
+    @staticmethod
+    def get_key(code: str, **options) -> str:
+        """
+        Compute the cache key of a conversion.
+
+        Args:
+            code (str): The MiniPascal code.
+            **options: The conversion options that change the result, such as the parser and the formatter.
+
+        Returns:
+            str: The hexadecimal cache key.
+        """
+        digest = hashlib.sha256()
+        for part in (str(ENTRY_FORMAT), get_compiler_fingerprint(), json.dumps(options, sort_keys = True),
+                     normalize_source(code)):
+            digest.update(part.encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, key: str):
+        """
+        Look up an entry, in memory first, then on disk.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            dict: The entry, or None if it is not cached.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                self.stats["memory_hits"] += 1
+                return entry
+        entry = self._read(key)
+        with self.lock:
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            self.stats["disk_hits"] += 1
+            self._remember(key, entry)
+        return entry
+
+    def put(self, key: str, entry: dict):
+        """
+        Store an entry in memory and on disk.
+
+        Failing to write the on-disk store is not an error.
+
+        Args:
+            key (str): The cache key.
+            entry (dict): The entry, with the "code", "success", "error_messages" and "error_info" keys.
+        """
+        with self.lock:
+            self.stats["stores"] += 1
+            self._remember(key, entry)
+        if self.directory is not None:
+            try:
+                self._write(key, entry)
+            except OSError:
+                pass
+
+    def clear(self):
+        """
+        Remove all the entries, in memory and on disk.
+        """
+        with self.lock:
+            self.entries.clear()
+            self.sizes.clear()
+            self.size = 0
+        if self.directory is not None and os.path.isdir(self.directory):
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    if name.endswith(".json"):
+                        try:
+                            os.remove(os.path.join(root, name))
+                        except OSError:
+                            pass
+
+    def hit_rate(self) -> float:
+        """
+        Get the ratio of lookups that were hits.
+
+        Returns:
+            float: The hit rate, 0 if there was no lookup.
+        """
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def _remember(self, key: str, entry: dict):
+        """
+        Add an entry to the memory cache and evict the least recently used entries over the limits. The lock must be
+        held.
+        """
+        if key in self.entries:
+            self.size -= self.sizes[key]
+        size = len(entry["code"]) + sum(len(message) for message in entry["error_messages"]) + len(
+            entry["error_info"] or "")
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        self.sizes[key] = size
+        self.size += size
+        while self.entries and (len(self.entries) > self.max_entries or self.size > self.max_bytes):
+            old_key, _ = self.entries.popitem(last = False)
+            self.size -= self.sizes.pop(old_key)
+            self.stats["evictions"] += 1
+
+    def _get_path(self, key: str) -> str:
+        """
+        Get the path of the file of an entry, in a subdirectory named after the first characters of the key.
+        """
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def _read(self, key: str):
+        """
+        Read an entry from the on-disk store, or return None if it is missing or unreadable.
+        """
+        if self.directory is None:
+            return None
+        try:
+            with open(self._get_path(key), "r") as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(entry, dict) or not {"code", "success", "error_messages", "error_info"} <= entry.keys():
+            return None
+        return entry
+
+    def _write(self, key: str, entry: dict):
+        """
+        Write an entry to the on-disk store through a temporary file, so readers never see a partial file.
+        """
+        path = self._get_path(key)
+        entry_dir = os.path.dirname(path)
+        os.makedirs(entry_dir, exist_ok = True)
+        fd, tmp_path = tempfile.mkstemp(dir = entry_dir, suffix = ".tmp")
+        try:
+            with os.fdopen(fd, "w") as file:
+                json.dump(entry, file)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
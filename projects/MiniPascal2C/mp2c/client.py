@@ -0,0 +1,163 @@
+# The client of the compile server of `mp2c.server`.
+#
+# The module only depends on the standard library and on `mp2c.paths`, so that a command connecting to a running
+# server starts without importing lark and the converter.
+
+import json
+import socket
+import threading
+
+from .paths import get_server_path
+from .version import __version__
+
+
+class Client:
+    """
+    Sends JSON-RPC 2.0 requests to a compile server over a socket, one at a time.
+
+    Attributes:
+        address (str): The address of the server, "unix:PATH" or "tcp:HOST:PORT".
+    """
+
+    def __init__(self, address: str, timeout = None):
+        """
+        Connects to a compile server.
+
+        Args:
+            address (str): The address of the server, "unix:PATH" or "tcp:HOST:PORT", as written by `Server.serve`.
+            timeout (float, optional): The time limit in seconds of the connection. Defaults to None, for no limit.
+
+        Raises:
+            ValueError: If the address is not valid.
+            OSError: If the server cannot be reached.
+        """
+        kind, _, location = address.partition(":")
+        if kind == "unix":
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(timeout)
+            try:
+                sock.connect(location)
+            except OSError:
+                sock.close()
+                raise
+        elif kind == "tcp":
+            host, _, port = location.rpartition(":")
+            sock = socket.create_connection((host, int(port)), timeout)
+        else:
+            raise ValueError("Unknown server address: {}".format(address))
+        # the time limit is only for connecting, since a request may take any time
+        sock.settimeout(None)
+        self.address = address
+        self.socket = sock
+        self.file = sock.makefile("rwb")
+        self.next_id = 0
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Close the connection.
+        """
+        self.file.close()
+        self.socket.close()
+
+    def call(self, method: str, **params):
+        """
+        Call a method of the server and wait for its result.
+
+        Args:
+            method (str): The method, such as "convert", see `mp2c.server`.
+            **params: The parameters of the method.
+
+        Returns:
+            The result of the method.
+
+        Raises:
+            RuntimeError: If the server answers with an error, or closes the connection.
+        """
+        with self.lock:
+            self.next_id += 1
+            request = {"jsonrpc": "2.0", "id": self.next_id, "method": method, "params": params}
+            self.file.write(json.dumps(request).encode("utf-8") + b"\n")
+            self.file.flush()
+            line = self.file.readline()
+        if not line:
+            raise RuntimeError("The compile server closed the connection")
+        response = json.loads(line)
+        if "error" in response:
+            raise RuntimeError("Compile server error {}: {}".format(response["error"]["code"],
+                                                                    response["error"]["message"]))
+        return response["result"]
+
+    def convert(self, code: str, **options) -> dict:
+        """
+        Convert a MiniPascal program, see `Server.convert`.
+
+        Args:
+            code (str): The MiniPascal code.
+            **options: The options of the converter: "parser", "format", "optimize", "fast_io" and "recover".
+
+        Returns:
+            dict: The "code", "success", "error_messages" and "syntax_errors" of the result.
+        """
+        return self.call("convert", code = code, **options)
+
+    def analyze(self, code: str, **options) -> dict:
+        """
+        Convert a MiniPascal program and analyze the code of a failed conversion, see `Server.analyze`.
+
+        Returns:
+            dict: The result of `convert`, with the "error_info" of the analysis.
+        """
+        return self.call("analyze", code = code, **options)
+
+    def run(self, code: str, input_ = None, **options) -> str:
+        """
+        Run a MiniPascal program on an input, see `Server.run`.
+
+        Args:
+            code (str): The MiniPascal code.
+            input_ (str, optional): The standard input of the program. Defaults to None, for an empty input.
+            **options: The "engine", "parser", "optimize" and "timeout" of the run.
+
+        Returns:
+            str: The standard output of the program, or an error message.
+        """
+        return self.call("run", code = code, input = input_ or "", **options)["output"]
+
+    def stats(self) -> dict:
+        """
+        Get the statistics of the server, see `Server.get_stats`.
+        """
+        return self.call("stats")
+
+    def shutdown(self):
+        """
+        Stop the server.
+        """
+        self.call("shutdown")
+
+
+def connect(timeout = 1.0):
+    """
+    Connect to the compile server whose address is in `get_server_path()`, if it is running the same version of mp2c.
+
+    Args:
+        timeout (float, optional): The time limit in seconds of the connection. Defaults to 1.0.
+
+    Returns:
+        Client: The client, or None if no server is running.
+    """
+    try:
+        with open(get_server_path(), "r") as file:
+            info = json.load(file)
+        if info.get("version") != __version__:
+            return None
+        return Client(info["address"], timeout)
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
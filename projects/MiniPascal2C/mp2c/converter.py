@@ -1,27 +1,157 @@
-from lark import Lark
+import asyncio
+import copy
+import threading
 
+from lark import Lark, Tree
+from lark.exceptions import UnexpectedInput
+
+from .builder import build_program
+from .cache import ConversionCache
 from .context import Context
-from .result import Result
-from .rules import rules
-from .utils import format_code, preprocess, postprocess
-from .visitors import visit_programstruct
+from .emitter import emit_items, emit_program
+from .fastio import lower_program
+from .formatter import format_tokens, write_formatted
+from .ir import Program
+from .optimizer import optimization_levels, optimize_program
+from .parsers import grammars, load_parser
+from .profiling import Profile, profile_modes
+from .pyemitter import compile_python, run_python
+from .recovery import SyntaxErrorInfo, parse_recovering
+from .result import Result, analysis_policies
+from .toolpool import ToolPool
+from .utils import acode_analyze, aformat_code, code_analyze, format_code, preprocess, preprocess_with_map, postprocess
 
 
 class Converter:
     """
     Converts MiniPascal code to C code using a parser.
 
+    The parse tree is turned into the typed IR of `mp2c.ir` by `build_program`, which also checks the program, and the
+    C code is emitted from the IR by `emit_program`, after the optimization passes of `mp2c.optimizer` when an
+    optimization level is set, and after lowering the read and write statements to the buffered I/O runtime of
+    `mp2c.fastio` with `fast_io`.
+
+    A converter is reentrant: the options and the parser are only read by a conversion, which keeps its context, IR
+    and tokens to itself, and the caches and the tool pool it shares are thread-safe. One converter can serve
+    conversions from several threads at the same time, and from asyncio code with `aconvert`.
+
     Attributes:
-        parser (Lark): The parser used for parsing MiniPascal code.
+        parser (Lark): The parser used for parsing MiniPascal code, loaded at first use.
 
     Methods:
-        __init__(self): Initializes the Converter object.
+        __init__(self, parser="earley", cache=True, format="builtin", tool_pool=None, conversion_cache=None,
+                 optimize=0, fast_io=False, profile=False, collectors=(), recover=False):
+            Initializes the Converter object.
         __call__(self, code, debug=False) -> tuple[bool, str]: Converts the given MiniPascal code to C code.
         convert(self, code) -> Result: Converts the given MiniPascal code to C code and returns the result.
+        convert_to(self, code, stream) -> Result: Converts the given MiniPascal code to C code and writes it to a
+            stream as it is emitted.
+        aconvert(self, code) -> Result: Converts the given MiniPascal code to C code without blocking the event loop.
     """
 
-    def __init__(self):
-        self.parser = Lark(rules, start = "programstruct")
+    def __init__(self, parser = "earley", cache = True, format = "builtin", tool_pool: ToolPool = None,
+                 conversion_cache: ConversionCache = None, optimize = 0, fast_io = False, profile = False,
+                 collectors = (), recover = False):
+        """
+        Initializes the Converter object.
+
+        Args:
+            parser (str, optional): The parsing algorithm, either "earley" or "lalr". The "lalr" parser uses the
+                conflict-free `lalr_rules` grammar and is much faster on large programs. Defaults to "earley".
+            cache (bool, optional): Whether to load the parser from the on-disk parser cache (LALR only).
+                Defaults to True.
+            format (str, optional): The C formatter, either "builtin" for the in-process `format_tokens`, "clang"
+                for clang-format, or "none" for one token per line, to be formatted later. Defaults to "builtin".
+            tool_pool (ToolPool, optional): The pool running clang-format and clang. When given, it is used for the
+                "clang" formatter and for the analysis of failed conversions, so that concurrent conversions share
+                batched tool invocations. Defaults to None, which runs one tool process per call.
+            conversion_cache (ConversionCache, optional): The cache of conversion results used by `convert`.
+                Defaults to None.
+            optimize (int, optional): The optimization level, 0 to emit the program as written, 1 to fold the
+                constant expressions and propagate the constants, or 2 to also optimize the loops, see
+                `optimize_program`. Defaults to 0.
+            fast_io (bool, optional): Whether to read and write through the buffered I/O runtime of `mp2c.fastio`
+                instead of scanf and printf. Defaults to False.
+            profile (bool or str, optional): Whether to measure the time and memory of each phase of `convert` and
+                `convert_to` into `Result.profile`, see `mp2c.profiling`: False, True, or "calls" to also count the
+                calls of each IR builder function. Defaults to False.
+            collectors (list, optional): The functions called with the name and the record of each measured phase,
+                see `Profile`. Defaults to ().
+            recover (bool, optional): Whether to recover from syntax errors to report all of them, with their
+                positions in `Result.syntax_errors`, followed by the semantic errors of the recovered program, see
+                `mp2c.recovery` (LALR only). Defaults to False.
+
+        Raises:
+            ValueError: If the parsing algorithm, the formatter, the optimization level or the profile mode is
+                unknown, or if syntax errors are recovered without the "lalr" parser.
+        """
+        if parser not in grammars:
+            raise ValueError("Unknown parser: {}".format(parser))
+        if format not in ("builtin", "clang", "none"):
+            raise ValueError("Unknown format: {}".format(format))
+        if optimize not in optimization_levels:
+            raise ValueError("Unknown optimization level: {}".format(optimize))
+        if profile not in profile_modes:
+            raise ValueError("Unknown profile mode: {}".format(profile))
+        if recover and parser != "lalr":
+            raise ValueError("Syntax error recovery needs the lalr parser, not {}".format(parser))
+        self.parser_type = parser
+        self.cache = cache
+        self.format_backend = format
+        self.tool_pool = tool_pool
+        self.conversion_cache = conversion_cache
+        self.optimize = optimize
+        self.fast_io = fast_io
+        self.profile = profile
+        self.collectors = list(collectors)
+        self.recover = recover
+        self._parser = None
+        self._parser_lock = threading.Lock()
+
+    @property
+    def parser(self) -> Lark:
+        """
+        The parser used for parsing MiniPascal code, loaded once when it is first needed.
+        """
+        if self._parser is None:
+            with self._parser_lock:
+                if self._parser is None:
+                    self._parser = load_parser(self.parser_type, self.cache)
+        return self._parser
+
+    def new_profile(self) -> Profile:
+        """
+        Creates the profile of a conversion, which records nothing unless profiling is enabled.
+
+        Returns:
+            Profile: The profile.
+        """
+        return Profile(bool(self.profile), self.collectors, self.profile == "calls")
+
+    def format(self, tokens, profile: Profile = None) -> str:
+        """
+        Postprocesses and formats the tokens generated by the visitors with the configured formatter.
+
+        Args:
+            tokens (list): The tokens generated by `emit_program`.
+            profile (Profile, optional): The profile measuring the "postprocess" and "format" phases. Defaults to
+                None.
+
+        Returns:
+            str: The formatted C code.
+        """
+        if profile is None:
+            profile = Profile(False)
+        with profile.phase("postprocess"):
+            tokens = postprocess(tokens)
+        with profile.phase("format"):
+            if self.format_backend == "none":
+                return "\n".join(tokens)
+            if self.format_backend == "clang":
+                if self.tool_pool is not None:
+                    return self.tool_pool.format("\n".join(tokens))
+                return format_code("\n".join(tokens))
+            return format_tokens(tokens)
 
     def __call__(self, code, debug = False) -> tuple[bool, str]:
         """
@@ -40,37 +170,417 @@ class Converter:
         code = preprocess(code)
         tree = parser.parse(code)
         context = Context()
-        tokens = visit_programstruct(tree, context)
+        tokens = emit_program(self.build(tree, context))
         if context.on_error:
             status = False
-        tokens = postprocess(tokens)
-        result_string = "\n".join(tokens)
-        result_string = format_code(result_string)
+        result_string = self.format(tokens)
         return status, result_string
 
-    def convert(self, code) -> Result:
+    def convert(self, code, analysis = "on-demand") -> Result:
         """
         Converts the given MiniPascal code to C code and returns the result.
 
         Args:
             code (str): The MiniPascal code to be converted.
+            analysis (str, optional): When the C code of a failed conversion is analyzed by clang to fill
+                `Result.error_info`: "never", "on-demand" (when `error_info` is first read), "eager" or "background".
+                Defaults to "on-demand".
 
         Returns:
-            Result: The conversion result, which includes the converted C code as a string and error messages.
+            Result: The conversion result, which includes the converted C code as a string and error messages, and
+                the time and memory of each phase with `profile`.
+
+        Raises:
+            ValueError: If the analysis policy is unknown.
+        """
+        if analysis not in analysis_policies:
+            raise ValueError("Unknown analysis policy: {}".format(analysis))
+        if self.conversion_cache is None:
+            return self.convert_guarded(code, analysis)
+        profile = self.new_profile()
+        with profile.phase("cache"):
+            key = self.get_cache_key(code)
+            entry = self.conversion_cache.get(key)
+        if entry is None:
+            result = self.convert_guarded(code, analysis, profile)
+        else:
+            result = self.get_cached_result(entry, analysis, profile)
+        if entry is None or analysis == "eager" and entry["error_info"] is None:
+            # the analysis output is stored once it was computed in advance
+            self.conversion_cache.put(key, get_cache_record(result, result.error_info if analysis == "eager" else None))
+        return result
+
+    async def aconvert(self, code, analysis = "on-demand", executor = None) -> Result:
+        """
+        Converts the given MiniPascal code to C code without blocking the event loop, see `convert`.
+
+        The parsing, the translation and the built-in formatting run in the executor, and clang-format and the clang
+        analysis of the "eager" policy run as asyncio subprocesses, or through `ToolPool.aformat` and
+        `ToolPool.aanalyze` with a tool pool. Reading `error_info` blocks with the "on-demand" policy, so asyncio code
+        should use "eager", "background" or "never". The subclasses of `Converter`, which translate in their own way,
+        run `convert` in the executor.
+
+        Args:
+            code (str): The MiniPascal code to be converted.
+            analysis (str, optional): When the C code of a failed conversion is analyzed, see `convert`. Defaults to
+                "on-demand".
+            executor (Executor, optional): The executor running the CPU work. Defaults to None, for the default
+                executor of the event loop.
+
+        Returns:
+            Result: The conversion result, the same as the one of `convert`.
+
+        Raises:
+            ValueError: If the analysis policy is unknown.
+        """
+        if analysis not in analysis_policies:
+            raise ValueError("Unknown analysis policy: {}".format(analysis))
+        loop = asyncio.get_running_loop()
+        clang = self.format_backend == "clang"
+        if type(self).convert_uncached is not Converter.convert_uncached or not clang and analysis != "eager":
+            return await loop.run_in_executor(executor, self.convert, code, analysis)
+        profile = self.new_profile()
+        key = entry = None
+        if self.conversion_cache is not None:
+            key = self.get_cache_key(code)
+            entry = await loop.run_in_executor(executor, self.conversion_cache.get, key)
+        if entry is not None:
+            result = self.get_cached_result(entry, "never", profile)
+            error_info = entry["error_info"] if analysis != "never" else None
+        else:
+            # the tokens joined by the "none" formatter are the input of clang-format
+            converter = copy.copy(self)
+            converter.conversion_cache = None
+            converter.format_backend = "none" if clang else self.format_backend
+            result = await loop.run_in_executor(executor, converter.convert_guarded, code, "never", profile)
+            if clang and result.code:
+                result.code = await (self.tool_pool.aformat(result.code) if self.tool_pool is not None
+                                     else aformat_code(result.code))
+            error_info = None
+        if analysis == "eager" and error_info is None and not result.success and result.code:
+            error_info = await (self.tool_pool.aanalyze(result.code) if self.tool_pool is not None
+                                else acode_analyze(result.code))
+        analyze = self.tool_pool.analyze if self.tool_pool is not None else code_analyze
+        final = Result(result.code, result.success, result.error_messages, profile.wrap("analyze", analyze),
+                       analysis if error_info is None else "never", profile.finish(), result.syntax_errors)
+        if error_info is not None:
+            final.error_info = error_info
+        if key is not None and (entry is None or analysis == "eager" and entry["error_info"] is None):
+            record = get_cache_record(final, error_info if analysis == "eager" else None)
+            await loop.run_in_executor(executor, self.conversion_cache.put, key, record)
+        return final
+
+    def get_cache_key(self, code) -> str:
+        """
+        Computes the key of a conversion in the conversion cache, which covers the options changing its result.
+
+        Args:
+            code (str): The MiniPascal code.
+
+        Returns:
+            str: The cache key, see `ConversionCache.get_key`.
+        """
+        options = {"parser": self.parser_type, "format": self.format_backend}
+        if self.optimize:
+            # unoptimized conversions keep the keys they had before the option was added
+            options["optimize"] = self.optimize
+        if self.fast_io:
+            options["fast_io"] = True
+        if self.recover:
+            options["recover"] = True
+        return self.conversion_cache.get_key(code, **options)
+
+    def get_cached_result(self, entry: dict, analysis = "on-demand", profile: Profile = None) -> Result:
+        """
+        Makes the result of a conversion found in the conversion cache.
+
+        Args:
+            entry (dict): The entry of the conversion cache.
+            analysis (str, optional): The analysis policy, see `convert`. The stored analysis output is used when it
+                is known. Defaults to "on-demand".
+            profile (Profile, optional): The profile of the conversion. Defaults to None.
+
+        Returns:
+            Result: The result.
+        """
+        if profile is None:
+            profile = self.new_profile()
+        analyze = self.tool_pool.analyze if self.tool_pool is not None else code_analyze
+        stored_info = entry["error_info"] if analysis != "never" else None
+        result = Result(entry["code"], entry["success"], list(entry["error_messages"]),
+                        profile.wrap("analyze", analyze), analysis if stored_info is None else "never",
+                        profile.finish(),
+                        [SyntaxErrorInfo.from_dict(error) for error in entry.get("syntax_errors", ())])
+        if stored_info is not None:
+            result.error_info = stored_info
+        return result
+
+    def convert_guarded(self, code, analysis = "on-demand", profile: Profile = None) -> Result:
+        """
+        Converts the given MiniPascal code to C code without using the conversion cache, reporting a program nested
+        too deeply for the recursion limit of the translation as a failed conversion, see `get_nesting_result`.
         """
-        status = True
-        parser = self.parser
-        code = preprocess(code)
         try:
-            tree = parser.parse(code)
-        except Exception as e:
-            return Result("", False, [str(e)])
-        context = Context()
-        tokens = visit_programstruct(tree, context)
-        tokens = postprocess(tokens)
-        result_string = "\n".join(tokens)
-        result_string = format_code(result_string)
+            return self.convert_uncached(code, analysis, profile)
+        except RecursionError as e:
+            return get_nesting_result(e, profile)
+
+    def convert_uncached(self, code, analysis = "on-demand", profile: Profile = None) -> Result:
+        """
+        Converts the given MiniPascal code to C code without using the conversion cache, see `convert`.
+        """
+        if profile is None:
+            profile = self.new_profile()
+        try:
+            try:
+                tree = self.parse(code, profile)
+            except Exception as e:
+                if self.recover and isinstance(e, UnexpectedInput):
+                    return self.convert_recovering(code, analysis, profile)
+                return Result("", False, [str(e)], analysis = analysis, profile = profile.finish())
+            context = Context()
+            program = self.build(tree, context, profile)
+            with profile.phase("emit"):
+                tokens = emit_program(program)
+            result_string = self.format(tokens, profile)
+        finally:
+            profile.finish()
         if context.on_error:
             error_messages = context.error_messages
-            return Result(result_string, False, error_messages)
-        return Result(result_string, True)
+            analyze = self.tool_pool.analyze if self.tool_pool is not None else code_analyze
+            return Result(result_string, False, error_messages, profile.wrap("analyze", analyze), analysis,
+                          profile.finish())
+        return Result(result_string, True, profile = profile.finish())
+
+    def convert_recovering(self, code, analysis = "on-demand", profile: Profile = None) -> Result:
+        """
+        Parses MiniPascal code with syntax errors again, recovering from them, and builds the recovered program to
+        report its semantic errors too, see `mp2c.recovery`.
+
+        Args:
+            code (str): The MiniPascal code, which has syntax errors.
+            analysis (str, optional): The analysis policy, see `convert`. Defaults to "on-demand".
+            profile (Profile, optional): The profile of the conversion. Defaults to None.
+
+        Returns:
+            Result: The failed result, without C code, with the messages of the syntax errors followed by the semantic
+                errors, and the syntax errors in `syntax_errors`.
+        """
+        if profile is None:
+            profile = self.new_profile()
+        try:
+            tree, syntax_errors = self.parse_recovering(code, profile)
+            error_messages = [str(error) for error in syntax_errors]
+            if tree is not None:
+                context = Context()
+                with profile.phase("build"):
+                    try:
+                        build_program(tree, context)
+                    except RecursionError as e:
+                        context.record_error(get_nesting_result(e).error_messages[0])
+                error_messages.extend(context.error_messages)
+        finally:
+            profile.finish()
+        return Result("", False, error_messages, analysis = analysis, profile = profile.finish(),
+                      syntax_errors = syntax_errors)
+
+    def convert_to(self, code, stream) -> Result:
+        """
+        Converts the given MiniPascal code to C code and writes it to a stream as it is emitted.
+
+        The C code is emitted, formatted and written one top-level part at a time, see `emit_items`: the includes,
+        the declarations, the main function and each function definition. The output held in memory is bounded by
+        the largest part instead of the whole program, while the written code is the same as the one of `convert`.
+        The "clang" formatter needs the whole code, which is formatted before it is written. The conversion cache is
+        not used.
+
+        Args:
+            code (str): The MiniPascal code to be converted.
+            stream: The text stream the C code is written to, such as an open file or `socket.makefile("w")`.
+
+        Returns:
+            Result: The conversion result, with the error messages but without the C code, which is only written to
+                the stream. Nothing is written if the code cannot be parsed. With `profile`, the emission, the
+                formatting and the writing of the parts, which are interleaved, are measured as one "write" phase.
+        """
+        profile = self.new_profile()
+        try:
+            try:
+                tree = self.parse(code, profile)
+            except Exception as e:
+                if self.recover and isinstance(e, UnexpectedInput):
+                    return self.convert_recovering(code, "never", profile)
+                return Result("", False, [str(e)], analysis = "never", profile = profile.finish())
+            context = Context()
+            try:
+                program = self.build(tree, context, profile)
+            except RecursionError as e:
+                return get_nesting_result(e, profile)
+            with profile.phase("write"):
+                parts = (postprocess(tokens) for tokens in emit_items(program))
+                if self.format_backend == "builtin":
+                    write_formatted(parts, stream.write)
+                elif self.format_backend == "none":
+                    separator = ""
+                    for tokens in parts:
+                        # an empty part, such as the declarations of a program without any, adds no line
+                        if tokens:
+                            stream.write(separator)
+                            stream.write("\n".join(tokens))
+                            separator = "\n"
+                else:
+                    stream.write(self.format(emit_program(program)))
+        finally:
+            profile.finish()
+        if context.on_error:
+            return Result("", False, context.error_messages, analysis = "never", profile = profile.finish())
+        return Result("", True, profile = profile.finish())
+
+    def run(self, code, input_ = None, timeout = None) -> str:
+        """
+        Runs MiniPascal code without a C compiler, see `mp2c.pyemitter`.
+
+        The checked and optimized IR is emitted as Python source and compiled to a code object, which prints what the
+        C program prints. The code object is run by a Python worker process, which is killed after the timeout. The
+        buffered I/O runtime of `fast_io` is not used.
+
+        Args:
+            code (str): The MiniPascal code.
+            input_ (str, optional): The standard input of the program. Defaults to None, for an empty input.
+            timeout (float, optional): The maximum run time in seconds. Defaults to None, for no limit.
+
+        Returns:
+            str: The standard output of the program, or an error message if it does not compile or stops with an
+                error, as `compile_code` returns.
+        """
+        try:
+            tree = self.parse(code)
+        except Exception as e:
+            return "Compilation failed:\n{}".format(e)
+        context = Context()
+        try:
+            program = build_program(tree, context)
+            if context.on_error:
+                return "Compilation failed:\n{}".format("\n".join(context.error_messages))
+            if self.optimize:
+                program = optimize_program(program, self.optimize)
+            code_object = compile_python(program)
+        except RecursionError as e:
+            return "Compilation failed:\n{}".format(get_nesting_result(e).error_messages[0])
+        try:
+            return run_python(code_object, input_, timeout)
+        except TimeoutError as e:
+            return str(e)
+        except Exception as e:
+            return "Runtime error:\n{}: {}".format(type(e).__name__, e)
+
+    def build(self, tree: Tree, context: Context, profile: Profile = None) -> Program:
+        """
+        Builds the IR of a parse tree and runs the configured passes on it.
+
+        Args:
+            tree (Tree): The parse tree.
+            context (Context): The context collecting the error messages.
+            profile (Profile, optional): The profile measuring the "build", "optimize" and "lower" phases. Defaults
+                to None.
+
+        Returns:
+            Program: The optimized IR, lowered to the buffered I/O runtime with `fast_io`.
+        """
+        if profile is None:
+            profile = Profile(False)
+        with profile.phase("build"):
+            program = build_program(tree, context)
+        if self.optimize:
+            with profile.phase("optimize"):
+                program = optimize_program(program, self.optimize)
+        if self.fast_io:
+            with profile.phase("lower"):
+                program = lower_program(program)
+        return program
+
+    def parse(self, code, profile: Profile = None, parser: Lark = None) -> Tree:
+        """
+        Preprocesses and parses MiniPascal code.
+
+        Args:
+            code (str): The MiniPascal code.
+            profile (Profile, optional): The profile measuring the "preprocess" and "parse" phases. Defaults to None.
+            parser (Lark, optional): The parser, such as a translating parser of `mp2c.streaming`, which returns what
+                its transformer returns instead of a parse tree. Defaults to `self.parser`.
+
+        Returns:
+            Tree: The parse tree.
+
+        Raises:
+            Exception: The error of the parser, at its position in the original code for an `UnexpectedInput`.
+        """
+        if profile is None:
+            profile = Profile(False)
+        with profile.phase("preprocess"):
+            code, source_map = preprocess_with_map(code)
+        if parser is None:
+            parser = self.parser
+        try:
+            with profile.phase("parse"):
+                return parser.parse(code)
+        except UnexpectedInput as e:
+            if e.line > 0:
+                # report the position in the original code, before comments were removed
+                e.line, e.column = source_map.to_source(e.line, e.column)
+            raise
+
+    def parse_recovering(self, code, profile: Profile = None) -> tuple:
+        """
+        Preprocesses and parses MiniPascal code, recovering from the syntax errors, see `parse_recovering`.
+
+        Args:
+            code (str): The MiniPascal code.
+            profile (Profile, optional): The profile measuring the "preprocess" and "parse" phases. Defaults to None.
+
+        Returns:
+            tuple: The parse tree of the recovered program, or None, and the `SyntaxErrorInfo` of each syntax error,
+                at its position in the original code.
+        """
+        if profile is None:
+            profile = Profile(False)
+        with profile.phase("preprocess"):
+            code, source_map = preprocess_with_map(code)
+        with profile.phase("parse"):
+            return parse_recovering(self.parser, code, source_map)
+
+
+def get_nesting_result(error: RecursionError, profile: Profile = None) -> Result:
+    """
+    Makes the result of a conversion which stopped on a program nested too deeply to be translated.
+
+    The nested expressions and statements are translated on explicit stacks rather than recursively, see
+    `run_nested`, so that this only guards against the recursion of the libraries the translation relies on.
+
+    Args:
+        error (RecursionError): The error raised by the translation.
+        profile (Profile, optional): The profile of the conversion. Defaults to None.
+
+    Returns:
+        Result: The failed result, without C code.
+    """
+    message = "Program nested too deeply to be converted ({})".format(error)
+    return Result("", False, [message], analysis = "never", profile = None if profile is None else profile.finish())
+
+
+def get_cache_record(result: Result, error_info = None) -> dict:
+    """
+    Makes the entry of the conversion cache storing a result.
+
+    Args:
+        result (Result): The result of the conversion.
+        error_info (str, optional): The analysis output, or None if it was not computed. Defaults to None.
+
+    Returns:
+        dict: The entry.
+    """
+    record = {"code": result.code, "success": result.success, "error_messages": list(result.error_messages),
+              "error_info": error_info}
+    if result.syntax_errors:
+        record["syntax_errors"] = [error.to_dict() for error in result.syntax_errors]
+    return record
@@ -0,0 +1,427 @@
+from .context import ArraySymbol
+from .ir import (ArrayElement, Assign, Binary, Block, Call, ConstDeclaration, Constant, Empty, Expression, For,
+                 Function, If, Parenthesized, Program, ProcedureCall, Read, Statement, Temporary, Unary, Variable,
+                 While, Write)
+from .utils import addop_map, mulop_map, relop_map
+
+includes = ['#include <stdio.h>', '#include <math.h>']
+
+operator_map = {**relop_map, **addop_map, **mulop_map}
+unary_operator_map = {"not": "!", "-": "-", "+": "+"}
+
+# The emitters append the C tokens of a node to a shared output list, in the order of `visit_programstruct`, so the
+# formatted code is the same as the one of the visitors. The emitter of a statement or of an expression holding other
+# nodes returns its parts instead, the nodes among its tokens, which `emit_parts` emits in turn.
+
+
+def emit_program(program: Program, definitions = True) -> list:
+    """
+    Emit the C tokens of a program.
+
+    Args:
+        program (Program): The IR of the program.
+        definitions (bool, optional): Whether to emit the function definitions after the main function. Defaults to
+            True.
+
+    Returns:
+        list: The C tokens, to be postprocessed and formatted.
+    """
+    tokens = []
+    for part in emit_items(program, definitions):
+        tokens.extend(part)
+    return tokens
+
+
+def emit_items(program: Program, definitions = True):
+    """
+    Emit the C tokens of a program one part at a time: the includes, the runtime, the prototypes and the global
+    declarations, the main function, then each function definition.
+
+    Args:
+        program (Program): The IR of the program.
+        definitions (bool, optional): Whether to emit the function definitions after the main function. Defaults to
+            True.
+
+    Yields:
+        list: The tokens of the next part. The parts end at the top level of the C code, and their concatenation is
+            the output of `emit_program`.
+    """
+    runtime = program.runtime
+    count = 0
+    while count < len(runtime) and runtime[count].startswith("#"):
+        count += 1
+    yield list(includes) + list(runtime[:count])
+    if count < len(runtime):
+        yield list(runtime[count:])
+    tokens = []
+    for function in program.functions:
+        emit_header(function, tokens)
+        tokens.append(";")
+    for declaration in program.declarations:
+        emit_declaration(declaration, tokens)
+    yield tokens
+    tokens = ["int main()", "{"]
+    emit_statements(program.main, tokens)
+    tokens.append("}")
+    yield tokens
+    if not definitions:
+        return
+    for function in program.functions:
+        tokens = []
+        emit_function(function, tokens)
+        yield tokens
+
+
+def emit_header(function: Function, tokens: list):
+    """
+    Emit the C header of a function, without the semicolon of a prototype.
+
+    Args:
+        function (Function): The function.
+        tokens (list): The output tokens.
+    """
+    tokens.append(function.return_type)
+    tokens.append(function.name)
+    tokens.append("(")
+    first = True
+    for parameter in function.parameters:
+        if first:
+            first = False
+        else:
+            tokens.append(",")
+        tokens.append(parameter.type)
+        if parameter.var:
+            tokens.append("*")
+        tokens.append(parameter.name)
+    tokens.append(")")
+
+
+def emit_function(function: Function, tokens: list):
+    """
+    Emit the C definition of a function. The result of a function is kept in a local variable named after the
+    function with a "_" prefix, and returned at the end.
+
+    Args:
+        function (Function): The function.
+        tokens (list): The output tokens.
+    """
+    emit_header(function, tokens)
+    tokens.append("{")
+    is_function = function.return_type != "void"
+    if is_function:
+        tokens.extend((function.return_type, "_" + function.name, ";"))
+    for declaration in function.declarations:
+        emit_declaration(declaration, tokens)
+    emit_statements(function.body, tokens)
+    if is_function:
+        tokens.extend(("return", "_" + function.name, ";"))
+    tokens.append("}")
+
+
+def emit_declaration(declaration, tokens: list):
+    """
+    Emit a constant or variable declaration.
+
+    Args:
+        declaration (ConstDeclaration or VarDeclaration): The declaration.
+        tokens (list): The output tokens.
+    """
+    symbol = declaration.symbol
+    if isinstance(declaration, ConstDeclaration):
+        tokens.extend(("const", symbol.type, symbol.name, "="))
+        emit_expression(declaration.value, tokens)
+    else:
+        tokens.append(symbol.type)
+        tokens.append(symbol.name)
+        if isinstance(symbol, ArraySymbol):
+            for dimension in symbol.dimensions:
+                tokens.extend(("[", str(dimension.length), "]"))
+    tokens.append(";")
+
+
+def emit_statements(statements: list, tokens: list):
+    """
+    Emit a list of statements.
+
+    Args:
+        statements (list): The statements.
+        tokens (list): The output tokens.
+    """
+    emit_parts(statements, tokens)
+
+
+def emit_expression(expression: Expression, tokens: list):
+    """
+    Emit an expression.
+
+    Args:
+        expression (Expression): The expression.
+        tokens (list): The output tokens.
+    """
+    emit_parts([expression], tokens)
+
+
+def emit_parts(parts, tokens: list):
+    """
+    Emit a sequence of tokens, tuples of tokens, statements and expressions. A statement is followed by a semicolon
+    unless it is empty or already ends with one.
+
+    The emitter of a node appends its first tokens and returns the rest of its parts, which are emitted in turn from
+    an explicit stack rather than by recursion, so that the statements and expressions may be nested to any depth.
+
+    Args:
+        parts (iterable): The parts.
+        tokens (list): The output tokens.
+    """
+    stack = [iter(parts)]
+    while stack:
+        for part in stack[-1]:
+            kind = type(part)
+            if kind is str:
+                tokens.append(part)
+                continue
+            emitter = _emitters.get(kind)
+            if emitter is None:
+                if kind is tuple:
+                    tokens.extend(part)
+                elif len(tokens) > part and tokens[-1] != ";":
+                    # the end of a statement starting at this position
+                    tokens.append(";")
+                continue
+            start = len(tokens)
+            nested = emitter(part, tokens)
+            if nested is None:
+                continue
+            if kind in _statement_emitters:
+                nested.append(start)
+            stack.append(iter(nested))
+            break
+        else:
+            stack.pop()
+
+
+def emit_empty(statement: Empty, tokens: list):
+    """
+    Emit nothing for the empty statement.
+    """
+
+
+def emit_assign(statement: Assign, tokens: list) -> list:
+    """
+    Emit an assignment.
+    """
+    return [statement.target, "=", statement.value]
+
+
+def emit_if(statement: If, tokens: list) -> list:
+    """
+    Emit an if statement, following "else if" chains in a loop and closing their braces at the end.
+    """
+    parts = []
+    depth = 0
+    while statement is not None:
+        parts.extend((("if", "("), statement.condition, (")", "{"), statement.then, "}"))
+        otherwise = statement.otherwise
+        statement = None
+        if otherwise is not None:
+            parts.append(("else", "{"))
+            if isinstance(otherwise, If):
+                depth += 1
+                statement = otherwise
+            else:
+                parts.append(otherwise)
+                parts.append("}")
+    parts.append((";", "}") * depth)
+    return parts
+
+
+def emit_for(statement: For, tokens: list) -> list:
+    """
+    Emit a for loop, counting up or down by one.
+    """
+    name = statement.name
+    tokens.extend(("for", "(", name, "="))
+    return [statement.start, (";", name, ">=" if statement.downto else "<="), statement.stop,
+            (";", name, "--" if statement.downto else "++", ")", "{"), statement.body, "}"]
+
+
+def emit_while(statement: While, tokens: list) -> list:
+    """
+    Emit a while loop.
+    """
+    tokens.extend(("while", "("))
+    return [statement.condition, (")", "{"), statement.body, "}"]
+
+
+def emit_temporary(statement: Temporary, tokens: list) -> list:
+    """
+    Emit the declaration of a temporary with its initial value.
+    """
+    if statement.type.endswith("*"):
+        tokens.extend((statement.type[:-1], "*"))
+    else:
+        tokens.append(statement.type)
+    tokens.extend((statement.name, "="))
+    return [statement.value]
+
+
+def emit_block(statement: Block, tokens: list) -> list:
+    """
+    Emit a compound statement in braces.
+    """
+    tokens.append("{")
+    return [*statement.statements, "}"]
+
+
+def emit_procedure_call(statement: ProcedureCall, tokens: list) -> list:
+    """
+    Emit a procedure call.
+    """
+    tokens.extend((statement.name, "("))
+    return get_argument_parts(statement.arguments, statement.references)
+
+
+def emit_read(statement: Read, tokens: list) -> list:
+    """
+    Emit a read call as a scanf call, passing the address of each variable.
+    """
+    tokens.extend(("scanf", "("))
+    parts = []
+    if statement.format is not None:
+        tokens.append(statement.format)
+        for argument in statement.arguments:
+            parts.append((",", "&"))
+            parts.append(argument)
+    parts.append(")")
+    return parts
+
+
+def emit_write(statement: Write, tokens: list) -> list:
+    """
+    Emit a write or writeln call as a printf call.
+    """
+    tokens.extend(("printf", "(", statement.format))
+    parts = []
+    for argument in statement.arguments:
+        parts.append(",")
+        parts.append(argument)
+    parts.append(")")
+    return parts
+
+
+def emit_constant(expression: Constant, tokens: list):
+    """
+    Emit a literal.
+    """
+    tokens.append(expression.text)
+
+
+def emit_variable(expression: Variable, tokens: list):
+    """
+    Emit a variable, dereferenced if it is a var parameter.
+    """
+    if expression.symbol is not None and expression.symbol.var:
+        tokens.append("*")
+    tokens.append(expression.name)
+
+
+def emit_array_element(expression: ArrayElement, tokens: list) -> list:
+    """
+    Emit an array element, shifting each index by the lower bound of its dimension unless it was already shifted.
+    """
+    tokens.append(expression.name)
+    parts = []
+    for index, offset in zip(expression.indices, expression.offsets):
+        parts.append("[")
+        parts.append(index)
+        parts.append("]" if offset is None else ("-", str(offset), "]"))
+    return parts
+
+
+def emit_call(expression: Call, tokens: list) -> list:
+    """
+    Emit a function call.
+    """
+    tokens.extend((expression.name, "("))
+    return get_argument_parts(expression.arguments, expression.references)
+
+
+def get_argument_parts(arguments: list, references: list) -> list:
+    """
+    Get the parts of the arguments of a call and of its closing parenthesis, taking the address of those passed by
+    reference.
+    """
+    parts = []
+    for argument, reference in zip(arguments, references):
+        if parts:
+            parts.append(",")
+        if reference:
+            parts.append("&")
+        parts.append(argument)
+    parts.append(")")
+    return parts
+
+
+def emit_nested(expression, tokens: list) -> list:
+    """
+    Emit a unary operation or an expression in parentheses, walking the nested unary operations and parentheses in a
+    loop.
+    """
+    closing = 0
+    while True:
+        kind = type(expression)
+        if kind is Unary:
+            tokens.append(unary_operator_map[expression.op])
+            expression = expression.operand
+        elif kind is Parenthesized:
+            tokens.append("(")
+            closing += 1
+            expression = expression.expression
+        else:
+            break
+    return [expression, (")",) * closing]
+
+
+def emit_binary(expression: Binary, tokens: list) -> list:
+    """
+    Emit an operator chain, walking its left operands in a loop. A real division converts its left operand, which
+    starts the chain, to float.
+    """
+    spine = []
+    while isinstance(expression, Binary):
+        spine.append(expression)
+        expression = expression.left
+    for binary in spine:
+        if binary.op == "/":
+            tokens.extend(("(", "float", ")"))
+    parts = [expression]
+    for binary in reversed(spine):
+        parts.append(operator_map[binary.op])
+        parts.append(binary.right)
+    return parts
+
+
+_statement_emitters = {
+    Empty: emit_empty,
+    Assign: emit_assign,
+    If: emit_if,
+    For: emit_for,
+    While: emit_while,
+    Temporary: emit_temporary,
+    Block: emit_block,
+    ProcedureCall: emit_procedure_call,
+    Read: emit_read,
+    Write: emit_write,
+}
+
+_expression_emitters = {
+    Constant: emit_constant,
+    Variable: emit_variable,
+    ArrayElement: emit_array_element,
+    Call: emit_call,
+    Unary: emit_nested,
+    Binary: emit_binary,
+    Parenthesized: emit_nested,
+}
+
+_emitters = {**_statement_emitters, **_expression_emitters}
@@ -0,0 +1,281 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from .paths import get_cache_dir
+
+# Part of the cache key, bump it whenever the way executables are built or stored changes
+EXECUTABLE_FORMAT = 1
+
+_compiler_versions = {}
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_compiler_version(compiler: str) -> str:
+    """
+    Get the version of a C compiler, as printed by `compiler --version`, which is part of the executable cache key.
+
+    Args:
+        compiler (str): The compiler command, such as "gcc".
+
+    Returns:
+        str: The version text, or the compiler name if the version cannot be read.
+    """
+    version = _compiler_versions.get(compiler)
+    if version is None:
+        try:
+            process = subprocess.run([compiler, "--version"], capture_output = True, text = True)
+            version = process.stdout.strip() or compiler
+        except OSError:
+            version = compiler
+        _compiler_versions[compiler] = version
+    return version
+
+
+def get_flags(optimize = 0, flags = ()) -> list:
+    """
+    Get the compiler flags of an optimization level and extra flags.
+
+    Args:
+        optimize (int or str, optional): The optimization level of the C compiler, such as 0, 2 or "s". Defaults to 0.
+        flags (tuple, optional): The other compiler flags. Defaults to ().
+
+    Returns:
+        list: The flags, starting with the "-O" flag.
+
+    Raises:
+        ValueError: If the optimization level is unknown.
+    """
+    if str(optimize) not in ("0", "1", "2", "3", "s", "fast"):
+        raise ValueError("Unknown optimization level: {}".format(optimize))
+    return ["-O{}".format(optimize), *flags]
+
+
+class ExecutableCache:
+    """
+    A content-addressed cache of compiled C programs.
+
+    The key of an executable is a hash of the C code, the compiler version and the compiler flags, so the same code is
+    compiled once and its executable run on any number of inputs. The executables are stored in a directory, each
+    compiled to a temporary file and renamed into place, so that concurrent processes can share the directory. The
+    sources are removed after compiling. Without a directory, a temporary directory is used, which is removed by
+    `close` or when the cache is garbage collected. Failed compilations are remembered in memory.
+
+    Attributes:
+        directory (str): The directory of the executables.
+        stats (dict): The number of hits, misses (compilations) and failed compilations.
+    """
+
+    def __init__(self, directory = None):
+        self.temporary = directory is None
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix = "mp2c-executables-")
+        self.directory = directory
+        self.failures = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "failures": 0}
+        self._finalizer = weakref.finalize(self, shutil.rmtree, directory, True) if self.temporary else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @classmethod
+    def on_disk(cls):
+        """
+        Create a cache stored in the "executables" directory of the mp2c cache directory, see `get_cache_dir`.
+
+        Returns:
+            ExecutableCache: The cache.
+        """
+        return cls(os.path.join(get_cache_dir(), "executables"))
+
+    @staticmethod
+    def get_key(code: str, compiler = "gcc", flags = ()) -> str:
+        """
+        Compute the cache key of an executable.
+
+        Args:
+            code (str): The C code.
+            compiler (str, optional): The compiler command. Defaults to "gcc".
+            flags (list, optional): The compiler flags. Defaults to ().
+
+        Returns:
+            str: The hexadecimal cache key.
+        """
+        digest = hashlib.sha256()
+        for part in (str(EXECUTABLE_FORMAT), compiler, get_compiler_version(compiler), json.dumps(list(flags)), code):
+            digest.update(part.encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get_executable(self, code: str, compiler = "gcc", optimize = 0, flags = ()) -> str:
+        """
+        Get the executable of C code, compiling it if it is not cached.
+
+        Args:
+            code (str): The C code.
+            compiler (str, optional): The compiler command. Defaults to "gcc".
+            optimize (int or str, optional): The optimization level of the compiler, see `get_flags`. Defaults to 0.
+            flags (tuple, optional): The other compiler flags. Defaults to ().
+
+        Returns:
+            str: The path of the executable.
+
+        Raises:
+            RuntimeError: If the code does not compile, with the compiler messages.
+        """
+        flags = get_flags(optimize, flags)
+        key = self.get_key(code, compiler, flags)
+        path = os.path.join(self.directory, key[:2], key)
+        with self.lock:
+            key_lock = self.locks.setdefault(key, threading.Lock())
+        # the same code is compiled once even when it is requested by several threads at the same time
+        with key_lock:
+            if key in self.failures:
+                with self.lock:
+                    self.stats["failures"] += 1
+                raise RuntimeError("Compilation failed:\n{}".format(self.failures[key]))
+            if os.path.exists(path):
+                with self.lock:
+                    self.stats["hits"] += 1
+                return path
+            with self.lock:
+                self.stats["misses"] += 1
+            error = self._compile(code, compiler, flags, path)
+            if error is not None:
+                self.failures[key] = error
+                with self.lock:
+                    self.stats["failures"] += 1
+                raise RuntimeError("Compilation failed:\n{}".format(error))
+        return path
+
+    def run(self, code: str, input_ = None, compiler = "gcc", optimize = 0, flags = (), timeout = None) -> str:
+        """
+        Compile C code, or get its cached executable, and run it, see `run_executable`.
+
+        Args:
+            code (str): The C code.
+            input_ (str, optional): The standard input of the program. Defaults to None.
+            compiler (str, optional): The compiler command. Defaults to "gcc".
+            optimize (int or str, optional): The optimization level of the compiler. Defaults to 0.
+            flags (tuple, optional): The other compiler flags. Defaults to ().
+            timeout (float, optional): The maximum run time in seconds. Defaults to None.
+
+        Returns:
+            str: The standard output of the program, or an error message if it does not compile or run.
+        """
+        try:
+            executable = self.get_executable(code, compiler, optimize, flags)
+        except RuntimeError as e:
+            return str(e)
+        return run_executable(executable, input_, timeout)
+
+    def clear(self):
+        """
+        Remove all the executables and forget the failed compilations.
+        """
+        with self.lock:
+            self.failures.clear()
+        shutil.rmtree(self.directory, ignore_errors = True)
+        os.makedirs(self.directory, exist_ok = True)
+
+    def close(self):
+        """
+        Remove the temporary directory of the cache. A cache with a directory given by the caller is kept.
+        """
+        if self._finalizer is not None:
+            self._finalizer()
+
+    def _compile(self, code: str, compiler: str, flags: list, path: str):
+        """
+        Compile C code to a temporary file next to the executable path, and rename it into place.
+
+        Returns:
+            str: The compiler messages if the compilation failed, or None.
+        """
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok = True)
+        fd, source_path = tempfile.mkstemp(dir = directory, suffix = ".c")
+        output_path = source_path[:-2] + ".tmp"
+        try:
+            with os.fdopen(fd, "w") as file:
+                file.write(code)
+            process = subprocess.run([compiler, *flags, source_path, "-o", output_path, "-lm"], capture_output = True,
+                                     text = True)
+            if process.returncode != 0:
+                return process.stderr
+            os.replace(output_path, path)
+            return None
+        finally:
+            for leftover in (source_path, output_path):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+
+
+def get_default_cache() -> ExecutableCache:
+    """
+    Get the executable cache shared by `compile_code` in this process, in a temporary directory removed at exit.
+
+    Returns:
+        ExecutableCache: The cache.
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ExecutableCache()
+        return _default_cache
+
+
+def run_executable(executable: str, input_ = None, timeout = None) -> str:
+    """
+    Run an executable on an input.
+
+    Args:
+        executable (str): The path of the executable.
+        input_ (str, optional): The standard input of the program. Defaults to None, for an empty input.
+        timeout (float, optional): The maximum run time in seconds. Defaults to None, for no limit.
+
+    Returns:
+        str: The standard output of the program, or an error message if it exits with an error or times out.
+    """
+    try:
+        process = subprocess.run([executable], input = input_ or "", capture_output = True, text = True,
+                                 timeout = timeout)
+    except subprocess.TimeoutExpired:
+        return "Timeout after {} s".format(timeout)
+    if process.returncode != 0:
+        return "Runtime error:\n{}".format(process.stderr)
+    return process.stdout
+
+
+def run_cases(executable: str, cases, jobs = None, timeout = None) -> list:
+    """
+    Run an executable on a table of inputs and expected outputs, in parallel.
+
+    Args:
+        executable (str): The path of the executable, see `ExecutableCache.get_executable`.
+        cases (list): The (input, expected output) pairs.
+        jobs (int, optional): The number of programs run at the same time. Defaults to the number of CPUs.
+        timeout (float, optional): The maximum run time of each case in seconds. Defaults to None.
+
+    Returns:
+        list: One record per case, in the order of the cases, with its "input", "expected" and "output", and whether
+            it "passed".
+    """
+    cases = list(cases)
+    jobs = jobs or os.cpu_count() or 1
+    with ThreadPoolExecutor(min(jobs, max(1, len(cases)))) as executor:
+        outputs = list(executor.map(lambda case: run_executable(executable, case[0], timeout), cases))
+    return [{"input": input_, "expected": expected, "output": output,
+             "passed": output == expected} for (input_, expected), output in zip(cases, outputs)]
@@ -0,0 +1,313 @@
+# Buffered I/O runtime for the generated C code, enabled with `--fast-io`.
+#
+# Without it, each read is a scanf call and each write or writeln a printf call, which parse their format string and
+# lock the stream at every call. With it, the read and write statements are lowered to calls of the small runtime of
+# `runtime_source`, emitted after the includes: the input is read from stdin in large blocks and parsed by hand, and
+# the output is collected in a buffer written when it is full and when the program exits.
+#
+# The runtime reads and writes well-formed input and output as scanf and printf do, with "%d", "%f" and "%c", except
+# that the special float values such as "inf" and "nan" cannot be read. The runtime names contain uppercase letters,
+# so they cannot clash with the names of the program, which are lowercased.
+
+import re
+
+from .ir import Block, Constant, For, Function, If, ProcedureCall, Program, Read, Variable, While, Write, run_nested
+
+runtime_source = r"""
+#include <stdlib.h>
+static char InputBuffer[65536];
+static int InputSize = 0;
+static int InputPosition = 0;
+static char OutputBuffer[65536];
+static int OutputSize = 0;
+void FlushOutput() {
+  fwrite(OutputBuffer, 1, OutputSize, stdout);
+  fflush(stdout);
+  OutputSize = 0;
+}
+int PeekInput() {
+  if (InputPosition == InputSize) {
+    InputSize = fread(InputBuffer, 1, 65536, stdin);
+    InputPosition = 0;
+    if (InputSize <= 0) {
+      InputSize = 0;
+      return -1;
+    }
+  }
+  return InputBuffer[InputPosition] & 255;
+}
+int SkipSpaces() {
+  int c = PeekInput();
+  while (c == ' ' || c == '\n' || c == '\t' || c == '\r' || c == '\v' || c == '\f') {
+    InputPosition++;
+    c = PeekInput();
+  }
+  return c;
+}
+void ReadInt(int *x) {
+  int c = SkipSpaces();
+  int negative = c == '-';
+  unsigned value = 0;
+  if (c == '-' || c == '+') {
+    InputPosition++;
+    c = PeekInput();
+  }
+  if (c < '0' || c > '9') {
+    return;
+  }
+  while (c >= '0' && c <= '9') {
+    value = value * 10 + (c - '0');
+    InputPosition++;
+    c = PeekInput();
+  }
+  if (negative) {
+    value = -value;
+  }
+  *x = value;
+}
+void ReadFloat(float *x) {
+  char text[64];
+  char *end;
+  float value;
+  int length = 0;
+  int c = SkipSpaces();
+  while (length < 63 && ((c >= '0' && c <= '9') || c == '.' || c == 'e' || c == 'E' || c == '-' || c == '+')) {
+    if ((c == '-' || c == '+') && length > 0 && text[length - 1] != 'e' && text[length - 1] != 'E') {
+      break;
+    }
+    text[length] = c;
+    length++;
+    InputPosition++;
+    c = PeekInput();
+  }
+  text[length] = 0;
+  value = strtof(text, &end);
+  if (end != text) {
+    *x = value;
+  }
+}
+void ReadChar(char *x) {
+  int c = PeekInput();
+  if (c >= 0) {
+    *x = c;
+    InputPosition++;
+  }
+}
+void ReserveOutput(int size) {
+  if (OutputSize + size > 65536) {
+    FlushOutput();
+  }
+}
+void WriteChar(char c) {
+  ReserveOutput(1);
+  OutputBuffer[OutputSize] = c;
+  OutputSize++;
+}
+void WriteString(const char *s) {
+  while (*s) {
+    WriteChar(*s);
+    s++;
+  }
+}
+void WriteInt(int x) {
+  char digits[12];
+  int count = 0;
+  unsigned value = x;
+  ReserveOutput(12);
+  if (x < 0) {
+    OutputBuffer[OutputSize] = '-';
+    OutputSize++;
+    value = -value;
+  }
+  digits[count] = '0' + value % 10;
+  count++;
+  value = value / 10;
+  while (value > 0) {
+    digits[count] = '0' + value % 10;
+    count++;
+    value = value / 10;
+  }
+  while (count > 0) {
+    count--;
+    OutputBuffer[OutputSize] = digits[count];
+    OutputSize++;
+  }
+}
+void WriteFloat(double x) {
+  ReserveOutput(64);
+  OutputSize += snprintf(OutputBuffer + OutputSize, 64, "%f", x);
+}
+"""
+
+_token_pattern = re.compile(r"#.*|'(?:\\.|[^'])'|\"(?:\\.|[^\"])*\"|\w+|&&|\|\||[-+*/%=!<>&|]=|\+\+|--|\S")
+
+_readers = {"int": "ReadInt", "float": "ReadFloat", "char": "ReadChar"}
+_writers = {"int": "WriteInt", "float": "WriteFloat", "char": "WriteChar", "char*": "WriteString"}
+
+
+def tokenize(source: str) -> list:
+    """
+    Split C source code into tokens as the emitter produces them, with each preprocessor directive a single token.
+
+    Args:
+        source (str): The C source code.
+
+    Returns:
+        list: The tokens.
+    """
+    return _token_pattern.findall(source)
+
+
+runtime = tuple(tokenize(runtime_source))
+
+
+def lower_program(program: Program) -> Program:
+    """
+    Lower the read and write statements of a program to calls of the buffered I/O runtime.
+
+    Args:
+        program (Program): The IR of the program.
+
+    Returns:
+        Program: The lowered program, which includes the runtime and shares the unchanged nodes with the input.
+    """
+    functions = [lower_function(function) for function in program.functions]
+    return Program(program.name, functions, program.declarations, lower_main(program.main), runtime)
+
+
+def lower_function(function: Function) -> Function:
+    """
+    Lower the read and write statements of a function.
+
+    Args:
+        function (Function): The function.
+
+    Returns:
+        Function: The lowered function.
+    """
+    return Function(function.name, function.symbol, function.return_type, function.parameters, function.declarations,
+                    run_nested(lower_statements(function.body)))
+
+
+def lower_main(statements: list) -> list:
+    """
+    Lower the read and write statements of the main block, which first registers the flush of the output buffer at
+    exit.
+
+    Args:
+        statements (list): The statements of the main block.
+
+    Returns:
+        list: The lowered statements.
+    """
+    flush = ProcedureCall("atexit", None, [Variable("FlushOutput", None, "")], [False])
+    return [flush] + run_nested(lower_statements(statements))
+
+
+def lower_statements(statements: list) -> list:
+    """
+    Lower the read and write statements of a list of statements, replacing each of them by its runtime calls. The
+    statements are lowered by nested passes of `run_nested`, which yield the pass on each nested statement and receive
+    its result.
+
+    Args:
+        statements (list): The statements.
+
+    Returns:
+        list: The lowered statements, as a nested pass.
+    """
+    lowered = []
+    for statement in statements:
+        kind = type(statement)
+        if kind is Read:
+            lowered.extend(lower_read(statement))
+        elif kind is Write:
+            lowered.extend(lower_write(statement))
+        else:
+            lowered.append((yield lower_statement(statement)))
+    return lowered
+
+
+def lower_statement(statement):
+    """
+    Lower the read and write statements in a statement, following "else if" chains in a loop.
+
+    Args:
+        statement (Statement): The statement.
+
+    Returns:
+        Statement: The lowered statement, a `Block` of runtime calls for a read or write statement with several
+            arguments, or the nested pass returning it.
+    """
+    kind = type(statement)
+    if kind is Read or kind is Write:
+        calls = lower_read(statement) if kind is Read else lower_write(statement)
+        return calls[0] if len(calls) == 1 else Block(calls)
+    if kind is For or kind is While or kind is Block or kind is If:
+        return lower_nested(statement)
+    return statement
+
+
+def lower_nested(statement):
+    """
+    Lower the read and write statements in a compound statement, a loop or an if statement.
+    """
+    kind = type(statement)
+    if kind is For:
+        body = yield lower_statement(statement.body)
+        return For(statement.name, statement.symbol, statement.start, statement.stop, body, statement.downto)
+    if kind is While:
+        return While(statement.condition, (yield lower_statement(statement.body)))
+    if kind is Block:
+        return Block((yield lower_statements(statement.statements)))
+    head = None
+    tail = None
+    while True:
+        branch = If(statement.condition, (yield lower_statement(statement.then)))
+        if tail is None:
+            head = branch
+        else:
+            tail.otherwise = branch
+        tail = branch
+        otherwise = statement.otherwise
+        if type(otherwise) is not If:
+            if otherwise is not None:
+                tail.otherwise = yield lower_statement(otherwise)
+            return head
+        statement = otherwise
+
+
+def lower_read(statement: Read) -> list:
+    """
+    Lower a read statement to one runtime call per variable. A statement without variables, or reading a variable of
+    another type, such as an undeclared one, is kept.
+
+    Args:
+        statement (Read): The read statement.
+
+    Returns:
+        list: The runtime calls.
+    """
+    if statement.format is None or any(argument.type not in _readers for argument in statement.arguments):
+        return [statement]
+    return [ProcedureCall(_readers[argument.type], None, [argument], [True]) for argument in statement.arguments]
+
+
+def lower_write(statement: Write) -> list:
+    """
+    Lower a write or writeln statement to one runtime call per expression, and one for the newline of writeln. A
+    statement writing a value of another type, such as an undeclared variable, is kept, after flushing the output
+    buffer so that the output stays in order.
+
+    Args:
+        statement (Write): The write statement.
+
+    Returns:
+        list: The runtime calls, which may be empty.
+    """
+    if any(argument.type not in _writers for argument in statement.arguments):
+        return [ProcedureCall("FlushOutput", None, [], []), statement]
+    calls = [ProcedureCall(_writers[argument.type], None, [argument], [False]) for argument in statement.arguments]
+    if statement.format.endswith('\\n"'):
+        calls.append(ProcedureCall("WriteChar", None, [Constant("'\\n'", "char")], [False]))
+    return calls
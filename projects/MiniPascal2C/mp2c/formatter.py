@@ -0,0 +1,217 @@
+type_names = {"int", "float", "bool", "char", "char*", "void"}
+keywords = {"if", "else", "for", "while", "return", "const"}
+unary_operators = {"-", "+", "!", "*", "&"}
+
+
+def is_operand(token: str) -> bool:
+    """
+    Check if a token ends an operand, so that an operator following it is a binary operator.
+
+    Args:
+        token (str): The token to check.
+
+    Returns:
+        bool: True if the token is an identifier, a literal, or a closing parenthesis or bracket.
+    """
+    if token in (")", "]", "++", "--"):
+        return True
+    if token in keywords or token in type_names:
+        return False
+    return token[0].isalnum() or token[0] in "_'\""
+
+
+class CodeFormatter:
+    """
+    Formats the C tokens generated by the visitors into readable code, without an external formatter.
+
+    The formatter indents blocks, puts one statement per line, spaces binary operators and commas, and separates the
+    includes and the function definitions by blank lines. Empty statements after a closing brace are dropped. The
+    output only depends on the tokens, so formatting is stable.
+
+    Attributes:
+        indent_width (int): The number of spaces per indentation level.
+        lines (list): The finished lines.
+        line (list): The pieces of the current line.
+        level (int): The current indentation level.
+    """
+
+    def __init__(self, indent_width = 2):
+        self.indent_width = indent_width
+        self.lines = []
+        self.line = []
+        self.level = 0
+
+    def end_line(self):
+        """
+        Finish the current line, if it is not empty.
+        """
+        if self.line:
+            self.lines.append(" " * (self.indent_width * self.level) + "".join(self.line))
+            self.line = []
+
+    def blank_line(self):
+        """
+        Finish the current line and add a blank line, unless there is one already.
+        """
+        self.end_line()
+        if self.lines and self.lines[-1] != "":
+            self.lines.append("")
+
+    def close_block(self, following):
+        """
+        Finish the line of a closing brace, keeping a following else on the same line.
+
+        Args:
+            following (str): The token after the closing brace.
+        """
+        if following == "else":
+            return
+        if self.level == 0:
+            self.blank_line()
+        else:
+            self.end_line()
+
+    def format(self, tokens: list) -> str:
+        """
+        Format a list of tokens.
+
+        Args:
+            tokens (list): The tokens generated by the visitors.
+
+        Returns:
+            str: The formatted code, ending with a newline.
+        """
+        self.lines = []
+        self.line = []
+        self.level = 0
+        previous = None
+        unary = False
+        cast = False
+        depth = 0
+        for_depth = None
+        count = len(tokens)
+        index = 0
+        while index < count:
+            token = tokens[index]
+            index += 1
+            following = tokens[index] if index < count else None
+            if token.startswith("#"):
+                self.end_line()
+                self.lines.append(token)
+                if following is None or not following.startswith("#"):
+                    self.blank_line()
+                previous = None
+                continue
+            if token == "}" or token == "{" and following == "}":
+                if token == "{":
+                    self.line.append(" {}" if self.line else "{}")
+                    index += 1
+                else:
+                    self.end_line()
+                    self.level -= 1
+                    self.line.append("}")
+                if index < count and tokens[index] == ";":
+                    index += 1
+                self.close_block(tokens[index] if index < count else None)
+                previous = "}"
+                continue
+            if token == "{":
+                self.line.append(" {" if self.line else "{")
+                self.end_line()
+                self.level += 1
+            elif token == ";":
+                self.line.append(";")
+                if for_depth is None:
+                    self.end_line()
+            elif token == ",":
+                self.line.append(",")
+            elif token == "(" and following in type_names and index + 1 < count and tokens[index + 1] == ")":
+                # a cast, such as (float), sticks to its operand
+                if self.line and self.needs_space(previous, token, unary, cast):
+                    self.line.append(" ")
+                self.line.append("(" + following + ")")
+                index += 2
+                previous = ")"
+                unary = False
+                cast = True
+                continue
+            else:
+                if token == "(":
+                    depth += 1
+                    if previous == "for":
+                        for_depth = depth
+                elif token == ")":
+                    if for_depth == depth:
+                        for_depth = None
+                    depth -= 1
+                if self.line and self.needs_space(previous, token, unary, cast):
+                    self.line.append(" ")
+                self.line.append(token)
+            unary = token in unary_operators and (previous is None or cast or not is_operand(previous))
+            cast = False
+            previous = token
+        self.end_line()
+        while self.lines and self.lines[-1] == "":
+            self.lines.pop()
+        return "\n".join(self.lines) + "\n"
+
+    @staticmethod
+    def needs_space(previous, token, unary, cast) -> bool:
+        """
+        Check if a space is needed between two tokens on the same line.
+
+        Args:
+            previous (str): The previous token.
+            token (str): The current token.
+            unary (bool): Whether the previous token is a unary operator.
+            cast (bool): Whether the previous token closes a cast.
+
+        Returns:
+            bool: True if the tokens are separated by a space.
+        """
+        if previous and previous[-1] in "+-&" and token[0] == previous[-1]:
+            # "- -y" must not become the decrement "--y", nor "& &x" the logical "&&x"
+            return True
+        if unary or cast or previous in ("(", "[") or token in (")", "]", "[", "++", "--"):
+            return False
+        if token == "(":
+            return not is_operand(previous)
+        return True
+
+
+def write_formatted(parts, write, indent_width = 2):
+    """
+    Format the C tokens of a program one part at a time and write each part once it is formatted.
+
+    The parts must end at the top level of the C code, as those of `emit_items`, so that the written code is the same
+    as the output of `format_tokens` on their concatenation: a blank line follows the includes and each closed block,
+    and the declarations follow each other.
+
+    Args:
+        parts (iterable): The token lists of the parts, already postprocessed.
+        write (callable): The function writing a string, such as the `write` method of a text stream.
+        indent_width (int, optional): The number of spaces per indentation level. Defaults to 2.
+    """
+    formatter = CodeFormatter(indent_width)
+    separator = ""
+    for tokens in parts:
+        if not tokens:
+            continue
+        if separator:
+            write(separator)
+        write(formatter.format(tokens))
+        separator = "\n" if tokens[-1] == "}" or tokens[-1].startswith("#") else ""
+
+
+def format_tokens(tokens: list, indent_width = 2) -> str:
+    """
+    Format the C tokens generated by the visitors, see `CodeFormatter`.
+
+    Args:
+        tokens (list): The tokens to be formatted.
+        indent_width (int, optional): The number of spaces per indentation level. Defaults to 2.
+
+    Returns:
+        str: The formatted code.
+    """
+    return CodeFormatter(indent_width).format(tokens)
@@ -0,0 +1,325 @@
+import re
+
+from lark import Tree
+
+from .builder import build_compound_statement, build_const_declarations, build_subprogram, build_var_declarations
+from .context import Context
+from .converter import Converter, get_nesting_result
+from .emitter import emit_function, emit_program
+from .fastio import lower_function, lower_main, runtime
+from .formatter import format_tokens
+from .ir import Program
+from .optimizer import get_constants, optimize_body, optimize_function
+from .result import Result, analysis_policies
+from .utils import code_analyze, postprocess, preprocess
+
+# Literals are matched first so that the keywords inside them are skipped
+_structure_pattern = re.compile(r"'[^']*'|\"(?:[^\"\\\\]|\\\\.)*\"|\b(begin|end|procedure|function)\b")
+_literal_pattern = re.compile(r"('[^']*'|\"(?:[^\"\\\\]|\\\\.)*\")")
+
+
+def normalize_whitespace(code: str) -> str:
+    """
+    Collapse each run of whitespace outside literals into one space, or none at the ends and next to literals.
+
+    Args:
+        code (str): The preprocessed code.
+
+    Returns:
+        str: The normalized code, which parses to the same tree.
+    """
+    pieces = _literal_pattern.split(code)
+    for index in range(0, len(pieces), 2):
+        pieces[index] = " ".join(pieces[index].split())
+    return "".join(pieces)
+
+
+def split_program(code: str):
+    """
+    Split preprocessed MiniPascal code into its head, its subprograms and its main block.
+
+    The head is the program heading with the global constant and variable declarations. Each subprogram runs from its
+    "procedure" or "function" keyword to the semicolon after its body. The main block runs from its "begin" to the
+    final period. The whitespace of the parts is normalized, see `normalize_whitespace`, so that edits of comments
+    and layout do not change them.
+
+    Args:
+        code (str): The preprocessed code.
+
+    Returns:
+        tuple: The head, the list of subprograms and the main block, or None if the structure is not recognized, for
+            example because of a syntax error.
+    """
+    subprograms = []
+    head_end = None
+    start = None
+    main_start = None
+    depth = 0
+    for match in _structure_pattern.finditer(code):
+        keyword = match.group(1)
+        if keyword is None:
+            continue
+        if keyword == "procedure" or keyword == "function":
+            if depth or start is not None or main_start is not None:
+                return None
+            if head_end is None:
+                head_end = match.start()
+            start = match.start()
+        elif keyword == "begin":
+            if depth == 0 and start is None:
+                if main_start is not None:
+                    return None
+                main_start = match.start()
+                if head_end is None:
+                    head_end = main_start
+            depth += 1
+        else:
+            depth -= 1
+            if depth < 0:
+                return None
+            if depth == 0 and start is not None:
+                semicolon = code.find(";", match.end())
+                if semicolon == -1 or code[match.end():semicolon].strip():
+                    return None
+                subprograms.append(normalize_whitespace(code[start:semicolon + 1]))
+                start = None
+    if main_start is None or depth or start is not None:
+        return None
+    return normalize_whitespace(code[:head_end]), subprograms, normalize_whitespace(code[main_start:])
+
+
+def get_signature(function) -> tuple:
+    """
+    Get the part of a function symbol that the code visited after its declaration depends on.
+
+    Args:
+        function (FunctionSymbol): The function symbol.
+
+    Returns:
+        tuple: The name, header, parameters and var flags of the function.
+    """
+    return function.name, tuple(function.header), repr(function.parameter_list), tuple(function.var_parameter)
+
+
+class IncrementalConverter(Converter):
+    """
+    Converts successive versions of a MiniPascal program, such as the buffer of an editor, reusing the work done on
+    the parts that did not change.
+
+    The program is split into its head, its subprograms and its main block, see `split_program`. Each part is parsed
+    on its own, and its parse tree is kept for the next conversion. A subprogram is visited again only if its code,
+    the head or the signature of a subprogram declared before it changed; otherwise its IR, with its symbol, and its
+    error messages are reused. The main block is reused in the same way, and the built-in formatter output is kept
+    for each function. With an optimization level, each part is optimized when it is visited, with the constants of
+    the head, and it is lowered to the buffered I/O runtime with `fast_io`. When the structure of the program is not
+    recognized, or a part does not parse, the whole program is converted as by `Converter.convert`, so error messages
+    are the same.
+
+    Only the parts of the last conversion are kept, so the memory used is bounded by the size of the program.
+
+    Attributes:
+        trees (dict): The parse tree of each part, by code.
+        visits (dict): The IR and the error messages of each subprogram and main block, by environment and code.
+        formatted (dict): The formatted code of each function, by IR node.
+        stats (dict): The number of parts parsed, visited and reused by the last conversion, and whether it was a
+            full conversion.
+    """
+
+    def __init__(self, parser = "lalr", cache = True, format = "builtin", tool_pool = None, optimize = 0,
+                 fast_io = False, recover = False):
+        """
+        Initializes the IncrementalConverter object, see `Converter`.
+
+        Args:
+            parser (str, optional): The parsing algorithm. Defaults to "lalr".
+            cache (bool, optional): Whether to load the parser from the on-disk parser cache. Defaults to True.
+            format (str, optional): The C formatter. Defaults to "builtin".
+            tool_pool (ToolPool, optional): The pool running clang-format and clang. Defaults to None.
+            optimize (int, optional): The optimization level. Defaults to 0.
+            fast_io (bool, optional): Whether to use the buffered I/O runtime. Defaults to False.
+            recover (bool, optional): Whether to recover from syntax errors to report all of them, in the full
+                conversion of a program which does not parse. Defaults to False.
+        """
+        super().__init__(parser, cache, format, tool_pool, optimize = optimize, fast_io = fast_io, recover = recover)
+        self.trees = {}
+        self.visits = {}
+        self.formatted = {}
+        self.stats = {}
+
+    def reset(self):
+        """
+        Forget the parts of the previous conversions.
+        """
+        self.trees = {}
+        self.visits = {}
+        self.formatted = {}
+
+    def convert(self, code, analysis = "on-demand") -> Result:
+        """
+        Converts the given MiniPascal code to C code, reusing the unchanged parts of the previous conversion.
+
+        Args:
+            code (str): The MiniPascal code to be converted.
+            analysis (str, optional): When the C code of a failed conversion is analyzed, see `Converter.convert`.
+                Defaults to "on-demand".
+
+        Returns:
+            Result: The conversion result, the same as returned by `Converter.convert`.
+
+        Raises:
+            ValueError: If the analysis policy is unknown.
+        """
+        if analysis not in analysis_policies:
+            raise ValueError("Unknown analysis policy: {}".format(analysis))
+        try:
+            return self.convert_incremental(code, analysis)
+        except RecursionError as e:
+            self.reset()
+            return get_nesting_result(e)
+
+    def convert_incremental(self, code, analysis = "on-demand") -> Result:
+        """
+        Converts the given MiniPascal code to C code, reusing the unchanged parts of the previous conversion, see
+        `convert`.
+        """
+        self.stats = {"parsed": 0, "visited": 0, "reused": 0, "full": False}
+        parts = split_program(preprocess(code))
+        trees = {}
+        try:
+            if parts is None:
+                raise ValueError("Unrecognized program structure")
+            head, subprograms, main = parts
+            head_tree = self.parse_part(head + " begin end.", trees)
+            subprogram_trees = [self.parse_part("program p; " + subprogram + " begin end.", trees)
+                                for subprogram in subprograms]
+            main_tree = self.parse_part("program p; " + main, trees)
+        except Exception:
+            self.reset()
+            self.stats["full"] = True
+            return super().convert(code, analysis)
+        self.trees = trees
+
+        context = Context()
+        context.enter_scope()
+        context.declare_library_functions()
+        head_body = get_child(head_tree, "program_body")
+        declarations = build_const_declarations(get_child(head_body, "const_declarations"), context)
+        declarations.extend(build_var_declarations(get_child(head_body, "var_declarations"), context))
+        constants = get_constants(declarations) if self.optimize else None
+
+        visits = {}
+        signatures = []
+        functions = {}
+        for subprogram, tree in zip(subprograms, subprogram_trees):
+            key = (head, tuple(signatures), subprogram)
+            visit = self.visits.get(key)
+            if visit is None:
+                self.stats["visited"] += 1
+                error_count = len(context.error_messages)
+                function = build_subprogram(next(tree.find_data("subprogram")), context)
+                if self.optimize:
+                    function = optimize_function(function, constants, self.optimize)
+                if self.fast_io:
+                    function = lower_function(function)
+                visit = (function, context.error_messages[error_count:])
+            else:
+                self.stats["reused"] += 1
+                function = visit[0]
+                # the parameters are registered in the global scope, as when the subprogram is visited
+                for parameter in function.parameters:
+                    context.register_value(parameter.name, parameter.type, True, var = parameter.var)
+                context.bind("subprogram", function.name, function.symbol)
+                for message in visit[1]:
+                    context.record_error(message)
+            visits[key] = visit
+            functions[function.name] = function
+            signatures.append(get_signature(function.symbol))
+
+        key = (head, tuple(signatures), main)
+        visit = self.visits.get(key)
+        if visit is None:
+            self.stats["visited"] += 1
+            error_count = len(context.error_messages)
+            statements = build_compound_statement(get_child(get_child(main_tree, "program_body"),
+                                                            "compound_statement"), context, "main")
+            if self.optimize:
+                statements = optimize_body(statements, constants, self.optimize)
+            if self.fast_io:
+                statements = lower_main(statements)
+            visit = (statements, context.error_messages[error_count:])
+        else:
+            self.stats["reused"] += 1
+            for message in visit[1]:
+                context.record_error(message)
+        visits[key] = visit
+        self.visits = visits
+
+        name = get_child(head_tree, "program_head").children[0].children[0].value
+        ordered = [functions[name] for name, symbol in context.get_funcs().items() if not symbol.is_library]
+        result_string = self.assemble(Program(name, ordered, declarations, visit[0],
+                                                     runtime if self.fast_io else ()))
+        context.exit_scope()
+        if context.on_error:
+            analyze = self.tool_pool.analyze if self.tool_pool is not None else code_analyze
+            return Result(result_string, False, context.error_messages, analyze, analysis)
+        return Result(result_string, True)
+
+    def parse_part(self, code: str, trees: dict) -> Tree:
+        """
+        Parse a part of the program, wrapped into a program, reusing its parse tree if it was parsed before.
+
+        Args:
+            code (str): The wrapped part.
+            trees (dict): The parse trees of the current conversion, where the tree is added.
+
+        Returns:
+            Tree: The parse tree of the wrapped part.
+        """
+        tree = self.trees.get(code)
+        if tree is None:
+            self.stats["parsed"] += 1
+            tree = self.parser.parse(code)
+        trees[code] = tree
+        return tree
+
+    def assemble(self, program: Program) -> str:
+        """
+        Emit and format the C code of a program.
+
+        With the built-in formatter, the prototypes, the globals and the main function are formatted together, and
+        each function definition is formatted on its own and reused while its IR node does not change.
+
+        Args:
+            program (Program): The IR of the program.
+
+        Returns:
+            str: The formatted C code.
+        """
+        if self.format_backend != "builtin":
+            return self.format(emit_program(program))
+        pieces = [format_tokens(postprocess(emit_program(program, definitions = False)))]
+        formatted = {}
+        for function in program.functions:
+            piece = self.formatted.get(function)
+            if piece is None:
+                tokens = []
+                emit_function(function, tokens)
+                piece = format_tokens(postprocess(tokens))
+            formatted[function] = piece
+            pieces.append(piece)
+        self.formatted = formatted
+        return "\n".join(pieces)
+
+
+def get_child(node: Tree, data: str) -> Tree:
+    """
+    Get the first child of a node with the given rule name.
+
+    Args:
+        node (Tree): The node.
+        data (str): The rule name.
+
+    Returns:
+        Tree: The child.
+    """
+    return next(child for child in node.children if isinstance(child, Tree) and child.data == data)
@@ -0,0 +1,456 @@
+# Typed intermediate representation of MiniPascal programs.
+#
+# The IR is built from the parse tree in one pass by `mp2c.builder`, which resolves the names and checks the types,
+# and is turned into C tokens by `mp2c.emitter`. Each node has the resolved symbol of the names it uses and, for
+# expressions, the C type of its value ("int", "float", "bool", "char", "char*", or "" when it is unknown because of
+# an error). The nodes only hold data, so a program can be cached, pickled and rewritten by optimization passes.
+#
+# The passes over nested nodes run on the explicit stack of `run_nested` rather than on the Python call stack, so that
+# expressions and statements nested to any depth are translated.
+
+from types import GeneratorType
+
+
+class Node:
+    """
+    The base class of the IR nodes.
+    """
+    __slots__ = ()
+
+    def __repr__(self):
+        fields = ", ".join("{}={!r}".format(name, getattr(self, name)) for name in self.fields())
+        return "{}({})".format(type(self).__name__, fields)
+
+    @classmethod
+    def fields(cls) -> list:
+        """
+        Get the names of the fields of the node, those of the base classes first.
+
+        Returns:
+            list: The field names.
+        """
+        names = []
+        for klass in reversed(cls.__mro__):
+            names.extend(klass.__dict__.get("__slots__", ()))
+        return names
+
+
+class Expression(Node):
+    """
+    The base class of the expressions.
+
+    Attributes:
+        type (str): The C type of the value.
+    """
+    __slots__ = ("type",)
+
+
+class Constant(Expression):
+    """
+    A number, character or string literal.
+
+    Attributes:
+        text (str): The C text of the literal, such as "3.14", "'a'" or "\\"abc\\"".
+    """
+    __slots__ = ("text",)
+
+    def __init__(self, text: str, type_: str):
+        self.type = type_
+        self.text = text
+
+
+class Variable(Expression):
+    """
+    A reference to a constant, a variable, a parameter or the result of the current function.
+
+    Attributes:
+        name (str): The C name, with a "_" prefix for the result of the current function.
+        symbol (ValueSymbol): The resolved symbol, or None if the name is not declared or is a `Temporary`.
+    """
+    __slots__ = ("name", "symbol")
+
+    def __init__(self, name: str, symbol, type_: str):
+        self.type = type_
+        self.name = name
+        self.symbol = symbol
+
+
+class ArrayElement(Expression):
+    """
+    A reference to an element of an array.
+
+    Attributes:
+        name (str): The C name of the array, or of a `Temporary` pointing to the row of the array indexed by all the
+            indices but the last one.
+        symbol (ArraySymbol): The resolved symbol.
+        indices (list): The index expressions, one per dimension, or only the last one through a row pointer.
+        offsets (list): The lower bound of each indexed dimension, or None where the optimizer already subtracted it
+            from the index.
+    """
+    __slots__ = ("name", "symbol", "indices", "offsets")
+
+    def __init__(self, name: str, symbol, indices: list, offsets: list, type_: str):
+        self.type = type_
+        self.name = name
+        self.symbol = symbol
+        self.indices = indices
+        self.offsets = offsets
+
+
+class Call(Expression):
+    """
+    A call of a function in an expression.
+
+    Attributes:
+        name (str): The name of the function.
+        function (FunctionSymbol): The resolved symbol, or None if the function is not declared.
+        arguments (list): The argument expressions.
+        references (list): Whether each argument is passed by reference, to a var parameter.
+    """
+    __slots__ = ("name", "function", "arguments", "references")
+
+    def __init__(self, name: str, function, arguments: list, references: list, type_: str):
+        self.type = type_
+        self.name = name
+        self.function = function
+        self.arguments = arguments
+        self.references = references
+
+
+class Unary(Expression):
+    """
+    An operation on one operand.
+
+    Attributes:
+        op (str): The MiniPascal operator, "not", "-" or "+".
+        operand (Expression): The operand.
+    """
+    __slots__ = ("op", "operand")
+
+    def __init__(self, op: str, operand: Expression, type_: str):
+        self.type = type_
+        self.op = op
+        self.operand = operand
+
+
+class Binary(Expression):
+    """
+    An operation on two operands. Chains of operators of the same precedence are nested to the left, as in the
+    source.
+
+    Attributes:
+        op (str): The MiniPascal operator, such as "+", "div", "and" or "<>".
+        left (Expression): The left operand.
+        right (Expression): The right operand.
+    """
+    __slots__ = ("op", "left", "right")
+
+    def __init__(self, op: str, left: Expression, right: Expression, type_: str):
+        self.type = type_
+        self.op = op
+        self.left = left
+        self.right = right
+
+
+class Parenthesized(Expression):
+    """
+    An expression in parentheses, kept so that the C code groups the operands as the source does.
+
+    Attributes:
+        expression (Expression): The inner expression.
+    """
+    __slots__ = ("expression",)
+
+    def __init__(self, expression: Expression, type_: str):
+        self.type = type_
+        self.expression = expression
+
+
+class Statement(Node):
+    """
+    The base class of the statements.
+    """
+    __slots__ = ()
+
+
+class Empty(Statement):
+    """
+    The empty statement.
+    """
+    __slots__ = ()
+
+
+class Assign(Statement):
+    """
+    An assignment.
+
+    Attributes:
+        target (Expression): The assigned `Variable` or `ArrayElement`.
+        value (Expression): The assigned value.
+    """
+    __slots__ = ("target", "value")
+
+    def __init__(self, target: Expression, value: Expression):
+        self.target = target
+        self.value = value
+
+
+class If(Statement):
+    """
+    An if statement. An "else if" chain nests one `If` per branch in `otherwise`.
+
+    Attributes:
+        condition (Expression): The condition.
+        then (Statement): The statement run when the condition holds.
+        otherwise (Statement): The statement run otherwise, or None without an else part.
+    """
+    __slots__ = ("condition", "then", "otherwise")
+
+    def __init__(self, condition: Expression, then: Statement, otherwise: Statement = None):
+        self.condition = condition
+        self.then = then
+        self.otherwise = otherwise
+
+
+class For(Statement):
+    """
+    A for loop over an integer variable, declared in its own scope.
+
+    Attributes:
+        name (str): The C name of the loop variable.
+        symbol (ValueSymbol): The symbol of the loop variable.
+        start (Expression): The initial value.
+        stop (Expression): The final value.
+        body (Statement): The loop body.
+        downto (bool): Whether the loop counts down.
+    """
+    __slots__ = ("name", "symbol", "start", "stop", "body", "downto")
+
+    def __init__(self, name: str, symbol, start: Expression, stop: Expression, body: Statement, downto = False):
+        self.name = name
+        self.symbol = symbol
+        self.start = start
+        self.stop = stop
+        self.body = body
+        self.downto = downto
+
+
+class While(Statement):
+    """
+    A while loop.
+
+    Attributes:
+        condition (Expression): The condition.
+        body (Statement): The loop body.
+    """
+    __slots__ = ("condition", "body")
+
+    def __init__(self, condition: Expression, body: Statement):
+        self.condition = condition
+        self.body = body
+
+
+class Temporary(Statement):
+    """
+    The declaration of a C local variable introduced by the optimizer, with its initial value.
+
+    Attributes:
+        name (str): The C name, which starts with an uppercase letter so that it cannot clash with the names of the
+            program, which are lowercased.
+        type (str): The C type, such as "int", or "float*" for a pointer to a row of an array.
+        value (Expression): The initial value.
+    """
+    __slots__ = ("name", "type", "value")
+
+    def __init__(self, name: str, type_: str, value: Expression):
+        self.name = name
+        self.type = type_
+        self.value = value
+
+
+class Block(Statement):
+    """
+    A compound statement.
+
+    Attributes:
+        statements (list): The statements, without the empty ones.
+    """
+    __slots__ = ("statements",)
+
+    def __init__(self, statements: list):
+        self.statements = statements
+
+
+class ProcedureCall(Statement):
+    """
+    A call of a procedure, or of a function whose result is ignored.
+
+    Attributes:
+        name (str): The name of the procedure.
+        function (FunctionSymbol): The resolved symbol, or None if the procedure is not declared.
+        arguments (list): The argument expressions.
+        references (list): Whether each argument is passed by reference, to a var parameter.
+    """
+    __slots__ = ("name", "function", "arguments", "references")
+
+    def __init__(self, name: str, function, arguments: list, references: list):
+        self.name = name
+        self.function = function
+        self.arguments = arguments
+        self.references = references
+
+
+class Read(Statement):
+    """
+    A call of the read built-in procedure.
+
+    Attributes:
+        format (str): The C format string of the arguments, or None without arguments.
+        arguments (list): The read variables.
+    """
+    __slots__ = ("format", "arguments")
+
+    def __init__(self, format_: str, arguments: list):
+        self.format = format_
+        self.arguments = arguments
+
+
+class Write(Statement):
+    """
+    A call of the write or writeln built-in procedure.
+
+    Attributes:
+        format (str): The C format string of the arguments, ending with a newline for writeln.
+        arguments (list): The written expressions.
+    """
+    __slots__ = ("format", "arguments")
+
+    def __init__(self, format_: str, arguments: list):
+        self.format = format_
+        self.arguments = arguments
+
+
+class ConstDeclaration(Node):
+    """
+    A constant declaration.
+
+    Attributes:
+        symbol (ValueSymbol): The symbol of the constant.
+        value (Expression): The value, a `Constant` with an optional sign.
+    """
+    __slots__ = ("symbol", "value")
+
+    def __init__(self, symbol, value: Expression):
+        self.symbol = symbol
+        self.value = value
+
+
+class VarDeclaration(Node):
+    """
+    A variable or array declaration.
+
+    Attributes:
+        symbol (ValueSymbol or ArraySymbol): The symbol of the variable or array.
+    """
+    __slots__ = ("symbol",)
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+
+
+class Parameter(Node):
+    """
+    A parameter of a subprogram.
+
+    Attributes:
+        name (str): The name of the parameter.
+        type (str): The C type of the parameter.
+        var (bool): Whether it is a var parameter, passed by reference.
+    """
+    __slots__ = ("name", "type", "var")
+
+    def __init__(self, name: str, type_: str, var = False):
+        self.name = name
+        self.type = type_
+        self.var = var
+
+
+class Function(Node):
+    """
+    A function or procedure definition.
+
+    Attributes:
+        name (str): The name of the subprogram.
+        symbol (FunctionSymbol): The symbol of the subprogram.
+        return_type (str): The C return type, "void" for a procedure.
+        parameters (list): The parameters.
+        declarations (list): The local constant and variable declarations.
+        body (list): The statements of the body.
+    """
+    __slots__ = ("name", "symbol", "return_type", "parameters", "declarations", "body")
+
+    def __init__(self, name: str, symbol, return_type: str, parameters: list, declarations: list, body: list):
+        self.name = name
+        self.symbol = symbol
+        self.return_type = return_type
+        self.parameters = parameters
+        self.declarations = declarations
+        self.body = body
+
+
+class Program(Node):
+    """
+    A whole program.
+
+    Attributes:
+        name (str): The name of the program.
+        functions (list): The subprograms, in the order of the symbol table.
+        declarations (list): The global constant and variable declarations.
+        main (list): The statements of the main block.
+        runtime (tuple): The C tokens of the support code emitted after the includes, starting with the includes it
+            needs, such as the buffered I/O of `mp2c.fastio`.
+    """
+    __slots__ = ("name", "functions", "declarations", "main", "runtime")
+
+    def __init__(self, name: str, functions: list, declarations: list, main: list, runtime: tuple = ()):
+        self.name = name
+        self.functions = functions
+        self.declarations = declarations
+        self.main = main
+        self.runtime = runtime
+
+
+def run_nested(task):
+    """
+    Run a recursive pass over nested nodes on a stack of generators rather than on the Python call stack.
+
+    The pass is written as generator functions, which yield their call on each nested node and receive its result.
+    A call may also give its result directly, without a generator, such as the call on a leaf.
+
+    Args:
+        task (generator): The call on the outermost node, or its result.
+
+    Returns:
+        The result of the call.
+    """
+    if type(task) is not GeneratorType:
+        return task
+    # the send methods of the suspended calls, and of the running one
+    stack = []
+    send = task.send
+    value = None
+    while True:
+        try:
+            task = send(value)
+        except StopIteration as stop:
+            if not stack:
+                return stop.value
+            send = stack.pop()
+            value = stop.value
+            continue
+        if type(task) is GeneratorType:
+            stack.append(send)
+            send = task.send
+            value = None
+        else:
+            value = task
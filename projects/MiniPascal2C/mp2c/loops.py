@@ -0,0 +1,424 @@
+# Loop optimizations over the IR of `mp2c.ir`, run after the folding passes of `mp2c.optimizer` at level 2.
+#
+# The final value of a for loop which does not change in the loop is computed once before the loop instead of at each
+# iteration, into a temporary of its own type. The rows of the multi-dimensional arrays indexed with expressions that do
+# not change in a loop are addressed once before the loop through a pointer, which takes the multiplications by the row
+# lengths out of the address arithmetic of the loop body: `a[i - 1][j - 1]` in a loop over j becomes `Row1[j - 1]` after
+# `float *Row1 = a[i - 1]`. The temporaries are declared in a block around the outermost loop they do not change in.
+#
+# An index is only hoisted when it is made of literals, variables the loop does not assign and the operators of
+# `_invariant_operators`, which have no side effects and cannot trap, so computing it once before the loop, even if the
+# loop runs zero times, does not change what the program does. A loop calling a subprogram of the program, or
+# assigning a var parameter, may assign any variable and only has its constant indices hoisted. The final value of a
+# for loop is evaluated at least once by the loop, so it may use any operator, but it is only hoisted when it calls no
+# subprogram and reads no array element and no variable the loop assigns.
+
+import itertools
+
+from .emitter import emit_expression
+from .ir import (ArrayElement, Assign, Binary, Block, Call, Constant, Empty, For, If, Parenthesized, ProcedureCall,
+                 Read, Temporary, Unary, Variable, While, Write, run_nested)
+
+_invariant_operators = {"+", "-", "*"}
+
+
+class LoopState:
+    """
+    What a loop assigns and the row pointers hoisted out of it.
+
+    Attributes:
+        writes (set): The C names of the variables assigned in the loop, including its loop variable.
+        unknown (bool): Whether the loop may assign other variables, through a subprogram or a var parameter.
+        counter (itertools.count): The numbers of the temporaries of the function body.
+        pointers (dict): The name of the pointer to each hoisted row, by the array name and the tokens of its indices.
+        temporaries (list): The declarations of the temporaries of the loop.
+    """
+
+    def __init__(self, writes: set, unknown: bool, counter):
+        self.writes = writes
+        self.unknown = unknown
+        self.counter = counter
+        self.pointers = {}
+        self.temporaries = []
+
+    def is_invariant(self, expression) -> bool:
+        """
+        Check whether an expression can be computed once before the loop.
+
+        Args:
+            expression (Expression): The expression.
+
+        Returns:
+            bool: True if the expression has no side effects and its value does not change in the loop.
+        """
+        for node in walk_expression(expression):
+            kind = type(node)
+            if kind is Variable:
+                symbol = node.symbol
+                if self.unknown or node.name in self.writes or symbol is not None and symbol.var:
+                    return False
+            elif kind is Binary:
+                if node.op not in _invariant_operators:
+                    return False
+            elif kind is Unary:
+                if node.op == "not":
+                    return False
+            elif kind is not Constant and kind is not Parenthesized:
+                return False
+        return True
+
+    def is_stable(self, expression) -> bool:
+        """
+        Check whether the final value of a for loop can be computed once before the loop.
+
+        Args:
+            expression (Expression): The final value.
+
+        Returns:
+            bool: True if the expression calls no subprogram of the program and its value does not change in the loop.
+        """
+        for node in walk_expression(expression):
+            kind = type(node)
+            if kind is Variable:
+                symbol = node.symbol
+                if self.unknown or node.name in self.writes or symbol is not None and symbol.var:
+                    return False
+            elif kind is ArrayElement or has_call(node):
+                return False
+        return True
+
+    def get_pointer(self, element: ArrayElement) -> str:
+        """
+        Get the pointer to the row of an array element, declaring it on first use.
+
+        Args:
+            element (ArrayElement): An element of a multi-dimensional array, whose indices but the last one are
+                invariant.
+
+        Returns:
+            str: The name of the pointer.
+        """
+        indices = element.indices[:-1]
+        offsets = element.offsets[:-1]
+        tokens = [element.name]
+        for index, offset in zip(indices, offsets):
+            emit_expression(index, tokens)
+            tokens.append(offset)
+        key = tuple(tokens)
+        name = self.pointers.get(key)
+        if name is None:
+            name = "Row{}".format(next(self.counter))
+            row = ArrayElement(element.name, element.symbol, indices, offsets, element.type + "*")
+            self.temporaries.append(Temporary(name, element.type + "*", row))
+            self.pointers[key] = name
+        return name
+
+
+def optimize_loops(statements: list) -> list:
+    """
+    Optimize the loops of the main block or of a function body.
+
+    Args:
+        statements (list): The folded statements of the body.
+
+    Returns:
+        list: The optimized statements.
+    """
+    counter = itertools.count(1)
+    return [run_nested(optimize_statement(statement, counter)) for statement in statements]
+
+
+def optimize_statement(statement, counter):
+    """
+    Optimize the loops of a statement, the outermost ones first, following "else if" chains in a loop. The passes of
+    this module over the statements and the expressions are nested passes of `run_nested`, which yield the pass on
+    each nested node and receive its result.
+
+    Args:
+        statement (Statement): The statement.
+        counter (itertools.count): The numbers of the temporaries of the function body.
+
+    Returns:
+        Statement: The optimized statement, a `Block` declaring the temporaries of a loop before it, or the nested pass
+            returning it.
+    """
+    kind = type(statement)
+    if kind is For:
+        return optimize_for(statement, counter)
+    if kind is While:
+        return optimize_while(statement, counter)
+    if kind is Block or kind is If:
+        return optimize_nested(statement, counter)
+    return statement
+
+
+def optimize_nested(statement, counter):
+    """
+    Optimize the loops of a compound statement or of an if statement.
+    """
+    if type(statement) is Block:
+        statements = []
+        for inner in statement.statements:
+            statements.append((yield optimize_statement(inner, counter)))
+        return Block(statements)
+    head = None
+    tail = None
+    while True:
+        branch = If(statement.condition, (yield optimize_statement(statement.then, counter)))
+        if tail is None:
+            head = branch
+        else:
+            tail.otherwise = branch
+        tail = branch
+        otherwise = statement.otherwise
+        if type(otherwise) is not If:
+            if otherwise is not None:
+                tail.otherwise = yield optimize_statement(otherwise, counter)
+            return head
+        statement = otherwise
+
+
+def optimize_for(statement: For, counter):
+    """
+    Compute the final value of a for loop once if it does not change in the loop, hoist the invariant rows of its body,
+    including those of the inner loops, and optimize the inner loops.
+    """
+    writes, unknown = get_writes(statement.body)
+    writes.add(statement.name)
+    state = LoopState(writes, unknown, counter)
+    stop = statement.stop
+    # the start value is computed before the final value, which must not read what a call in it assigns
+    if (type(stop) is not Constant and type(stop) is not Variable and state.is_stable(stop)
+            and not any(has_call(node) for node in walk_expression(statement.start))):
+        name = "Bound{}".format(next(counter))
+        state.temporaries.append(Temporary(name, stop.type, stop))
+        stop = Variable(name, None, stop.type)
+    body = yield optimize_statement((yield rewrite_statement(statement.body, state)), counter)
+    loop = For(statement.name, statement.symbol, statement.start, stop, body, statement.downto)
+    return Block(state.temporaries + [loop]) if state.temporaries else loop
+
+
+def optimize_while(statement: While, counter):
+    """
+    Hoist the invariant rows of the condition and the body of a while loop, and optimize the inner loops.
+    """
+    writes, unknown = get_writes(statement.body)
+    unknown = unknown or any(has_call(node) for node in walk_expression(statement.condition))
+    state = LoopState(writes, unknown, counter)
+    condition = yield rewrite_expression(statement.condition, state)
+    body = yield optimize_statement((yield rewrite_statement(statement.body, state)), counter)
+    loop = While(condition, body)
+    return Block(state.temporaries + [loop]) if state.temporaries else loop
+
+
+def get_writes(statement) -> tuple[set, bool]:
+    """
+    Get the variables a statement may assign.
+
+    Args:
+        statement (Statement): The statement.
+
+    Returns:
+        tuple[set, bool]: The C names of the assigned variables, and whether the statement may also assign other
+            variables, through a call of a subprogram or a var parameter.
+    """
+    writes = set()
+    unknown = False
+    expressions = []
+    statements = [statement]
+    while statements:
+        statement = statements.pop()
+        kind = type(statement)
+        targets = ()
+        if kind is Assign:
+            targets = (statement.target,)
+            expressions.extend((statement.target, statement.value))
+        elif kind is If:
+            expressions.append(statement.condition)
+            statements.append(statement.then)
+            if statement.otherwise is not None:
+                statements.append(statement.otherwise)
+        elif kind is For:
+            writes.add(statement.name)
+            expressions.extend((statement.start, statement.stop))
+            statements.append(statement.body)
+        elif kind is While:
+            expressions.append(statement.condition)
+            statements.append(statement.body)
+        elif kind is Block:
+            statements.extend(statement.statements)
+        elif kind is Temporary:
+            expressions.append(statement.value)
+        elif kind is ProcedureCall:
+            unknown = unknown or has_call(statement)
+            targets = [argument for argument, reference in zip(statement.arguments, statement.references)
+                       if reference]
+            expressions.extend(statement.arguments)
+        elif kind is Read:
+            targets = statement.arguments
+            expressions.extend(statement.arguments)
+        elif kind is Write:
+            expressions.extend(statement.arguments)
+        for target in targets:
+            if type(target) is Variable:
+                writes.add(target.name)
+                if target.symbol is not None and target.symbol.var:
+                    unknown = True
+    if not unknown:
+        unknown = any(has_call(node) for expression in expressions for node in walk_expression(expression))
+    return writes, unknown
+
+
+def has_call(node) -> bool:
+    """
+    Check whether a node is a call of a subprogram of the program, which may assign any variable.
+    """
+    if type(node) is not Call and type(node) is not ProcedureCall:
+        return False
+    return node.function is None or not node.function.is_library
+
+
+def walk_expression(expression):
+    """
+    Iterate over the nodes of an expression, using a stack rather than recursion for the long operator chains.
+
+    Args:
+        expression (Expression): The expression.
+
+    Yields:
+        Expression: The expression and each of its subexpressions.
+    """
+    stack = [expression]
+    while stack:
+        node = stack.pop()
+        yield node
+        kind = type(node)
+        if kind is Binary:
+            stack.append(node.right)
+            stack.append(node.left)
+        elif kind is Unary:
+            stack.append(node.operand)
+        elif kind is Parenthesized:
+            stack.append(node.expression)
+        elif kind is ArrayElement:
+            stack.extend(node.indices)
+        elif kind is Call:
+            stack.extend(node.arguments)
+
+
+def rewrite_statement(statement, state: LoopState):
+    """
+    Address the hoisted rows of the array elements of a statement through their pointers.
+
+    Args:
+        statement (Statement): The statement.
+        state (LoopState): The loop containing the statement.
+
+    Returns:
+        Statement: The rewritten statement, as a nested pass of `run_nested`.
+    """
+    kind = type(statement)
+    if kind is Assign:
+        target = yield rewrite_expression(statement.target, state)
+        return Assign(target, (yield rewrite_expression(statement.value, state)))
+    if kind is For:
+        start = yield rewrite_expression(statement.start, state)
+        stop = yield rewrite_expression(statement.stop, state)
+        body = yield rewrite_statement(statement.body, state)
+        return For(statement.name, statement.symbol, start, stop, body, statement.downto)
+    if kind is While:
+        condition = yield rewrite_expression(statement.condition, state)
+        return While(condition, (yield rewrite_statement(statement.body, state)))
+    if kind is Block:
+        statements = []
+        for inner in statement.statements:
+            statements.append((yield rewrite_statement(inner, state)))
+        return Block(statements)
+    if kind is Temporary:
+        return Temporary(statement.name, statement.type, (yield rewrite_expression(statement.value, state)))
+    if kind is ProcedureCall or kind is Read or kind is Write:
+        arguments = []
+        for argument in statement.arguments:
+            arguments.append((yield rewrite_expression(argument, state)))
+        if kind is ProcedureCall:
+            return ProcedureCall(statement.name, statement.function, arguments, statement.references)
+        return kind(statement.format, arguments)
+    if kind is Empty:
+        return statement
+    head = None
+    tail = None
+    while True:
+        condition = yield rewrite_expression(statement.condition, state)
+        branch = If(condition, (yield rewrite_statement(statement.then, state)))
+        if tail is None:
+            head = branch
+        else:
+            tail.otherwise = branch
+        tail = branch
+        otherwise = statement.otherwise
+        if type(otherwise) is not If:
+            if otherwise is not None:
+                tail.otherwise = yield rewrite_statement(otherwise, state)
+            return head
+        statement = otherwise
+
+
+def rewrite_expression(expression, state: LoopState):
+    """
+    Address the hoisted rows of the array elements of an expression through their pointers, walking the operator
+    chains and the nested unary operations and parentheses in a loop.
+
+    Args:
+        expression (Expression): The expression.
+        state (LoopState): The loop containing the expression.
+
+    Returns:
+        Expression: The rewritten expression, or the nested pass returning it.
+    """
+    if type(expression) in (ArrayElement, Call, Unary, Parenthesized, Binary):
+        return rewrite_nested(expression, state)
+    return expression
+
+
+def rewrite_nested(expression, state: LoopState):
+    """
+    Address the hoisted rows of the array elements of an expression which is not a leaf.
+    """
+    kind = type(expression)
+    if kind is ArrayElement:
+        symbol = expression.symbol
+        indices = expression.indices
+        last = yield rewrite_expression(indices[-1], state)
+        if (symbol is not None and expression.name == symbol.name and len(indices) == len(symbol.dimensions) > 1
+                and all(state.is_invariant(index) for index in indices[:-1])):
+            return ArrayElement(state.get_pointer(expression), symbol, [last], expression.offsets[-1:],
+                                expression.type)
+        rewritten = []
+        for index in indices[:-1]:
+            rewritten.append((yield rewrite_expression(index, state)))
+        return ArrayElement(expression.name, symbol, rewritten + [last], expression.offsets, expression.type)
+    if kind is Call:
+        arguments = []
+        for argument in expression.arguments:
+            arguments.append((yield rewrite_expression(argument, state)))
+        return Call(expression.name, expression.function, arguments, expression.references, expression.type)
+    if kind is Unary or kind is Parenthesized:
+        chain = []
+        while type(expression) is Unary or type(expression) is Parenthesized:
+            chain.append(expression)
+            expression = expression.operand if type(expression) is Unary else expression.expression
+        result = yield rewrite_expression(expression, state)
+        for wrapper in reversed(chain):
+            if type(wrapper) is Unary:
+                result = Unary(wrapper.op, result, wrapper.type)
+            else:
+                result = Parenthesized(result, wrapper.type)
+        return result
+    spine = []
+    while type(expression) is Binary:
+        spine.append(expression)
+        expression = expression.left
+    result = yield rewrite_expression(expression, state)
+    for binary in reversed(spine):
+        result = Binary(binary.op, result, (yield rewrite_expression(binary.right, state)), binary.type)
+    return result
@@ -0,0 +1,708 @@
+# Optimization passes over the IR of `mp2c.ir`.
+#
+# The passes return new nodes and leave their input unchanged, so an IR can be emitted both as written and optimized.
+# Level 1 folds the constant expressions, propagates the values of the declared constants, folds the lower bounds of
+# the arrays into constant indices and removes the branches whose condition is constant. Level 2 then optimizes the
+# loops, see `mp2c.loops`.
+#
+# Constant expressions are evaluated with the semantics of the emitted C code rather than those of MiniPascal: "div"
+# truncates toward zero, "/" converts the leftmost operand of its operator chain to float as `emit_binary` does, and
+# float operations are rounded to single precision. An expression is left as written when C would not compute it at
+# compile time, or would compute it differently, such as a division by zero or an integer overflow.
+#
+# The folders of the nodes holding statements or expressions are nested passes of `run_nested`, which yield the
+# folder of each nested node and receive the folded node, and the folders of the leaves return it directly.
+
+import math
+import struct
+
+from .ir import (ArrayElement, Assign, Binary, Block, Call, ConstDeclaration, Constant, Empty, For, Function, If,
+                 Parenthesized, Program, ProcedureCall, Read, Temporary, Unary, Variable, While, Write, run_nested)
+from .loops import optimize_loops
+from .utils import relop_map
+
+optimization_levels = (0, 1, 2)
+
+int_min = -2 ** 31
+int_max = 2 ** 31 - 1
+
+# The kind of a C value is "int", "float" for single precision or "double" for the unsuffixed real literals
+_kind_ranks = {"int": 0, "float": 1, "double": 2}
+_type_kinds = {"int": "int", "char": "int", "bool": "int", "float": "float"}
+
+
+def optimize_program(program: Program, level = 1) -> Program:
+    """
+    Optimize a program.
+
+    Args:
+        program (Program): The IR of the program.
+        level (int, optional): The optimization level, see `optimization_levels`. Level 0 returns the program as it
+            is. Defaults to 1.
+
+    Returns:
+        Program: The optimized program, which shares the unchanged nodes with the input.
+
+    Raises:
+        ValueError: If the optimization level is unknown.
+    """
+    if level not in optimization_levels:
+        raise ValueError("Unknown optimization level: {}".format(level))
+    if level == 0:
+        return program
+    constants = get_constants(program.declarations)
+    functions = [optimize_function(function, constants, level) for function in program.functions]
+    return Program(program.name, functions, program.declarations, optimize_body(program.main, constants, level))
+
+
+def optimize_function(function: Function, constants: dict, level = 1) -> Function:
+    """
+    Optimize the body of a function.
+
+    Args:
+        function (Function): The function.
+        constants (dict): The values of the global constants, see `get_constants`.
+        level (int, optional): The optimization level, 1 or 2. Defaults to 1.
+
+    Returns:
+        Function: The optimized function.
+    """
+    constants = get_constants(function.declarations, constants)
+    body = optimize_body(function.body, constants, level)
+    return Function(function.name, function.symbol, function.return_type, function.parameters, function.declarations,
+                    body)
+
+
+def optimize_body(statements: list, constants: dict, level = 1) -> list:
+    """
+    Optimize the statements of the main block or of a function body.
+
+    Args:
+        statements (list): The statements.
+        constants (dict): The values of the visible constants, see `get_constants`.
+        level (int, optional): The optimization level, 1 or 2. Defaults to 1.
+
+    Returns:
+        list: The optimized statements.
+    """
+    statements = optimize_statements(statements, constants)
+    if level >= 2:
+        statements = optimize_loops(statements)
+    return statements
+
+
+def optimize_statements(statements: list, constants: dict) -> list:
+    """
+    Optimize a list of statements, dropping those which became empty.
+
+    Args:
+        statements (list): The statements.
+        constants (dict): The values of the visible constants, see `get_constants`.
+
+    Returns:
+        list: The optimized statements.
+    """
+    return run_nested(fold_statements(statements, constants))
+
+
+def fold_statements(statements: list, constants: dict):
+    """
+    Fold a list of statements, dropping those which became empty, as a nested pass of `run_nested`.
+    """
+    folded = []
+    for statement in statements:
+        statement = yield fold_statement(statement, constants)
+        if type(statement) is not Empty:
+            folded.append(statement)
+    return folded
+
+
+def get_constants(declarations: list, constants: dict = None) -> dict:
+    """
+    Get the values of the constants declared in a scope.
+
+    Args:
+        declarations (list): The declarations of the scope.
+        constants (dict, optional): The values of the constants of the enclosing scopes. Defaults to None.
+
+    Returns:
+        dict: A new dictionary mapping the symbol of each constant to a `Constant` of its declared C type, including
+            the constants of the enclosing scopes.
+    """
+    constants = dict(constants) if constants else {}
+    for declaration in declarations:
+        if not isinstance(declaration, ConstDeclaration):
+            continue
+        symbol = declaration.symbol
+        value = run_nested(fold_expression(declaration.value, constants))
+        if type(value) is not Constant:
+            continue
+        if symbol.type == "char":
+            constants[symbol] = value
+            continue
+        number = get_constant(value)
+        if number is None:
+            continue
+        if symbol.type == "float":
+            number = cast_float(number)
+        elif number[0] != "int":
+            continue
+        value = make_constant(number, symbol.type)
+        if value is not None:
+            constants[symbol] = value
+    return constants
+
+
+def fold_statement(statement, constants: dict):
+    """
+    Fold the constant expressions of a statement.
+
+    Args:
+        statement (Statement): The statement.
+        constants (dict): The values of the visible constants.
+
+    Returns:
+        Statement: The folded statement, which may be `Empty` when a constant condition removed it, or the nested pass
+            returning it.
+    """
+    return _statement_folders[type(statement)](statement, constants)
+
+
+def fold_empty(statement: Empty, constants: dict) -> Empty:
+    """
+    Fold nothing in the empty statement.
+    """
+    return statement
+
+
+def fold_assign(statement: Assign, constants: dict):
+    """
+    Fold the value of an assignment and the indices of its target.
+    """
+    target = yield fold_target(statement.target, constants)
+    return Assign(target, (yield fold_expression(statement.value, constants)))
+
+
+def fold_if(statement: If, constants: dict):
+    """
+    Fold an if statement, following "else if" chains in a loop. A branch whose condition is constant is either kept
+    without its test or removed with the branches after it.
+    """
+    head = None
+    tail = None
+    rest = None
+    while True:
+        condition = yield fold_expression(statement.condition, constants)
+        value = get_constant(condition)
+        otherwise = statement.otherwise
+        if value is not None and value[1]:
+            rest = yield fold_statement(statement.then, constants)
+            break
+        if value is None:
+            branch = If(condition, (yield fold_statement(statement.then, constants)))
+            if tail is None:
+                head = branch
+            else:
+                tail.otherwise = branch
+            tail = branch
+        if otherwise is None:
+            break
+        if type(otherwise) is not If:
+            rest = yield fold_statement(otherwise, constants)
+            break
+        statement = otherwise
+    if tail is None:
+        return Empty() if rest is None else rest
+    if type(rest) is not Empty:
+        tail.otherwise = rest
+    return head
+
+
+def fold_for(statement: For, constants: dict):
+    """
+    Fold the bounds and the body of a for loop.
+    """
+    start = yield fold_expression(statement.start, constants)
+    stop = yield fold_expression(statement.stop, constants)
+    body = yield fold_statement(statement.body, constants)
+    return For(statement.name, statement.symbol, start, stop, body, statement.downto)
+
+
+def fold_while(statement: While, constants: dict):
+    """
+    Fold a while loop, which is removed when its condition is constantly false.
+    """
+    condition = yield fold_expression(statement.condition, constants)
+    value = get_constant(condition)
+    if value is not None and not value[1]:
+        return Empty()
+    return While(condition, (yield fold_statement(statement.body, constants)))
+
+
+def fold_temporary(statement: Temporary, constants: dict):
+    """
+    Fold the initial value of a temporary of an already optimized program.
+    """
+    return Temporary(statement.name, statement.type, (yield fold_expression(statement.value, constants)))
+
+
+def fold_block(statement: Block, constants: dict):
+    """
+    Fold the statements of a compound statement.
+    """
+    return Block((yield fold_statements(statement.statements, constants)))
+
+
+def fold_procedure_call(statement: ProcedureCall, constants: dict):
+    """
+    Fold the arguments of a procedure call.
+    """
+    arguments = yield fold_arguments(statement.arguments, statement.references, constants)
+    return ProcedureCall(statement.name, statement.function, arguments, statement.references)
+
+
+def fold_read(statement: Read, constants: dict):
+    """
+    Fold the indices of the read variables.
+    """
+    arguments = []
+    for argument in statement.arguments:
+        arguments.append((yield fold_target(argument, constants)))
+    return Read(statement.format, arguments)
+
+
+def fold_write(statement: Write, constants: dict):
+    """
+    Fold the written expressions.
+    """
+    arguments = []
+    for argument in statement.arguments:
+        arguments.append((yield fold_expression(argument, constants)))
+    return Write(statement.format, arguments)
+
+
+def fold_arguments(arguments: list, references: list, constants: dict):
+    """
+    Fold the arguments of a call. The variables passed by reference are kept, with their indices folded.
+    """
+    folded = []
+    for argument, reference in zip(arguments, references):
+        folded.append((yield fold_target(argument, constants) if reference else fold_expression(argument, constants)))
+    return folded
+
+
+def fold_target(expression, constants: dict):
+    """
+    Fold the indices of a variable whose address is used, which is not replaced by its value.
+    """
+    if type(expression) is ArrayElement:
+        return fold_array_element(expression, constants)
+    return expression
+
+
+def fold_expression(expression, constants: dict):
+    """
+    Fold an expression.
+
+    Args:
+        expression (Expression): The expression.
+        constants (dict): The values of the visible constants.
+
+    Returns:
+        Expression: The folded expression, a `Constant` if its value is known, or the nested pass returning it.
+    """
+    return _expression_folders[type(expression)](expression, constants)
+
+
+def fold_constant(expression: Constant, constants: dict) -> Constant:
+    """
+    Fold nothing in a literal.
+    """
+    return expression
+
+
+def fold_variable(expression: Variable, constants: dict):
+    """
+    Replace a constant by its value.
+    """
+    return constants.get(expression.symbol, expression)
+
+
+def fold_array_element(expression: ArrayElement, constants: dict):
+    """
+    Fold the indices of an array element. The lower bound of a dimension is subtracted from a constant index, or
+    merged with the constant term of an index such as "i + 1", and its offset is then None.
+    """
+    indices = []
+    offsets = []
+    for index, offset in zip(expression.indices, expression.offsets):
+        index = yield fold_expression(index, constants)
+        if offset is not None:
+            shifted = shift_index(index, offset)
+            if shifted is not None:
+                index = shifted
+                offset = None
+        indices.append(index)
+        offsets.append(offset)
+    return ArrayElement(expression.name, expression.symbol, indices, offsets, expression.type)
+
+
+def shift_index(index, offset: int):
+    """
+    Subtract the lower bound of a dimension from an integer index at compile time.
+
+    Args:
+        index (Expression): The folded index.
+        offset (int): The lower bound.
+
+    Returns:
+        Expression: The index minus the lower bound, or None if it cannot be simplified.
+    """
+    value = get_constant(index)
+    if value is not None:
+        if value[0] != "int":
+            return None
+        return make_constant(("int", value[1] - offset), "int")
+    if offset == 0:
+        return index if get_kind(index) == "int" else None
+    if type(index) is not Binary or index.op not in ("+", "-"):
+        return None
+    value = get_constant(index.right)
+    if value is None or value[0] != "int" or get_kind(index.left) != "int":
+        return None
+    total = (value[1] if index.op == "+" else -value[1]) - offset
+    if total == 0:
+        return index.left
+    constant = make_constant(("int", abs(total)), "int")
+    if constant is None:
+        return None
+    return Binary("+" if total > 0 else "-", index.left, constant, "int")
+
+
+def fold_call(expression: Call, constants: dict):
+    """
+    Fold the arguments of a function call.
+    """
+    arguments = yield fold_arguments(expression.arguments, expression.references, constants)
+    return Call(expression.name, expression.function, arguments, expression.references, expression.type)
+
+
+def fold_nested(expression, constants: dict):
+    """
+    Fold a unary operation or an expression in parentheses, walking the nested unary operations and parentheses in a
+    loop. The parentheses are dropped around a constant.
+    """
+    chain = []
+    while type(expression) is Unary or type(expression) is Parenthesized:
+        chain.append(expression)
+        expression = expression.operand if type(expression) is Unary else expression.expression
+    result = yield fold_expression(expression, constants)
+    for wrapper in reversed(chain):
+        if type(wrapper) is Parenthesized:
+            if type(result) is not Constant:
+                result = Parenthesized(result, wrapper.type)
+            continue
+        value = get_constant(result)
+        if value is not None:
+            folded = apply_unary(wrapper.op, value)
+            constant = None if folded is None else make_constant(folded, wrapper.type)
+            if constant is not None:
+                result = constant
+                continue
+        result = Unary(wrapper.op, result, wrapper.type)
+    return result
+
+
+def fold_binary(expression: Binary, constants: dict):
+    """
+    Fold an operator chain, walking its left operands in a loop. The operations are folded from the start of the
+    chain while their operands are constant, converting the first operand to float if the chain has a real division,
+    as the emitted C code does.
+    """
+    spine = []
+    while type(expression) is Binary:
+        spine.append(expression)
+        expression = expression.left
+    result = yield fold_expression(expression, constants)
+    value = get_constant(result)
+    if value is not None and any(binary.op == "/" for binary in spine):
+        value = cast_float(value)
+    for binary in reversed(spine):
+        right = yield fold_expression(binary.right, constants)
+        if value is not None:
+            right_value = get_constant(right)
+            folded = None if right_value is None else apply_binary(binary.op, value, right_value)
+            constant = None if folded is None else make_constant(folded, binary.type)
+            if constant is not None:
+                result = constant
+                value = folded
+                continue
+            value = None
+        result = Binary(binary.op, result, right, binary.type)
+    return result
+
+
+def get_constant(expression):
+    """
+    Get the C value of a number or character literal.
+
+    Args:
+        expression (Expression): The expression.
+
+    Returns:
+        tuple: The kind and the value of the literal, or None if the expression is not a literal with a C value
+            known here.
+    """
+    if type(expression) is not Constant:
+        return None
+    text = expression.text
+    if text.startswith("'"):
+        return ("int", ord(text[1])) if len(text) == 3 else None
+    if text.startswith('"'):
+        return None
+    if text.endswith("f"):
+        number = to_float32(float(text[:-1]))
+        return None if number is None else ("float", number)
+    if "." in text or "e" in text:
+        return "double", float(text)
+    value = int(text)
+    if value < int_min or value > int_max:
+        return None
+    return "int", value
+
+
+def make_constant(value: tuple, type_: str):
+    """
+    Make a literal with a C value.
+
+    Args:
+        value (tuple): The kind and the value.
+        type_ (str): The type of the literal in the IR.
+
+    Returns:
+        Constant: The literal, or None if the value cannot be written as a literal of its kind.
+    """
+    kind, number = value
+    if kind == "int":
+        if number <= int_min or number > int_max:
+            return None
+        return Constant(str(number), type_)
+    if kind == "double":
+        return Constant(repr(number), type_)
+    for precision in range(1, 10):
+        text = "{:.{}g}".format(number, precision)
+        if to_float32(float(text)) == number:
+            break
+    if "." not in text and "e" not in text:
+        text += ".0"
+    return Constant(text + "f", type_)
+
+
+def get_kind(expression):
+    """
+    Get the kind of the C value of an expression, as emitted.
+
+    Args:
+        expression (Expression): The expression.
+
+    Returns:
+        str: "int", "float" or "double", or None if it is not known.
+    """
+    return run_nested(find_kind(expression))
+
+
+def find_kind(expression):
+    """
+    Get the kind of the C value of an expression, or for an operator chain the nested pass of `run_nested` returning
+    it.
+    """
+    expression_type = type(expression)
+    while expression_type is Unary or expression_type is Parenthesized:
+        if expression_type is Unary:
+            if expression.op == "not":
+                return "int"
+            expression = expression.operand
+        else:
+            expression = expression.expression
+        expression_type = type(expression)
+    if expression_type is Constant:
+        value = get_constant(expression)
+        return None if value is None else value[0]
+    if expression_type is not Binary:
+        return _type_kinds.get(expression.type)
+    return find_chain_kind(expression)
+
+
+def find_chain_kind(expression: Binary):
+    """
+    Get the kind of the C value of an operator chain, as a nested pass of `run_nested`.
+    """
+    spine = []
+    while type(expression) is Binary:
+        spine.append(expression)
+        expression = expression.left
+    kind = yield find_kind(expression)
+    if any(binary.op == "/" for binary in spine):
+        kind = "float"
+    for binary in reversed(spine):
+        if kind is None:
+            return None
+        op = binary.op
+        if op in relop_map or op in ("and", "or", "mod"):
+            kind = "int"
+        else:
+            right = yield find_kind(binary.right)
+            kind = None if right is None else promote(kind, right)
+    return kind
+
+
+def promote(left: str, right: str) -> str:
+    """
+    Get the kind of the result of an arithmetic operation, by the usual arithmetic conversions of C.
+    """
+    return left if _kind_ranks[left] >= _kind_ranks[right] else right
+
+
+def convert(value: tuple, kind: str):
+    """
+    Convert a C value to a kind of the same or a higher rank.
+    """
+    if value[0] == kind:
+        return value[1]
+    if kind == "float":
+        return to_float32(float(value[1]))
+    return float(value[1])
+
+
+def cast_float(value: tuple):
+    """
+    Convert a C value to float, as the "(float)" cast of a real division does.
+    """
+    number = to_float32(float(value[1]))
+    return None if number is None else ("float", number)
+
+
+def to_float32(number: float):
+    """
+    Round a number to single precision.
+
+    Returns:
+        float: The rounded number, or None if it is not finite in single precision.
+    """
+    if not math.isfinite(number):
+        return None
+    try:
+        return struct.unpack("f", struct.pack("f", number))[0]
+    except OverflowError:
+        return None
+
+
+def apply_unary(op: str, value: tuple):
+    """
+    Compute a unary operation on a C value.
+
+    Args:
+        op (str): The MiniPascal operator.
+        value (tuple): The kind and the value of the operand.
+
+    Returns:
+        tuple: The kind and the value of the result, or None if it is not computed here.
+    """
+    kind, number = value
+    if op == "not":
+        return "int", int(not number)
+    if op == "-":
+        number = -number
+    return check_value(kind, number)
+
+
+def apply_binary(op: str, left: tuple, right: tuple):
+    """
+    Compute a binary operation on C values.
+
+    Args:
+        op (str): The MiniPascal operator.
+        left (tuple): The kind and the value of the left operand.
+        right (tuple): The kind and the value of the right operand.
+
+    Returns:
+        tuple: The kind and the value of the result, or None if it is not computed here, because C computes it at
+            run time or it is undefined.
+    """
+    if left is None or right is None:
+        return None
+    if op == "and":
+        return "int", int(bool(left[1]) and bool(right[1]))
+    if op == "or":
+        return "int", int(bool(left[1]) or bool(right[1]))
+    kind = promote(left[0], right[0])
+    a = convert(left, kind)
+    b = convert(right, kind)
+    if a is None or b is None:
+        return None
+    if op in relop_map:
+        c_op = relop_map[op]
+        result = {"==": a == b, "!=": a != b, "<": a < b, "<=": a <= b, ">": a > b, ">=": a >= b}[c_op]
+        return "int", int(result)
+    if op == "+":
+        return check_value(kind, a + b)
+    if op == "-":
+        return check_value(kind, a - b)
+    if op == "*":
+        return check_value(kind, a * b)
+    if b == 0:
+        return None
+    if op == "mod":
+        if kind != "int":
+            return None
+        return check_value(kind, a - b * truncate_divide(a, b))
+    if kind == "int":
+        return check_value(kind, truncate_divide(a, b))
+    return check_value(kind, a / b)
+
+
+def truncate_divide(a: int, b: int) -> int:
+    """
+    Divide integers, rounding toward zero as C does.
+    """
+    quotient = abs(a) // abs(b)
+    return quotient if (a < 0) == (b < 0) else -quotient
+
+
+def check_value(kind: str, number):
+    """
+    Round the result of an operation to its kind.
+
+    Returns:
+        tuple: The kind and the rounded value, or None if it overflows.
+    """
+    if kind == "int":
+        return (kind, number) if int_min <= number <= int_max else None
+    if kind == "float":
+        number = to_float32(number)
+        return None if number is None else (kind, number)
+    return (kind, number) if math.isfinite(number) else None
+
+
+_statement_folders = {
+    Empty: fold_empty,
+    Assign: fold_assign,
+    If: fold_if,
+    For: fold_for,
+    While: fold_while,
+    Temporary: fold_temporary,
+    Block: fold_block,
+    ProcedureCall: fold_procedure_call,
+    Read: fold_read,
+    Write: fold_write,
+}
+
+_expression_folders = {
+    Constant: fold_constant,
+    Variable: fold_variable,
+    ArrayElement: fold_array_element,
+    Call: fold_call,
+    Unary: fold_nested,
+    Binary: fold_binary,
+    Parenthesized: fold_nested,
+}
@@ -0,0 +1,257 @@
+# Parallel translation of the subprograms of a program, see `ParallelConverter`.
+#
+# Once the headers of the subprograms are registered, a subprogram body only depends on the global declarations and
+# on the signatures of the subprograms declared before it, so the bodies can be translated independently. The
+# translation runs in two phases:
+#
+# 1. The head of the program, a stub of each subprogram, made of its heading and an empty body, and the main block
+#    are parsed together and built, which registers the global declarations and all the signatures in the order of
+#    the sequential translation, and builds the main block.
+# 2. The subprograms are split into consecutive chunks, translated in a process pool. A worker parses the head, the
+#    stubs of the subprograms before its chunk and the subprograms of its chunk, replays the head and the stubs to
+#    rebuild the context they are translated in, and returns their formatted definitions with their error messages.
+#
+# The definitions are stitched in the order of the symbol table and the error messages in the order of the
+# sequential translation, so the code and the messages are those of `Converter`. A program that is not recognized by
+# `split_program` or does not parse is converted sequentially, for the exact position of the syntax error.
+
+import os
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+from .builder import build_compound_statement, build_const_declarations, build_subprogram, build_var_declarations
+from .context import Context
+from .converter import Converter
+from .fastio import lower_main, runtime
+from .incremental import split_program
+from .ir import Program
+from .optimizer import get_constants, optimize_body
+from .profiling import Profile
+from .result import Result
+from .streaming import assemble, get_header, translate_function
+from .utils import code_analyze, preprocess
+from .visitors import flatten_left_recursion
+
+# The converter of the current worker process, created once by `init_worker`
+_converter = None
+
+
+def get_stub(subprogram: str) -> str:
+    """
+    Get the stub of a subprogram: its heading, up to the semicolon after its parameters and result type, with an
+    empty body.
+
+    Args:
+        subprogram (str): The code of the subprogram, as split by `split_program`.
+
+    Returns:
+        str: The stub, which registers the same signature as the subprogram.
+    """
+    depth = 0
+    for index, character in enumerate(subprogram):
+        if character == "(":
+            depth += 1
+        elif character == ")":
+            depth -= 1
+        elif character == ";" and depth == 0:
+            return subprogram[:index + 1] + " begin end;"
+    return subprogram
+
+
+def build_head(tree, context: Context, optimize = 0) -> tuple:
+    """
+    Build the global declarations of a parsed program and get its subprogram nodes.
+
+    Args:
+        tree (Tree): The parse tree of the program.
+        context (Context): The context, with the global scope entered.
+        optimize (int, optional): The optimization level. Defaults to 0.
+
+    Returns:
+        tuple: The `ConstDeclaration` and `VarDeclaration` nodes, the global constants with an optimization level, and
+            the subprogram nodes.
+    """
+    program_body = tree.children[1]
+    declarations = build_const_declarations(program_body.children[0], context)
+    declarations.extend(build_var_declarations(program_body.children[1], context))
+    subprograms = [child for child in flatten_left_recursion(program_body.children[2]) if child.data == "subprogram"]
+    return declarations, get_constants(declarations) if optimize else None, subprograms
+
+
+def init_worker(cache = True, format = "builtin", optimize = 0, fast_io = False):
+    """
+    Initialize a worker process with its own converter, holding the parser and the translation options.
+
+    Args:
+        cache (bool, optional): Whether to use the on-disk parser cache. Defaults to True.
+        format (str, optional): The C formatter. Defaults to "builtin".
+        optimize (int, optional): The optimization level. Defaults to 0.
+        fast_io (bool, optional): Whether to use the buffered I/O runtime. Defaults to False.
+    """
+    global _converter
+    # a forked worker inherits the memory tracing of a profiled parent, which would slow it down several times
+    tracemalloc.stop()
+    _converter = Converter("lalr", cache, format, optimize = optimize, fast_io = fast_io)
+
+
+def translate_chunk(head: str, stubs: list, subprograms: list) -> tuple:
+    """
+    Translate a chunk of consecutive subprograms in a worker process.
+
+    Args:
+        head (str): The head of the program, with the global declarations.
+        stubs (list): The stubs of the subprograms declared before the chunk, see `get_stub`.
+        subprograms (list): The code of the subprograms of the chunk.
+
+    Returns:
+        tuple: The name and the translated definition of each subprogram, see `translate_function`, and the error
+            messages of the chunk.
+    """
+    if _converter is None:
+        init_worker()
+    tree = _converter.parser.parse(" ".join([head, *stubs, *subprograms, "begin end."]))
+    context = Context()
+    context.enter_scope()
+    context.declare_library_functions()
+    _, constants, nodes = build_head(tree, context, _converter.optimize)
+    for node in nodes[:len(stubs)]:
+        build_subprogram(node, context)
+    count = len(context.error_messages)
+    parts = []
+    for node in nodes[len(stubs):]:
+        function = build_subprogram(node, context)
+        parts.append((function.name, translate_function(function, _converter, constants)))
+    return parts, context.error_messages[count:]
+
+
+class ParallelConverter(Converter):
+    """
+    Converts MiniPascal programs to C, translating the subprogram bodies in parallel in a process pool after a
+    pre-pass registering their signatures, see `mp2c.parallel`.
+
+    Programs with fewer than `min_subprograms` subprograms are converted sequentially, as the pool would cost more
+    than it saves. The pool is started at the first parallel conversion, and stopped by `close`.
+
+    Attributes:
+        jobs (int): The number of worker processes.
+        min_subprograms (int): The number of subprograms from which a program is translated in parallel.
+        stats (dict): Whether the last conversion was "parallel", and its number of "chunks".
+    """
+
+    def __init__(self, parser = "lalr", cache = True, format = "builtin", tool_pool = None, conversion_cache = None,
+                 optimize = 0, fast_io = False, profile = False, collectors = (), recover = False, jobs = None,
+                 min_subprograms = 32):
+        """
+        Initializes the ParallelConverter object, see `Converter`.
+
+        Args:
+            parser (str, optional): The parsing algorithm, which must be "lalr". Defaults to "lalr".
+            jobs (int, optional): The number of worker processes. Defaults to the number of CPUs.
+            min_subprograms (int, optional): The number of subprograms from which a program is translated in
+                parallel. Defaults to 32.
+
+        Raises:
+            ValueError: If the parsing algorithm is not "lalr", or an option is unknown.
+        """
+        if parser != "lalr":
+            raise ValueError("Parallel translation needs the lalr parser, not {}".format(parser))
+        super().__init__(parser, cache, format, tool_pool, conversion_cache, optimize, fast_io, profile, collectors,
+                         recover)
+        self.jobs = jobs or os.cpu_count() or 1
+        self.min_subprograms = min_subprograms
+        self.stats = {}
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        """
+        The pool of worker processes, started when it is first needed.
+        """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.jobs, initializer = init_worker,
+                                                 initargs = (self.cache, self.format_backend, self.optimize,
+                                                             self.fast_io))
+        return self._executor
+
+    def close(self):
+        """
+        Stop the worker processes.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def convert_uncached(self, code, analysis = "on-demand", profile: Profile = None) -> Result:
+        """
+        Converts the given MiniPascal code to C code, translating the subprograms in parallel, without using the
+        conversion cache, see `Converter.convert`. The profile measures the "preprocess", "signatures" and "main"
+        phases, the "bodies" phase, which waits for the workers, and the "format" phase.
+        """
+        if profile is None:
+            profile = self.new_profile()
+        self.stats = {"parallel": False, "chunks": 0}
+        with profile.phase("preprocess"):
+            parts = split_program(preprocess(code))
+        if parts is None or not parts[1] or len(parts[1]) < self.min_subprograms:
+            return super().convert_uncached(code, analysis, profile)
+        head, subprograms, main_block = parts
+        stubs = [get_stub(subprogram) for subprogram in subprograms]
+        try:
+            with profile.phase("signatures"):
+                tree = self.parser.parse(" ".join([head, *stubs, main_block]))
+        except Exception:
+            return super().convert_uncached(code, analysis, profile)
+        # a few chunks per worker balance the load between subprograms of different sizes
+        size = -(-len(subprograms) // (self.jobs * 4))
+        chunks = [(start, subprograms[start:start + size]) for start in range(0, len(subprograms), size)]
+        futures = [self.executor.submit(translate_chunk, head, stubs[:start], chunk) for start, chunk in chunks]
+
+        with profile.phase("signatures"):
+            context = Context()
+            context.enter_scope()
+            context.declare_library_functions()
+            declarations, constants, nodes = build_head(tree, context, self.optimize)
+            head_messages = list(context.error_messages)
+            headers = {}
+            for node in nodes:
+                function = build_subprogram(node, context)
+                headers[function.name] = get_header(function)
+        with profile.phase("main"):
+            count = len(context.error_messages)
+            main = build_compound_statement(tree.children[1].children[3], context, "main")
+            if self.optimize:
+                main = optimize_body(main, constants, self.optimize)
+            if self.fast_io:
+                main = lower_main(main)
+            main_messages = context.error_messages[count:]
+        try:
+            with profile.phase("bodies"):
+                results = [future.result() for future in futures]
+        except Exception:
+            return super().convert_uncached(code, analysis, profile)
+        self.stats = {"parallel": True, "chunks": len(chunks)}
+
+        definitions = {}
+        error_messages = head_messages
+        for chunk_parts, messages in results:
+            definitions.update(chunk_parts)
+            error_messages.extend(messages)
+        error_messages.extend(main_messages)
+        names = [name for name, symbol in context.get_funcs().items() if not symbol.is_library]
+        context.exit_scope()
+        program = Program(tree.children[0].children[0].children[0].value, [headers[name] for name in names],
+                          declarations, main, runtime if self.fast_io else ())
+        with profile.phase("format"):
+            result_string = assemble(program, [definitions[name] for name in names], self)
+        profile.finish()
+        if error_messages:
+            analyze = self.tool_pool.analyze if self.tool_pool is not None else code_analyze
+            return Result(result_string, False, error_messages, profile.wrap("analyze", analyze), analysis,
+                          profile.finish())
+        return Result(result_string, True, profile = profile.finish())
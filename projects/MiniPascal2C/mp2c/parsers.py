@@ -0,0 +1,163 @@
+import hashlib
+import os
+import tempfile
+
+import lark
+from lark import Lark
+
+from .paths import get_cache_dir
+from .rules import lalr_rules, rules
+
+grammars = {"earley": rules, "lalr": lalr_rules}
+
+# Part of the cache key, bump it whenever the way parsers are built or stored changes
+CACHE_FORMAT = 1
+
+
+def get_cache_key(parser: str) -> str:
+    """
+    Compute the cache key of a parser.
+
+    The key covers the grammar text, the parsing algorithm, the Lark version and the cache format, so a change to
+    any of them yields a new key and stale cache files are never loaded.
+
+    Args:
+        parser (str): The parsing algorithm.
+
+    Returns:
+        str: The hexadecimal cache key.
+    """
+    digest = hashlib.sha256()
+    for part in (grammars[parser], parser, lark.__version__, str(CACHE_FORMAT)):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()[:32]
+
+
+def get_cache_path(parser: str, cache_dir: str = None) -> str:
+    """
+    Get the path of the cache file of a parser.
+
+    Args:
+        parser (str): The parsing algorithm.
+        cache_dir (str, optional): The cache directory. Defaults to `get_cache_dir()`.
+
+    Returns:
+        str: The path of the cache file.
+    """
+    if cache_dir is None:
+        cache_dir = get_cache_dir()
+    return os.path.join(cache_dir, "parser-{}-{}.lark".format(parser, get_cache_key(parser)))
+
+
+def build_parser(parser: str = "earley") -> Lark:
+    """
+    Build a parser from the grammar rules, without using the cache.
+
+    Args:
+        parser (str, optional): The parsing algorithm, either "earley" or "lalr". Defaults to "earley".
+
+    Returns:
+        Lark: The parser.
+
+    Raises:
+        ValueError: If the parsing algorithm is unknown.
+    """
+    if parser not in grammars:
+        raise ValueError("Unknown parser: {}".format(parser))
+    return Lark(grammars[parser], start = "programstruct", parser = parser)
+
+
+def save_parser(lark_parser: Lark, cache_path: str):
+    """
+    Save a parser to a cache file.
+
+    The parser is written to a temporary file in the same directory first, then moved into place, so concurrent
+    processes never see a partially written cache file. Cache files of the same parser with other keys are removed.
+
+    Args:
+        lark_parser (Lark): The parser to be saved.
+        cache_path (str): The path of the cache file.
+    """
+    cache_dir, cache_name = os.path.split(cache_path)
+    os.makedirs(cache_dir, exist_ok = True)
+    fd, tmp_path = tempfile.mkstemp(dir = cache_dir, suffix = ".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            lark_parser.save(file)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    prefix = cache_name.rsplit("-", 1)[0] + "-"
+    for name in os.listdir(cache_dir):
+        if name.startswith(prefix) and name.endswith(".lark") and name != cache_name:
+            try:
+                os.remove(os.path.join(cache_dir, name))
+            except OSError:
+                pass
+
+
+def load_parser(parser: str = "earley", cache: bool = True, cache_dir: str = None) -> Lark:
+    """
+    Load a parser, using the on-disk cache when possible.
+
+    Only LALR parsers can be serialized by Lark, so Earley parsers are always built from the grammar rules. A missing,
+    unreadable or incompatible cache file is rebuilt; failing to write the cache is not an error.
+
+    Args:
+        parser (str, optional): The parsing algorithm, either "earley" or "lalr". Defaults to "earley".
+        cache (bool, optional): Whether to use the cache. Defaults to True.
+        cache_dir (str, optional): The cache directory. Defaults to `get_cache_dir()`.
+
+    Returns:
+        Lark: The parser.
+
+    Raises:
+        ValueError: If the parsing algorithm is unknown.
+    """
+    if parser not in grammars:
+        raise ValueError("Unknown parser: {}".format(parser))
+    if not cache or parser != "lalr":
+        return build_parser(parser)
+    cache_path = get_cache_path(parser, cache_dir)
+    try:
+        with open(cache_path, "rb") as file:
+            return Lark.load(file)
+    except Exception:
+        pass
+    lark_parser = build_parser(parser)
+    try:
+        save_parser(lark_parser, cache_path)
+    except OSError:
+        pass
+    return lark_parser
+
+
+def load_translating_parser(transformer, cache: bool = True, cache_dir: str = None) -> Lark:
+    """
+    Load an LALR parser calling the methods of a transformer as it reduces the rules, see `mp2c.streaming`.
+
+    Such a parser is bound to its transformer, so it is built for each transformer. With the cache, Lark stores the
+    analysis of the grammar in "lalr-transformer.lark" in the cache directory, and checks it against the grammar and
+    the Lark version itself, rebuilding it when it is stale.
+
+    Args:
+        transformer (Transformer): The transformer, whose method named after a rule is called with the children of
+            each reduction of the rule, and returns what the parent rule gets instead of a subtree.
+        cache (bool, optional): Whether to use the cache. Defaults to True.
+        cache_dir (str, optional): The cache directory. Defaults to `get_cache_dir()`.
+
+    Returns:
+        Lark: The parser, whose `parse` returns what the transformer returns for the programstruct rule.
+    """
+    options = {"start": "programstruct", "parser": "lalr", "transformer": transformer}
+    if cache:
+        if cache_dir is None:
+            cache_dir = get_cache_dir()
+        try:
+            os.makedirs(cache_dir, exist_ok = True)
+            options["cache"] = os.path.join(cache_dir, "lalr-transformer.lark")
+        except OSError:
+            pass
+    return Lark(grammars["lalr"], **options)
@@ -0,0 +1,32 @@
+# The locations of the files mp2c keeps between runs. The module only depends on the standard library, so that the
+# client of the compile server can find it without importing the converter.
+
+import os
+
+
+def get_cache_dir() -> str:
+    """
+    Get the directory where compiled parsers are cached, with the conversions, the executables and the address of the
+    compile server.
+
+    The directory is taken from the MP2C_CACHE_DIR environment variable, or defaults to "mp2c" under the user cache
+    directory (XDG_CACHE_HOME or ~/.cache).
+
+    Returns:
+        str: The path of the cache directory.
+    """
+    cache_dir = os.environ.get("MP2C_CACHE_DIR")
+    if cache_dir:
+        return cache_dir
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "mp2c")
+
+
+def get_server_path() -> str:
+    """
+    Get the path of the file where a running compile server writes its address, see `mp2c.server`.
+
+    Returns:
+        str: The path of the address file, in the cache directory.
+    """
+    return os.path.join(get_cache_dir(), "server.json")
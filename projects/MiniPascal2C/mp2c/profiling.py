@@ -0,0 +1,181 @@
+# Opt-in instrumentation of the conversion phases, see `Converter(profile=True)`.
+#
+# Each phase records its wall time, the CPU time of the converting thread and the peak of the memory allocated by
+# Python during the phase, measured with tracemalloc. tracemalloc is started for the conversion when it is not already
+# tracing, which makes the conversion a few times slower; the peaks are process-wide, so they are only accurate when no
+# other thread allocates at the same time.
+
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+from . import builder
+
+profile_modes = (False, True, "calls")
+
+
+class Profile:
+    """
+    The time and memory used by each phase of a conversion.
+
+    A phase run several times, such as the formatting of each part by `Converter.convert_to`, is recorded once with
+    the sum of its times and the largest of its peaks.
+
+    Attributes:
+        phases (dict): The record of each phase, in the order they first ran, with its "wall" and "cpu" times in
+            seconds, its "peak" allocated memory in bytes (None when memory is not traced) and its number of "runs".
+        counters (dict): The number of calls of each function of `mp2c.builder`, the IR builder, with the "calls"
+            mode.
+        collectors (list): The functions called with the name of each phase and the record of the run that ended.
+    """
+
+    def __init__(self, enabled = True, collectors = (), count_calls = False):
+        """
+        Args:
+            enabled (bool, optional): Whether to record the phases. A disabled profile records nothing and costs
+                almost nothing. Defaults to True.
+            collectors (list, optional): The functions called at the end of each phase with its name and a record
+                of this run, such as a logger or a metrics exporter. Defaults to ().
+            count_calls (bool, optional): Whether to count the calls of the builder functions during the "build"
+                phase, which makes it several times slower. Defaults to False.
+        """
+        self.enabled = enabled
+        self.collectors = list(collectors)
+        self.count_calls = count_calls
+        self.phases = {}
+        self.counters = {}
+        self._tracing = False
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+
+    def phase(self, name: str):
+        """
+        Measure a phase.
+
+        Args:
+            name (str): The name of the phase.
+
+        Returns:
+            A context manager measuring the code run in it.
+        """
+        if not self.enabled:
+            return nullcontext()
+        return self._measure(name)
+
+    @contextmanager
+    def _measure(self, name: str):
+        """
+        Measure the code run in the context and add it to the record of a phase.
+        """
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        counting = self.count_calls and name == "build"
+        if counting:
+            sys.setprofile(self._count)
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            run = {"wall": time.perf_counter() - wall, "cpu": time.thread_time() - cpu,
+                   "peak": tracemalloc.get_traced_memory()[1] - baseline if tracing else None}
+            if counting:
+                sys.setprofile(None)
+            record = self.phases.get(name)
+            if record is None:
+                self.phases[name] = dict(run, runs = 1)
+            else:
+                record["wall"] += run["wall"]
+                record["cpu"] += run["cpu"]
+                if run["peak"] is not None:
+                    record["peak"] = max(record["peak"] or 0, run["peak"])
+                record["runs"] += 1
+            for collector in self.collectors:
+                collector(name, run)
+
+    def wrap(self, name: str, function):
+        """
+        Measure each call of a function as a phase, such as the clang analysis of a result, which runs later.
+
+        Args:
+            name (str): The name of the phase.
+            function (callable): The function.
+
+        Returns:
+            callable: The measured function, or the function itself for a disabled profile.
+        """
+        if not self.enabled or function is None:
+            return function
+        lock = threading.Lock()
+
+        def measured(*args, **kwargs):
+            with lock, self.phase(name):
+                return function(*args, **kwargs)
+
+        return measured
+
+    def finish(self):
+        """
+        Stop tracing the memory if the profile started it.
+
+        Returns:
+            Profile: The profile, or None if it is disabled, to be stored in `Result.profile`.
+        """
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+        return self if self.enabled else None
+
+    def total(self, key = "wall") -> float:
+        """
+        Get the total of a measure over the phases.
+
+        Args:
+            key (str, optional): The measure, "wall" or "cpu". Defaults to "wall".
+
+        Returns:
+            float: The total time in seconds.
+        """
+        return sum(record[key] for record in self.phases.values())
+
+    def format(self, top = 10) -> str:
+        """
+        Format the phases as a table, followed by the most called builder functions.
+
+        Args:
+            top (int, optional): The number of builder functions listed. Defaults to 10.
+
+        Returns:
+            str: The table.
+        """
+        lines = ["{:<12} {:>10} {:>10} {:>7} {:>11}".format("phase", "wall (ms)", "cpu (ms)", "share", "peak (KiB)")]
+        total = self.total() or 1.0
+        for name, record in self.phases.items():
+            peak = "-" if record["peak"] is None else "{:.1f}".format(record["peak"] / 1024)
+            lines.append("{:<12} {:>10.2f} {:>10.2f} {:>6.1f}% {:>11}".format(
+                name, record["wall"] * 1000, record["cpu"] * 1000, record["wall"] / total * 100, peak))
+        lines.append("{:<12} {:>10.2f} {:>10.2f}".format("total", self.total() * 1000, self.total("cpu") * 1000))
+        if self.counters:
+            lines.append("")
+            lines.append("{:<32} {:>10}".format("builder function", "calls"))
+            for name, count in sorted(self.counters.items(), key = lambda item: -item[1])[:top]:
+                lines.append("{:<32} {:>10}".format(name, count))
+        return "\n".join(lines)
+
+    def _count(self, frame, event, arg):
+        """
+        Count the calls of the builder functions, as a `sys.setprofile` hook.
+        """
+        if event == "call" and frame.f_code.co_filename == _builder_file:
+            name = frame.f_code.co_name
+            if not name.startswith("<"):
+                # comprehensions and generator expressions are counted with the function they are in
+                self.counters[name] = self.counters.get(name, 0) + 1
+
+
+_builder_file = builder.__file__
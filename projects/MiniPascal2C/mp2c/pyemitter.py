@@ -0,0 +1,1179 @@
+# Direct execution of MiniPascal programs: the IR of `mp2c.ir`, checked by `mp2c.builder`, is emitted as Python source,
+# compiled to a code object and run by a Python worker process, without the C compiler.
+#
+# The generated code computes what the C code of `mp2c.emitter` computes: integers are wrapped to 32 bits where C
+# would store or compare them, "div" and "mod" truncate toward zero, the real operations are rounded to single
+# precision unless an operand is a double literal or a library call, and read and write follow scanf and printf with
+# the same format strings. The names of the program get a "_" suffix, so they cannot clash with Python keywords,
+# built-ins or the names of the runtime, none of which end with "_".
+#
+# A var parameter is passed as a container and a key, the module globals and the name of a global variable, the row
+# and the index of an array element, or the one-element list holding a local variable passed by reference.
+#
+# Python compiles a limited nesting, so a body nested deeper than `max_depth` and an expression with more operations
+# nested than `max_nesting` are moved to a nested function of the emitted function, defined at its start and called in
+# their place. The IR is walked on the explicit stack of `run_nested`, so programs nested to any depth are emitted.
+
+import ast
+import atexit
+import marshal
+import math
+import os
+import pickle
+import re
+import struct
+import subprocess
+import sys
+import threading
+
+from .ir import (ArrayElement, Assign, Binary, Block, Call, ConstDeclaration, Constant, Empty, For, If, Parenthesized,
+                 ProcedureCall, Program, Read, Temporary, Unary, Variable, While, Write, run_nested)
+from .loops import LoopState, get_writes
+from .optimizer import get_constant, get_kind, promote
+
+_comparisons = {"=": "==", "<>": "!=", "<": "<", "<=": "<=", ">": ">", ">=": ">="}
+_defaults = {"int": "0", "float": "0.0", "char": "'\\x00'", "bool": "False"}
+_space = " \t\n\v\f\r"
+_int_pattern = re.compile(r"[-+]?\d+")
+_float_pattern = re.compile(r"[-+]?(?:\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?|inf(?:inity)?|nan)", re.I)
+_single = struct.Struct("f")
+
+# The indentation level from which the body of a compound statement is a nested function, and the number of nested
+# operations from which an expression is, since Python compiles at most 20 nested loops and 200 nested parentheses
+max_depth = 16
+max_nesting = 100
+
+# The recursion limit of the generated code, whose recursive subprograms are recursive Python functions, and the stack
+# size of the thread running it in a worker process
+recursion_limit = 100000
+stack_size = 512 * 1024 * 1024
+
+# The worker processes waiting for a program to run, at most `max_idle_workers` of them
+max_idle_workers = os.cpu_count() or 1
+_idle_workers = []
+_workers_lock = threading.Lock()
+
+
+class Scope:
+    """
+    The names of the function being emitted and its output lines.
+
+    Attributes:
+        functions (dict): The IR of each subprogram of the program, by name.
+        types (dict): The declared types of the variables the function can access, by name.
+        locals (set): The names of the local variables, the value parameters and the result of the function.
+        cells (set): The local names passed by reference somewhere in the function, held in one-element lists.
+        references (set): The names of the var parameters.
+        assigned (set): The global names assigned by the function, declared `global`.
+        temporaries (set): The Python names of the temporaries of the function.
+        closures (list): The name, the lines of the body and whether it assigns variables of each nested function of
+            the function, see `emit_closures`.
+        lines (list): The lines of the function body.
+        depth (int): The indentation level of the next line.
+        counter (int): The number of temporaries of the function.
+    """
+
+    def __init__(self, functions: dict, types: dict = None):
+        self.functions = functions
+        self.types = dict(types or {})
+        self.locals = set()
+        self.cells = set()
+        self.references = set()
+        self.assigned = set()
+        self.temporaries = set()
+        self.closures = []
+        self.lines = []
+        self.depth = 1
+        self.counter = 0
+
+    def add(self, line: str):
+        """
+        Add a line at the current indentation level.
+
+        Args:
+            line (str): The line.
+        """
+        self.lines.append("    " * self.depth + line)
+
+    def new_name(self, prefix: str) -> str:
+        """
+        Get a new temporary name, which does not end with "_", unlike the names of the program.
+
+        Args:
+            prefix (str): The prefix of the name, such as "Stop".
+
+        Returns:
+            str: The name.
+        """
+        self.counter += 1
+        name = "{}{}".format(prefix, self.counter)
+        self.temporaries.add(name)
+        return name
+
+
+def emit_python(program: Program) -> str:
+    """
+    Emit the Python source of a program, which runs the program when executed by `run_python`.
+
+    Args:
+        program (Program): The IR of the program, without errors. It may be optimized, but not lowered to the
+            buffered I/O runtime.
+
+    Returns:
+        str: The Python source.
+    """
+    functions = {function.name: function for function in program.functions}
+    lines = ["Globals = globals()"]
+    for declaration in program.declarations:
+        lines.append(emit_declaration(declaration))
+    names = [declaration.symbol.name + "_" for declaration in program.declarations]
+    types = {declaration.symbol.name: declaration.symbol.type for declaration in program.declarations}
+    for function in program.functions:
+        lines.append("")
+        lines.extend(emit_function(function, functions, types))
+    scope = Scope(functions, types)
+    emit_statements(program.main, scope)
+    lines.append("")
+    lines.append("def Main():")
+    if names:
+        lines.append("    global " + ", ".join(names))
+    lines.extend("    " + line for line in emit_closures(scope))
+    lines.extend(scope.lines or ["    pass"])
+    lines.append("")
+    lines.append("Main()")
+    return "\n".join(lines) + "\n"
+
+
+def emit_declaration(declaration) -> str:
+    """
+    Emit the initialization of a constant, a variable or an array, whose elements are zero as in C.
+
+    Args:
+        declaration (ConstDeclaration or VarDeclaration): The declaration.
+
+    Returns:
+        str: The assignment.
+    """
+    symbol = declaration.symbol
+    if isinstance(declaration, ConstDeclaration):
+        return "{}_ = {}".format(symbol.name, emit_expression(declaration.value, Scope({}))[0])
+    value = _defaults.get(symbol.type, "0")
+    dimensions = getattr(symbol, "dimensions", ())
+    if dimensions:
+        value = "[{}] * {}".format(value, dimensions[-1].length)
+        for dimension in reversed(dimensions[:-1]):
+            value = "[{} for Index in range({})]".format(value, dimension.length)
+    return "{}_ = {}".format(symbol.name, value)
+
+
+def emit_function(function, functions: dict, types: dict) -> list:
+    """
+    Emit the definition of a subprogram.
+
+    Args:
+        function (Function): The subprogram.
+        functions (dict): The subprograms of the program, by name.
+        types (dict): The declared types of the global variables, by name.
+
+    Returns:
+        list: The lines of the definition.
+    """
+    scope = Scope(functions, types)
+    parameters = []
+    for parameter in function.parameters:
+        scope.types[parameter.name] = parameter.type
+        if parameter.var:
+            scope.references.add(parameter.name)
+            parameters.extend((parameter.name + "_ref", parameter.name + "_key"))
+        else:
+            scope.locals.add(parameter.name)
+            parameters.append(parameter.name + "_")
+    result = "_" + function.name
+    results = []
+    if function.return_type != "void":
+        scope.locals.add(result)
+        results.append((result, "{}_ = {}".format(result, _defaults.get(function.return_type, "0"))))
+    for declaration in function.declarations:
+        scope.locals.add(declaration.symbol.name)
+        scope.types[declaration.symbol.name] = declaration.symbol.type
+    scope.cells = get_cells(function.body, scope.locals)
+    prologue = []
+    for parameter in function.parameters:
+        if parameter.name in scope.cells:
+            prologue.append("{0}_ = [{0}_]".format(parameter.name))
+    for name, line in [(declaration.symbol.name, emit_declaration(declaration))
+                       for declaration in function.declarations] + results:
+        if name in scope.cells:
+            target, value = line.split(" = ", 1)
+            line = "{} = [{}]".format(target, value)
+        prologue.append(line)
+    emit_statements(function.body, scope)
+    if function.return_type != "void":
+        scope.add("return " + emit_variable_name(result, scope))
+    lines = ["def {}_({}):".format(function.name, ", ".join(parameters))]
+    if scope.assigned:
+        lines.append("    global " + ", ".join(sorted(scope.assigned)))
+    lines.extend("    " + line for line in prologue)
+    lines.extend("    " + line for line in emit_closures(scope))
+    lines.extend(scope.lines)
+    if len(lines) == 1:
+        lines.append("    pass")
+    return lines
+
+
+def get_cells(statements: list, names: set) -> set:
+    """
+    Get the local names of a function passed by reference in its body.
+
+    Args:
+        statements (list): The statements of the body.
+        names (set): The local names.
+
+    Returns:
+        set: The names passed by reference.
+    """
+    cells = set()
+    stack = list(statements)
+    while stack:
+        statement = stack.pop()
+        kind = type(statement)
+        expressions = []
+        if kind is Assign:
+            expressions = [statement.target, statement.value]
+        elif kind is If:
+            expressions = [statement.condition]
+            stack.append(statement.then)
+            if statement.otherwise is not None:
+                stack.append(statement.otherwise)
+        elif kind is For:
+            expressions = [statement.start, statement.stop]
+            stack.append(statement.body)
+        elif kind is While:
+            expressions = [statement.condition]
+            stack.append(statement.body)
+        elif kind is Block:
+            stack.extend(statement.statements)
+        elif kind is Temporary:
+            expressions = [statement.value]
+        elif kind is ProcedureCall or kind is Read or kind is Write:
+            expressions = list(statement.arguments)
+            if kind is ProcedureCall:
+                cells.update(argument.name for argument, reference in zip(statement.arguments, statement.references)
+                             if reference and type(argument) is Variable and argument.name in names)
+        while expressions:
+            expression = expressions.pop()
+            node_kind = type(expression)
+            if node_kind is Call:
+                cells.update(argument.name for argument, reference in zip(expression.arguments,
+                                                                          expression.references)
+                             if reference and type(argument) is Variable and argument.name in names)
+                expressions.extend(expression.arguments)
+            elif node_kind is Binary:
+                expressions.extend((expression.left, expression.right))
+            elif node_kind is Unary:
+                expressions.append(expression.operand)
+            elif node_kind is Parenthesized:
+                expressions.append(expression.expression)
+            elif node_kind is ArrayElement:
+                expressions.extend(expression.indices)
+    return cells
+
+
+def emit_statements(statements: list, scope: Scope):
+    """
+    Emit a list of statements.
+
+    Args:
+        statements (list): The statements.
+        scope (Scope): The function being emitted.
+    """
+    for statement in statements:
+        run_nested(emit_statement(statement, scope))
+
+
+def emit_statement(statement, scope: Scope):
+    """
+    Emit a statement. The passes of this module over the statements and the expressions are nested passes of
+    `run_nested`, which yield the pass on each nested node and receive its result.
+
+    Args:
+        statement (Statement): The statement.
+        scope (Scope): The function being emitted.
+
+    Returns:
+        The nested pass emitting a compound statement, or None.
+    """
+    return _statement_emitters[type(statement)](statement, scope)
+
+
+def emit_body(statement, scope: Scope):
+    """
+    Emit the indented body of a compound statement, which is "pass" if it is empty. From `max_depth` on, the body is
+    emitted in a nested function of the function being emitted, which it calls.
+    """
+    if scope.depth >= max_depth:
+        lines, depth = scope.lines, scope.depth
+        scope.lines, scope.depth = [], 1
+        yield emit_statement(statement, scope)
+        body = scope.lines or ["    pass"]
+        scope.lines, scope.depth = lines, depth + 1
+        scope.add(add_closure(body, True, scope) + "()")
+        scope.depth = depth
+        return
+    scope.depth += 1
+    start = len(scope.lines)
+    yield emit_statement(statement, scope)
+    if len(scope.lines) == start:
+        scope.add("pass")
+    scope.depth -= 1
+
+
+def add_closure(body: list, assigns: bool, scope: Scope) -> str:
+    """
+    Add a nested function to the function being emitted, see `emit_closures`.
+
+    Args:
+        body (list): The lines of its body, indented by one level.
+        assigns (bool): Whether it assigns the variables of the function, as the body of a statement does.
+        scope (Scope): The function being emitted.
+
+    Returns:
+        str: The name of the nested function.
+    """
+    name = "Nested{}".format(len(scope.closures) + 1)
+    scope.closures.append((name, body, assigns))
+    return name
+
+
+def emit_closures(scope: Scope) -> list:
+    """
+    Emit the definitions of the nested functions of a function, the bodies and the expressions nested too deeply to be
+    compiled in place. The bodies assign the globals and the locals of the function, whose temporaries are bound
+    first, so that they are locals of the function rather than of the body assigning them.
+
+    Args:
+        scope (Scope): The emitted function.
+
+    Returns:
+        list: The lines of the definitions, to be indented at the start of the function body.
+    """
+    if not scope.closures:
+        return []
+    lines = []
+    names = scope.temporaries | {name + "_" for name in scope.locals if name not in scope.cells}
+    if scope.temporaries and any(assigns for name, body, assigns in scope.closures):
+        lines.append("{} = None".format(" = ".join(sorted(scope.temporaries))))
+    for name, body, assigns in scope.closures:
+        lines.append("def {}():".format(name))
+        if assigns and scope.assigned:
+            lines.append("    global " + ", ".join(sorted(scope.assigned)))
+        if assigns and names:
+            lines.append("    nonlocal " + ", ".join(sorted(names)))
+        lines.extend(body)
+    return lines
+
+
+def emit_empty(statement: Empty, scope: Scope):
+    """
+    Emit nothing for the empty statement.
+    """
+
+
+def emit_assign(statement: Assign, scope: Scope):
+    """
+    Emit an assignment, converting the value to the type of the target.
+    """
+    target = emit_target(statement.target, scope)
+    value = emit_value(statement.value, statement.target.type, scope)
+    if (type(statement.target) is Variable and statement.target.type == "int"
+            and scope.types.get(statement.target.name) == "char"):
+        # the variable of a for loop over characters, which C converts back to a character
+        value = "chr({} & 255)".format(value)
+    scope.add("{} = {}".format(target, value))
+
+
+def emit_if(statement: If, scope: Scope):
+    """
+    Emit an if statement, following "else if" chains in a loop.
+    """
+    keyword = "if"
+    while True:
+        scope.add("{} {}:".format(keyword, emit_expression(statement.condition, scope)[0]))
+        yield emit_body(statement.then, scope)
+        otherwise = statement.otherwise
+        if type(otherwise) is If:
+            keyword = "elif"
+            statement = otherwise
+            continue
+        if otherwise is not None:
+            scope.add("else:")
+            yield emit_body(otherwise, scope)
+        return
+
+
+def emit_for(statement: For, scope: Scope):
+    """
+    Emit a for loop. When the loop variable is an integer and the body does not assign it nor anything its final
+    value depends on, the loop is a Python for loop over a range, after which the loop variable is set to the value C
+    leaves in it. Otherwise it is a while loop re-evaluating the final value at each iteration, as the C loop does,
+    which steps a real by one in single precision and a character to the next code. The body reads a character
+    loop variable as its code, as C promotes it.
+    """
+    writes, unknown = get_writes(statement.body)
+    state = LoopState(writes, unknown, None)
+    type_ = scope.types.get(statement.name, "int")
+    target = emit_target(Variable(statement.name, statement.symbol, type_), scope)
+    start = emit_value(statement.start, type_, scope)
+    step, compare = (-1, ">=") if statement.downto else (1, "<=")
+    if type_ == "char" or type_ == "float":
+        scope.add("{} = {}".format(target, start))
+        stop = emit_expression(statement.stop, scope)[0]
+        if type_ == "char":
+            condition = "ord({}) {} {}".format(target, compare,
+                                               "ord({})".format(stop) if statement.stop.type == "char" else stop)
+            increment = "{0} = chr(ord({0}) {1} 1)"
+        else:
+            condition = "{} {} {}".format(target, compare, stop)
+            increment = "{0} = Single({0} {1} 1)"
+        scope.add("while {}:".format(condition))
+        yield emit_body(statement.body, scope)
+        scope.depth += 1
+        scope.add(increment.format(target, "-" if step < 0 else "+"))
+        scope.depth -= 1
+        return
+    if not unknown and statement.name not in writes and state.is_invariant(statement.stop):
+        first = scope.new_name("Start")
+        last = scope.new_name("Stop")
+        scope.add("{} = {}".format(first, start))
+        scope.add("{} = {}".format(last, emit_value(statement.stop, "int", scope)))
+        scope.add("for {} in range({}, {} {} 1{}):".format(target, first, last, "-" if step < 0 else "+",
+                                                           ", -1" if step < 0 else ""))
+        yield emit_body(statement.body, scope)
+        scope.add("{0} = {1} {2} 1 if {3} {4} {1} else {3}".format(target, last, "-" if step < 0 else "+", first,
+                                                                  compare))
+        return
+    scope.add("{} = {}".format(target, start))
+    scope.add("while {} {} {}:".format(target, compare, emit_value(statement.stop, "int", scope)))
+    yield emit_body(statement.body, scope)
+    scope.depth += 1
+    scope.add("{0} = {0} {1} 1".format(target, "-" if step < 0 else "+"))
+    scope.depth -= 1
+
+
+def emit_while(statement: While, scope: Scope):
+    """
+    Emit a while loop.
+    """
+    scope.add("while {}:".format(emit_expression(statement.condition, scope)[0]))
+    yield emit_body(statement.body, scope)
+
+
+def emit_temporary(statement: Temporary, scope: Scope):
+    """
+    Emit the initialization of a temporary of the optimizer. A pointer to a row of an array is the row itself.
+    """
+    scope.locals.add(statement.name)
+    scope.temporaries.add(statement.name + "_")
+    value_type = statement.type if not statement.type.endswith("*") else ""
+    scope.add("{}_ = {}".format(statement.name, emit_value(statement.value, value_type, scope)))
+
+
+def emit_block(statement: Block, scope: Scope):
+    """
+    Emit the statements of a compound statement.
+    """
+    for inner in statement.statements:
+        yield emit_statement(inner, scope)
+
+
+def emit_procedure_call(statement: ProcedureCall, scope: Scope):
+    """
+    Emit a procedure call.
+    """
+    text, nesting = run_nested(emit_call_text(statement.name, statement.function, statement.arguments,
+                                              statement.references, scope))
+    scope.add(text)
+
+
+def emit_read(statement: Read, scope: Scope):
+    """
+    Emit a read call, which assigns the values read until the first one that does not match, as scanf does.
+    """
+    if statement.format is None:
+        return
+    codes = "".join(re.findall(r"%(\w)", ast.literal_eval(statement.format)))
+    values = scope.new_name("Values")
+    scope.add("{} = Input.scan({!r})".format(values, codes))
+    for index, argument in enumerate(statement.arguments):
+        scope.add("if len({}) > {}:".format(values, index))
+        scope.depth += 1
+        scope.add("{} = {}[{}]".format(emit_target(argument, scope), values, index))
+        scope.depth -= 1
+
+
+def emit_write(statement: Write, scope: Scope):
+    """
+    Emit a write or writeln call, formatting the values with the printf format string.
+    """
+    text = repr(ast.literal_eval(statement.format))
+    if not statement.arguments:
+        scope.add("Output.append({})".format(text))
+        return
+    values = [emit_value(argument, "", scope) for argument in statement.arguments]
+    scope.add("Output.append({} % ({},))".format(text, ", ".join(values)))
+
+
+_statement_emitters = {
+    Empty: emit_empty,
+    Assign: emit_assign,
+    If: emit_if,
+    For: emit_for,
+    While: emit_while,
+    Temporary: emit_temporary,
+    Block: emit_block,
+    ProcedureCall: emit_procedure_call,
+    Read: emit_read,
+    Write: emit_write,
+}
+
+
+def emit_target(expression, scope: Scope) -> str:
+    """
+    Emit the target of an assignment, declaring the assigned global names.
+
+    Args:
+        expression (Expression): A `Variable` or an `ArrayElement`.
+        scope (Scope): The function being emitted.
+
+    Returns:
+        str: The Python target.
+    """
+    if type(expression) is Variable:
+        name = expression.name
+        if name not in scope.locals and name not in scope.references and name not in scope.cells:
+            scope.assigned.add(name + "_")
+        return emit_variable_name(name, scope)
+    return emit_expression(expression, scope)[0]
+
+
+def emit_variable_name(name: str, scope: Scope) -> str:
+    """
+    Emit the access to a variable, through its container for a var parameter or a local passed by reference.
+    """
+    if name in scope.references:
+        return "{0}_ref[{0}_key]".format(name)
+    if name in scope.cells:
+        return "{}_[0]".format(name)
+    return name + "_"
+
+
+def emit_reference(expression, scope: Scope):
+    """
+    Emit the container and the key of a variable or an array element passed to a var parameter.
+    """
+    if type(expression) is ArrayElement:
+        if len(expression.indices) > 1:
+            row = ArrayElement(expression.name, expression.symbol, expression.indices[:-1], expression.offsets[:-1],
+                               expression.type)
+            text, kind, unbounded, nesting = yield emit_operand(row, scope)
+        else:
+            text, nesting = expression.name + "_", 0
+        index, index_nesting = yield emit_index(expression.indices[-1], expression.offsets[-1], scope)
+        return "{}, {}".format(text, index), max(nesting, index_nesting)
+    name = expression.name
+    if name in scope.references:
+        return "{0}_ref, {0}_key".format(name), 0
+    if name in scope.cells:
+        return "{}_, 0".format(name), 0
+    return "Globals, {!r}".format(name + "_"), 0
+
+
+def emit_call_text(name: str, function, arguments: list, references: list, scope: Scope):
+    """
+    Emit a call of a subprogram or a library function, converting the values to the types of the parameters, and
+    give its number of nested operations.
+    """
+    values = []
+    nesting = 0
+    if function is not None and function.is_library:
+        for argument in arguments:
+            text, argument_nesting = yield emit_converted(argument, "", scope)
+            values.append(text)
+            nesting = max(nesting, argument_nesting)
+        return "Library.{}({})".format(name, ", ".join(values)), nesting + 1
+    definition = scope.functions.get(name)
+    parameters = definition.parameters if definition is not None else [None] * len(arguments)
+    for argument, reference, parameter in zip(arguments, references, parameters):
+        if reference:
+            text, argument_nesting = yield emit_reference(argument, scope)
+        else:
+            text, argument_nesting = yield emit_converted(argument, parameter.type if parameter is not None else "",
+                                                          scope)
+        values.append(text)
+        nesting = max(nesting, argument_nesting)
+    return "{}_({})".format(name, ", ".join(values)), nesting + 1
+
+
+def emit_value(expression, type_: str, scope: Scope) -> str:
+    """
+    Emit an expression whose value is stored or passed as a value of a C type, wrapping an integer to 32 bits and
+    rounding a real to single precision.
+
+    Args:
+        expression (Expression): The expression.
+        type_ (str): The C type of the stored value, or "" to keep the value as computed.
+        scope (Scope): The function being emitted.
+
+    Returns:
+        str: The Python expression.
+    """
+    return run_nested(emit_converted(expression, type_, scope))[0]
+
+
+def emit_converted(expression, type_: str, scope: Scope):
+    """
+    Emit a value as `emit_value` does, and give its number of nested operations.
+    """
+    text, kind, unbounded, nesting = yield emit_operand(expression, scope)
+    if type_ == "float":
+        return (text, nesting) if kind == "float" else ("Single({})".format(text), nesting + 1)
+    if type_ == "int" and (kind == "float" or kind == "double"):
+        return "int({})".format(text), nesting + 1
+    if unbounded and kind == "int":
+        return wrap(text), nesting + 3
+    return text, nesting
+
+
+def wrap(text: str) -> str:
+    """
+    Wrap an integer expression to 32 bits, as the C int arithmetic does.
+    """
+    return "(({} + 2147483648 & 4294967295) - 2147483648)".format(text)
+
+
+def emit_index(index, offset, scope: Scope):
+    """
+    Emit an array index, shifted by the lower bound of its dimension, and give its number of nested operations.
+    """
+    text, nesting = yield emit_converted(index, "int", scope)
+    return (text, nesting) if offset is None else ("{} - {}".format(text, offset), nesting + 1)
+
+
+def emit_expression(expression, scope: Scope) -> tuple:
+    """
+    Emit an expression.
+
+    Args:
+        expression (Expression): The expression.
+        scope (Scope): The function being emitted.
+
+    Returns:
+        tuple: The Python expression, the kind of its C value ("int", "float", "double" or None for the other
+            types), and whether it is an integer that may be out of the 32-bit range.
+    """
+    text, kind, unbounded, nesting = run_nested(emit_operand(expression, scope))
+    return text, kind, unbounded
+
+
+def emit_operand(expression, scope: Scope):
+    """
+    Emit an expression as `emit_expression` does, and give the number of nested operations of the Python expression,
+    which is at most `max_nesting`, see `limit_nesting`.
+
+    Args:
+        expression (Expression): The expression.
+        scope (Scope): The function being emitted.
+
+    Returns:
+        tuple: The Python expression, the kind of its C value, whether it is an integer that may be out of the 32-bit
+            range and its number of nested operations, or the nested pass returning them.
+    """
+    kind = type(expression)
+    if kind is Constant:
+        text = expression.text
+        if expression.type == "char":
+            return repr(ast.literal_eval(text) if text.startswith("'") else text), None, False, 0
+        if expression.type == "char*":
+            return repr(ast.literal_eval(text)), None, False, 0
+        value = get_constant(expression)
+        if value is None:
+            return text, get_kind(expression), False, 0
+        return repr(value[1]), value[0], False, 0
+    if kind is Variable:
+        text = emit_variable_name(expression.name, scope)
+        if expression.type == "int" and expression.name in scope.types:
+            # the variable of a for loop is an integer in the body, whatever its declared type
+            declared = scope.types[expression.name]
+            if declared == "char":
+                return "ord({})".format(text), "int", False, 1
+            if declared == "float":
+                return text, "float", False, 0
+        return text, get_kind(expression), False, 0
+    if kind is ArrayElement:
+        return emit_element(expression, scope)
+    if kind is Call:
+        return emit_call(expression, scope)
+    if kind is Unary or kind is Parenthesized:
+        return emit_nested(expression, scope)
+    return emit_binary(expression, scope)
+
+
+def limit_nesting(text: str, nesting: int, scope: Scope) -> tuple:
+    """
+    Keep an expression compilable, by moving it to a nested function of the function being emitted, which it calls,
+    when it has more than `max_nesting` nested operations.
+
+    Args:
+        text (str): The Python expression.
+        nesting (int): Its number of nested operations.
+        scope (Scope): The function being emitted.
+
+    Returns:
+        tuple: The expression or the call of the nested function, and its number of nested operations.
+    """
+    if nesting <= max_nesting:
+        return text, nesting
+    return add_closure(["    return " + text], False, scope) + "()", 1
+
+
+def emit_element(expression: ArrayElement, scope: Scope):
+    """
+    Emit an array element.
+    """
+    indices = []
+    nesting = 0
+    for index, offset in zip(expression.indices, expression.offsets):
+        text, index_nesting = yield emit_index(index, offset, scope)
+        indices.append("[{}]".format(text))
+        nesting = max(nesting, index_nesting) + 1
+    text, nesting = limit_nesting(expression.name + "_" + "".join(indices), nesting, scope)
+    return text, get_kind(expression), False, nesting
+
+
+def emit_call(expression: Call, scope: Scope):
+    """
+    Emit a function call, whose value is a double for a library function.
+    """
+    text, nesting = yield emit_call_text(expression.name, expression.function, expression.arguments,
+                                         expression.references, scope)
+    text, nesting = limit_nesting(text, nesting, scope)
+    library = expression.function is not None and expression.function.is_library
+    return text, "double" if library else get_kind(expression), False, nesting
+
+
+def emit_nested(expression, scope: Scope):
+    """
+    Emit a unary operation or an expression in parentheses, walking the nested unary operations and parentheses in a
+    loop. The parentheses of the source are not needed in Python, and each run of signs or of "not" operators is
+    emitted as at most two operations, so that deeply nested factors still compile.
+    """
+    ops = []
+    while type(expression) is Unary or type(expression) is Parenthesized:
+        if type(expression) is Unary:
+            ops.append(expression.op)
+            expression = expression.operand
+        else:
+            expression = expression.expression
+    text, kind, unbounded, nesting = yield emit_operand(expression, scope)
+    index = len(ops)
+    while index:
+        # the run of operators of the same kind ending at ops[index - 1], applied from the innermost one
+        start = index - 1
+        negation = ops[start] == "not"
+        while start and (ops[start - 1] == "not") == negation:
+            start -= 1
+        run = ops[start:index]
+        index = start
+        if negation:
+            if len(run) % 2:
+                text, nesting = "(not {})".format(text), nesting + 1
+            else:
+                text, nesting = "(not (not {}))".format(text), nesting + 2
+            kind, unbounded = "int", False
+        elif "-" in run:
+            if run.count("-") % 2:
+                text, nesting = "(-{})".format(text), nesting + 1
+            unbounded = True
+        text, nesting = limit_nesting(text, nesting, scope)
+    return text, kind, unbounded, nesting
+
+
+def emit_binary(expression: Binary, scope: Scope):
+    """
+    Emit an operator chain as `emit_binary` of `mp2c.emitter` does, walking its left operands in a loop. A real
+    division converts the leftmost operand of the chain to float. A run of integer additions and subtractions is
+    emitted flat, wrapped to 32 bits once where its value is used, which gives the value of C because the wrapping
+    commutes with them; a long run is a call of `sum`, since Python cannot compile deeply nested operations.
+    """
+    spine = []
+    while type(expression) is Binary:
+        spine.append(expression)
+        expression = expression.left
+    text, kind, unbounded, nesting = yield emit_operand(expression, scope)
+    if any(binary.op == "/" for binary in spine) and kind != "float":
+        text = "Single({})".format(wrap(text) if unbounded else text)
+        kind, unbounded, nesting = "float", False, nesting + (4 if unbounded else 1)
+    terms = []
+    for binary in reversed(spine):
+        op = binary.op
+        right, right_kind, right_unbounded, right_nesting = yield emit_operand(binary.right, scope)
+        if op in _comparisons or op in ("and", "or"):
+            if terms:
+                text, nesting = join_terms(text, nesting, terms, scope)
+                terms = []
+            if unbounded:
+                text, nesting = wrap(text), nesting + 3
+            if right_unbounded:
+                right, right_nesting = wrap(right), right_nesting + 3
+            python_op = _comparisons.get(op, op)
+            text, kind, unbounded = "({} {} {})".format(text, python_op, right), "int", False
+            text, nesting = limit_nesting(text, max(nesting, right_nesting) + 1, scope)
+            continue
+        kind = promote(kind or "int", right_kind or "int")
+        if kind == "int" and op in ("+", "-"):
+            terms.append((op, right, right_nesting))
+            unbounded = True
+            continue
+        if terms:
+            text, nesting = join_terms(text, nesting, terms, scope)
+            terms = []
+        if kind == "int":
+            if op == "*":
+                text, unbounded = "({} * {})".format(text, right), True
+                text, nesting = limit_nesting(text, max(nesting, right_nesting) + 1, scope)
+                continue
+            if unbounded:
+                text, nesting = wrap(text), nesting + 3
+            if right_unbounded:
+                right, right_nesting = wrap(right), right_nesting + 3
+            text, unbounded = "{}({}, {})".format("Mod" if op == "mod" else "Div", text, right), False
+            text, nesting = limit_nesting(text, max(nesting, right_nesting) + 1, scope)
+            continue
+        nesting = max(nesting, right_nesting) + 1
+        if op in ("+", "-", "*"):
+            text = "({} {} {})".format(text, op, right)
+        elif op == "mod":
+            text = "math.fmod({}, {})".format(text, right)
+        else:
+            text = "Divide({}, {})".format(text, right)
+        if kind == "float":
+            text, nesting = "Single({})".format(text), nesting + 1
+        text, nesting = limit_nesting(text, nesting, scope)
+        unbounded = False
+    if terms:
+        text, nesting = join_terms(text, nesting, terms, scope)
+    return text, kind, unbounded, nesting
+
+
+def join_terms(first: str, nesting: int, terms: list, scope: Scope) -> tuple:
+    """
+    Join the operands of a run of integer additions and subtractions.
+
+    Args:
+        first (str): The first operand.
+        nesting (int): The number of nested operations of the first operand.
+        terms (list): The operator, "+" or "-", the operand and its number of nested operations of each following
+            term.
+        scope (Scope): The function being emitted.
+
+    Returns:
+        tuple: The Python expression of the sum, and its number of nested operations.
+    """
+    nesting = max([nesting] + [term_nesting for op, term, term_nesting in terms])
+    if len(terms) < 100:
+        text = "({}{})".format(first, "".join(" {} {}".format(op, term) for op, term, term_nesting in terms))
+        return limit_nesting(text, nesting + len(terms), scope)
+    text = "sum(({}, {}))".format(first, ", ".join(term if op == "+" else "-" + term
+                                                   for op, term, term_nesting in terms))
+    return limit_nesting(text, nesting + 3, scope)
+
+
+class Scanner:
+    """
+    The standard input of a program run by `run_python`, read as scanf reads it.
+
+    Attributes:
+        text (str): The input.
+        position (int): The position of the next character to read.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.position = 0
+
+    def scan(self, codes: str) -> list:
+        """
+        Read values with scanf conversions, stopping at the first value that does not match.
+
+        Args:
+            codes (str): The conversion of each value, "d", "f" or "c".
+
+        Returns:
+            list: The values read, an int, a float rounded to single precision or a one-character string each.
+        """
+        values = []
+        text = self.text
+        for code in codes:
+            if code == "c":
+                if self.position >= len(text):
+                    break
+                values.append(text[self.position])
+                self.position += 1
+                continue
+            while self.position < len(text) and text[self.position] in _space:
+                self.position += 1
+            match = (_int_pattern if code == "d" else _float_pattern).match(text, self.position)
+            if match is None:
+                break
+            self.position = match.end()
+            if code == "d":
+                values.append((int(match.group()) + 2147483648 & 4294967295) - 2147483648)
+            else:
+                values.append(single(float(match.group())))
+        return values
+
+
+def single(number: float) -> float:
+    """
+    Round a number to single precision, to infinity when it is too large, as a C float conversion does.
+    """
+    try:
+        return _single.unpack(_single.pack(number))[0]
+    except OverflowError:
+        return math.copysign(math.inf, number)
+
+
+def divide(a, b) -> float:
+    """
+    Divide reals, with the infinite or NaN results of C for a division by zero.
+    """
+    if b == 0:
+        return math.nan if a == 0 or a != a else math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+
+def truncate_divide(a: int, b: int) -> int:
+    """
+    Divide integers, rounding toward zero as C does. A division by zero raises `ZeroDivisionError`.
+    """
+    quotient = abs(a) // abs(b)
+    return quotient if (a < 0) == (b < 0) else -quotient
+
+
+def remainder(a: int, b: int) -> int:
+    """
+    Compute the remainder of an integer division, with the sign of the dividend as in C.
+    """
+    return a - b * truncate_divide(a, b)
+
+
+class Library:
+    """
+    The math.h functions of the library, which return the infinite or NaN results of C instead of raising.
+    """
+
+
+def _library_function(name: str):
+    """
+    Make a library function from the function of the same name in `math`.
+    """
+    function = getattr(math, name)
+
+    def call(x):
+        try:
+            return float(function(x))
+        except OverflowError:
+            return math.inf
+        except ValueError:
+            return -math.inf if name.startswith("log") and x == 0 else math.nan
+
+    call.__name__ = name
+    return staticmethod(call)
+
+
+for _name in ("acos", "asin", "atan", "cos", "cosh", "sin", "sinh", "tanh", "exp", "log", "log10", "sqrt", "ceil",
+              "fabs", "floor"):
+    setattr(Library, _name, _library_function(_name))
+
+
+def compile_python(program: Program):
+    """
+    Compile a program to a Python code object.
+
+    Args:
+        program (Program): The IR of the program, see `emit_python`.
+
+    Returns:
+        CodeType: The code object, to be run by `run_python`.
+    """
+    return compile(emit_python(program), "<mp2c {}>".format(program.name), "exec")
+
+
+def run_python(code, input_ = None, timeout = None) -> str:
+    """
+    Run a program compiled by `compile_python` in a worker process, see `PythonWorker`.
+
+    The worker raises its recursion limit to `recursion_limit`, for the recursive subprograms, without changing the
+    limit of this process and of its other threads. An idle worker is reused, and the worker is stopped if the program
+    runs for longer than the timeout.
+
+    Args:
+        code (CodeType): The code object.
+        input_ (str, optional): The standard input of the program. Defaults to None, for an empty input.
+        timeout (float, optional): The maximum run time in seconds. Defaults to None, for no limit.
+
+    Returns:
+        str: The standard output of the program.
+
+    Raises:
+        TimeoutError: If the program runs for longer than the timeout.
+        Exception: The error that stopped the program, such as a `ZeroDivisionError` or an `IndexError`, or a
+            `RuntimeError` if the worker process stopped.
+    """
+    with _workers_lock:
+        worker = _idle_workers.pop() if _idle_workers else None
+    if worker is None:
+        worker = PythonWorker()
+    try:
+        failed, value = worker.run(code, input_, timeout)
+    except BaseException:
+        worker.close()
+        raise
+    with _workers_lock:
+        if len(_idle_workers) < max_idle_workers:
+            _idle_workers.append(worker)
+            worker = None
+    if worker is not None:
+        worker.close()
+    if failed:
+        raise value
+    return value
+
+
+class PythonWorker:
+    """
+    A Python process running compiled programs one at a time, see `serve_worker`.
+
+    The code objects and the inputs are sent to the standard input of the process, and the outputs or the errors of
+    the programs are read from its standard output, pickled.
+
+    Attributes:
+        process (Popen): The worker process.
+    """
+
+    def __init__(self):
+        env = dict(os.environ)
+        # the package is found where this process found it
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env["PYTHONPATH"] = os.pathsep.join(path for path in (root, env.get("PYTHONPATH")) if path)
+        command = [sys.executable, "-c", "from mp2c.pyemitter import serve_worker; serve_worker()"]
+        self.process = subprocess.Popen(command, stdin = subprocess.PIPE, stdout = subprocess.PIPE, env = env)
+
+    def run(self, code, input_ = None, timeout = None) -> tuple:
+        """
+        Run a program in the worker.
+
+        Args:
+            code (CodeType): The code object.
+            input_ (str, optional): The standard input of the program. Defaults to None.
+            timeout (float, optional): The maximum run time in seconds, after which the worker is killed. Defaults to
+                None, for no limit.
+
+        Returns:
+            tuple: Whether the program failed, and its output or its error.
+
+        Raises:
+            TimeoutError: If the program runs for longer than the timeout.
+            RuntimeError: If the worker process stopped.
+        """
+        expired = threading.Event()
+
+        def expire():
+            expired.set()
+            self.process.kill()
+
+        timer = threading.Timer(timeout, expire) if timeout is not None else None
+        try:
+            pickle.dump((marshal.dumps(code), input_ or ""), self.process.stdin)
+            self.process.stdin.flush()
+            if timer is not None:
+                timer.start()
+            return pickle.load(self.process.stdout)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            if expired.is_set():
+                raise TimeoutError("Timeout after {} s".format(timeout)) from None
+            raise RuntimeError("The Python worker stopped with exit code {}".format(self.process.wait())) from None
+        finally:
+            if timer is not None:
+                timer.cancel()
+
+    def close(self):
+        """
+        Stop the worker process.
+        """
+        if self.process.poll() is None:
+            try:
+                self.process.stdin.close()
+                self.process.wait(1)
+            except (OSError, subprocess.TimeoutExpired):
+                self.process.kill()
+                self.process.wait()
+
+
+def serve_worker():
+    """
+    Run the programs sent by `PythonWorker` on the standard input until it is closed, each in a thread with a stack
+    of `stack_size` bytes, and send their outputs or their errors on the standard output.
+    """
+    requests = sys.stdin.buffer
+    replies = sys.stdout.buffer
+    # nothing else may write to the replies
+    sys.stdout = sys.stderr
+    sys.setrecursionlimit(recursion_limit)
+    try:
+        threading.stack_size(stack_size)
+    except (ValueError, RuntimeError):
+        pass
+    while True:
+        try:
+            code, input_ = pickle.load(requests)
+        except EOFError:
+            return
+        reply = []
+        thread = threading.Thread(target = run_request, args = (marshal.loads(code), input_, reply))
+        thread.start()
+        thread.join()
+        pickle.dump(reply[0], replies)
+        replies.flush()
+
+
+def run_request(code, input_: str, reply: list):
+    """
+    Run a program in a worker process and append the reply to `PythonWorker`: whether it failed, and its output or
+    its error.
+    """
+    output = []
+    namespace = {"Input": Scanner(input_), "Output": output, "Single": single, "Divide": divide,
+                 "Div": truncate_divide, "Mod": remainder, "Library": Library, "math": math}
+    try:
+        exec(code, namespace)
+    except Exception as e:
+        try:
+            pickle.dumps(e)
+        except Exception:
+            e = RuntimeError("{}: {}".format(type(e).__name__, e))
+        reply.append((True, e))
+        return
+    reply.append((False, "".join(output)))
+
+
+@atexit.register
+def close_workers():
+    """
+    Stop the idle worker processes.
+    """
+    with _workers_lock:
+        workers = list(_idle_workers)
+        _idle_workers.clear()
+    for worker in workers:
+        worker.close()
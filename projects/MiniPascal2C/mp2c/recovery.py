@@ -0,0 +1,368 @@
+# Syntax error recovery for the LALR parser, see `parse_recovering`.
+#
+# The parser stops at the first syntax error, so a program with several errors needs one conversion per error. The
+# recovering parser drives the LALR parser token by token, and repairs the input at each error so that the parse goes
+# on to the next one:
+#
+# 1. A missing token, such as a semicolon between two statements or a "then" after a condition, is inserted when the
+#    erroneous token can be shifted right after it.
+# 2. Otherwise, the erroneous token is deleted if the next token can be shifted instead, or replaced by a keyword or
+#    a symbol after which the next token can be shifted, such as "integer" for a misspelled type.
+# 3. Otherwise, in panic mode, the tokens are skipped up to the next semicolon, "end" or period, and the parser stack
+#    is popped to the nearest state where that token can be shifted, which discards the statement or the declaration
+#    being parsed.
+# 4. At the end of the input, the blocks left open are closed with "end", ";", "begin" and "." tokens.
+#
+# An error is reported only once a few tokens were shifted since the previous one, so that an error does not cascade
+# into others while the parser resynchronizes. The tree of the recovered program only holds complete rules, so it can
+# be built into IR to report the semantic errors of the parts that parsed.
+
+from difflib import SequenceMatcher
+
+from lark import Lark, Token, Tree
+from lark.exceptions import UnexpectedCharacters, UnexpectedInput, UnexpectedToken
+from lark.parsers.lalr_analysis import Shift
+
+# The terminals which may be inserted before an erroneous token, in order of preference
+insertable_terminals = ("SEMICOLON", "RPAR", "RSQB", "THEN", "DO", "OF", "ASSIGNOP", "END")
+# The terminals the parser resynchronizes on in panic mode
+sync_terminals = ("SEMICOLON", "END", "DOT")
+# The terminals closing the blocks left open at the end of the input, in order of preference
+closing_terminals = ("END", "DOT", "SEMICOLON", "BEGIN")
+# The number of tokens to shift after an error before the next error is reported
+quiet_shifts = 2
+# The maximum number of tokens inserted at the end of the input
+max_closing_tokens = 1000
+
+
+class SyntaxErrorInfo:
+    """
+    A syntax error found by the parser, with its position in the source code.
+
+    Attributes:
+        line (int): The 1-based line of the error.
+        column (int): The 1-based column of the error.
+        token (str): The text of the unexpected token, the unexpected character, or "" at the end of the input.
+        expected (list): The names of the terminals which were expected, sorted.
+        message (str): The message of the parser, the same as raised by `Converter.parse`.
+    """
+
+    def __init__(self, line: int, column: int, token: str, expected: list, message: str):
+        self.line = line
+        self.column = column
+        self.token = token
+        self.expected = expected
+        self.message = message
+
+    def __str__(self):
+        return self.message
+
+    def __repr__(self):
+        return "SyntaxErrorInfo(line={}, column={}, token={!r})".format(self.line, self.column, self.token)
+
+    def __eq__(self, other):
+        if not isinstance(other, SyntaxErrorInfo):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def to_dict(self) -> dict:
+        """
+        Convert the error to a dictionary of JSON values.
+
+        Returns:
+            dict: The attributes of the error.
+        """
+        return {"line": self.line, "column": self.column, "token": self.token, "expected": list(self.expected),
+                "message": self.message}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SyntaxErrorInfo":
+        """
+        Create an error from a dictionary returned by `to_dict`.
+
+        Args:
+            data (dict): The attributes of the error.
+
+        Returns:
+            SyntaxErrorInfo: The error.
+        """
+        return cls(data["line"], data["column"], data["token"], list(data["expected"]), data["message"])
+
+
+class RecoveringParser:
+    """
+    Parses code with an LALR parser, recovering from the syntax errors, see `mp2c.recovery`.
+
+    Attributes:
+        interactive (InteractiveParser): The interactive parser, holding the parser state and the lexer.
+        source_map (SourceMap): The map of the positions in the parsed code to the source code, or None.
+        errors (list): The `SyntaxErrorInfo` of the reported errors.
+        literals (dict): The text of each terminal defined by a string, used for the inserted tokens.
+        keywords (dict): The name of the terminal of each keyword.
+        pending (Token): The erroneous token to delete or replace once the next token is read, or None.
+        skipping (bool): Whether the tokens are skipped up to a synchronizing token.
+        shifted (int): The number of tokens shifted since the last error.
+    """
+
+    def __init__(self, parser: Lark, code: str, source_map = None):
+        self.interactive = parser.parse_interactive(code)
+        self.source_map = source_map
+        self.errors = []
+        self.literals = {terminal.name: terminal.pattern.value for terminal in parser.terminals
+                         if terminal.pattern.type == "str"}
+        self.keywords = {value: name for name, value in self.literals.items() if value.isalpha()}
+        self.pending = None
+        self.skipping = False
+        self.shifted = 0
+
+    @property
+    def state(self):
+        """
+        The state of the LALR parser, with its stacks of states and values.
+        """
+        return self.interactive.parser_state
+
+    def parse(self) -> Tree:
+        """
+        Parse the code, recording the syntax errors in `errors`.
+
+        Returns:
+            Tree: The parse tree of the recovered program, or None if the end of the input could not be recovered.
+        """
+        token = None
+        for token, error in self.tokens():
+            if self.pending is not None or self.skipping:
+                # the contextual lexer reads a keyword as an identifier where it does not expect the keyword
+                token = self.retype(token)
+            if self.pending is not None:
+                self.repair(token)
+            elif self.skipping:
+                if token.type in sync_terminals and self.resync(token):
+                    self.skipping = False
+            elif error is not None:
+                self.report(error)
+                self.recover(self.retype(token))
+            else:
+                try:
+                    self.state.feed_token(token)
+                    self.shifted += 1
+                except UnexpectedToken as e:
+                    self.report(e)
+                    self.recover(self.retype(token))
+        end = Token.new_borrow_pos("$END", "", token) if token else Token("$END", "", 0, 1, 1)
+        return self.finish(end)
+
+    def tokens(self):
+        """
+        Lex the code with the contextual lexer of the parser, skipping the characters which match no terminal.
+
+        Yields:
+            tuple: Each token, with the `UnexpectedToken` of the lexer if it is not expected in the state of the
+                parser, or None.
+        """
+        lexer_thread = self.interactive.lexer_thread
+        while True:
+            try:
+                for token in lexer_thread.lex(self.state):
+                    yield token, None
+                return
+            except UnexpectedToken as e:
+                # the lexer matched a terminal which the parser does not expect, and consumed it
+                yield e.token, e
+            except UnexpectedCharacters as e:
+                self.report(e)
+                line_counter = lexer_thread.state.line_ctr
+                line_counter.feed(lexer_thread.state.text[line_counter.char_pos:line_counter.char_pos + 1])
+
+    def retype(self, token: Token) -> Token:
+        """
+        Get a token with the terminal of its keyword, if it is a keyword read as another terminal.
+        """
+        name = self.keywords.get(token.value)
+        if name is None or name == token.type:
+            return token
+        return Token.new_borrow_pos(name, token.value, token)
+
+    def recover(self, token: Token):
+        """
+        Recover from a syntax error at a token: insert a missing token before it, resynchronize the parser on it if
+        it is a synchronizing token, or wait for the next token to repair it, see `repair`.
+        """
+        stack = self.state.state_stack
+        for name in insertable_terminals:
+            inserted = self.simulate(stack, name)
+            if inserted is not None and self.simulate(inserted, token.type) is not None:
+                self.state.feed_token(Token.new_borrow_pos(name, self.literals[name], token))
+                self.state.feed_token(token)
+                self.shifted += 1
+                return
+        if token.type not in sync_terminals or not self.resync(token):
+            self.pending = token
+
+    def repair(self, token: Token):
+        """
+        Repair the pending erroneous token with the token after it: delete it, replace it, or resynchronize the
+        parser in panic mode.
+        """
+        pending = self.pending
+        self.pending = None
+        stack = self.state.state_stack
+        if self.simulate(stack, token.type) is not None:
+            self.state.feed_token(token)
+            self.shifted += 1
+            return
+        # the keywords and symbols closest to the erroneous token are tried first, for misspellings
+        names = sorted((name for name in self.state.parse_conf.states[stack[-1]] if name in self.literals),
+                       key = lambda name: (-SequenceMatcher(None, pending.value, self.literals[name]).ratio(), name))
+        for name in names:
+            replaced = self.simulate(stack, name)
+            if replaced is not None and self.simulate(replaced, token.type) is not None:
+                self.state.feed_token(Token.new_borrow_pos(name, self.literals[name], pending))
+                self.state.feed_token(token)
+                self.shifted += 2
+                return
+        if token.type not in sync_terminals or not self.resync(token):
+            self.skipping = True
+
+    def resync(self, token: Token) -> bool:
+        """
+        Pop the parser stack to the nearest state where a token can be shifted, and shift it.
+
+        Returns:
+            bool: Whether the token was shifted.
+        """
+        state_stack = self.state.state_stack
+        for depth in range(len(state_stack)):
+            if self.simulate(state_stack[:len(state_stack) - depth], token.type) is not None:
+                self.pop(depth)
+                self.state.feed_token(token)
+                self.shifted = 1
+                return True
+        return False
+
+    def finish(self, end: Token) -> Tree:
+        """
+        Feed the end of the input, closing the blocks left open after a syntax error.
+
+        Returns:
+            Tree: The parse tree, or None if the blocks could not be closed.
+        """
+        if not self.skipping and self.pending is None:
+            try:
+                return self.state.feed_token(end, True)
+            except UnexpectedToken as e:
+                self.report(e)
+        for _ in range(max_closing_tokens):
+            if self.simulate(self.state.state_stack, end.type, True) is not None:
+                return self.state.feed_token(end, True)
+            if not self.close(end):
+                return None
+        return None
+
+    def close(self, end: Token) -> bool:
+        """
+        Shift the first closing token which can be shifted, popping the parser stack to the nearest state where one
+        can be.
+
+        Returns:
+            bool: Whether a token was shifted.
+        """
+        state_stack = self.state.state_stack
+        for depth in range(len(state_stack)):
+            for name in closing_terminals:
+                if self.simulate(state_stack[:len(state_stack) - depth], name) is not None:
+                    self.pop(depth)
+                    self.state.feed_token(Token.new_borrow_pos(name, self.literals[name], end))
+                    return True
+        return False
+
+    def pop(self, depth: int):
+        """
+        Pop the last states of the parser stack, with their values.
+        """
+        if depth:
+            del self.state.state_stack[-depth:]
+            del self.state.value_stack[-depth:]
+
+    def simulate(self, stack: list, name: str, is_end = False):
+        """
+        Simulate feeding a terminal to the parser, on the states only.
+
+        Args:
+            stack (list): The stack of states.
+            name (str): The name of the terminal.
+            is_end (bool, optional): Whether the terminal is the end of the input. Defaults to False.
+
+        Returns:
+            list: The stack of states after the terminal is shifted, or after the program is reduced at the end of the
+                input, or None if the terminal is not expected.
+        """
+        parse_conf = self.state.parse_conf
+        states = parse_conf.states
+        stack = list(stack)
+        while True:
+            action = states[stack[-1]].get(name)
+            if action is None:
+                return None
+            action, argument = action
+            if action is Shift:
+                if is_end:
+                    return None
+                stack.append(argument)
+                return stack
+            size = len(argument.expansion)
+            if size:
+                del stack[-size:]
+            stack.append(states[stack[-1]][argument.origin.name][1])
+            if is_end and stack[-1] == parse_conf.end_state:
+                return stack
+
+    def accepts(self) -> set:
+        """
+        Get the terminals which can be fed in the current state of the parser, as `InteractiveParser.accepts` does,
+        without copying the parse tree built so far.
+        """
+        stack = self.state.state_stack
+        return {name for name in self.state.parse_conf.states[stack[-1]] if name.isupper() and
+                self.simulate(stack, name, name == "$END") is not None}
+
+    def report(self, error: UnexpectedInput):
+        """
+        Record a syntax error, unless it follows the previous one too closely, and start counting the shifted tokens.
+        """
+        quiet = self.errors and self.shifted < quiet_shifts
+        self.shifted = 0
+        if quiet:
+            return
+        if isinstance(error, UnexpectedToken):
+            # the message lists the terminals the parser accepts, computed on the states only
+            error._accepts = self.accepts()
+            expected = error._accepts
+            token = str(error.token)
+        else:
+            expected = error.allowed or set()
+            token = error.char
+        if self.source_map is not None and error.line > 0:
+            # report the position in the original code, before comments were removed
+            error.line, error.column = self.source_map.to_source(error.line, error.column)
+        self.errors.append(SyntaxErrorInfo(error.line, error.column, token, sorted(expected), str(error)))
+
+
+def parse_recovering(parser: Lark, code: str, source_map = None) -> tuple:
+    """
+    Parse code with an LALR parser, recovering from the syntax errors to report all of them in one pass, see
+    `mp2c.recovery`.
+
+    Args:
+        parser (Lark): The LALR parser.
+        code (str): The preprocessed code.
+        source_map (SourceMap, optional): The map of the positions in the code to the source code, for the reported
+            positions. Defaults to None.
+
+    Returns:
+        tuple: The parse tree of the recovered program, or None if it could not be recovered, and the list of
+            `SyntaxErrorInfo`, empty if the code has no syntax error.
+    """
+    recovering_parser = RecoveringParser(parser, code, source_map)
+    tree = recovering_parser.parse()
+    return tree, recovering_parser.errors
@@ -1,5 +1,28 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 from .utils import code_analyze
 
+analysis_policies = ("never", "on-demand", "eager", "background")
+
+# The executor running the analyses of the "background" policy, created at first use
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_analysis_executor() -> ThreadPoolExecutor:
+    """
+    Get the executor running background analyses, creating it if needed.
+
+    Returns:
+        ThreadPoolExecutor: The shared executor.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(thread_name_prefix = "mp2c-analysis")
+        return _executor
+
 
 class Result:
     """
@@ -9,17 +32,70 @@ class Result:
         code (str): The code that was analyzed.
         success (bool): Indicates whether the analysis was successful or not.
         error_messages (list): A list of error messages, if any.
-        error_info (str): Additional information about the error, if any. Detected by Clang.
+        error_info (str): Additional information about the error, if any. Detected by Clang when first read, or in
+            advance depending on the analysis policy.
+        profile (Profile): The time and memory of each phase of the conversion, or None if it was not profiled.
+        syntax_errors (list): The `SyntaxErrorInfo` of each syntax error, with its line and column, when the
+            converter recovers from syntax errors. Their messages are also the first error messages.
     """
 
-    def __init__(self, code: str, success: bool = True, error_messages = None):
+    def __init__(self, code: str, success: bool = True, error_messages = None, analyze = code_analyze,
+                 analysis = "on-demand", profile = None, syntax_errors = None):
+        """
+        Args:
+            code (str): The converted code.
+            success (bool, optional): Whether the conversion was successful. Defaults to True.
+            error_messages (list, optional): The error messages. Defaults to None.
+            analyze (callable, optional): The function analyzing the code of a failed conversion, such as
+                `ToolPool.analyze`. Defaults to `code_analyze`.
+            analysis (str, optional): When the code of a failed conversion is analyzed: "never", "on-demand" (when
+                `error_info` is first read), "eager" (now) or "background" (now, in another thread).
+                Defaults to "on-demand".
+            profile (Profile, optional): The profile of the conversion, see `mp2c.profiling`. Defaults to None.
+            syntax_errors (list, optional): The syntax errors, see `mp2c.recovery`. Defaults to None.
+
+        Raises:
+            ValueError: If the analysis policy is unknown.
+        """
+        if analysis not in analysis_policies:
+            raise ValueError("Unknown analysis policy: {}".format(analysis))
         if error_messages is None:
             error_messages = []
-        if not success and code != "":
-            error_info = code_analyze(code)
-        else:
-            error_info = ""
+        if syntax_errors is None:
+            syntax_errors = []
         self.code = code
         self.success = success
         self.error_messages = error_messages
-        self.error_info = error_info
+        self.analysis = analysis
+        self.profile = profile
+        self.syntax_errors = syntax_errors
+        self._analyze = analyze if not success and code != "" and analysis != "never" else None
+        self._error_info = None
+        self._future = None
+        self._lock = threading.Lock()
+        if self._analyze is not None:
+            if analysis == "eager":
+                self._error_info = self._analyze(code)
+            elif analysis == "background":
+                self._future = get_analysis_executor().submit(self._analyze, code)
+
+    @property
+    def error_info(self) -> str:
+        """
+        The clang analysis of the code of a failed conversion, computed once and cached. Empty if the conversion
+        succeeded or if the analysis policy is "never".
+        """
+        with self._lock:
+            if self._error_info is None:
+                if self._future is not None:
+                    self._error_info = self._future.result()
+                elif self._analyze is not None:
+                    self._error_info = self._analyze(self.code)
+                else:
+                    self._error_info = ""
+            return self._error_info
+
+    @error_info.setter
+    def error_info(self, value: str):
+        with self._lock:
+            self._error_info = value
@@ -122,3 +122,151 @@ CHAR                     : "char"
 %import common.ESCAPED_STRING
 %ignore WS
 """
+
+# LALR(1) compatible grammar rules for MiniPascal.
+#
+# The language is the same as `rules`, but the grammar is free of ambiguities and LALR(1) conflicts:
+# - the dangling else is resolved by splitting statements into closed and open statements, so an else belongs to the
+#   nearest if (the Earley parser of `rules` attaches it to the outermost one instead),
+# - an empty subprogram_declarations is only derived when there is no subprogram at all,
+# - the id of a constant declaration has its own rule, so "=" is not confused with RELOP by the contextual lexer,
+# - whitespace is never matched by `empty`, since it is ignored by the lexer.
+# The helper rules are aliased back to the rule names used in `rules`, so the parse tree has the same shape and can
+# be visited by the same visitors.
+lalr_rules = r"""
+RELOP                    : EQUAL
+                         | "<>"
+                         | "<"
+                         | "<="
+                         | ">"
+                         | ">="
+EQUAL                    : "="
+programstruct            : program_head ";" program_body "."
+program_head             : "program" id "(" idlist ")"
+                         | "program" id
+idlist                   : id
+                         | idlist "," id
+program_body             : const_declarations var_declarations subprogram_declarations compound_statement
+const_declarations       : "const" const_declaration ";"
+                         | empty
+const_declaration        : const_id "=" const_value
+                         | const_declaration ";" const_id "=" const_value
+const_id                 : IDENTIFIER_TOKEN -> id
+const_value              : PLUS num
+                         | MINUS num
+                         | num
+                         | "'" LETTER "'"
+PLUS                     : "+"
+MINUS                    : "-"
+var_declarations         : "var" var_declaration ";"
+                         | empty
+var_declaration          : idlist ":" type
+                         | var_declaration ";" idlist ":" type
+type                     : basic_type
+                         | "array" "[" period "]" "of" basic_type
+basic_type               : INTEGER
+                         | REAL
+                         | BOOLEAN
+                         | CHAR
+                         | STRING
+STRING                   : "string"
+period                   : DIGITS ".." DIGITS
+                         | period "," DIGITS ".." DIGITS
+subprogram_declarations  : empty
+                         | subprogram ";"
+                         | subprogram_list subprogram ";" -> subprogram_declarations
+subprogram_list          : subprogram ";" -> subprogram_declarations
+                         | subprogram_list subprogram ";" -> subprogram_declarations
+subprogram               : procedure_declaration | function_declaration
+procedure_declaration    : "procedure" id formal_parameter ";" subprogram_body
+function_declaration     : "function" id formal_parameter ":" basic_type ";"  subprogram_body
+subprogram_body          : const_declarations var_declarations compound_statement
+formal_parameter         : "(" parameter_list ")"
+                         | empty
+parameter_list           : empty
+                         | parameter (";" parameter)*
+parameter                : var_parameter
+                         | value_parameter
+var_parameter            : "var" value_parameter
+value_parameter          : idlist ":" basic_type
+compound_statement       : "begin" statement_list "end"
+statement_list           : _statement
+                         | statement_list ";" _statement
+_statement               : closed_statement
+                         | open_statement
+closed_statement         : empty -> statement
+                         | assign_statement -> statement
+                         | procedure_call -> statement
+                         | compound_statement -> statement
+                         | closed_if_else_statement -> statement
+                         | closed_for_statement -> statement
+                         | closed_while_statement -> statement
+                         | repeat_statement -> statement
+open_statement           : open_if_else_statement -> statement
+                         | open_for_statement -> statement
+                         | open_while_statement -> statement
+repeat_statement         : "repeat" statement_list "until" expression
+assign_statement         : variable ASSIGNOP expression
+closed_if_else_statement : "if" expression "then" closed_statement closed_else_part -> if_else_statement
+open_if_else_statement   : "if" expression "then" _statement -> if_else_statement
+                         | "if" expression "then" closed_statement open_else_part -> if_else_statement
+closed_else_part         : "else" closed_statement -> else_part
+open_else_part           : "else" open_statement -> else_part
+closed_for_statement     : "for" id ASSIGNOP expression "to" expression "do" closed_statement -> for_statement
+                         | "for" id ASSIGNOP expression DOWN "to" expression "do" closed_statement -> for_statement
+open_for_statement       : "for" id ASSIGNOP expression "to" expression "do" open_statement -> for_statement
+                         | "for" id ASSIGNOP expression DOWN "to" expression "do" open_statement -> for_statement
+DOWN                     : "down"
+closed_while_statement   : "while" expression "do" closed_statement -> while_statement
+open_while_statement     : "while" expression "do" open_statement -> while_statement
+variable_list            : variable ("," variable)*
+variable                 : id id_varpart?
+id_varpart               : "[" expression_list "]"
+procedure_call           : id
+                         | id "(" expression_list ")"
+expression_list          : expression ("," expression)*
+expression               : simple_expression
+                         | simple_expression RELOP simple_expression
+                         | char_literal
+                         | string_literal
+char_literal             : "'" LETTER "'"
+string_literal           : ESCAPED_STRING
+simple_expression        : term
+                         | simple_expression ADDOP term
+term                     : factor
+                         | term MULOP factor
+factor                   : num
+                         | variable
+                         | "(" expression ")"
+                         | NOT factor
+                         | UMINUS factor
+                         | function_call
+function_call            : func_id "(" expression_list? ")"
+NOT                      : "not"
+DIGITS                   : DIGIT+
+id                       : IDENTIFIER_TOKEN
+optional_fraction        : "." DIGITS
+num                      : DIGITS optional_fraction?
+ADDOP                    : "+"
+                         | "-"
+                         | "or"
+MULOP                    : "*"
+                         | "/"
+                         | "div"
+                         | "mod"
+                         | "and"
+ASSIGNOP                 : ":="
+empty                    :
+func_id                  : id
+UMINUS                   : "-"
+IDENTIFIER_TOKEN         : /[a-zA-Z_][a-zA-Z0-9_]*/
+INTEGER                  : "integer"
+REAL                     : "real"
+BOOLEAN                  : "boolean"
+CHAR                     : "char"
+%import common.DIGIT
+%import common.LETTER
+%import common.WS
+%import common.ESCAPED_STRING
+%ignore WS
+"""
@@ -0,0 +1,459 @@
+# A long-running compile server, see `Server`.
+#
+# Running `python main.py` for each file pays the start-up of the interpreter, the import of lark and the loading of
+# the parser every time. The server pays them once and answers JSON-RPC 2.0 requests, one JSON object per line, on
+# its standard input and output or on a local socket, with these methods:
+#
+# - "convert": convert a program, with the options of `Converter`, and return its code and error messages.
+# - "analyze": the same, with the clang analysis of the code of a failed conversion in "error_info".
+# - "run": run a program on an input, in a Python worker process with the "python" engine or compiled by gcc with the
+#   "c" engine, and stop it after a time limit.
+# - "stats": the number of requests and the statistics of the caches.
+# - "shutdown": stop the server once the response is sent.
+#
+# The parsers are loaded once per set of options and shared by the requests, which each build their own context. The
+# conversion results, the executables and the clang-format and clang processes are shared through a
+# `ConversionCache` in memory, an `ExecutableCache` and a `ToolPool`. The requests of different connections, and the
+# requests read from the standard input, are served concurrently by threads.
+#
+# A server listening on a socket writes its address to `get_server_path()`, where `mp2c.client.connect` finds it, and
+# removes the file when it stops.
+
+import inspect
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import ConversionCache
+from .converter import Converter
+from .executables import ExecutableCache
+from .paths import get_cache_dir, get_server_path
+from .toolpool import ToolPool
+from .utils import compile_code
+from .version import __version__
+
+# The error codes of JSON-RPC 2.0
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+engines = ("python", "c")
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """
+    Answers the requests of one connection, in order, one line each.
+    """
+
+    def handle(self):
+        for line in self.rfile:
+            response = self.server.rpc.handle_line(line.decode("utf-8"))
+            if response is not None:
+                self.wfile.write(response.encode("utf-8") + b"\n")
+
+
+class Server:
+    """
+    Converts, analyzes and runs MiniPascal programs for JSON-RPC 2.0 clients, keeping the parsers and the caches warm
+    between the requests, see `mp2c.server`.
+
+    Attributes:
+        cache (bool): Whether the parsers are loaded from the on-disk parser cache.
+        conversion_cache (ConversionCache): The cache of the conversion results, shared by all the options.
+        executable_cache (ExecutableCache): The cache of the executables of the "c" engine.
+        tool_pool (ToolPool): The pool running clang-format and clang for all the requests.
+        jobs (int): The number of threads serving the requests read from the standard input.
+        run_timeout (float): The time limit in seconds of the runs whose request gives none, or None for no limit.
+        stats (dict): The number of "requests" and "errors", and the number of calls of each method.
+        address (str): The address the server listens on, "unix:PATH" or "tcp:HOST:PORT", or None.
+    """
+
+    def __init__(self, cache = True, conversion_cache: ConversionCache = None,
+                 executable_cache: ExecutableCache = None, tool_pool: ToolPool = None, jobs = None,
+                 run_timeout = 10.0):
+        """
+        Args:
+            cache (bool, optional): Whether to load the parsers from the on-disk parser cache. Defaults to True.
+            conversion_cache (ConversionCache, optional): The cache of the conversion results. Defaults to None, for
+                a cache in memory.
+            executable_cache (ExecutableCache, optional): The cache of the executables. Defaults to None, for a
+                temporary directory removed by `close`.
+            tool_pool (ToolPool, optional): The pool running clang-format and clang. Defaults to None, for a new
+                pool closed by `close`.
+            jobs (int, optional): The number of threads serving the requests read from the standard input. Defaults
+                to the number of CPUs, and at least 4, since most requests wait for a tool process.
+            run_timeout (float, optional): The time limit in seconds of the runs whose request gives none. Defaults
+                to 10 seconds, since the programs may not stop, and None removes the limit.
+        """
+        self.cache = cache
+        self.conversion_cache = conversion_cache if conversion_cache is not None else ConversionCache()
+        self.executable_cache = executable_cache if executable_cache is not None else ExecutableCache()
+        self.tool_pool = tool_pool if tool_pool is not None else ToolPool()
+        self.jobs = jobs or max(os.cpu_count() or 1, 4)
+        self.run_timeout = run_timeout
+        self.stats = {"requests": 0, "errors": 0, "methods": {}}
+        self.address = None
+        self.started = time.time()
+        self.stopped = threading.Event()
+        self.methods = {"convert": self.convert, "analyze": self.analyze, "run": self.run,
+                        "stats": self.get_stats, "shutdown": self.shutdown}
+        self.converters = {}
+        self.lock = threading.Lock()
+        self._owned = (executable_cache is None, tool_pool is None)
+        self._socket_server = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Close the executable cache and the tool pool created by the server.
+        """
+        owns_executables, owns_tools = self._owned
+        if owns_executables:
+            self.executable_cache.close()
+        if owns_tools:
+            self.tool_pool.close()
+
+    def get_converter(self, parser = "lalr", format = "builtin", optimize = 0, fast_io = False,
+                      recover = False) -> Converter:
+        """
+        Get the converter of a set of options, creating it with its parser at the first request using them.
+
+        Returns:
+            Converter: The converter, shared by the requests with the same options.
+
+        Raises:
+            ValueError: If an option is unknown, see `Converter`.
+        """
+        key = (parser, format, optimize, bool(fast_io), bool(recover))
+        with self.lock:
+            converter = self.converters.get(key)
+            if converter is None:
+                converter = Converter(parser, self.cache, format, self.tool_pool, self.conversion_cache, optimize,
+                                      bool(fast_io), recover = bool(recover))
+                # the parser is loaded under the lock, so that it is loaded once
+                converter.parser
+                self.converters[key] = converter
+        return converter
+
+    def warm(self, parsers = ("lalr",)):
+        """
+        Load the parsers and convert a trivial program, so that the first request does not pay for them.
+
+        Args:
+            parsers (tuple, optional): The parsing algorithms to load. Defaults to ("lalr",).
+        """
+        for parser in parsers:
+            self.get_converter(parser).convert("program warm; begin end.", "never")
+
+    def convert(self, code: str, parser = "lalr", format = "builtin", optimize = 0, fast_io = False,
+                recover = False) -> dict:
+        """
+        Convert a MiniPascal program, see `Converter.convert`.
+
+        Returns:
+            dict: The "code", "success", "error_messages" and "syntax_errors" of the result.
+        """
+        result = self.get_converter(parser, format, optimize, fast_io, recover).convert(code, "never")
+        return {"code": result.code, "success": result.success, "error_messages": list(result.error_messages),
+                "syntax_errors": [error.to_dict() for error in result.syntax_errors]}
+
+    def analyze(self, code: str, parser = "lalr", format = "builtin", optimize = 0, fast_io = False,
+                recover = False) -> dict:
+        """
+        Convert a MiniPascal program and analyze the code of a failed conversion with clang.
+
+        Returns:
+            dict: The result of `convert`, with the "error_info" of the analysis, empty for a successful conversion.
+        """
+        result = self.get_converter(parser, format, optimize, fast_io, recover).convert(code, "eager")
+        return {"code": result.code, "success": result.success, "error_messages": list(result.error_messages),
+                "syntax_errors": [error.to_dict() for error in result.syntax_errors],
+                "error_info": result.error_info}
+
+    def run(self, code: str, input = "", engine = "python", parser = "lalr", optimize = 0, timeout = None) -> dict:
+        """
+        Run a MiniPascal program on an input.
+
+        The "python" engine runs the program in a Python worker process, see `Converter.run`. The "c" engine converts
+        the program and runs its executable, compiled once by gcc, see `compile_code`. With both engines, the program
+        is stopped after the timeout, or after `run_timeout` if the request gives none.
+
+        Returns:
+            dict: The standard "output" of the program, or the error message of its conversion or its run.
+
+        Raises:
+            ValueError: If the engine is unknown.
+        """
+        if engine not in engines:
+            raise ValueError("Unknown engine: {}".format(engine))
+        if timeout is None:
+            timeout = self.run_timeout
+        converter = self.get_converter(parser, optimize = optimize)
+        if engine == "python":
+            return {"output": converter.run(code, input, timeout)}
+        result = converter.convert(code, "never")
+        if not result.success:
+            return {"output": "Compilation failed:\n{}".format("\n".join(result.error_messages))}
+        return {"output": compile_code(result.code, input, cache = self.executable_cache, timeout = timeout)}
+
+    def get_stats(self) -> dict:
+        """
+        Get the statistics of the server.
+
+        Returns:
+            dict: The "version", "pid", "uptime" in seconds, the number of "requests" and "errors", the calls of each
+                method, the options of the loaded "converters", and the statistics of the "conversion_cache" and the
+                "executable_cache".
+        """
+        with self.lock:
+            return {"version": __version__, "pid": os.getpid(), "uptime": time.time() - self.started,
+                    "requests": self.stats["requests"], "errors": self.stats["errors"],
+                    "methods": dict(self.stats["methods"]),
+                    "converters": [list(key) for key in self.converters],
+                    "conversion_cache": dict(self.conversion_cache.stats),
+                    "executable_cache": dict(self.executable_cache.stats)}
+
+    def shutdown(self):
+        """
+        Stop serving, once the response to the request is sent.
+        """
+        self.stopped.set()
+        if self._socket_server is not None:
+            # `shutdown` waits for the loop of `serve_forever`, which must not be the thread of the request
+            threading.Thread(target = self._socket_server.shutdown, daemon = True).start()
+
+    def handle(self, request):
+        """
+        Answer a JSON-RPC 2.0 request, or a batch of requests.
+
+        Args:
+            request: The decoded request, or the list of requests of a batch.
+
+        Returns:
+            The response, the list of responses of a batch, or None for notifications, which are not answered.
+        """
+        if isinstance(request, list):
+            if not request:
+                return get_error(None, INVALID_REQUEST, "Empty batch")
+            responses = [response for response in map(self.handle, request) if response is not None]
+            return responses or None
+        if not isinstance(request, dict) or request.get("jsonrpc") != "2.0" or \
+                not isinstance(request.get("method"), str):
+            self.count(None, False)
+            return get_error(request.get("id") if isinstance(request, dict) else None, INVALID_REQUEST,
+                             "Invalid request")
+        request_id = request.get("id")
+        method = self.methods.get(request["method"])
+        params = request.get("params", {})
+        if method is None:
+            error = (METHOD_NOT_FOUND, "Method not found: {}".format(request["method"]))
+        elif not isinstance(params, (dict, list)):
+            error = (INVALID_PARAMS, "Invalid params")
+        else:
+            args, kwargs = (params, {}) if isinstance(params, list) else ((), params)
+            try:
+                inspect.signature(method).bind(*args, **kwargs)
+            except TypeError as e:
+                error = (INVALID_PARAMS, str(e))
+            else:
+                try:
+                    result = method(*args, **kwargs)
+                except ValueError as e:
+                    error = (INVALID_PARAMS, str(e))
+                except Exception as e:
+                    error = (INTERNAL_ERROR, "{}: {}".format(type(e).__name__, e))
+                else:
+                    self.count(request["method"], True)
+                    return {"jsonrpc": "2.0", "id": request_id, "result": result} if "id" in request else None
+        self.count(request["method"], False)
+        return get_error(request_id, *error) if "id" in request else None
+
+    def handle_line(self, line: str):
+        """
+        Answer a line of JSON.
+
+        Args:
+            line (str): The JSON of a request or of a batch.
+
+        Returns:
+            str: The JSON of the response, without a newline, or None if there is nothing to answer.
+        """
+        if not line.strip():
+            return None
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            self.count(None, False)
+            return json.dumps(get_error(None, PARSE_ERROR, "Parse error: {}".format(e)))
+        response = self.handle(request)
+        return json.dumps(response) if response is not None else None
+
+    def count(self, method, success: bool):
+        """
+        Count a request in the statistics.
+
+        Args:
+            method (str): The method, or None for an invalid request.
+            success (bool): Whether the request succeeded.
+        """
+        with self.lock:
+            self.stats["requests"] += 1
+            if not success:
+                self.stats["errors"] += 1
+            if method is not None:
+                self.stats["methods"][method] = self.stats["methods"].get(method, 0) + 1
+
+    def serve_stdio(self, stdin = None, stdout = None):
+        """
+        Answer the requests read from a text stream, one line each, until the end of the stream or a "shutdown"
+        request. The requests are served concurrently, so their responses may be written out of order.
+
+        Args:
+            stdin (optional): The text stream of the requests. Defaults to `sys.stdin`.
+            stdout (optional): The text stream of the responses. Defaults to `sys.stdout`.
+        """
+        stdin = stdin if stdin is not None else sys.stdin
+        stdout = stdout if stdout is not None else sys.stdout
+        write_lock = threading.Lock()
+
+        def answer(line):
+            response = self.handle_line(line)
+            if response is not None:
+                with write_lock:
+                    stdout.write(response + "\n")
+                    stdout.flush()
+
+        with ThreadPoolExecutor(self.jobs, thread_name_prefix = "mp2c-server") as executor:
+            for line in iter(stdin.readline, ""):
+                future = executor.submit(answer, line)
+                if is_shutdown(line):
+                    # the stream is not read again once the server is stopped
+                    future.result()
+                if self.stopped.is_set():
+                    break
+
+    def serve(self, address = None, on_ready = None):
+        """
+        Answer the requests of the clients of a socket until a "shutdown" request or an interrupt, writing the
+        address to `get_server_path()` while serving.
+
+        Args:
+            address (str, optional): "unix:PATH" or "tcp:HOST:PORT". Defaults to a Unix socket in the cache directory,
+                or to a free port of 127.0.0.1 where Unix sockets are not available.
+            on_ready (callable, optional): The function called with the address once the server listens. Defaults to
+                None.
+
+        Raises:
+            ValueError: If the address is not valid.
+        """
+        if address is None:
+            path = os.path.join(get_cache_dir(), "server.sock")
+            address = "unix:" + path if hasattr(socket, "AF_UNIX") and len(path) < 100 else "tcp:127.0.0.1:0"
+        kind, _, location = address.partition(":")
+        if kind == "unix":
+            os.makedirs(os.path.dirname(os.path.abspath(location)), exist_ok = True)
+            if os.path.exists(location):
+                os.remove(location)
+            server = socketserver.ThreadingUnixStreamServer(location, RequestHandler)
+        elif kind == "tcp":
+            host, _, port = location.rpartition(":")
+            server = socketserver.ThreadingTCPServer((host, int(port)), RequestHandler)
+            address = "tcp:{}:{}".format(*server.server_address[:2])
+        else:
+            raise ValueError("Unknown server address: {}".format(address))
+        server.daemon_threads = True
+        server.rpc = self
+        self._socket_server = server
+        self.address = address
+        server_path = get_server_path()
+        try:
+            write_address(server_path, address)
+            if on_ready is not None:
+                on_ready(address)
+            if not self.stopped.is_set():
+                server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self._socket_server = None
+            self.address = None
+            remove_address(server_path)
+            if kind == "unix" and os.path.exists(location):
+                os.remove(location)
+
+
+def get_error(request_id, code: int, message: str) -> dict:
+    """
+    Make a JSON-RPC 2.0 error response.
+
+    Args:
+        request_id: The id of the request, or None if it is unknown.
+        code (int): The error code.
+        message (str): The error message.
+
+    Returns:
+        dict: The response.
+    """
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+
+def is_shutdown(line: str) -> bool:
+    """
+    Check whether a line of JSON holds a "shutdown" request, alone or in a batch.
+
+    Args:
+        line (str): The JSON of a request or of a batch.
+
+    Returns:
+        bool: Whether the method of the request, or of a request of the batch, is "shutdown".
+    """
+    try:
+        request = json.loads(line)
+    except ValueError:
+        return False
+    requests = request if isinstance(request, list) else [request]
+    return any(isinstance(request, dict) and request.get("method") == "shutdown" for request in requests)
+
+
+def write_address(path: str, address: str):
+    """
+    Write the address of the server of this process to the address file, atomically.
+
+    Args:
+        path (str): The path of the address file.
+        address (str): The address of the server.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+    temporary_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(temporary_path, "w") as file:
+        json.dump({"address": address, "pid": os.getpid(), "version": __version__}, file)
+    os.replace(temporary_path, path)
+
+
+def remove_address(path: str):
+    """
+    Remove the address file, if it was written by this process and not replaced by another server.
+
+    Args:
+        path (str): The path of the address file.
+    """
+    try:
+        with open(path, "r") as file:
+            if json.load(file).get("pid") != os.getpid():
+                return
+        os.remove(path)
+    except (OSError, ValueError):
+        pass
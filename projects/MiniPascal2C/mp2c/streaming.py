@@ -0,0 +1,260 @@
+# Parse-time translation of MiniPascal programs, see `StreamingConverter`.
+#
+# The LALR parser calls the methods of a `Translator` as it reduces the rules of the grammar, instead of building the
+# parse tree of the whole program first. A subprogram is reduced as soon as its last token is parsed: it is then built
+# into IR, optimized, emitted and formatted, and only its formatted definition is kept, so its parse tree, its IR and
+# its C tokens are released before the next subprogram is parsed. The global declarations are reduced before the
+# first subprogram, and are built then. The main block is translated when the whole program is reduced, since its
+# names may refer to any subprogram.
+#
+# The builders are called in the same order as by `build_program`, so the code and the error messages are the same as
+# with the two-pass `Converter`.
+
+import threading
+
+from lark import Lark, Transformer, Tree
+from lark.exceptions import UnexpectedInput
+
+from .builder import build_compound_statement, build_const_declarations, build_subprogram, build_var_declarations
+from .context import Context
+from .converter import Converter, get_nesting_result
+from .emitter import emit_function, emit_program
+from .fastio import lower_function, lower_main, runtime
+from .formatter import format_tokens
+from .ir import Function, Program
+from .optimizer import get_constants, optimize_body, optimize_function
+from .parsers import load_translating_parser
+from .profiling import Profile
+from .result import Result
+from .utils import code_analyze, postprocess
+
+
+class Translator(Transformer):
+    """
+    The transformer of the translating parser, whose methods are called by the parser with the children of each
+    reduction of the rule they are named after. Only the rules translated while parsing have a method; the parser
+    builds the subtrees of the others.
+
+    Attributes:
+        converter (Converter): The converter, with the optimization level, the I/O runtime and the formatter.
+        context (Context): The context of the conversion.
+        pending (list): The const_declarations and var_declarations subtrees reduced since the last subprogram, the
+            global ones first until the declarations are built.
+        declarations (list): The IR of the global declarations, or None until they are built.
+        constants (dict): The global constants, with an optimization level.
+        headers (dict): The IR of each subprogram without its declarations and body, for its prototype, by name.
+        parts (dict): The definition of each subprogram by name, formatted with the built-in formatter or as tokens
+            for the other ones, which format the whole code.
+    """
+
+    def __init__(self, converter: Converter):
+        super().__init__(False)
+        self.converter = converter
+        self.reset()
+
+    def reset(self):
+        """
+        Start a new conversion.
+        """
+        self.context = Context()
+        self.context.enter_scope()
+        self.context.declare_library_functions()
+        self.pending = []
+        self.declarations = None
+        self.constants = None
+        self.headers = {}
+        self.parts = {}
+
+    def const_declarations(self, children: list) -> Tree:
+        """
+        Keep the subtree of a const_declarations rule until the declarations it is part of are built.
+        """
+        tree = Tree("const_declarations", children)
+        self.pending.append(tree)
+        return tree
+
+    def var_declarations(self, children: list) -> Tree:
+        """
+        Keep the subtree of a var_declarations rule until the declarations it is part of are built.
+        """
+        tree = Tree("var_declarations", children)
+        self.pending.append(tree)
+        return tree
+
+    def subprogram(self, children: list):
+        """
+        Translate a subprogram as soon as it is parsed.
+
+        Returns:
+            None: Nothing is kept in the tree of the subprogram declarations.
+        """
+        self.build_declarations()
+        function = build_subprogram(Tree("subprogram", children), self.context)
+        self.pending = []
+        self.parts[function.name] = translate_function(function, self.converter, self.constants)
+        self.headers[function.name] = get_header(function)
+        return None
+
+    def programstruct(self, children: list) -> str:
+        """
+        Translate the main block and assemble the code once the whole program is parsed.
+
+        Returns:
+            str: The formatted C code, returned by the parser.
+        """
+        program_head, program_body = children
+        self.build_declarations()
+        converter = self.converter
+        main = build_compound_statement(program_body.children[3], self.context, "main")
+        if converter.optimize:
+            main = optimize_body(main, self.constants, converter.optimize)
+        if converter.fast_io:
+            main = lower_main(main)
+        names = [name for name, symbol in self.context.get_funcs().items() if not symbol.is_library]
+        self.context.exit_scope()
+        program = Program(program_head.children[0].children[0].value, [self.headers[name] for name in names],
+                          self.declarations, main, runtime if converter.fast_io else ())
+        return assemble(program, [self.parts[name] for name in names], converter)
+
+    def build_declarations(self):
+        """
+        Build the global declarations, from the first two pending subtrees, if they are not built yet.
+        """
+        if self.declarations is not None:
+            return
+        const_declarations, var_declarations = self.pending[:2]
+        self.declarations = build_const_declarations(const_declarations, self.context)
+        self.declarations.extend(build_var_declarations(var_declarations, self.context))
+        if self.converter.optimize:
+            self.constants = get_constants(self.declarations)
+
+
+def translate_function(function: Function, converter: Converter, constants: dict):
+    """
+    Optimize, lower, emit and format the definition of a subprogram, as configured in a converter.
+
+    Args:
+        function (Function): The IR of the subprogram.
+        converter (Converter): The converter, with the optimization level, the I/O runtime and the formatter.
+        constants (dict): The global constants, used with an optimization level.
+
+    Returns:
+        str or list: The formatted definition with the built-in formatter, or its tokens for the other ones, which
+            format the whole code, see `assemble`.
+    """
+    if converter.optimize:
+        function = optimize_function(function, constants, converter.optimize)
+    if converter.fast_io:
+        function = lower_function(function)
+    tokens = []
+    emit_function(function, tokens)
+    if converter.format_backend == "builtin":
+        return format_tokens(postprocess(tokens))
+    return tokens
+
+
+def get_header(function: Function) -> Function:
+    """
+    Get the IR of a subprogram without its declarations and body, which is enough for its prototype.
+
+    Args:
+        function (Function): The IR of the subprogram.
+
+    Returns:
+        Function: The header.
+    """
+    return Function(function.name, function.symbol, function.return_type, function.parameters, [], [])
+
+
+def assemble(program: Program, parts: list, converter: Converter) -> str:
+    """
+    Format a program whose subprograms were translated separately by `translate_function`: the prototypes, the
+    globals and the main function are formatted together, followed by the definitions.
+
+    Args:
+        program (Program): The IR of the program, with the headers of its subprograms.
+        parts (list): The translated definition of each subprogram, in the order of `program.functions`.
+        converter (Converter): The converter, with the formatter.
+
+    Returns:
+        str: The formatted C code, the same as the one of `Converter`.
+    """
+    if converter.format_backend != "builtin":
+        tokens = emit_program(program, definitions = False)
+        for part in parts:
+            tokens.extend(part)
+        return converter.format(tokens)
+    pieces = [format_tokens(postprocess(emit_program(program, definitions = False)))]
+    pieces.extend(parts)
+    return "\n".join(pieces)
+
+
+class StreamingConverter(Converter):
+    """
+    Converts MiniPascal programs to C while parsing them, with an LALR parser translating each subprogram as soon as
+    it is parsed, see `mp2c.streaming`.
+
+    The whole parse tree, the IR and the C tokens of the program are never held in memory at the same time: the
+    memory used is bounded by the largest subprogram, the main block and the formatted code. The code is the same as
+    the one of `Converter`. The translating parser is bound to the state of one conversion, so the conversions of a
+    converter are run one at a time.
+    """
+
+    def __init__(self, parser = "lalr", cache = True, format = "builtin", tool_pool = None, conversion_cache = None,
+                 optimize = 0, fast_io = False, profile = False, collectors = (), recover = False):
+        """
+        Initializes the StreamingConverter object, see `Converter`.
+
+        Args:
+            parser (str, optional): The parsing algorithm, which must be "lalr". Defaults to "lalr".
+
+        Raises:
+            ValueError: If the parsing algorithm is not "lalr", or an option is unknown.
+        """
+        if parser != "lalr":
+            raise ValueError("Parse-time translation needs the lalr parser, not {}".format(parser))
+        super().__init__(parser, cache, format, tool_pool, conversion_cache, optimize, fast_io, profile, collectors,
+                         recover)
+        self._translator = None
+        self._translating_parser = None
+        self._lock = threading.Lock()
+
+    @property
+    def translating_parser(self) -> Lark:
+        """
+        The parser translating the programs, built when it is first needed.
+        """
+        if self._translating_parser is None:
+            self._translator = Translator(self)
+            self._translating_parser = load_translating_parser(self._translator, self.cache)
+        return self._translating_parser
+
+    def convert_uncached(self, code, analysis = "on-demand", profile: Profile = None) -> Result:
+        """
+        Converts the given MiniPascal code to C code while parsing it, without using the conversion cache, see
+        `Converter.convert`. The "parse" phase of the profile includes the whole translation.
+        """
+        if profile is None:
+            profile = self.new_profile()
+        with self._lock:
+            parser = self.translating_parser
+            translator = self._translator
+            translator.reset()
+            try:
+                try:
+                    result_string = self.parse(code, profile, parser)
+                except Exception as e:
+                    if self.recover and isinstance(e, UnexpectedInput):
+                        return self.convert_recovering(code, analysis, profile)
+                    if isinstance(e, RecursionError):
+                        return get_nesting_result(e, profile)
+                    return Result("", False, [str(e)], analysis = analysis, profile = profile.finish())
+            finally:
+                context = translator.context
+                translator.reset()
+                profile.finish()
+        if context.on_error:
+            analyze = self.tool_pool.analyze if self.tool_pool is not None else code_analyze
+            return Result(result_string, False, context.error_messages, profile.wrap("analyze", analyze), analysis,
+                          profile.finish())
+        return Result(result_string, True, profile = profile.finish())
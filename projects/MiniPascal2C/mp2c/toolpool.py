@@ -0,0 +1,223 @@
+import asyncio
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+tools = ("format", "analyze")
+
+
+class ToolPool:
+    """
+    Runs clang-format and clang static analysis for many translation units.
+
+    Requests are queued and grouped into batches, and each batch is handled by a single invocation of the tool on all
+    its translation units, so the process start-up cost is paid once per batch instead of once per program. At most
+    `max_workers` tool processes run at the same time, and each invocation is killed after `timeout` seconds.
+
+    The pool can be used from threads through the `submit_*` methods, which return concurrent futures, from blocking
+    code through `format` and `analyze`, and from asyncio code through `aformat` and `aanalyze`.
+
+    Attributes:
+        max_workers (int): The maximum number of tool processes running at the same time.
+        batch_size (int): The maximum number of translation units per invocation.
+        batch_delay (float): The time in seconds to wait for more requests before running an incomplete batch.
+        timeout (float): The time limit in seconds of one invocation.
+        commands (dict): The command of each tool, without the file arguments.
+    """
+
+    def __init__(self, max_workers = None, batch_size = 16, batch_delay = 0.01, timeout = 60,
+                 format_command = ("clang-format", "-style=llvm"), analyze_command = ("clang", "-c", "--analyze")):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.timeout = timeout
+        self.commands = {"format": list(format_command), "analyze": list(analyze_command)}
+        self.executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix = "mp2c-tool")
+        self.lock = threading.Lock()
+        self.pending = {tool: [] for tool in tools}
+        self.timers = {tool: None for tool in tools}
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def submit(self, tool: str, code: str) -> Future:
+        """
+        Queue a translation unit for a tool.
+
+        Args:
+            tool (str): Either "format" or "analyze".
+            code (str): The C code.
+
+        Returns:
+            Future: A future resolving to the formatted code or to the analysis output.
+
+        Raises:
+            RuntimeError: If the pool is closed.
+        """
+        future = Future()
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("ToolPool is closed")
+            pending = self.pending[tool]
+            pending.append((code, future))
+            if len(pending) >= self.batch_size:
+                self._flush(tool)
+            elif self.timers[tool] is None:
+                timer = threading.Timer(self.batch_delay, self.flush, (tool,))
+                timer.daemon = True
+                self.timers[tool] = timer
+                timer.start()
+        return future
+
+    def submit_format(self, code: str) -> Future:
+        """
+        Queue C code to be formatted with clang-format, see `submit`.
+        """
+        return self.submit("format", code)
+
+    def submit_analyze(self, code: str) -> Future:
+        """
+        Queue C code to be analyzed with clang, see `submit`.
+        """
+        return self.submit("analyze", code)
+
+    def format(self, code: str) -> str:
+        """
+        Format C code with clang-format, waiting for the result.
+
+        Args:
+            code (str): The code to be formatted.
+
+        Returns:
+            str: The formatted code.
+        """
+        return self.submit_format(code).result()
+
+    def analyze(self, code: str) -> str:
+        """
+        Analyze C code with clang, waiting for the result.
+
+        Args:
+            code (str): The code to be analyzed.
+
+        Returns:
+            str: The diagnostics reported by clang for this code.
+        """
+        return self.submit_analyze(code).result()
+
+    async def aformat(self, code: str) -> str:
+        """
+        Format C code with clang-format without blocking the event loop, see `format`.
+        """
+        return await asyncio.wrap_future(self.submit_format(code))
+
+    async def aanalyze(self, code: str) -> str:
+        """
+        Analyze C code with clang without blocking the event loop, see `analyze`.
+        """
+        return await asyncio.wrap_future(self.submit_analyze(code))
+
+    def flush(self, tool: str = None):
+        """
+        Start the queued requests now, without waiting for a full batch.
+
+        Args:
+            tool (str, optional): The tool whose requests are started. Defaults to all tools.
+        """
+        with self.lock:
+            for name in (tool,) if tool else tools:
+                self._flush(name)
+
+    def close(self):
+        """
+        Start the queued requests and wait for all the running invocations to finish.
+        """
+        with self.lock:
+            self.closed = True
+            for tool in tools:
+                self._flush(tool)
+        self.executor.shutdown(wait = True)
+
+    def _flush(self, tool: str):
+        """
+        Hand the queued requests of a tool to the executor. The lock must be held.
+        """
+        timer = self.timers[tool]
+        if timer is not None:
+            timer.cancel()
+            self.timers[tool] = None
+        batch = self.pending[tool]
+        if batch:
+            self.pending[tool] = []
+            self.executor.submit(self._run_batch, tool, batch)
+
+    def _run_batch(self, tool: str, batch: list):
+        """
+        Run one tool invocation on a batch of requests and resolve their futures.
+        """
+        batch = [(code, future) for code, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        work_dir = tempfile.mkdtemp(prefix = "mp2c-")
+        try:
+            paths = []
+            for index, (code, _) in enumerate(batch):
+                path = os.path.join(work_dir, "tu{}.c".format(index))
+                with open(path, "w") as file:
+                    file.write(code)
+                paths.append(path)
+            if tool == "format":
+                outputs = self._run_format(paths, work_dir)
+            else:
+                outputs = self._run_analyze(paths, work_dir)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        finally:
+            shutil.rmtree(work_dir, ignore_errors = True)
+        for (_, future), output in zip(batch, outputs):
+            future.set_result(output)
+
+    def _run_format(self, paths: list, work_dir: str) -> list:
+        """
+        Format the files in place with one clang-format invocation and return their contents.
+        """
+        process = subprocess.run(self.commands["format"] + ["-i"] + paths, cwd = work_dir, stdout = subprocess.PIPE,
+                                 stderr = subprocess.PIPE, text = True, timeout = self.timeout)
+        if process.returncode != 0:
+            raise RuntimeError("Formatting failed:\n{}".format(process.stderr))
+        outputs = []
+        for path in paths:
+            with open(path, "r") as file:
+                outputs.append(file.read())
+        return outputs
+
+    def _run_analyze(self, paths: list, work_dir: str) -> list:
+        """
+        Analyze the files with one clang invocation and split its diagnostics by file.
+
+        Lines that do not follow a diagnostic of a known file, such as driver errors, are reported for every file.
+        """
+        process = subprocess.run(self.commands["analyze"] + paths, cwd = work_dir, stdout = subprocess.PIPE,
+                                 stderr = subprocess.PIPE, text = True, timeout = self.timeout)
+        common = []
+        outputs = {path: [] for path in paths}
+        for text in (process.stdout, process.stderr):
+            current = None
+            for line in text.splitlines(keepends = True):
+                path = line.split(":", 1)[0]
+                if path in outputs:
+                    current = outputs[path]
+                if current is None:
+                    common.append(line)
+                else:
+                    current.append(line)
+        return ["".join(common + outputs[path]) for path in paths]
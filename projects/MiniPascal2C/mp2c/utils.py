@@ -1,3 +1,6 @@
+import asyncio
+import bisect
+import os
 import re
 import subprocess
 import tempfile
@@ -6,6 +9,7 @@ from enum import Enum
 from lark.lark import Tree
 
 from .context import Context
+from .executables import get_default_cache
 
 type_map = {"integer": "int", "real": "float", "boolean": "bool", "char": "char", "string": "char*"}
 relop_map = {"=": "==", "<>": "!=", "<": "<", "<=": "<=", ">": ">", ">=": ">=", "==": "=="}
@@ -40,52 +44,30 @@ def format_code(code: str) -> str:
     return formatted_code
 
 
-def compile_code(code: str, input_ = None, compiler = "gcc") -> str:
+def compile_code(code: str, input_ = None, compiler = "gcc", optimize = 0, cache = None, timeout = None) -> str:
     """
     Compile and run the given code.
 
-    This function takes a string of code as input, writes it to a temporary file, compiles it using the specified
-    compiler (default is gcc), and runs the resulting executable. If an input is provided, it is passed to the
-    executable during its execution. The function returns the stdout of the executable if it runs successfully, or an
-    error message if the compilation or execution fails.
+    The code is compiled with the specified compiler (default is gcc) through an executable cache, so the same code is
+    compiled once and its executable reused for every input, and the resulting executable is run. If an input is
+    provided, it is passed to the executable during its execution. The function returns the stdout of the executable
+    if it runs successfully, or an error message if the compilation or execution fails.
 
     Args:
         code (str): The code to be compiled and run.
         input_ (str, optional): The input to be passed to the executable. Defaults to None.
         compiler (str, optional): The compiler to be used. Defaults to "gcc".
+        optimize (int or str, optional): The optimization level of the compiler, such as 0, 2 or "s". Defaults to 0.
+        cache (ExecutableCache, optional): The executable cache. Defaults to None, which uses the cache shared by the
+            process, in a temporary directory removed at exit.
+        timeout (float, optional): The maximum run time in seconds. Defaults to None, for no limit.
 
     Returns:
         str: The stdout of the executable if it runs successfully, or an error message if the compilation or execution fails.
     """
-    with tempfile.NamedTemporaryFile(suffix = ".c", delete = False) as source_file:
-        source_file.write(code.encode())
-        source_file.flush()
-        source_file_path = source_file.name
-    executable_path = source_file_path[:-2]
-    compile_command = [compiler, source_file_path, "-o", executable_path, "-lm"]
-    compile_process = subprocess.run(
-        compile_command,
-        stdout = subprocess.PIPE,
-        stderr = subprocess.PIPE,
-        text = True,
-    )
-    if compile_process.returncode != 0:
-        return f"Compilation failed:\n{compile_process.stderr}"
-    run_command = [executable_path]
-    run_process = subprocess.Popen(
-        run_command,
-        stdin = subprocess.PIPE,
-        stdout = subprocess.PIPE,
-        stderr = subprocess.PIPE,
-        text = True,
-    )
-    if input_:
-        stdout, stderr = run_process.communicate(input_)
-    else:
-        stdout, stderr = run_process.communicate()
-    if run_process.returncode != 0:
-        return f"Runtime error:\n{stderr}"
-    return stdout
+    if cache is None:
+        cache = get_default_cache()
+    return cache.run(code, input_, compiler, optimize, timeout = timeout)
 
 
 class Status(Enum):
@@ -123,7 +105,7 @@ def convert_to_lower_except_literals(code):
     Returns:
     - str: The converted code.
     """
-    converted_code = ''
+    converted_code = []
     in_char_literal = False
     in_string_literal = False
 
@@ -134,11 +116,165 @@ def convert_to_lower_except_literals(code):
             in_string_literal = not in_string_literal
 
         if not in_char_literal and not in_string_literal:
-            converted_code += char.lower()
+            converted_code.append(char.lower())
         else:
-            converted_code += char
+            converted_code.append(char)
+
+    return "".join(converted_code)
 
-    return converted_code
+
+class SourceMap:
+    """
+    Maps positions in preprocessed code back to the original source code.
+
+    The preprocessed code is a sequence of pieces, each copied from one offset of the source (possibly lowercased),
+    with the comments between them removed. The map keeps the offsets where each piece starts in both texts.
+
+    Attributes:
+        source (str): The original source code.
+        code (str): The preprocessed code.
+        code_offsets (list): The offset of each piece in the preprocessed code.
+        source_offsets (list): The offset of each piece in the source code.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.code = ""
+        self.code_offsets = []
+        self.source_offsets = []
+        self._line_starts = {}
+
+    def add(self, code_offset: int, source_offset: int):
+        """
+        Record that the piece starting at `code_offset` in the preprocessed code was copied from `source_offset`.
+        """
+        self.code_offsets.append(code_offset)
+        self.source_offsets.append(source_offset)
+
+    def to_source_offset(self, offset: int) -> int:
+        """
+        Map an offset in the preprocessed code to the original source.
+
+        Args:
+            offset (int): The 0-based offset in the preprocessed code.
+
+        Returns:
+            int: The 0-based offset in the source code.
+        """
+        index = bisect.bisect_right(self.code_offsets, offset) - 1
+        if index < 0:
+            return offset
+        return self.source_offsets[index] + offset - self.code_offsets[index]
+
+    def to_source(self, line: int, column: int) -> tuple[int, int]:
+        """
+        Map a position in the preprocessed code, as reported by the parser, to the original source.
+
+        Args:
+            line (int): The 1-based line in the preprocessed code.
+            column (int): The 1-based column in the preprocessed code.
+
+        Returns:
+            tuple[int, int]: The 1-based line and column in the source code.
+        """
+        code_starts = self._get_line_starts("code")
+        offset = code_starts[min(line, len(code_starts)) - 1] + column - 1
+        return self._to_position(self.to_source_offset(offset))
+
+    def _get_line_starts(self, name: str) -> list:
+        """
+        Get the offsets where the lines of the source ("source") or of the preprocessed code ("code") start.
+        """
+        if name not in self._line_starts:
+            text = getattr(self, name)
+            starts = [0]
+            index = text.find("\n")
+            while index != -1:
+                starts.append(index + 1)
+                index = text.find("\n", index + 1)
+            self._line_starts[name] = starts
+        return self._line_starts[name]
+
+    def _to_position(self, offset: int) -> tuple[int, int]:
+        """
+        Convert an offset in the source code to a 1-based line and column.
+        """
+        starts = self._get_line_starts("source")
+        line = bisect.bisect_right(starts, offset)
+        return line, offset - starts[line - 1] + 1
+
+
+def _find_literal_end(code: str, start: int) -> int:
+    """
+    Find the end of the string or character literal starting at `start`, skipping quotes preceded by a backslash.
+    An unterminated literal ends with the code.
+    """
+    quote = code[start]
+    index = code.find(quote, start + 1)
+    while index != -1 and code[index - 1] == "\\":
+        index = code.find(quote, index + 1)
+    return len(code) if index == -1 else index + 1
+
+
+_special_pattern = re.compile(r"[{'\"]")
+
+
+def preprocess_with_map(code: str) -> tuple[str, SourceMap]:
+    """
+    Preprocess the given code and map the positions of the result back to the code.
+
+    The code is scanned once, in linear time: `{...}` comments are removed and everything is converted to lowercase,
+    except for string and character literals, which are copied as they are. Braces inside literals are not comments.
+    An unterminated comment is kept as code.
+
+    Args:
+        code (str): The code to be preprocessed.
+
+    Returns:
+        tuple[str, SourceMap]: The preprocessed code and its source map.
+    """
+    source_map = SourceMap(code)
+    pieces = []
+    length = 0
+    index = 0
+    end = len(code)
+
+    def emit(piece, offset):
+        nonlocal length
+        source_map.add(length, offset)
+        pieces.append(piece)
+        length += len(piece)
+
+    while index < end:
+        match = _special_pattern.search(code, index)
+        special = match.start() if match else end
+        if special > index:
+            text = code[index:special]
+            lowered = text.lower()
+            if len(lowered) == len(text):
+                emit(lowered, index)
+            else:
+                # a few characters change length when lowercased, keep the mapping exact for each of them
+                for offset in range(index, special):
+                    emit(code[offset].lower(), offset)
+        if match is None:
+            break
+        char = code[special]
+        if char == "{":
+            close = code.find("}", special + 1)
+            if close == -1:
+                emit("{", special)
+                index = special + 1
+            else:
+                index = close + 1
+        elif special > 0 and code[special - 1] == "\\":
+            emit(char, special)
+            index = special + 1
+        else:
+            index = _find_literal_end(code, special)
+            emit(code[special:index], special)
+    source_map.code = "".join(pieces)
+    return source_map.code, source_map
 
 
 def preprocess(code: str) -> str:
@@ -153,9 +289,7 @@ def preprocess(code: str) -> str:
     Returns:
         str: The preprocessed code.
     """
-    code_without_comments = re.sub(r"\{.*?}", "", code, flags = re.DOTALL)
-    code_without_comments = convert_to_lower_except_literals(code_without_comments)
-    return code_without_comments
+    return preprocess_with_map(code)[0]
 
 
 def postprocess(tokens: list) -> list:
@@ -265,3 +399,49 @@ def code_analyze(code: str) -> str:
         print(f"Failed to delete temporary file: {e}")
 
     return stdout or stderr
+
+
+async def aformat_code(code: str) -> str:
+    """
+    Format the given code using clang-format in an asyncio subprocess, without blocking the event loop, see
+    `format_code`.
+
+    Args:
+        code (str): The code to be formatted.
+
+    Returns:
+        str: The formatted code.
+    """
+    process = await asyncio.create_subprocess_exec(
+        "clang-format", "-style=llvm",
+        stdin = asyncio.subprocess.PIPE,
+        stdout = asyncio.subprocess.PIPE,
+        stderr = asyncio.subprocess.PIPE,
+    )
+    formatted_code, _ = await process.communicate(code.encode())
+    return formatted_code.decode()
+
+
+async def acode_analyze(code: str) -> str:
+    """
+    Analyze the given code using clang in an asyncio subprocess, without blocking the event loop, see `code_analyze`.
+
+    Args:
+        code (str): The code to be analyzed.
+
+    Returns:
+        str: The stdout or stderr of the clang process.
+    """
+    with tempfile.NamedTemporaryFile(mode = 'w', suffix = '.c', delete = False) as tmp_file:
+        tmp_file.write(code)
+        tmp_file_name = tmp_file.name
+    try:
+        process = await asyncio.create_subprocess_exec(
+            "clang", "-c", "--analyze", tmp_file_name,
+            stdout = asyncio.subprocess.PIPE,
+            stderr = asyncio.subprocess.PIPE,
+        )
+        stdout, stderr = await process.communicate()
+    finally:
+        os.remove(tmp_file_name)
+    return stdout.decode() or stderr.decode()
@@ -4,6 +4,48 @@ from .context import FunctionSymbol
 from .utils import *
 
 
+def flatten_left_recursion(node: Tree) -> list:
+    """
+    Get the children of a left-recursive node, such as a statement_list, as one flat list in source order.
+
+    A left-recursive rule nests one node per list item, with the nested node of the same rule as the first child.
+    The spine is walked in a loop, so lists of any length are visited without deep recursion.
+
+    Args:
+        node (Tree): The outermost node of the list.
+
+    Returns:
+        list: The children of the innermost node, followed by the other children of each enclosing node.
+    """
+    spine = [node]
+    while node.children and isinstance(node.children[0], Tree) and node.children[0].data == node.data:
+        node = node.children[0]
+        spine.append(node)
+    children = list(node.children)
+    for enclosing in reversed(spine[:-1]):
+        children.extend(enclosing.children[1:])
+    return children
+
+
+def get_single_factor(node: Tree):
+    """
+    Get the factor of an expression made of a single factor, such as the expression in "(-x)".
+
+    Args:
+        node (Tree): The expression node in the parse tree.
+
+    Returns:
+        Tree: The factor node, or None if the expression has an operator.
+    """
+    for data in ("simple_expression", "term", "factor"):
+        if len(node.children) != 1:
+            return None
+        node = node.children[0]
+        if not isinstance(node, Tree) or node.data != data:
+            return None
+    return node
+
+
 def visit_empty(node: Tree, context: Context):
     """
     This function is used to visit an empty node in the parse tree.
@@ -75,16 +117,16 @@ def visit_period(node: Tree, context: Context):
     """
     periods = []
     current_period = []
-    for child in node.children:
+    for child in flatten_left_recursion(node):
         if isinstance(child, Token):
             current_period.append(int(child.value))
-        elif child.data == "period":
-            current_period = visit_period(child, context)
-            periods.extend(current_period)
-            current_period = []
+            if len(current_period) == 2:
+                periods.append(current_period)
+                current_period = []
         else:
             raise Exception("Unknown period child data: {}".format(child.data))
-    periods.append(current_period)
+    if current_period:
+        periods.append(current_period)
     return periods
 
 
@@ -156,12 +198,10 @@ def visit_idlist(node: Tree, context: Context):
         list: A list of ids.
     """
     ids = []
-    for child in node.children:
+    for child in flatten_left_recursion(node):
         if child.data == "id":
             # 从idlist得到的id不需要考虑func_name修正
             ids.append(visit_id(child, context, ""))
-        elif child.data == "idlist":
-            ids.extend(visit_idlist(child, context))
         else:
             raise Exception("Unknown idlist child data: {}".format(child.data))
     return ids
@@ -361,13 +401,13 @@ def visit_id_varpart(node: Tree, context: Context, func_name: str, id_token):
             count = 0
             for expression_token in expression_list:
                 if expression_token == ",":
-                    offset = array_symbol.dimensions[count][1]
+                    offset = array_symbol.dimensions[count].start
                     tokens.extend(['-', str(offset)])
                     count += 1
                     tokens.extend(["]", "["])
                 else:
                     tokens.append(expression_token)
-            offset = array_symbol.dimensions[count][1]
+            offset = array_symbol.dimensions[count].start
             tokens.extend(['-', str(offset)])
             count += 1
             tokens.append("]")
@@ -548,17 +588,27 @@ def visit_factor(node: Tree, context: Context, func_name: str):
     Returns:
         tuple: A tuple containing a list of tokens representing the factor and the factor type.
     """
+    # the signs, the "not" operators and the parentheses around a single factor are unwrapped in a loop
     tokens = []
-    factor_type = None
-    for child in node.children:
+    closing = 0
+    while True:
+        child = node.children[0]
         if isinstance(child, Token):
-            token_type = child.type
-            token_value = child.value
-            if token_type == "NOT":
+            if child.type == "NOT":
                 tokens.append("!")
-            elif token_type == "UMINUS":
-                tokens.append(uminus_map[token_value])
-        elif child.data == "num":
+            elif child.type == "UMINUS":
+                tokens.append(uminus_map[child.value])
+            node = node.children[1]
+            continue
+        inner = get_single_factor(child) if child.data == "expression" else None
+        if inner is None:
+            break
+        tokens.append("(")
+        closing += 1
+        node = inner
+    factor_type = None
+    for child in node.children:
+        if child.data == "num":
             num_token, factor_type = visit_num(child, context)
             tokens.extend(num_token)
         elif child.data == "expression":
@@ -578,6 +628,7 @@ def visit_factor(node: Tree, context: Context, func_name: str):
             tokens.extend(function_call_token)
         else:
             raise Exception("Unknown factor child data: {}".format(child.data))
+    tokens.extend([")"] * closing)
     return tokens, factor_type
 
 
@@ -596,7 +647,7 @@ def visit_term(node: Tree, context: Context, func_name: str):
     term_type = None
     tokens = []
     operator = None
-    for child in node.children:
+    for child in flatten_left_recursion(node):
         if isinstance(child, Token):
             tokens.append(mulop_map[child.value])
             operator = child.value
@@ -606,9 +657,6 @@ def visit_term(node: Tree, context: Context, func_name: str):
             factor_token, factor_type = visit_factor(child, context, func_name)
             tokens.extend(factor_token)
             term_type = factor_type
-        elif child.data == "term":
-            term_token, term_type = visit_term(child, context, func_name)
-            tokens.extend(term_token)
         else:
             raise Exception("Unknown term child data: {}".format(child.data))
         if operator == "/":
@@ -630,16 +678,13 @@ def visit_simple_expression(node: Tree, context: Context, func_name: str):
     """
     tokens = []
     simple_expression_type = None
-    for child in node.children:
+    for child in flatten_left_recursion(node):
         if isinstance(child, Token):
             tokens.append(addop_map[child.value])
         elif child.data == "term":
             term_token, term_type = visit_term(child, context, func_name)
             tokens.extend(term_token)
             simple_expression_type = term_type
-        elif child.data == "simple_expression":
-            simple_expression_token, simple_expression_type = visit_simple_expression(child, context, func_name)
-            tokens.extend(simple_expression_token)
         else:
             raise Exception(
                 "Unknown simple_expression child data: {}".format(child.data)
@@ -754,6 +799,9 @@ def visit_if_else_statement(node: Tree, context: Context, func_name: str):
     """
     Visit an if-else statement node in the parse tree.
 
+    An "else if" chain nests one if-else statement per branch in the parse tree. The chain is followed in a loop, so
+    chains of any length are visited without deep recursion.
+
     Args:
         node (Tree): The node in the parse tree.
         context (Context): The context in which the node exists.
@@ -763,28 +811,60 @@ def visit_if_else_statement(node: Tree, context: Context, func_name: str):
         list: A list of tokens representing the if-else statement.
     """
     tokens = []
-    for child in node.children:
-        if child.data == "expression":
-            tokens.append("if")
-            tokens.append("(")
-            expression_tokens, expression_type = visit_expression(child, context, func_name)
-            tokens.extend(expression_tokens)
-            tokens.append(")")
-        elif child.data == "statement":
-            tokens.append("{")
-            statement_tokens = visit_statement(child, context, func_name)
-            tokens.extend(statement_tokens)
-            tokens.append("}")
-        elif child.data == "else_part":
-            else_part_tokens = visit_else_part(child, context, func_name)
-            tokens.extend(else_part_tokens)
-        else:
-            raise Exception(
-                "Unknown if_else_statement child data: {}".format(child.data)
-            )
+    depth = 0
+    while node is not None:
+        nested = None
+        for child in node.children:
+            if child.data == "expression":
+                tokens.append("if")
+                tokens.append("(")
+                expression_tokens, expression_type = visit_expression(child, context, func_name)
+                tokens.extend(expression_tokens)
+                tokens.append(")")
+            elif child.data == "statement":
+                tokens.append("{")
+                statement_tokens = visit_statement(child, context, func_name)
+                tokens.extend(statement_tokens)
+                tokens.append("}")
+            elif child.data == "else_part":
+                nested = get_else_if(child)
+                if nested is None:
+                    else_part_tokens = visit_else_part(child, context, func_name)
+                    tokens.extend(else_part_tokens)
+                else:
+                    tokens.append("else")
+                    tokens.append("{")
+            else:
+                raise Exception(
+                    "Unknown if_else_statement child data: {}".format(child.data)
+                )
+        if nested is not None:
+            depth += 1
+        node = nested
+    # each nested if-else statement is closed as by visit_else_part and visit_statement
+    for _ in range(depth):
+        tokens.append(";")
+        tokens.append("}")
     return tokens
 
 
+def get_else_if(node: Tree):
+    """
+    Get the if-else statement that is the whole else part of an if-else statement, if any.
+
+    Args:
+        node (Tree): The else part node in the parse tree.
+
+    Returns:
+        Tree: The nested if-else statement node, or None.
+    """
+    statement = node.children[0]
+    if statement.data == "statement" and len(statement.children) == 1:
+        if statement.children[0].data == "if_else_statement":
+            return statement.children[0]
+    return None
+
+
 def visit_else_part(node: Tree, context: Context, func_name: str):
     """
     Visit an else part node in the parse tree.
@@ -992,13 +1072,10 @@ def visit_statement_list(node: Tree, context: Context, func_name: str):
         list: A list of tokens representing the statement list.
     """
     tokens = []
-    for child in node.children:
+    for child in flatten_left_recursion(node):
         if child.data == "statement":
             statement_tokens = visit_statement(child, context, func_name)
             tokens.extend(statement_tokens)
-        elif child.data == "statement_list":
-            statement_list_tokens = visit_statement_list(child, context, func_name)
-            tokens.extend(statement_list_tokens)
         else:
             raise Exception("Unknown statement_list child data: {}".format(child.data))
     return tokens
@@ -1063,15 +1140,15 @@ def visit_for_statement(node: Tree, context: Context, func_name: str):
         else:
             raise Exception("Unknown for_statement child data: {}".format(child.data))
     tokens.extend(["for", "("])
-    tokens.extend(id_token)
+    tokens.append(id_token)
     tokens.append("=")
     tokens.extend(from_tokens)
     tokens.append(";")
-    tokens.extend(id_token)
-    tokens.append("<=")
+    tokens.append(id_token)
+    tokens.append(">=" if down_to else "<=")
     tokens.extend(to_tokens)
     tokens.append(";")
-    tokens.extend(id_token)
+    tokens.append(id_token)
     if down_to:
         tokens.append("--")
     else:
@@ -1209,7 +1286,7 @@ def visit_const_declaration(node: Tree, context: Context):
     """
     tokens = []
     const_id = ""
-    for child in node.children:
+    for child in flatten_left_recursion(node):
         if child.data == "id":
             tokens.append("const")
             const_id = visit_id(child, context, "")
@@ -1221,8 +1298,6 @@ def visit_const_declaration(node: Tree, context: Context):
             tokens.extend(res[0])
             tokens.append(";")
             context.register_value(const_id, res[1], False, res[0])
-        elif child.data == "const_declaration":
-            tokens.extend(visit_const_declaration(child, context))
         else:
             raise Exception("Unknown const_declaration child data: {}".format(child.data))
     return tokens
@@ -1264,13 +1339,11 @@ def visit_var_declaration(node: Tree, context: Context):
     tokens = []
     id_lists = []
     id_types = []
-    for child in node.children:
+    for child in flatten_left_recursion(node):
         if child.data == "idlist":
             id_lists.append(visit_idlist(child, context))
         elif child.data == "type":
             id_types.append(visit_type(child, context))
-        elif child.data == "var_declaration":
-            tokens.extend(visit_var_declaration(child, context))
         else:
             raise Exception("Unknown var_declaration child data: {}".format(child.data))
     for id_list, id_type in zip(id_lists, id_types):
@@ -1494,13 +1567,11 @@ def visit_subprogram_declarations(node: Tree, context: Context):
         list: A list of tokens representing the subprogram declarations.
     """
     tokens = []
-    for child in node.children:
+    for child in flatten_left_recursion(node):
         if child.data == "subprogram":
             tokens.extend(visit_subprogram(child, context))
         elif child.data == "empty":
-            return tokens
-        elif child.data == "subprogram_declarations":
-            tokens.extend(visit_subprogram_declarations(child, context))
+            continue
         else:
             raise Exception(
                 "Unknown subprogram_declarations child data: {}".format(child.data)
@@ -1,8 +1,13 @@
+import re
+
 from setuptools import setup, find_packages
 
+with open('mp2c/version.py') as version_file:
+  version = re.search(r'__version__ = "(.*)"', version_file.read()).group(1)
+
 setup(
   name='mp2c',
-  version='0.9.0',  # You should change this to your actual version
+  version=version,
   description='A Python package that convert MiniPascal code to C code',
   packages=find_packages(),  # Automatically finds sub-packages
   include_package_data=True,  # Includes data files in sub-packages
@@ -0,0 +1,12 @@
+import pytest
+
+
+@pytest.fixture(autouse = True)
+def cache_dir(tmp_path, monkeypatch):
+    """
+    Keep the caches of mp2c (parsers, conversions and executables) of every test in a temporary directory instead of
+    the user cache.
+    """
+    directory = tmp_path / "mp2c-cache"
+    monkeypatch.setenv("MP2C_CACHE_DIR", str(directory))
+    return directory
@@ -0,0 +1,89 @@
+# The programs shared by the test modules
+
+program = r"""
+program echo;
+var a: array[1..4] of integer; i, n, total: integer; x, sum: real; c: char;
+function readsum(count: integer): real;
+var k: integer; y, s: real;
+begin
+    s := 0.0;
+    for k := 1 to count do
+    begin
+        read(y);
+        s := s + y
+    end;
+    readsum := s
+end;
+begin
+    read(n);
+    total := 0;
+    for i := 1 to n do
+    begin
+        read(a[i]);
+        total := total + a[i]
+    end;
+    sum := readsum(2);
+    read(c, c);
+    if total > 0 then writeln("total", total, c) else writeln(0);
+    if n = 0 then writeln(1) else write(n);
+    i := n;
+    while i > 0 do
+    begin
+        write(a[i], c);
+        i := i - 1
+    end;
+    writeln;
+    writeln(sum, -2147483647 - 1)
+end.
+"""
+
+data = " 4\n12 -7\n+30 2000\n1.5e1 -.25 xz\n"
+
+errors_code = r"""
+program errors;
+const limit = 3;
+var a: integer; r: real;
+function half(x: integer): integer;
+var k: integer;
+begin
+    k := y;
+    half := x div 2
+end;
+procedure show(var x: integer);
+begin
+    writeln(x, z)
+end;
+begin
+    a := half(limit);
+    show(a);
+    a := w
+end.
+"""
+
+
+def generate_program(subprograms):
+    lines = ["program many;", "var total: integer;"]
+    for index in range(subprograms):
+        lines.append("procedure p{}(var a: integer; b: integer);".format(index))
+        lines.append("var k: integer;")
+        lines.append("begin")
+        lines.extend("  for k := 1 to b do a := a + k * {};".format(statement) for statement in range(20))
+        lines.append("  a := a - b")
+        lines.append("end;")
+    lines.append("begin")
+    lines.append("  total := 0;")
+    lines.extend("  p{}(total, 2);".format(index) for index in range(subprograms))
+    lines.append("  writeln(total)")
+    lines.append("end.")
+    return "\n".join(lines)
+
+
+broken_code = """program broken;
+var a: integr; b: integer;
+begin
+    a := 1
+    b := ;
+    if a > 1 b := 2;
+    c := 3
+end.
+"""
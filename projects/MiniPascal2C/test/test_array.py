@@ -1,4 +1,6 @@
-from mp2c import Converter, compile_code
+import tracemalloc
+
+from mp2c import ArraySymbol, Converter, compile_code
 
 
 class TestArray:
@@ -60,3 +62,22 @@ class TestArray:
                 "8162432404856647280" +
                 "9182736455463728190" +
                 "102030405060708090100")
+
+    def test_array_symbol_shape(self):
+        symbol = ArraySymbol("grid", "int", [[0, 3], [1, 5], [-2, 2]])
+        assert [(dimension.start, dimension.length, dimension.stride) for dimension in symbol.dimensions] == [
+            (0, 4, 25), (1, 5, 5), (-2, 5, 1)]
+        assert symbol.size == 100
+        assert not hasattr(symbol, "__dict__")
+
+    def test_large_array(self):
+        code = "program t; var arr: array[1..100000000] of integer; begin arr[100000000] := 1 end."
+        converter = Converter("lalr")
+        converter.convert(code)
+        tracemalloc.start()
+        result = converter.convert(code)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert result.success
+        assert "int arr[100000000];" in result.code
+        assert peak < 10 ** 7
@@ -0,0 +1,86 @@
+import asyncio
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from mp2c import ConversionCache, Converter, StreamingConverter, ToolPool
+from test.programs import errors_code, generate_program, program
+
+recursive_code = """program deep;
+var n: integer;
+function depth(k: integer): integer;
+begin
+    if k = 0 then depth := 0 else depth := depth(k - 1) + 1
+end;
+begin
+    read(n);
+    writeln(depth(n))
+end.
+"""
+
+# A stand-in for clang --analyze: prints the number of lines of each file
+analyze_script = """
+import sys
+for path in sys.argv[1:]:
+    with open(path) as file:
+        print("{}: {} lines".format(path, len(file.read().splitlines())))
+"""
+
+
+class TestAsync:
+    def test_threads(self):
+        sources = [generate_program(count) for count in range(1, 17)] + [errors_code, program, "program broken; begin"]
+        for parser, sources in (("lalr", sources), ("earley", sources[:4] + sources[-3:])):
+            expected = [Converter(parser).convert(source) for source in sources]
+            converter = Converter(parser)
+            with ThreadPoolExecutor(8) as executor:
+                results = list(executor.map(lambda source: converter.convert(source, "never"), sources))
+            assert [result.code for result in results] == [result.code for result in expected]
+            assert [result.error_messages for result in results] == [result.error_messages for result in expected]
+        # the programs run in worker processes, which leave the recursion limit of this process unchanged
+        limit = sys.getrecursionlimit()
+        with ThreadPoolExecutor(4) as executor:
+            outputs = list(executor.map(lambda depth: converter.run(recursive_code, str(depth)),
+                                        [5000, 20000, 5000, 20000]))
+        assert outputs == ["5000\n", "20000\n", "5000\n", "20000\n"] and sys.getrecursionlimit() == limit
+
+    def test_aconvert(self):
+        sources = [generate_program(count) for count in range(1, 9)] + [errors_code, "program broken; begin"]
+
+        async def convert_all(converter, analysis = "on-demand"):
+            return await asyncio.gather(*(converter.aconvert(source, analysis) for source in sources))
+
+        for converter in (Converter("lalr", optimize = 1), StreamingConverter(fast_io = True)):
+            results = asyncio.run(convert_all(converter))
+            assert [result.code for result in results] == [converter.convert(source).code for source in sources]
+        assert not results[-2].success and results[-1].error_messages[0].startswith("Unexpected")
+        with pytest.raises(ValueError):
+            asyncio.run(Converter("lalr").aconvert(program, "later"))
+
+    @pytest.mark.skipif(shutil.which("clang-format") is None, reason = "clang-format is not installed")
+    def test_aconvert_tools(self):
+        sources = [program, errors_code]
+        converter = Converter("lalr", format = "clang")
+        expected = [converter.convert(source).code for source in sources]
+
+        async def convert_all():
+            return await asyncio.gather(*(converter.aconvert(source, "never") for source in sources))
+
+        results = asyncio.run(convert_all())
+        assert [result.code for result in results] == expected
+        # the analysis of the "eager" policy runs through the tool pool, and is stored in the conversion cache
+        command = [sys.executable, "-c", analyze_script]
+        with ToolPool(analyze_command = command) as pool:
+            converter = Converter("lalr", format = "clang", tool_pool = pool, conversion_cache = ConversionCache())
+
+            async def convert_twice():
+                first = await converter.aconvert(errors_code, "eager")
+                return first, await converter.aconvert(errors_code, "eager")
+
+            first, second = asyncio.run(convert_twice())
+        assert first.code == expected[1]
+        assert first.error_info.endswith("{} lines\n".format(len(expected[1].splitlines())))
+        assert second.error_info == first.error_info and second.error_messages == first.error_messages
+        assert converter.conversion_cache.stats["hits"] == 1
@@ -0,0 +1,82 @@
+import json
+import os
+
+from mp2c import batch, compile_code
+from mp2c.batch import collect_sources, convert_batch, get_output_paths, write_summary
+
+good_code = r"""
+program Good;
+var
+  a: integer;
+begin
+  a := 6;
+  writeln(a * 7);
+end.
+"""
+
+bad_code = r"""
+program Bad;
+begin
+  a := ;
+end.
+"""
+
+
+def make_sources(root):
+    (root / "sub").mkdir(parents = True)
+    (root / "good.pas").write_text(good_code)
+    (root / "sub" / "good.pas").write_text(good_code)
+    (root / "sub" / "bad.pas").write_text(bad_code)
+    (root / "notes.txt").write_text("not a program")
+
+
+class TestBatch:
+    def test_collect_sources(self, tmp_path):
+        make_sources(tmp_path)
+        expected = sorted([str(tmp_path / "good.pas"), str(tmp_path / "sub" / "good.pas"),
+                           str(tmp_path / "sub" / "bad.pas")])
+        assert collect_sources([str(tmp_path)]) == expected
+        assert collect_sources([str(tmp_path / "**" / "*.pas")]) == expected
+        assert collect_sources([str(tmp_path / "good.pas"), str(tmp_path / "*.pas")]) == [str(tmp_path / "good.pas")]
+
+    def test_output_paths(self, tmp_path):
+        sources = [str(tmp_path / "good.pas"), str(tmp_path / "sub" / "good.pas")]
+        assert get_output_paths(sources) == [str(tmp_path / "good.c"), str(tmp_path / "sub" / "good.c")]
+        output_dir = str(tmp_path / "out")
+        assert get_output_paths(sources, output_dir) == [os.path.join(output_dir, "good.c"),
+                                                         os.path.join(output_dir, "sub", "good.c")]
+
+    def test_convert_batch(self, tmp_path):
+        make_sources(tmp_path / "src")
+        output_dir = tmp_path / "out"
+        sources = collect_sources([str(tmp_path / "src")])
+        summary = convert_batch(sources, str(output_dir), jobs = 2)
+        assert summary["total"] == 3
+        assert summary["succeeded"] == 2
+        assert summary["failed"] == 1
+        assert summary["lines"] > 0
+        assert summary["files_per_second"] > 0
+        records = {os.path.relpath(record["input"], tmp_path / "src"): record for record in summary["files"]}
+        assert records[os.path.join("sub", "bad.pas")]["status"] == "error"
+        assert records[os.path.join("sub", "bad.pas")]["error_messages"]
+        assert records[os.path.join("sub", "bad.pas")]["output"] is None
+        assert records["good.pas"]["status"] == "success"
+        with open(output_dir / "sub" / "good.c") as file:
+            assert compile_code(file.read()) == "42\n"
+        summary_path = tmp_path / "summary.json"
+        write_summary(summary, str(summary_path))
+        with open(summary_path) as file:
+            assert json.load(file)["failed"] == 1
+
+    def test_convert_batch_serial(self, tmp_path):
+        make_sources(tmp_path / "src")
+        sources = collect_sources([str(tmp_path / "src")])
+        convert_batch(sources, str(tmp_path / "out"), jobs = 1)
+        assert batch._converter is None
+        with open(tmp_path / "out" / "good.c") as file:
+            assert "int a;" in file.read()
+        # a later serial batch with other options must not reuse the converter of the first one
+        summary = convert_batch(sources, str(tmp_path / "out"), jobs = 1, format = "none")
+        assert summary["succeeded"] == 2
+        with open(tmp_path / "out" / "good.c") as file:
+            assert "int a;" not in file.read()
@@ -0,0 +1,90 @@
+import os
+import sys
+
+from mp2c import ConversionCache, Converter, ToolPool, compile_code
+from mp2c.batch import convert_batch
+from mp2c.cache import normalize_source
+
+code = "program t; var a: integer; begin a := 6 * 7; writeln(a) end."
+bad_code = "program t; begin b := 1 end."
+
+
+class TestConversionCache:
+    def test_memory_hits(self):
+        cache = ConversionCache()
+        converter = Converter("lalr", conversion_cache = cache)
+        first = converter.convert(code)
+        second = converter.convert(code + "  \r\n")
+        assert cache.stats["misses"] == 1
+        assert cache.stats["memory_hits"] == 1
+        assert second.code == first.code
+        assert compile_code(second.code) == "42\n"
+        Converter("lalr", format = "none", conversion_cache = cache).convert(code)
+        assert cache.stats["misses"] == 2
+        assert cache.hit_rate() == 1 / 3
+
+    def test_errors_and_analysis(self, tmp_path):
+        log = tmp_path / "log"
+        script = "import sys\nopen(sys.argv[1], 'a').write('call\\n')\nprint('analysis')"
+        cache = ConversionCache()
+        with ToolPool(analyze_command = [sys.executable, "-c", script, str(log)]) as pool:
+            converter = Converter("lalr", tool_pool = pool, conversion_cache = cache)
+            result = converter.convert(bad_code)
+            assert result.error_messages == ["Variable not declared: b", "Type mismatch in assignment: b, != 1, int"]
+            assert not log.exists()
+            result = converter.convert(bad_code, analysis = "eager")
+            assert result.error_info == "analysis\n"
+            result = converter.convert(bad_code, analysis = "eager")
+            assert result.error_info == "analysis\n"
+            assert not result.success
+            assert log.read_text() == "call\n"
+            assert converter.convert(bad_code, analysis = "never").error_info == ""
+
+    def test_lru(self):
+        cache = ConversionCache(max_entries = 2)
+        for key in "abc":
+            cache.put(key, {"code": key, "success": True, "error_messages": [], "error_info": None})
+        assert cache.get("a") is None
+        assert cache.get("c")["code"] == "c"
+        assert cache.stats["evictions"] == 1
+        cache = ConversionCache(max_bytes = 10)
+        cache.put("a", {"code": "x" * 8, "success": True, "error_messages": [], "error_info": None})
+        cache.put("b", {"code": "x" * 8, "success": True, "error_messages": [], "error_info": None})
+        assert cache.get("a") is None
+        assert cache.size == 8
+
+    def test_disk(self, tmp_path):
+        directory = str(tmp_path / "conversions")
+        first = Converter("lalr", conversion_cache = ConversionCache(directory)).convert(code)
+        cache = ConversionCache(directory)
+        second = Converter("lalr", conversion_cache = cache).convert(code)
+        assert cache.stats["disk_hits"] == 1
+        assert second.code == first.code
+        key = cache.get_key(code, parser = "lalr", format = "builtin")
+        with open(os.path.join(directory, key[:2], key + ".json"), "w") as file:
+            file.write("{corrupted")
+        cache = ConversionCache(directory)
+        assert Converter("lalr", conversion_cache = cache).convert(code).code == first.code
+        assert cache.stats["misses"] == 1
+        cache.clear()
+        assert ConversionCache(directory).get(key) is None
+
+    def test_on_disk(self, cache_dir):
+        cache = ConversionCache.on_disk()
+        assert cache.directory == str(cache_dir / "conversions")
+        Converter("lalr", conversion_cache = cache).convert(code)
+        assert ConversionCache.on_disk().get(cache.get_key(code, parser = "lalr", format = "builtin")) is not None
+
+    def test_batch(self, tmp_path):
+        for i in range(3):
+            (tmp_path / "p{}.pas".format(i)).write_text(code)
+        sources = sorted(str(path) for path in tmp_path.glob("*.pas"))
+        directory = str(tmp_path / "conversions")
+        summary = convert_batch(sources, str(tmp_path / "out"), jobs = 1, conversion_cache = directory)
+        assert summary["cache_hits"] == 2
+        summary = convert_batch(sources, str(tmp_path / "out"), jobs = 2, conversion_cache = directory)
+        assert summary["cache_hits"] == 3
+        assert summary["succeeded"] == 3
+
+    def test_normalize_source(self):
+        assert normalize_source("a  \r\nb\t\n\n") == "a\nb"
@@ -60,6 +60,21 @@ class TestControl:
 
         assert output == "12345678910"
 
+    def test_for_downto_loop(self):
+        control_test_code = r"""
+        program ForDowntoTest;
+        var
+            i: integer;
+        begin
+            for i := 5 downto 1 do
+                write(i);
+        end.
+        """
+        converter = Converter()
+        success, result = converter(control_test_code, debug = True)
+        output = compile_code(result)
+        assert output == "54321"
+
     def test_while_loop(self):
         control_test_code = r"""
         program WhileLoopTest;
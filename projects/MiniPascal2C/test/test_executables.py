@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+from mp2c import Converter, ExecutableCache, compile_code, run_cases
+
+program = r"""
+program square(input, output);
+var n, i, s: integer;
+begin
+    read(n);
+    s := 0;
+    for i := 1 to n do s := s + i * i;
+    writeln(s)
+end.
+"""
+
+
+class TestExecutables:
+    def test_reuse(self):
+        code = Converter("lalr").convert(program).code
+        with ExecutableCache() as cache:
+            executable = cache.get_executable(code)
+            assert cache.get_executable(code) == executable
+            assert cache.stats == {"hits": 1, "misses": 1, "failures": 0}
+            assert compile_code(code, "3\n", cache = cache) == "14\n"
+            assert cache.get_executable(code, optimize = 2) != executable
+            assert cache.stats["misses"] == 2
+            # only the executables are kept, the sources are removed
+            files = [name for _, _, names in os.walk(cache.directory) for name in names]
+            assert sorted(files) == sorted(os.path.basename(path) for path in
+                                           (executable, cache.get_executable(code, optimize = 2)))
+            directory = cache.directory
+        assert not os.path.exists(directory)
+
+    def test_failures(self):
+        with ExecutableCache() as cache:
+            output = compile_code("int main() { return x; }", cache = cache)
+            assert output.startswith("Compilation failed:\n") and "x" in output
+            assert compile_code("int main() { return x; }", cache = cache) == output
+            assert cache.stats == {"hits": 0, "misses": 1, "failures": 2}
+            assert compile_code("int main() { return 1; }", cache = cache).startswith("Runtime error:")
+            with pytest.raises(ValueError):
+                cache.get_executable("int main() { return 0; }", optimize = 5)
+
+    def test_run_cases(self):
+        code = Converter("lalr").convert(program).code
+        with ExecutableCache() as cache:
+            executable = cache.get_executable(code, optimize = 2)
+            cases = [("{}\n".format(n), "{}\n".format(n * (n + 1) * (2 * n + 1) // 6)) for n in range(20)]
+            cases.append(("2\n", "4\n"))
+            results = run_cases(executable, cases, jobs = 4)
+            assert [result["passed"] for result in results] == [True] * 20 + [False]
+            assert results[-1]["output"] == "5\n" and results[3]["input"] == "3\n"
+            assert cache.stats["misses"] == 1
+
+    def test_on_disk(self, cache_dir):
+        code = Converter("lalr").convert(program).code
+        cache = ExecutableCache.on_disk()
+        assert cache.directory == str(cache_dir / "executables")
+        executable = cache.get_executable(code)
+        assert executable.startswith(cache.directory)
+        cache = ExecutableCache.on_disk()
+        assert cache.get_executable(code) == executable
+        assert cache.stats["hits"] == 1
+        cache.close()
+        assert os.path.exists(executable)
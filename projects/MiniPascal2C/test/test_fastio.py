@@ -0,0 +1,49 @@
+import io
+
+from mp2c import Context, Converter, IncrementalConverter, build_program, compile_code, preprocess
+from mp2c.fastio import lower_program, runtime
+from mp2c.ir import Block, For, ProcedureCall
+from test.programs import data, program
+
+
+def build(code):
+    tree = Converter("lalr").parser.parse(preprocess(code))
+    context = Context()
+    return build_program(tree, context), context
+
+
+class TestFastIO:
+    def test_lowering(self):
+        ir, context = build(program)
+        assert not context.on_error
+        lowered = lower_program(ir)
+        assert lowered.runtime == runtime and ir.runtime == ()
+        main = lowered.main
+        assert isinstance(main[0], ProcedureCall) and main[0].name == "atexit"
+        assert main[1].name == "ReadInt" and main[1].references == [True]
+        loop = main[3]
+        assert isinstance(loop, For) and loop.body.statements[0].name == "ReadInt"
+        reads = main[5]
+        assert isinstance(reads, ProcedureCall) and reads.name == "ReadChar"
+        assert main[6].name == "ReadChar"
+        function = lowered.functions[0]
+        assert function.body[1].body.statements[0].name == "ReadFloat"
+        branch = main[7]
+        assert isinstance(branch.then, Block)
+        assert [call.name for call in branch.then.statements] == ["WriteString", "WriteInt", "WriteChar", "WriteChar"]
+        assert main[8].otherwise.name == "WriteInt"
+
+    def test_same_output(self):
+        plain = Converter("lalr").convert(program)
+        fast = Converter("lalr", fast_io = True).convert(program)
+        assert plain.success and fast.success
+        assert "scanf" not in fast.code and "atexit(FlushOutput);" in fast.code
+        expected = "total2035x\n42000x30x-7x12x\n14.750000-2147483648\n"
+        assert compile_code(fast.code, data) == compile_code(plain.code, data) == expected
+
+    def test_converters(self):
+        fast = Converter("lalr", fast_io = True, optimize = 2).convert(program)
+        assert IncrementalConverter(fast_io = True, optimize = 2).convert(program).code == fast.code
+        stream = io.StringIO()
+        assert Converter("lalr", fast_io = True, optimize = 2).convert_to(program, stream).success
+        assert stream.getvalue() == fast.code
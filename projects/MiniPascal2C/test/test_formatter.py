@@ -0,0 +1,152 @@
+import io
+import shutil
+
+import pytest
+
+from mp2c import Converter, compile_code
+from mp2c.formatter import format_tokens
+
+
+class RecordingStream(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.writes = []
+
+    def write(self, text):
+        self.writes.append(text)
+        return super().write(text)
+
+
+class TestFormatter:
+    def test_format_tokens(self):
+        tokens = ['#include <stdio.h>', '#include <math.h>', 'void', 'p', '(', 'int', '*', 'x', ')', ';', 'int',
+                  'a', '[', '10', ']', ';', 'int main()', '{', 'if', '(', 'a', '[', '1', '-', '1', ']', '>', '-',
+                  '1', ')', '{', 'p', '(', '&', 'a', '[', '0', ']', ')', ';', '}', 'else', '{', '}', ';', 'for',
+                  '(', 'i', '=', '1', ';', 'i', '<=', '10', ';', 'i', '++', ')', '{', 'printf', '(', '"%f\\n"',
+                  ',', '(', 'float', ')', '-', 'i', '/', '2', ')', ';', '}', ';', '}', 'void', 'p', '(', 'int',
+                  '*', 'x', ')', '{', '*', 'x', '=', '!', '(', '*', 'x', '==', '0', ')', ';', '}']
+        expected = '\n'.join([
+            '#include <stdio.h>',
+            '#include <math.h>',
+            '',
+            'void p(int *x);',
+            'int a[10];',
+            'int main() {',
+            '  if (a[1 - 1] > -1) {',
+            '    p(&a[0]);',
+            '  } else {}',
+            '  for (i = 1; i <= 10; i++) {',
+            '    printf("%f\\n", (float)-i / 2);',
+            '  }',
+            '}',
+            '',
+            'void p(int *x) {',
+            '  *x = !(*x == 0);',
+            '}',
+            '',
+        ])
+        assert format_tokens(tokens) == expected
+
+    def test_format_stable(self):
+        code = r"""
+        program Stable;
+        var
+          a, b: integer;
+        procedure swap(var x, y: integer);
+        var
+          t: integer;
+        begin
+          t := x; x := y; y := t
+        end;
+        begin
+          a := -1; b := 2;
+          if a < b then begin swap(a, b) end;
+          writeln(a, b)
+        end.
+        """
+        converter = Converter()
+        first = converter.convert(code).code
+        assert first == converter.convert(code).code
+        assert "void swap(int *x, int *y) {" in first
+        assert compile_code(first) == "2-1\n"
+
+    def test_format_repeated_signs(self):
+        # "- -y" must not be formatted as the decrement "--y", nor "+ +y" as "++y"
+        tokens = ['#include <stdio.h>', 'int main()', '{', 'int', 'x', '=', '1', ',', 'y', '=', '-', '2', ';',
+                  'printf', '(', '"%d %d %d %d\\n"', ',', 'x', '-', '-', 'y', ',', '-', '-', 'y', ',', '+', '+',
+                  'y', ',', 'x', '+', '+', 'y', ')', ';', '}']
+        code = format_tokens(tokens)
+        assert "printf(\"%d %d %d %d\\n\", x - -y, - -y, + +y, x + +y);" in code
+        assert compile_code(code) == "-1 -2 -2 -1\n"
+        assert format_tokens(['p', '(', '&', '&', 'x', ')', ';']) == 'p(& &x);\n'
+        code = r"""
+        program Signs;
+        var
+          x, y: integer;
+        begin
+          x := 1; y := -2;
+          writeln(x - -y);
+          writeln(- -y)
+        end.
+        """
+        for parser in ("earley", "lalr"):
+            result = Converter(parser).convert(code)
+            assert result.success and "--" not in result.code
+            assert compile_code(result.code) == "-1\n-2\n"
+
+    @pytest.mark.skipif(shutil.which("clang-format") is None, reason = "clang-format is not installed")
+    def test_format_clang(self):
+        code = "program t; var a: integer; begin a := 6 * 7; writeln(a) end."
+        result = Converter(format = "clang").convert(code)
+        assert result.success
+        assert compile_code(result.code) == "42\n"
+
+    def test_unknown_format(self):
+        with pytest.raises(ValueError):
+            Converter(format = "gnu")
+
+    def test_convert_to(self):
+        code = r"""
+        program Stream;
+        const n = 3;
+        var
+          a: array[1..3] of integer;
+          i, total: integer;
+        function twice(x: integer): integer;
+        begin
+          twice := x * 2
+        end;
+        procedure fill(var s: integer);
+        begin
+          for i := 1 to n do a[i] := twice(i);
+          s := a[1] + a[2] + a[3]
+        end;
+        begin
+          fill(total);
+          writeln(total)
+        end.
+        """
+        for format in ("builtin", "none"):
+            converter = Converter("lalr", format = format)
+            stream = RecordingStream()
+            result = converter.convert_to(code, stream)
+            assert result.success and result.code == ""
+            assert stream.getvalue() == converter.convert(code).code
+            assert len(stream.writes) > 4
+            # without declarations, the part of the prototypes and declarations is empty
+            stream = io.StringIO()
+            assert converter.convert_to("program t; begin writeln(1) end.", stream).success
+            assert stream.getvalue() == converter.convert("program t; begin writeln(1) end.").code
+        stream = io.StringIO()
+        assert Converter("lalr").convert_to(code, stream).success
+        assert compile_code(stream.getvalue()) == "12\n"
+
+    def test_convert_to_errors(self):
+        stream = io.StringIO()
+        result = Converter("lalr").convert_to("program t; begin x := end.", stream)
+        assert not result.success and "line 1" in result.error_messages[0]
+        assert stream.getvalue() == ""
+        code = "program t; var x: integer; begin y := 1 end."
+        result = Converter("lalr").convert_to(code, stream)
+        assert not result.success and result.error_messages == Converter("lalr").convert(code).error_messages
+        assert stream.getvalue() == Converter("lalr").convert(code).code
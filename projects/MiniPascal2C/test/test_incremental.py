@@ -0,0 +1,83 @@
+from mp2c import Converter, IncrementalConverter, compile_code
+from mp2c.incremental import split_program
+
+base_code = r"""
+program Edit;
+const
+  limit = 10;
+var
+  a, b: integer;
+function twice(x: integer): integer;
+begin
+  twice := x * 2
+end;
+procedure show(x: integer);
+begin
+  writeln(x)
+end;
+function triple(x: integer): integer;
+begin
+  triple := twice(x) + x
+end;
+begin
+  a := twice(limit);
+  b := triple(a);
+  show(b)
+end.
+"""
+
+
+class TestIncremental:
+    def check(self, converter, code):
+        expected = Converter("lalr").convert(code)
+        result = converter.convert(code)
+        assert result.code == expected.code
+        assert result.success == expected.success
+        assert result.error_messages == expected.error_messages
+        return result
+
+    def test_split_program(self):
+        head, subprograms, main = split_program("program p; var s: char; procedure q; begin if 1 > 0 then begin "
+                                                "s := 'end' end end; begin q end.")
+        assert head == "program p; var s: char;"
+        assert subprograms == ["procedure q; begin if 1 > 0 then begin s :='end'end end;"]
+        assert main == "begin q end."
+        assert split_program("program p; begin end") is not None
+        assert split_program("program p; begin begin end.") is None
+        assert split_program("program p; procedure q; begin end begin end.") is None
+
+    def test_reuse(self):
+        converter = IncrementalConverter()
+        result = self.check(converter, base_code)
+        assert compile_code(result.code) == "60\n"
+        assert converter.stats == {"parsed": 5, "visited": 4, "reused": 0, "full": False}
+        self.check(converter, base_code.replace("writeln(x)", "writeln(x + 1)"))
+        assert converter.stats == {"parsed": 1, "visited": 1, "reused": 3, "full": False}
+        result = self.check(converter, base_code.replace("b := triple(a);", "b := triple(a) - 1;"))
+        assert converter.stats == {"parsed": 2, "visited": 2, "reused": 2, "full": False}
+        assert compile_code(result.code) == "59\n"
+        self.check(converter, base_code.replace("b := triple(a);", "b := triple(a) - 1; { a comment }"))
+        assert converter.stats == {"parsed": 0, "visited": 0, "reused": 4, "full": False}
+
+    def test_signature_change(self):
+        converter = IncrementalConverter()
+        self.check(converter, base_code)
+        code = base_code.replace("function twice(x: integer)", "function twice(x, y: integer)")
+        result = self.check(converter, code)
+        assert not result.success
+        assert converter.stats["visited"] == 4
+        self.check(converter, base_code.replace("limit = 10", "limit = 11"))
+        assert converter.stats == {"parsed": 2, "visited": 4, "reused": 0, "full": False}
+
+    def test_errors(self):
+        converter = IncrementalConverter()
+        code = base_code.replace("writeln(x)", "writeln(y)")
+        result = self.check(converter, code)
+        assert not result.success
+        result = self.check(converter, code.replace("b := triple(a);", "b := triple(a) + 1;"))
+        assert converter.stats["reused"] == 3
+        assert "Variable not declared: y" in result.error_messages
+        result = self.check(converter, base_code.replace("b := triple(a);", "b := ;"))
+        assert converter.stats["full"]
+        assert not result.success
+        self.check(converter, base_code)
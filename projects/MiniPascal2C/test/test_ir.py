@@ -0,0 +1,87 @@
+import pickle
+
+from mp2c import Context, Converter, build_program, compile_code, emit_program, preprocess, visit_programstruct
+from mp2c.ir import Assign, Binary, Call, For, If, Node, Parenthesized, Variable, Write
+
+program = r"""
+program ir;
+const limit = 3; sign = -1;
+var a, total: integer; x: real; v: array[1..3] of integer;
+function scale(var n: integer; f: real): real;
+begin
+    n := n + 1;
+    scale := n * f / 2
+end;
+begin
+    total := 0;
+    for a := 1 to limit do
+        v[a] := a * sign;
+    x := scale(total, 4.0);
+    if total = 1 then writeln(x) else if total = 2 then writeln(v[1]) else writeln((v[2] + v[3]) div 2)
+end.
+"""
+
+
+def parse(code):
+    return Converter("lalr").parser.parse(preprocess(code))
+
+
+class TestIR:
+    def test_same_tokens_as_visitors(self):
+        invalid = "program t; var a: integer; b: real; begin a := b; c := 1; writeln(a, c) end."
+        for code in (program, invalid):
+            tree = parse(code)
+            visited_context = Context()
+            visited = visit_programstruct(tree, visited_context)
+            built_context = Context()
+            emitted = emit_program(build_program(tree, built_context))
+            assert emitted == visited
+            assert built_context.error_messages == visited_context.error_messages
+
+    def test_resolved_types_and_symbols(self):
+        context = Context()
+        ir = build_program(parse(program), context)
+        assert not context.on_error
+        function, = ir.functions
+        assert [parameter.var for parameter in function.parameters] == [True, False]
+        increment, result = function.body
+        assert increment.target.symbol.var
+        assert isinstance(result.value, Binary) and result.value.op == "/" and result.value.type == "float"
+        assert result.target.name == "_scale"
+
+        loop, call = ir.main[1:3]
+        assert isinstance(loop, For) and loop.symbol.type == "int"
+        assert loop.body.target.offsets == [1]
+        assert isinstance(call.value, Call) and call.value.function is function.symbol
+        assert call.value.references == [True, False]
+
+        branch = ir.main[3]
+        assert isinstance(branch.otherwise, If)
+        written = branch.otherwise.otherwise
+        assert isinstance(written, Write) and written.format == r'"%d\n"'
+        average = written.arguments[0]
+        assert average.op == "div" and isinstance(average.left, Parenthesized)
+
+    def test_nodes_have_slots(self):
+        ir = build_program(parse(program), Context())
+        nodes = [ir, *ir.functions, *ir.declarations, *ir.main]
+        for node in nodes:
+            assert isinstance(node, Node)
+            assert not hasattr(node, "__dict__")
+
+    def test_pickle(self):
+        ir = build_program(parse(program), Context())
+        copy = pickle.loads(pickle.dumps(ir))
+        assert emit_program(copy) == emit_program(ir)
+        assert isinstance(copy.main[0], Assign) and isinstance(copy.main[0].target, Variable)
+
+    def test_compile(self):
+        result = Converter("lalr").convert(program)
+        assert result.success
+        assert compile_code(result.code) == "2.000000\n"
+
+    def test_for_variable_name(self):
+        code = "program t; var index, s: integer; begin s := 0; for index := 1 to 4 do s := s + index; writeln(s) end."
+        result = Converter("lalr").convert(code)
+        assert "for (index = 1; index <= 4; index++)" in result.code
+        assert compile_code(result.code) == "10\n"
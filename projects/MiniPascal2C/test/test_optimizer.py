@@ -0,0 +1,219 @@
+import pytest
+
+from mp2c import (Context, Converter, IncrementalConverter, build_program, compile_code, emit_program, optimize_program,
+                  preprocess)
+from mp2c.ir import ArrayElement, Binary, Block, For, If, Temporary, Variable, Write
+
+program = r"""
+program folding;
+const size = 10; first = 1; sign = -1; ratio = 2.5; letter = 'z';
+var a: array[1..10] of integer; i, total: integer; x: real;
+function area(w: integer): real;
+const half = 0.5;
+begin
+    area := w * size * half
+end;
+begin
+    total := 0;
+    for i := first to size do
+        a[i] := i * sign;
+    a[size - first] := 2 * 3 + 7 div 2;
+    a[i - 3 + 1] := a[first + 4] * (size div 3);
+    x := 7 div 2 / 4 + ratio;
+    if size > 5 then total := total + 1 else total := total - 1;
+    while size < 0 do total := 0;
+    if total = 1 then writeln(x, a[9], a[8], letter) else if first = 2 then writeln(0) else writeln(1);
+    writeln(area(4), 10 mod 4 - -3 * 2, 1 / 3)
+end.
+"""
+
+loops = r"""
+program loops;
+const n = 3;
+var a, b, c: array[1..3, 0..2] of integer; i, j, k, m: integer;
+function next(x: integer): integer;
+begin
+    next := x + 1
+end;
+procedure touch;
+begin
+    i := i
+end;
+begin
+    for i := 1 to n do
+        for j := 0 to n - 1 do
+        begin
+            a[i, j] := i + j;
+            b[i, j] := i * j
+        end;
+    for i := 1 to n do
+        for j := 0 to n - 1 do
+        begin
+            c[i, j] := 0;
+            for k := 1 to n do c[i, j] := c[i, j] + a[i, k - 1] * b[k, j]
+        end;
+    m := 2;
+    for i := 1 to m * 2 - 1 do k := i;
+    for i := 1 to next(m) do m := m + 1 - i div 2;
+    for i := n downto 1 do
+    begin
+        touch;
+        write(c[i, i - 1], c[n, 0])
+    end;
+    writeln(m)
+end.
+"""
+
+
+def build(code):
+    tree = Converter("lalr").parser.parse(preprocess(code))
+    context = Context()
+    return build_program(tree, context), context
+
+
+class TestOptimizer:
+    def test_fold_expressions(self):
+        ir, context = build(program)
+        assert not context.on_error
+        main = optimize_program(ir).main
+        assert main[2].value.text == "9"
+        assert main[4].value.text == "3.375f"
+        written = main[-1].arguments
+        assert [argument.text for argument in written[1:]] == ["8", "0.33333334f"]
+
+    def test_propagate_constants(self):
+        ir, _ = build(program)
+        optimized = optimize_program(ir)
+        loop = optimized.main[1]
+        assert loop.start.text == "1" and loop.stop.text == "10"
+        assert loop.body.value.right.text == "-1"
+        body = optimized.functions[0].body[0].value
+        assert isinstance(body, Binary) and body.right.text == "0.5f" and body.left.right.text == "10"
+        assert optimized.declarations == ir.declarations
+
+    def test_array_offsets(self):
+        ir, _ = build(program)
+        main = optimize_program(ir).main
+        assert main[2].target.indices[0].text == "8" and main[2].target.offsets == [None]
+        target = main[3].target
+        assert target.offsets == [None]
+        assert isinstance(target.indices[0], Binary) and target.indices[0].op == "-"
+        assert target.indices[0].right.text == "3"
+        source = main[3].value.left
+        assert source.indices[0].text == "4" and source.offsets == [None]
+        unchanged = main[1].body.target
+        assert unchanged.offsets == [1]
+
+    def test_constant_conditions(self):
+        ir, _ = build(program)
+        main = optimize_program(ir).main
+        assert len(main) == len(ir.main) - 1
+        assert main[5].target.name == "total" and main[5].value.op == "+"
+        branch = main[6]
+        assert isinstance(branch, If) and isinstance(branch.otherwise, Write)
+
+    def test_c_semantics(self):
+        code = ("program t; var x: real; i: integer; begin x := 7 div 2 / 2; i := -7 div 2; i := -7 mod 3; "
+                "i := 2147483647 + 1; i := 5 div 0; x := 1.5 * 2 end.")
+        ir, _ = build(code)
+        main = optimize_program(ir).main
+        assert main[0].value.text == "1.75f"
+        assert main[1].value.text == "-3"
+        assert main[2].value.text == "-1"
+        assert isinstance(main[3].value, Binary)
+        assert isinstance(main[4].value, Binary)
+        assert main[5].value.text == "3.0"
+
+    def test_input_unchanged(self):
+        ir, _ = build(program)
+        expected = emit_program(ir)
+        optimize_program(ir)
+        assert emit_program(ir) == expected
+        assert optimize_program(ir, 0) is ir
+        with pytest.raises(ValueError):
+            optimize_program(ir, 3)
+        with pytest.raises(ValueError):
+            Converter("lalr", optimize = 3)
+
+    def test_same_output(self):
+        plain = Converter("lalr").convert(program)
+        optimized = Converter("lalr", optimize = 1).convert(program)
+        assert plain.success and optimized.success
+        assert len(optimized.code) < len(plain.code)
+        assert compile_code(optimized.code) == compile_code(plain.code) == "3.375000-15-8z\n20.00000080.333333\n"
+
+    def test_incremental(self):
+        converter = IncrementalConverter(optimize = 1)
+        expected = Converter("lalr", optimize = 1).convert(program).code
+        assert converter.convert(program).code == expected
+        edited = program.replace("total := 0;", "total := 1;")
+        assert converter.convert(edited).code == Converter("lalr", optimize = 1).convert(edited).code
+        assert converter.stats["reused"] == 1
+
+    def test_loop_bounds(self):
+        ir, _ = build(loops)
+        main = optimize_program(ir, 2).main
+        block = main[3]
+        assert isinstance(block, Block) and isinstance(block.statements[0], Temporary)
+        bound = block.statements[0]
+        assert bound.name == "Bound5" and bound.type == "int" and isinstance(bound.value, Binary)
+        loop = block.statements[1]
+        assert isinstance(loop.stop, Variable) and loop.stop.name == "Bound5"
+        assert isinstance(main[0], For) and main[0].stop.text == "3"
+        # a final value calling a subprogram, or reading a variable the loop assigns, is computed at each iteration
+        assert isinstance(main[4], For) and main[4].stop.name == "next"
+
+    def test_row_pointers(self):
+        ir, _ = build(loops)
+        main = optimize_program(ir, 2).main
+        block = main[1].body
+        assert [temporary.name for temporary in block.statements[:-1]] == ["Row3", "Row4"]
+        row = block.statements[0].value
+        assert row.name == "c" and len(row.indices) == 1 and row.type == "int*"
+        inner = block.statements[-1].body.statements[1]
+        element = inner.body.value.left
+        assert element.name == "Row3" and element.indices[0].name == "j" and element.offsets == [None]
+        column = inner.body.value.right.right
+        assert isinstance(column, ArrayElement) and column.name == "b"
+        # the loop calls a procedure, which may assign any variable, so only the constant rows are hoisted
+        block = main[5]
+        assert block.statements[0].name == "Row6" and block.statements[0].value.indices[0].text == "2"
+        written = block.statements[1].body.statements[1].arguments
+        assert [argument.name for argument in written] == ["c", "Row6"]
+
+    def test_loop_output(self):
+        folded = Converter("lalr", optimize = 1).convert(loops)
+        optimized = Converter("lalr", optimize = 2).convert(loops)
+        assert folded.success and optimized.success
+        assert "int Bound5 = m * 2 - 1;" in optimized.code and "int *Row3 = c[i - 1];" in optimized.code
+        assert "i >= 1" in optimized.code and "i >= 1" in folded.code
+        assert "i <= next(m)" in optimized.code
+        assert compile_code(optimized.code) == compile_code(folded.code) == "520200002\n"
+        converter = IncrementalConverter(optimize = 2)
+        assert converter.convert(loops).code == optimized.code
+
+    def test_loop_bound_output(self):
+        code = r"""
+        program bounds;
+        var r, s: real; i, n, x, z, count: integer;
+        begin
+            read(s);
+            count := 0;
+            for r := 0.5 to s + 0.0 do count := count + 1;
+            writeln(count);
+            n := 10; x := 7; z := 1234;
+            count := 0;
+            for i := n downto x mod 3 do
+            begin
+                x := z mod 1000;
+                z := z * 7 + 1;
+                count := count + 1
+            end;
+            writeln(count, x)
+        end.
+        """
+        plain = Converter("lalr").convert(code)
+        optimized = Converter("lalr", optimize = 2).convert(code)
+        # the real final value keeps its type, and the one the loop assigns is computed at each iteration
+        assert "float Bound1 = s + 0.0;" in optimized.code and "i >= x % 3" in optimized.code
+        assert compile_code(optimized.code, "2.5") == compile_code(plain.code, "2.5") == "3\n11498\n"
@@ -0,0 +1,42 @@
+import pytest
+
+from mp2c import Converter, ParallelConverter, compile_code
+from test.programs import data, errors_code, generate_program, program
+
+
+class TestParallel:
+    def test_same_code(self):
+        code = generate_program(20)
+        for options in ({}, {"optimize": 2}, {"fast_io": True, "optimize": 1}, {"format": "none"}):
+            with ParallelConverter(jobs = 2, min_subprograms = 0, **options) as converter:
+                for source in (program, code):
+                    expected = Converter("lalr", **options).convert(source)
+                    result = converter.convert(source)
+                    assert converter.stats["parallel"]
+                    assert result.success and result.code == expected.code
+                assert converter.stats["chunks"] == 7
+        with ParallelConverter(jobs = 2, min_subprograms = 0) as converter:
+            result = converter.convert(program)
+        assert compile_code(result.code, data) == "total2035x\n42000x30x-7x12x\n14.750000-2147483648\n"
+
+    def test_errors(self):
+        with ParallelConverter(jobs = 2, min_subprograms = 0) as converter:
+            expected = Converter("lalr").convert(errors_code)
+            result = converter.convert(errors_code)
+            assert converter.stats["parallel"]
+            assert not result.success and len(result.error_messages) == 6
+            assert result.error_messages == expected.error_messages and result.code == expected.code
+            # a syntax error in a body is reported by a worker, and the program is converted sequentially
+            code = generate_program(4).replace("a := a - b", "a := - ", 1)
+            expected = Converter("lalr").convert(code)
+            result = converter.convert(code)
+            assert not converter.stats["parallel"] and not result.success
+            assert result.error_messages[0].splitlines()[0] == expected.error_messages[0].splitlines()[0]
+
+    def test_fallback(self):
+        with ParallelConverter(jobs = 2) as converter:
+            result = converter.convert(program)
+            assert not converter.stats["parallel"] and converter._executor is None
+            assert result.code == Converter("lalr").convert(program).code
+        with pytest.raises(ValueError):
+            ParallelConverter("earley")
@@ -0,0 +1,144 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from lark import Token
+
+from mp2c import Converter, compile_code, load_parser, preprocess
+from mp2c.parsers import get_cache_path
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def normalize(node):
+    # whitespace is ignored by the LALR lexer, so `empty` nodes never hold WS tokens there
+    if isinstance(node, Token):
+        return node.type, node.value
+    if node.data == "empty":
+        return "empty",
+    return node.data, tuple(normalize(child) for child in node.children)
+
+
+class TestParser:
+    sample_code = r"""
+    program Sample(input, output);
+    const
+      n = 10;
+      neg = -2.5;
+      c = 'c';
+    var
+      i, j: integer;
+      r: real;
+      grid: array[1..10, 0..5] of integer;
+
+    function square(x: integer): integer;
+    begin
+      square := x * x;
+    end;
+
+    procedure count(var x: integer; step: integer);
+    var
+      k: integer;
+    begin
+      for k := 1 to 10 do
+        x := x + step;
+    end;
+
+    function one: integer;
+    begin
+      one := 1
+    end;
+
+    begin
+      read(i, j);
+      if i <= j then
+        i := square(j) div 2 mod 3
+      else if i <> j then
+        begin
+          r := grid[1, 2] - one() + -r * 2 / 3.5;
+          for j := 3 downto 1 do
+            grid[j, 0] := j;
+        end;
+      while (i > 0) and not (i = 100) or (i < 0) do
+        i := i - 1;
+      count(i, n);
+      writeln("done", c, i);
+      writeln;
+    end.
+    """
+
+    def test_lalr_tree_matches_earley(self):
+        code = preprocess(self.sample_code)
+        earley_tree = Converter("earley").parser.parse(code)
+        lalr_tree = Converter("lalr").parser.parse(code)
+        assert normalize(lalr_tree) == normalize(earley_tree)
+
+    def test_lalr_dangling_else(self):
+        code = "program t; var a, b: boolean; x: integer; begin if a then if b then x := 1 else x := 2 end."
+        tree = Converter("lalr").parser.parse(code)
+        outer, inner = [subtree for subtree in tree.iter_subtrees_topdown() if subtree.data == "if_else_statement"]
+        assert outer.children[-1].data == "statement"
+        assert inner.children[-1].data == "else_part"
+
+    def test_cli_dangling_else(self, tmp_path):
+        # the CLI parses with earley by default, which attaches the else to the outer if, and lalr to the nearest one
+        input_path = tmp_path / "t.pas"
+        output_path = tmp_path / "t.c"
+        input_path.write_text("program t; var a, b, x: integer; "
+                              "begin a := 1; b := 0; x := 0; if a = 1 then if b = 1 then x := 1 else x := 2; "
+                              "writeln(x) end.")
+        env = dict(os.environ, MP2C_CACHE_DIR = str(tmp_path / "cache"))
+        subprocess.run([sys.executable, "main.py", "-i", str(input_path), "-o", str(output_path), "--no-server"],
+                       cwd = PROJECT_DIR, env = env, stdout = subprocess.DEVNULL, check = True)
+        assert compile_code(output_path.read_text(), "") == "0\n"
+        subprocess.run([sys.executable, "main.py", "-i", str(input_path), "-o", str(output_path), "--no-server",
+                        "-p", "lalr"], cwd = PROJECT_DIR, env = env, stdout = subprocess.DEVNULL, check = True)
+        assert compile_code(output_path.read_text(), "") == "2\n"
+        # the recovering parser needs lalr, which it uses without -p
+        subprocess.run([sys.executable, "main.py", "-i", str(input_path), "-o", str(output_path), "--no-server",
+                        "--recover"], cwd = PROJECT_DIR, env = env, stdout = subprocess.DEVNULL, check = True)
+        assert compile_code(output_path.read_text(), "") == "2\n"
+
+    def test_lalr_convert(self):
+        converter = Converter("lalr")
+        success, result = converter(self.sample_code, debug = True)
+        assert success
+        output = compile_code(result, "3 4\n")
+        assert output == "donec100\n\n"
+
+    def test_lalr_syntax_error(self):
+        converter = Converter("lalr")
+        result = converter.convert("program t; begin x := end.")
+        assert not result.success
+        assert result.code == ""
+
+    def test_unknown_parser(self):
+        with pytest.raises(ValueError):
+            Converter("cyk")
+
+    def test_parser_cache(self, tmp_path):
+        cache_path = get_cache_path("lalr", str(tmp_path))
+        stale_path = tmp_path / "parser-lalr-stale.lark"
+        stale_path.write_bytes(b"stale")
+        parser = load_parser("lalr", cache_dir = str(tmp_path))
+        assert os.path.exists(cache_path)
+        assert not stale_path.exists()
+        cached_parser = load_parser("lalr", cache_dir = str(tmp_path))
+        code = preprocess(self.sample_code)
+        assert normalize(cached_parser.parse(code)) == normalize(parser.parse(code))
+
+    def test_parser_cache_corrupted(self, tmp_path):
+        cache_path = get_cache_path("lalr", str(tmp_path))
+        with open(cache_path, "wb") as file:
+            file.write(b"not a parser")
+        parser = load_parser("lalr", cache_dir = str(tmp_path))
+        assert parser.parse("program t; begin end.").data == "programstruct"
+        assert load_parser("lalr", cache_dir = str(tmp_path)).parse("program t; begin end.")
+
+    def test_parser_loaded_lazily(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("MP2C_CACHE_DIR", str(tmp_path))
+        converter = Converter("lalr")
+        assert not any(tmp_path.iterdir())
+        assert converter.convert("program t; begin end.").success
+        assert any(tmp_path.iterdir())
@@ -0,0 +1,35 @@
+import pytest
+
+from mp2c import Converter, preprocess, preprocess_with_map
+
+
+class TestPreprocess:
+    @pytest.mark.parametrize("code, expected", [
+        ("PROGRAM X; {Comment 'x'} BEGIN WriteLn('Hello W') END.", "program x;  begin writeln('Hello W') end."),
+        ("A := 'B{c}D'; { multi\nline }E", "a := 'B{c}D'; e"),
+        ("X := \"Ab\"; Y", "x := \"Ab\"; y"),
+        ("A'\\'B'C", "a'\\'B'c"),
+        ("A { unterminated", "a { unterminated"),
+        ("A 'unterminated B", "a 'unterminated B"),
+        ("", ""),
+    ])
+    def test_preprocess(self, code, expected):
+        assert preprocess(code) == expected
+
+    def test_source_map(self):
+        code = "Program T;\n{ a\n  comment }\nBEGIN {x} A := 1\nEND."
+        processed, source_map = preprocess_with_map(code)
+        assert processed == "program t;\n\nbegin  a := 1\nend."
+        assert source_map.to_source(3, 8) == (4, 11)
+        assert source_map.to_source(4, 1) == (5, 1)
+        for offset, char in enumerate(processed):
+            assert code[source_map.to_source_offset(offset)].lower() == char
+
+    def test_linear(self):
+        code = "A := 'X'; {c} " * 200000
+        assert preprocess(code) == "a := 'X';  " * 200000
+
+    def test_error_position(self):
+        code = "program t;\n{ a\n  long\n  comment }\nbegin\n  a := ;\nend."
+        result = Converter("lalr").convert(code)
+        assert "at line 6, column 8" in result.error_messages[0]
@@ -0,0 +1,60 @@
+import io
+import tracemalloc
+
+import pytest
+
+from mp2c import ConversionCache, Converter, Profile
+
+program = r"""
+program profiled;
+var i, s: integer;
+function twice(x: integer): integer;
+begin
+    twice := x * 2
+end;
+begin
+    s := 0;
+    for i := 1 to 10 do s := s + twice(i);
+    writeln(s)
+end.
+"""
+
+
+class TestProfiling:
+    def test_phases(self):
+        result = Converter("lalr", optimize = 1).convert(program)
+        assert result.profile is None
+        result = Converter("lalr", optimize = 1, profile = True).convert(program)
+        profile = result.profile
+        assert list(profile.phases) == ["preprocess", "parse", "build", "optimize", "emit", "postprocess", "format"]
+        for record in profile.phases.values():
+            assert record["wall"] >= 0 and record["cpu"] >= 0 and record["peak"] >= 0 and record["runs"] == 1
+        assert profile.phases["parse"]["peak"] > 0
+        assert profile.total() == pytest.approx(sum(record["wall"] for record in profile.phases.values()))
+        assert not profile.counters and not tracemalloc.is_tracing()
+        assert profile.format().splitlines()[0].split()[0] == "phase"
+
+    def test_collectors(self):
+        runs = []
+        converter = Converter("lalr", profile = "calls", collectors = [lambda name, run: runs.append(name)],
+                              conversion_cache = ConversionCache())
+        first = converter.convert(program)
+        assert runs == ["cache", "preprocess", "parse", "build", "emit", "postprocess", "format"]
+        assert first.profile.counters["build_subprogram"] == 1 and first.profile.counters["build_factor"] > 5
+        assert "build_factor" in first.profile.format()
+        second = converter.convert(program)
+        assert list(second.profile.phases) == ["cache"] and second.code == first.code
+
+    def test_convert_to(self):
+        result = Converter("lalr", profile = True).convert_to(program, io.StringIO())
+        assert list(result.profile.phases) == ["preprocess", "parse", "build", "write"]
+        result = Converter("lalr", profile = True).convert("program p; begin x := end.")
+        assert not result.success and list(result.profile.phases) == ["preprocess", "parse"]
+        with pytest.raises(ValueError):
+            Converter(profile = "memory")
+
+    def test_analyze(self):
+        profile = Profile()
+        analyze = profile.wrap("analyze", lambda code: code.upper())
+        assert analyze("int") == "INT" and profile.phases["analyze"]["runs"] == 1
+        assert profile.finish() is profile and Profile(False).finish() is None
@@ -0,0 +1,124 @@
+import sys
+
+from mp2c import Context, Converter, build_program, compile_code, preprocess
+from mp2c.pyemitter import compile_python, emit_python, run_python
+
+program = r"""
+program refs;
+var g, i, j: integer; m: array[1..3, 0..2] of integer; r: real; c: char;
+procedure swap(var a, b: integer);
+var t: integer;
+begin
+    t := a;
+    a := b;
+    b := t
+end;
+procedure bump(var x: integer; n: integer);
+begin
+    if n > 0 then
+    begin
+        x := x + n;
+        bump(x, n - 1)
+    end
+end;
+function total(k: integer): integer;
+var s, t: integer;
+begin
+    s := 0;
+    t := 5;
+    swap(s, t);
+    bump(s, k);
+    total := s
+end;
+function fact(n: integer): integer;
+begin
+    if n = 0 then fact := 1 else fact := n * fact(n - 1)
+end;
+begin
+    read(g, r, c, c);
+    for i := 1 to 3 do
+        for j := 0 to 2 do
+            m[i, j] := i * 10 + j;
+    swap(m[1, 0], m[3, 2]);
+    swap(g, m[2, 1]);
+    writeln(g, m[1, 0], m[3, 2], m[2, 1], c);
+    writeln(total(4), fact(12), fact(13));
+    for i := 3 downto 1 do write(i);
+    writeln(i, j);
+    writeln(-7 div 2, -7 mod 2, g * 100000 div 7);
+    writeln(r / 3, r * 1.5, sqrt(r), 1 / 3, r * r);
+    i := 2147483647;
+    i := i + 1;
+    writeln(i, "end")
+end.
+"""
+
+data = "1000000 2.5 xy"
+
+
+class TestPyEmitter:
+    def test_same_output(self):
+        for level in (0, 2):
+            converter = Converter("lalr", optimize = level)
+            result = converter.convert(program)
+            assert result.success
+            output = converter.run(program, data)
+            assert output == compile_code(result.code, data)
+            assert output.startswith("2132101000000x\n154790016001932053504\n32103\n-3-1300000\n")
+
+    def test_emit(self):
+        tree = Converter("lalr").parser.parse(preprocess(program))
+        context = Context()
+        ir = build_program(tree, context)
+        assert not context.on_error
+        source = emit_python(ir)
+        assert "def swap_(a_ref, a_key, b_ref, b_key):" in source
+        assert "swap_(s_, 0, t_, 0)" in source and "swap_(Globals, 'g_', m_[2 - 1], 1 - 0)" in source
+        assert run_python(compile_python(ir), data) == Converter("lalr").run(program, data)
+
+    def test_errors(self):
+        converter = Converter("lalr")
+        assert converter.run("program p; begin x := 1 end.").startswith("Compilation failed:\n")
+        assert converter.run("program p; var a: integer; begin read(a); writeln(10 div a) end.",
+                             "0").startswith("Runtime error:\nZeroDivisionError")
+        # scanf stops at the first value that does not match and leaves the others unchanged
+        code = "program p; var a, b: integer; begin a := 1; b := 2; read(a, b); writeln(a, b) end."
+        assert converter.run(code, "7 x") == "72\n"
+
+    def test_worker(self):
+        converter = Converter("lalr")
+        code = "program p; var a: integer; begin a := 0; while a = 0 do a := 0; writeln(a) end."
+        assert converter.run(code, timeout = 0.5) == "Timeout after 0.5 s"
+        # the killed worker is replaced by a new one
+        assert converter.run("program p; begin writeln(1) end.") == "1\n"
+        code = "program p; var n: integer; function f(k: integer): integer; begin if k = 0 then f := 0 " \
+               "else f := f(k - 1) + 1 end; begin read(n); writeln(f(n)) end."
+        limit = sys.getrecursionlimit()
+        assert converter.run(code, "50000") == "50000\n"
+        assert sys.getrecursionlimit() == limit
+        assert converter.run(code, "200000").startswith("Runtime error:\nRecursionError")
+
+    def test_loop_types(self):
+        code = r"""
+        program loops;
+        const first = 'a'; last = 'e';
+        var r, s: real; c: char; count: integer;
+        begin
+            read(s);
+            count := 0;
+            for r := 0.5 to s + 0.0 do count := count + 1;
+            writeln(count, r);
+            for r := s downto 0 do count := count + 10;
+            writeln(count, r);
+            for c := first to last do write(c);
+            writeln(c);
+            for c := last downto first do count := count + c;
+            writeln(count, c)
+        end.
+        """
+        for level in (0, 2):
+            converter = Converter("lalr", optimize = level)
+            output = converter.run(code, "2.5")
+            # a real steps by one in single precision, and a character is its code in the body
+            assert output == compile_code(converter.convert(code).code, "2.5")
+            assert output == "33.500000\n33-0.500000\n979899100101f\n528`\n"
@@ -0,0 +1,74 @@
+import pytest
+
+from mp2c import ConversionCache, Converter, SyntaxErrorInfo, StreamingConverter, load_parser, parse_recovering
+from mp2c.utils import preprocess
+from test.programs import broken_code, errors_code, program
+
+
+class TestRecovery:
+    def test_all_errors(self):
+        result = Converter("lalr", recover = True).convert(broken_code)
+        assert not result.success and result.code == ""
+        assert [(error.line, error.column, error.token) for error in result.syntax_errors] == [
+            (2, 8, "integr"), (5, 5, "b"), (5, 10, ";"), (6, 14, "b")]
+        assert "SEMICOLON" in result.syntax_errors[1].expected
+        # the messages of the syntax errors come first, the first one as without recovery
+        first = Converter("lalr").convert(broken_code).error_messages[0]
+        assert result.error_messages[0].splitlines()[0] == first.splitlines()[0]
+        assert result.error_messages[:4] == [error.message for error in result.syntax_errors]
+        # the recovered program is visited: "integr" is read as "integer", and "c" is not declared
+        assert result.error_messages[4:] == ["Variable not declared: c", "Type mismatch in assignment: c, != 3, int"]
+
+    def test_undeclared_names(self):
+        # the calls and arrays the recovered program does not declare are reported instead of stopping the builder
+        code = "program p; var a: integer; procedure s(x: integer); begin end; " \
+               "begin a := 1 s(1, 2); q(a) a[1] := f(2) end."
+        result = Converter("lalr", recover = True).convert(code)
+        assert len(result.syntax_errors) == 2
+        assert result.error_messages[2:] == ["list index out of range",
+                                             "Number of parameters does not match: expected 1, got 2",
+                                             "Procedure not declared: q", "Array not declared: a",
+                                             "Function not declared: f"]
+        # without syntax errors, the same names are reported by the builder
+        code = "program p; var a: integer; begin q(a); a := b[1, 2] end."
+        assert Converter("lalr").convert(code).error_messages[:2] == ["Procedure not declared: q",
+                                                                      "Array not declared: b"]
+
+    def test_repairs(self):
+        parser = load_parser("lalr")
+        cases = {
+            "program p; begin a := 1 end": [(1, 25, "")],
+            "program p; begin a := 1 @ 2; b := (1 + 2; c := 3 end.": [(1, 25, "@"), (1, 41, ";")],
+            "program p; procedure q(x: integer) begin x := 1 end; begin q(1) end.": [(1, 36, "begin")],
+            "program p; begin while a < 3 do begin a := a + 1 end end end.": [(1, 58, "end")],
+        }
+        for code, positions in cases.items():
+            tree, errors = parse_recovering(parser, preprocess(code))
+            assert tree is not None and tree.data == "programstruct"
+            assert [(error.line, error.column, error.token) for error in errors] == positions
+            with pytest.raises(Exception, match = "line 1,? col"):
+                parser.parse(preprocess(code))
+        # an incomplete program heading cannot be completed
+        tree, errors = parse_recovering(parser, "program")
+        assert tree is None and [(error.line, error.column, error.token) for error in errors] == [(1, 1, "")]
+        tree, errors = parse_recovering(parser, preprocess(program))
+        assert errors == [] and tree == parser.parse(preprocess(program))
+
+    def test_converters(self):
+        code = broken_code.replace("integr", "integer")
+        expected = Converter("lalr", recover = True).convert(code)
+        assert len(expected.syntax_errors) == 3
+        cache = ConversionCache()
+        converter = Converter("lalr", recover = True, conversion_cache = cache)
+        for _ in range(2):
+            result = converter.convert(code)
+            assert result.syntax_errors == expected.syntax_errors
+            assert result.error_messages == expected.error_messages
+        assert cache.stats["hits"] == 1
+        assert SyntaxErrorInfo.from_dict(expected.syntax_errors[0].to_dict()) == expected.syntax_errors[0]
+        assert StreamingConverter(recover = True).convert(code).error_messages == expected.error_messages
+        # programs without syntax errors are converted as without recovery
+        result = Converter("lalr", recover = True).convert(errors_code)
+        assert result.syntax_errors == [] and result.code == Converter("lalr").convert(errors_code).code
+        with pytest.raises(ValueError):
+            Converter("earley", recover = True)
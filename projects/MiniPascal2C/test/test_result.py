@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+
+from mp2c import Converter
+from mp2c.result import Result
+
+bad_code = "program t; begin b := 1 end."
+
+
+class CountingAnalyzer:
+    def __init__(self):
+        self.calls = 0
+        self.threads = []
+
+    def __call__(self, code):
+        self.calls += 1
+        self.threads.append(threading.current_thread())
+        return "analysis of {} characters".format(len(code))
+
+
+class TestResult:
+    def test_on_demand(self):
+        analyze = CountingAnalyzer()
+        result = Result("int main() {}", False, ["error"], analyze)
+        assert analyze.calls == 0
+        assert result.error_info == "analysis of 13 characters"
+        assert result.error_info == "analysis of 13 characters"
+        assert analyze.calls == 1
+
+    def test_eager(self):
+        analyze = CountingAnalyzer()
+        result = Result("int main() {}", False, ["error"], analyze, "eager")
+        assert analyze.calls == 1
+        assert result.error_info == "analysis of 13 characters"
+        assert analyze.calls == 1
+
+    def test_background(self):
+        analyze = CountingAnalyzer()
+        result = Result("int main() {}", False, ["error"], analyze, "background")
+        assert result.error_info == "analysis of 13 characters"
+        assert analyze.calls == 1
+        assert analyze.threads[0] is not threading.current_thread()
+
+    def test_not_analyzed(self):
+        analyze = CountingAnalyzer()
+        assert Result("int main() {}", False, ["error"], analyze, "never").error_info == ""
+        assert Result("int main() {}", True, analyze = analyze, analysis = "eager").error_info == ""
+        assert Result("", False, ["error"], analyze, "eager").error_info == ""
+        assert analyze.calls == 0
+
+    def test_convert_policy(self):
+        converter = Converter("lalr")
+        result = converter.convert(bad_code)
+        assert not result.success
+        assert result.error_messages
+        result = converter.convert(bad_code, analysis = "never")
+        assert result.error_info == ""
+        with pytest.raises(ValueError):
+            converter.convert(bad_code, analysis = "always")
@@ -1,4 +1,6 @@
-from mp2c import Converter, compile_code
+import pickle
+
+from mp2c import Context, Converter, ValueSymbol, compile_code, library_functions
 
 
 def test_scope_success():
@@ -54,3 +56,49 @@ def test_scope_failure():
     converter = Converter()
     success, result = converter(scope_test_code)
     assert not success
+
+
+def test_shadowing():
+    context = Context()
+    context.enter_scope()
+    context.register_value("a", "int", True)
+    context.register_array("v", "int", [[1, 3]])
+    outer = context.get_value("a")
+    context.enter_scope()
+    context.register_value("a", "float", True)
+    assert context.get_value("a").type == "float"
+    array = context.get_array("v")
+    assert [(dimension.start, dimension.length) for dimension in array.dimensions] == [(1, 3)]
+    context.register_value("a", "char", True)
+    assert context.get_value("a").type == "char"
+    context.exit_scope()
+    assert context.get_value("a") is outer
+    context.exit_scope()
+    assert context.get_value("a") is None and context.get_array("v") is None
+    assert not context.values and not context.arrays
+
+
+def test_library_prelude():
+    first, second = Context(), Context()
+    for context in (first, second):
+        context.enter_scope()
+        assert context.get_func("sqrt") is None
+        context.declare_library_functions()
+    assert first.get_func("sqrt") is second.get_func("sqrt") is library_functions["sqrt"]
+    assert first.get_funcs() == {}
+    symbol = first.register_func("sqrt", ["int", "sqrt", "(", ")"], [], [])
+    assert first.get_func("sqrt") is symbol and not symbol.is_library
+    assert second.get_func("sqrt").is_library
+    first.enter_scope()
+    assert first.get_func("sqrt") is symbol
+    first.register_func("inner", ["void", "inner", "(", ")"], [], [])
+    assert first.get_funcs() == {}
+    first.exit_scope()
+    assert list(first.get_funcs()) == ["sqrt", "inner"]
+
+
+def test_symbol_slots():
+    symbol = ValueSymbol("name", "int", True, None)
+    assert not hasattr(symbol, "__dict__")
+    copy = pickle.loads(pickle.dumps(symbol))
+    assert (copy.name, copy.type, copy.mutable) == ("name", "int", True)
@@ -0,0 +1,140 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import mp2c
+from mp2c import Client, Converter, Server
+from mp2c.client import connect
+from mp2c.server import is_shutdown
+from test.programs import broken_code, data, program
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestServer:
+    def test_handle(self):
+        with Server() as server:
+            response = server.handle({"jsonrpc": "2.0", "id": 1, "method": "convert", "params": {"code": program}})
+            assert response["id"] == 1 and response["result"]["success"]
+            assert response["result"]["code"] == Converter("lalr").convert(program).code
+            result = server.handle({"jsonrpc": "2.0", "id": 2, "method": "convert",
+                                    "params": {"code": broken_code, "recover": True}})["result"]
+            expected = Converter("lalr", recover = True).convert(broken_code)
+            assert result["error_messages"] == expected.error_messages
+            assert [error["line"] for error in result["syntax_errors"]] == [2, 5, 5, 6]
+            result = server.handle({"jsonrpc": "2.0", "id": 3, "method": "run",
+                                    "params": {"code": program, "input": data}})["result"]
+            assert result["output"] == "total2035x\n42000x30x-7x12x\n14.750000-2147483648\n"
+            # the errors of JSON-RPC 2.0, and a notification, which is not answered
+            assert json.loads(server.handle_line("{"))["error"]["code"] == -32700
+            assert server.handle({"id": 4, "method": "convert"})["error"]["code"] == -32600
+            assert server.handle({"jsonrpc": "2.0", "id": 5, "method": "compile"})["error"]["code"] == -32601
+            assert server.handle({"jsonrpc": "2.0", "id": 6, "method": "convert",
+                                  "params": {"source": program}})["error"]["code"] == -32602
+            assert server.handle({"jsonrpc": "2.0", "id": 7, "method": "convert",
+                                  "params": {"code": program, "parser": "earley", "recover": True}})["error"][
+                       "code"] == -32602
+            assert server.handle({"jsonrpc": "2.0", "method": "convert", "params": {"code": program}}) is None
+            responses = server.handle([{"jsonrpc": "2.0", "id": 8, "method": "stats"},
+                                       {"jsonrpc": "2.0", "id": 9, "method": "convert", "params": [program]}])
+            assert [response["id"] for response in responses] == [8, 9]
+            assert responses[0]["result"]["converters"] == [["lalr", "builtin", 0, False, False],
+                                                            ["lalr", "builtin", 0, False, True]]
+            assert server.conversion_cache.stats["hits"] == 2
+
+    def test_stdio(self):
+        requests = [{"jsonrpc": "2.0", "id": index, "method": "convert", "params": {"code": program, "optimize": 1}}
+                    for index in range(8)]
+        requests.append({"jsonrpc": "2.0", "id": "stop", "method": "shutdown"})
+        requests.append({"jsonrpc": "2.0", "id": "late", "method": "stats"})
+        stdin = io.StringIO("".join(json.dumps(request) + "\n" for request in requests))
+        stdout = io.StringIO()
+        with Server(jobs = 4) as server:
+            server.serve_stdio(stdin, stdout)
+        responses = {response["id"]: response for response in map(json.loads, stdout.getvalue().splitlines())}
+        # the requests after the shutdown are not read
+        assert sorted(responses, key = str) == [0, 1, 2, 3, 4, 5, 6, 7, "stop"]
+        expected = Converter("lalr", optimize = 1).convert(program).code
+        assert all(responses[index]["result"]["code"] == expected for index in range(8))
+        # only the method of a request stops the server, not its parameters
+        assert is_shutdown('{"jsonrpc": "2.0", "id": 1, "method": "shutdown"}')
+        assert is_shutdown('[{"jsonrpc": "2.0", "id": 1, "method": "stats"}, {"jsonrpc": "2.0", "method": "shutdown"}]')
+        assert not is_shutdown(json.dumps({"jsonrpc": "2.0", "id": "shutdown", "method": "run",
+                                           "params": {"code": program, "input": "shutdown", "engine": "shutdown"}}))
+        assert not is_shutdown('{"method": "shutdown"')
+
+    def test_run_timeout(self):
+        endless_code = "program p; var a: integer; begin a := 0; while a = 0 do a := 0; writeln(a) end."
+        with Server(run_timeout = 0.5) as server:
+            assert server.run(endless_code) == {"output": "Timeout after 0.5 s"}
+            assert server.run(endless_code, timeout = 0.2) == {"output": "Timeout after 0.2 s"}
+            assert server.run(program, data) == {"output": "total2035x\n42000x30x-7x12x\n14.750000-2147483648\n"}
+
+    def test_socket(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("MP2C_CACHE_DIR", str(tmp_path))
+        assert connect() is None
+        ready = threading.Event()
+        with Server() as server:
+            thread = threading.Thread(target = server.serve, kwargs = {"on_ready": lambda address: ready.set()})
+            thread.start()
+            assert ready.wait(30)
+            clients = [connect() for _ in range(4)]
+            assert all(isinstance(client, Client) for client in clients)
+            outputs = [None] * len(clients)
+
+            def work(index):
+                outputs[index] = clients[index].run(program, data, engine = "c")
+
+            threads = [threading.Thread(target = work, args = (index,)) for index in range(len(clients))]
+            for worker in threads:
+                worker.start()
+            for worker in threads:
+                worker.join()
+            assert outputs == ["total2035x\n42000x30x-7x12x\n14.750000-2147483648\n"] * len(clients)
+            assert clients[0].convert(program)["code"] == Converter("lalr").convert(program).code
+            assert clients[0].stats()["executable_cache"]["misses"] == 1
+            clients[0].shutdown()
+            thread.join(30)
+            for client in clients:
+                client.close()
+        assert not thread.is_alive() and not (tmp_path / "server.json").exists()
+        assert connect() is None
+
+    def test_exports(self):
+        namespace = {}
+        exec("from mp2c import *", namespace)
+        for name in ("Converter", "Server", "ExecutableCache", "Context", "compile_code", "preprocess",
+                     "visit_programstruct", "rules", "lalr_rules"):
+            assert namespace[name] is getattr(mp2c, name)
+        assert "os" not in namespace and "_exports" not in namespace
+        assert {"Converter", "Client", "compile_code"} <= set(dir(mp2c))
+        # the client starts without importing lark and the converter
+        code = "import sys, mp2c; mp2c.Client; print('lark' in sys.modules)"
+        assert subprocess.run([sys.executable, "-c", code], capture_output = True, text = True).stdout == "False\n"
+
+    def test_cli(self, tmp_path):
+        input_path = tmp_path / "t.pas"
+        input_path.write_text("program t; var a: integer; begin read(a); writeln(a * 7) end.")
+        ready = threading.Event()
+        with Server() as server:
+            thread = threading.Thread(target = server.serve, kwargs = {"on_ready": lambda address: ready.set()})
+            thread.start()
+            assert ready.wait(30)
+            try:
+                command = [sys.executable, "main.py", "-i", str(input_path)]
+                process = subprocess.run(command + ["--run"], cwd = PROJECT_DIR, capture_output = True, text = True,
+                                         input = "6\n", timeout = 60)
+                assert process.stdout == "42\n"
+                assert server.stats["methods"]["run"] == 1
+                # an output error is raised once the server has answered, without converting the file again
+                process = subprocess.run(command + ["-o", str(tmp_path / "missing" / "t.c")], cwd = PROJECT_DIR,
+                                         capture_output = True, text = True, timeout = 60)
+                assert process.returncode != 0 and "FileNotFoundError" in process.stderr
+                assert "report_server_result" in process.stderr and "convert_file" not in process.stderr
+                assert server.stats["methods"]["analyze"] == 1
+            finally:
+                server.shutdown()
+                thread.join(30)
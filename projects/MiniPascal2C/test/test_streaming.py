@@ -0,0 +1,48 @@
+import tracemalloc
+
+from mp2c import Converter, StreamingConverter, compile_code
+from test.programs import data, errors_code, generate_program, program
+
+
+class TestStreaming:
+    def test_same_code(self):
+        for options in ({}, {"optimize": 2}, {"fast_io": True, "optimize": 1}, {"format": "none"}):
+            expected = Converter("lalr", **options).convert(program)
+            result = StreamingConverter(**options).convert(program)
+            assert result.success and result.code == expected.code
+        result = StreamingConverter().convert(program)
+        assert compile_code(result.code, data) == "total2035x\n42000x30x-7x12x\n14.750000-2147483648\n"
+
+    def test_errors(self):
+        converter = StreamingConverter()
+        expected = Converter("lalr").convert(errors_code)
+        result = converter.convert(errors_code)
+        assert not result.success and len(result.error_messages) == 6
+        assert result.error_messages == expected.error_messages and result.code == expected.code
+        result = converter.convert("program p; begin a := end.")
+        assert not result.success and result.code == ""
+        expected = Converter("lalr").convert("program p; begin a := end.")
+        # the expected tokens are listed from a set, in an order that depends on how the parser was built
+        assert result.error_messages[0].splitlines()[0] == expected.error_messages[0].splitlines()[0]
+        # the converter is reusable after errors
+        assert converter.convert(program).code == Converter("lalr").convert(program).code
+
+    def test_memory(self):
+        code = generate_program(100)
+        converters = [Converter("lalr"), StreamingConverter()]
+        peaks = []
+        for converter in converters:
+            converter.convert("program p; begin end.")
+            tracemalloc.start()
+            result = converter.convert(code)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            assert result.success
+        # the parse tree of the whole program is never built
+        assert peaks[1] * 4 < peaks[0]
+
+    def test_parser_cache(self, cache_dir):
+        assert StreamingConverter().convert(program).success
+        # the grammar analysis is cached in the cache directory of the test
+        assert (cache_dir / "lalr-transformer.lark").exists()
+        assert StreamingConverter(cache = False).convert(program).success
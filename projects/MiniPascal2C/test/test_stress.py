@@ -0,0 +1,136 @@
+import sys
+
+from lark import Tree
+
+from mp2c import Context, Converter, build_program, compile_code, emit_program, visit_programstruct
+from mp2c.formatter import format_tokens
+
+# Well above the recursion limit, so that any recursion per list item fails
+count = 100000
+
+program = "program stress; var a, b: integer; begin a := a + 1 end."
+
+
+def parse(code):
+    return Converter("lalr").parser.parse(code)
+
+
+def convert_tree(tree):
+    context = Context()
+    tokens = visit_programstruct(tree, context)
+    assert not context.on_error, context.error_messages
+    context = Context()
+    assert emit_program(build_program(tree, context)) == tokens
+    assert not context.on_error
+    return tokens
+
+
+class TestStress:
+    def test_recursion_limit(self):
+        assert count > 10 * sys.getrecursionlimit()
+
+    def test_long_statement_list(self):
+        tree = parse(program)
+        statement_list = next(tree.find_data("statement_list"))
+        statement = statement_list.children[0]
+        for _ in range(count - 1):
+            statement_list = Tree("statement_list", [statement_list, statement])
+        next(tree.find_data("compound_statement")).children[0] = statement_list
+        tokens = convert_tree(tree)
+        assert tokens.count("a") == 2 * count + 1
+        code = format_tokens(tokens)
+        assert code.count("a = a + 1;") == count
+
+    def test_long_expressions(self):
+        tree = parse("program stress; var a, b: integer; begin a := 1 + 2; b := 2 * 3 end.")
+        for data in ("simple_expression", "term"):
+            node = next(node for node in tree.find_data(data) if len(node.children) == 3)
+            left, operator, right = node.children
+            for _ in range(count):
+                left = Tree(data, [left, operator, right])
+            node.children[0] = left
+        tokens = convert_tree(tree)
+        assert tokens.count("+") == count + 1
+        assert tokens.count("*") == count + 1
+
+    def test_long_else_if_chain(self):
+        tree = parse("program stress; var a, b: integer; begin if a = 1 then b := 1 else b := 2 end.")
+        node = next(tree.find_data("if_else_statement"))
+        condition, statement, else_part = node.children
+        for _ in range(count):
+            else_part = Tree("else_part", [Tree("statement", [Tree("if_else_statement",
+                                                                   [condition, statement, else_part])])])
+        node.children[2] = else_part
+        tokens = convert_tree(tree)
+        assert tokens.count("if") == count + 1
+        assert tokens.count("else") == count + 1
+        assert tokens.count("}") == 2 * count + 3
+
+    def test_convert_long_program(self):
+        statements = ["a := a + 1"] * 5000
+        statements.append("b := " + " + ".join(["a"] * 3000))
+        statements.append("if a = 0 then b := 0" + "".join(" else if a = {} then b := b - 1".format(i)
+                                                           for i in range(1, 1500)))
+        statements.append("writeln(b)")
+        code = "program stress; var a, b: integer; begin a := 0; " + ";\n".join(statements) + " end."
+        result = Converter("lalr").convert(code)
+        assert result.success
+        assert compile_code(result.code) == "{}\n".format(5000 * 3000)
+
+    def test_deep_factors(self):
+        tree = parse("program stress; var a, b: integer; begin a := -(b) end.")
+        node = next(tree.find_data("assign_statement"))
+        factor = next(subtree for subtree in node.iter_subtrees_topdown() if subtree.data == "factor")
+        sign, operand = factor.children
+        for index in range(count):
+            if index % 2:
+                operand = Tree("factor", [sign, operand])
+            else:
+                operand = Tree("factor", [Tree("expression", [Tree("simple_expression", [Tree("term", [operand])])])])
+        factor.children[1] = operand
+        tokens = convert_tree(tree)
+        assert tokens.count("-") == count // 2 + 1
+        assert tokens.count("(") == count // 2 + 1
+
+    def test_convert_deep_factors(self):
+        depth = 5000
+        expressions = ["(" * depth + "x" + ")" * depth, "- " * depth + "x", "- (" * depth + "x" + ")" * depth]
+        statements = ["writeln({})".format(expression) for expression in expressions]
+        statements.append("if " + "not " * depth + "(x > 0) then writeln(x)")
+        code = "program stress; var x: integer; begin read(x); " + ";\n".join(statements) + " end."
+        for optimize in (0, 1, 2):
+            converter = Converter("lalr", optimize = optimize)
+            result = converter.convert(code)
+            assert result.success
+            assert compile_code(result.code, "3\n") == "3\n3\n3\n3\n"
+            assert converter.run(code, "3\n") == "3\n3\n3\n3\n"
+
+    def test_convert_deep_expressions(self):
+        depth = 5000
+        expressions = ["(x - " * depth + "x" + ")" * depth, "f(" * depth + "x" + ")" * depth,
+                       "a[" * depth + "1" + "]" * depth]
+        statements = ["writeln({})".format(expression) for expression in expressions]
+        code = ("program stress; var x: integer; a: array[0..1] of integer; function f(b: integer): integer; "
+                "begin f := b end; begin read(x); a[1] := 1; " + ";\n".join(statements) + " end.")
+        for optimize in (0, 1, 2):
+            converter = Converter("lalr", optimize = optimize)
+            result = converter.convert(code)
+            assert result.success
+            assert compile_code(result.code, "3\n") == "3\n3\n1\n"
+            assert converter.run(code, "3\n") == "3\n3\n1\n"
+
+    def test_convert_deep_statements(self):
+        # each loop of the loop optimizer walks its body, so the nested loops are not as deep as the expressions
+        depth = 1000
+        statements = ["begin " * depth + "x := x + 1" + " end" * depth, "if x > 0 then " * depth + "x := x + 1",
+                      "while x < 10 do " * depth + "x := x + 1", "for i := 1 to 1 do " * depth + "x := x + i",
+                      "writeln(x)", "q(x)", "writeln(x)"]
+        code = ("program stress; var x, i: integer; procedure q(var a: integer); var t: integer; begin t := 0; "
+                + "if a > 0 then " * depth + "t := t + a; a := t + 1 end; begin read(x); " + ";\n".join(statements)
+                + " end.")
+        for optimize in (0, 1, 2):
+            converter = Converter("lalr", optimize = optimize)
+            result = converter.convert(code)
+            assert result.success
+            assert compile_code(result.code, "3\n") == "11\n12\n"
+            assert converter.run(code, "3\n") == "11\n12\n"
@@ -0,0 +1,85 @@
+import asyncio
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from mp2c import Converter, ToolPool, compile_code
+from mp2c.batch import convert_batch
+from mp2c.utils import format_code
+
+# A stand-in for clang-format: upper-cases the files given after "-i" and logs each invocation
+upper_script = """
+import sys
+log, paths = sys.argv[1], sys.argv[3:]
+with open(log, "a") as file:
+    file.write("{}\\n".format(len(paths)))
+for path in paths:
+    with open(path) as file:
+        code = file.read()
+    with open(path, "w") as file:
+        file.write(code.upper())
+"""
+
+
+class TestToolPool:
+    def test_batching(self, tmp_path):
+        log = tmp_path / "log"
+        command = [sys.executable, "-c", upper_script, str(log)]
+        with ToolPool(max_workers = 2, batch_size = 4, batch_delay = 0.05, format_command = command) as pool:
+            futures = [pool.submit_format("code {}".format(i)) for i in range(10)]
+            assert [future.result() for future in futures] == ["CODE {}".format(i) for i in range(10)]
+        assert sorted(int(line) for line in log.read_text().split()) == [2, 4, 4]
+
+    def test_async(self, tmp_path):
+        command = [sys.executable, "-c", upper_script, str(tmp_path / "log")]
+
+        async def run(pool):
+            return await asyncio.gather(*(pool.aformat("x{}".format(i)) for i in range(5)))
+
+        with ToolPool(format_command = command) as pool:
+            assert asyncio.run(run(pool)) == ["X{}".format(i) for i in range(5)]
+
+    def test_timeout(self):
+        command = [sys.executable, "-c", "import time; time.sleep(10)"]
+        with ToolPool(timeout = 0.2, format_command = command) as pool:
+            with pytest.raises(subprocess.TimeoutExpired):
+                pool.format("int main() {}")
+
+    def test_closed(self):
+        pool = ToolPool()
+        pool.close()
+        with pytest.raises(RuntimeError):
+            pool.submit_format("")
+
+    def test_analyze_split(self, tmp_path):
+        script = "import sys\nfor path in sys.argv[1:]:\n    print(path + ':1:1: warning: ' + open(path).read())"
+        with ToolPool(analyze_command = [sys.executable, "-c", script]) as pool:
+            futures = [pool.submit_analyze("unit{}".format(i)) for i in range(3)]
+            outputs = [future.result() for future in futures]
+        for i, output in enumerate(outputs):
+            assert output.endswith("tu{}.c:1:1: warning: unit{}\n".format(i, i))
+
+    @pytest.mark.skipif(shutil.which("clang-format") is None, reason = "clang-format is not installed")
+    def test_clang_format(self, tmp_path):
+        code = "program t; var a: integer; begin a := 6 * 7; writeln(a) end."
+        with ToolPool() as pool:
+            result = Converter("lalr", format = "clang", tool_pool = pool).convert(code)
+            expected = Converter("lalr", format = "clang").convert(code).code
+            assert result.code == expected
+            assert compile_code(result.code) == "42\n"
+            assert pool.format("int main(){return 0;}") == format_code("int main(){return 0;}")
+
+    @pytest.mark.skipif(shutil.which("clang-format") is None, reason = "clang-format is not installed")
+    def test_batch_clang(self, tmp_path):
+        for i in range(3):
+            (tmp_path / "p{}.pas".format(i)).write_text(
+                "program p; var a: integer; begin a := {}; writeln(a) end.".format(i))
+        sources = sorted(str(path) for path in tmp_path.glob("*.pas"))
+        summary = convert_batch(sources, str(tmp_path / "out"), jobs = 2, format = "clang")
+        assert summary["succeeded"] == 3
+        for i, record in enumerate(summary["files"]):
+            assert "code" not in record
+            with open(record["output"]) as file:
+                assert compile_code(file.read()) == "{}\n".format(i)